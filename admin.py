@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify, session
 from flask import current_app
-from utils.emails import send_email
+from utils.outbox import queue_email
+from utils import ratings
+from utils.search import mark_reviewer_salons_changed, mark_salon_changed
+from utils.cache import invalidate_salon
 from utils.logerror import log_error
+from utils.streaming import iter_rows, server_cursor, stream_json
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -28,7 +32,7 @@ def get_users():
             return jsonify({'error': 'Unauthorized access'}), 403
         
         mysql = current_app.config['MYSQL']
-        cursor = mysql.connection.cursor()
+        cursor = server_cursor(mysql.connection)
         query = """
             select *
             from users
@@ -36,11 +40,7 @@ def get_users():
             order by 'role'
         """
         cursor.execute(query)
-        rows = cursor.fetchall()
-        cols = [desc[0] for desc in cursor.description]
-        cursor.close()
-        data = [dict(zip(cols, row)) for row in rows]
-        return jsonify({'users': data}), 200
+        return stream_json(iter_rows(cursor), key='users', cursor=cursor)
     except Exception as e:
         #save error to audit logs
         log_error(str(e), session.get("user_id"))
@@ -213,15 +213,12 @@ def verifySalon():
             """, (salon_id,))
         
         #notify the owner via email
-            try:
-                send_email(
-                    to=salon_email,
-                    subject="Salon Application Approved",
-                    body=f"Dear {salon_name},\n\nCongratulations! Your salon application has been approved. You can now start offering your services on our platform.\n\nBest regards,\nSalon Management Team"
-                )
-            except Exception as e:
-                log_error(str(e), session.get("user_id"))
-                print(f"Failed to send approval email: {e}")
+            queue_email(
+                conn,
+                to=salon_email,
+                subject="Salon Application Approved",
+                body=f"Dear {salon_name},\n\nCongratulations! Your salon application has been approved. You can now start offering your services on our platform.\n\nBest regards,\nSalon Management Team"
+            )
         else:
             reason = data.get("reason", "No reason provided")
             #log the reason for rejection
@@ -237,15 +234,12 @@ def verifySalon():
                 values (%s, %s, %s)
             """, (owner_id, "Salon Application Rejected", f"Dear {salon_name}, your salon application has been rejected for the following reason: {reason}"))
 
-            try:
-                send_email(
-                    to=salon_email,
-                    subject="Salon Application Rejected",
-                    body=f"Dear {salon_name},\n\nWe regret to inform you that your salon application has been rejected for the following reason:\n\n{reason}\n\nIf you have any questions, please contact our support team.\n\nBest regards,\nSalon Management Team"
-                )
-            except Exception as e:
-                log_error(str(e), session.get("user_id"))
-                print(f"Failed to send rejection email: {e}")
+            queue_email(
+                conn,
+                to=salon_email,
+                subject="Salon Application Rejected",
+                body=f"Dear {salon_name},\n\nWe regret to inform you that your salon application has been rejected for the following reason:\n\n{reason}\n\nIf you have any questions, please contact our support team.\n\nBest regards,\nSalon Management Team"
+            )
 
             #delete the salon's data from all related tables
             cursor.execute("""
@@ -257,6 +251,7 @@ def verifySalon():
                 WHERE product_id IN (SELECT product_id FROM products WHERE salon_id = %s)
                 OR service_id IN (SELECT service_id FROM services WHERE salon_id = %s)
             """, (salon_id, salon_id))
+            ratings.remove_salon_reviews(conn, salon_id)
             cursor.execute("DELETE FROM reviews WHERE salon_id = %s", (salon_id,))
             cursor.execute("""
                 DELETE FROM invoices 
@@ -277,7 +272,9 @@ def verifySalon():
             cursor.execute("DELETE FROM salons WHERE salon_id = %s", (salon_id,))
             cursor.execute("SET FOREIGN_KEY_CHECKS = 1;")
 
+        mark_salon_changed(conn, salon_id)
         conn.commit()
+        invalidate_salon(salon_id)
         cursor.close()
         return jsonify({
             "message": "Data received successfully",
@@ -330,15 +327,12 @@ def deleteUser():
         user_name = user_data[2]
 
         #notify why the account was deleted
-        try:
-            send_email(
-                to=user_email,
-                subject="Account Deletion Notice",
-                body=f"Dear {user_name},\n\nWe would like to inform you that your account has been deleted by the administration team. If you have any questions or believe this was done in error, please contact our support team.\n\nBest regards,\nSalon Management Team"
-            )
-        except Exception as e:
-            log_error(str(e), session.get("user_id"))
-            print(f"Failed to send account deletion email: {e}")
+        queue_email(
+            conn,
+            to=user_email,
+            subject="Account Deletion Notice",
+            body=f"Dear {user_name},\n\nWe would like to inform you that your account has been deleted by the administration team. If you have any questions or believe this was done in error, please contact our support team.\n\nBest regards,\nSalon Management Team"
+        )
 
         cursor.execute("SET FOREIGN_KEY_CHECKS = 0;")
 
@@ -349,6 +343,7 @@ def deleteUser():
 
             if owned_salon:
                 salon_id = owned_salon[0]
+                mark_salon_changed(conn, salon_id)
                 cursor.execute("SET FOREIGN_KEY_CHECKS = 0;")
                 cursor.execute("DELETE FROM salon_analytics WHERE salon_id = %s", (salon_id,))
                 cursor.execute("DELETE FROM promotions WHERE salon_id = %s", (salon_id,))
@@ -367,6 +362,9 @@ def deleteUser():
                 cursor.execute("DELETE FROM salons WHERE salon_id = %s", (salon_id,))
                 cursor.execute("SET FOREIGN_KEY_CHECKS = 1;")
         
+        #their ratings leave the salons they reviewed
+        mark_reviewer_salons_changed(conn, user_id)
+        ratings.remove_customer_reviews(conn, user_id)
         cursor.execute("DELETE FROM reviews WHERE customer_id = %s", (user_id,))
         cursor.execute("DELETE FROM review_replies WHERE user_id = %s", (user_id,))
         cursor.execute("DELETE FROM user_history WHERE user_id = %s", (user_id,))
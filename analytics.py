@@ -1,10 +1,18 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, Response, jsonify, request, current_app, session
 from datetime import datetime, timezone, timedelta
 from MySQLdb.cursors import DictCursor
+import hmac
 import time
-import os
-import json
 from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from utils import reminders, rollups
+from utils.cache import response_cache
+from utils.throttle import throttle
+from utils.logerror import error_pipeline
+from utils.metrics import prometheus_text, request_metrics
+from utils.profiler import sql_profiler
+from utils.streaming import iter_rows, server_cursor, stream_json
 
 analytics_bp = Blueprint('analytics', __name__)
 
@@ -12,41 +20,19 @@ analytics_bp = Blueprint('analytics', __name__)
 # IN-MEMORY MONITORING STORAGE (No database changes needed!)
 # ============================================================================
 
-# Store errors in memory (last 1000 errors)
-error_log = deque(maxlen=1000)
+# Recent errors and per-endpoint error counts live in the error pipeline
+error_log = error_pipeline.recent
+error_stats = error_pipeline.by_endpoint
 
 # Store uptime checks in memory (last 500 checks)
 uptime_checks = deque(maxlen=500)
 
-# Error statistics by endpoint
-error_stats = defaultdict(lambda: {'count': 0, 'last_error': None})
-
 # Response time tracking
 response_times = deque(maxlen=100)
 
 def log_error_memory(error_type, endpoint, error_message, stack_trace=None):
-    """Log errors to in-memory storage"""
-    error_entry = {
-        'timestamp': datetime.now(timezone.utc).isoformat(),
-        'error_type': error_type,
-        'endpoint': endpoint,
-        'error_message': error_message,
-        'stack_trace': stack_trace
-    }
-    error_log.append(error_entry)
-    error_stats[endpoint]['count'] += 1
-    error_stats[endpoint]['last_error'] = datetime.now(timezone.utc)
-
-    # Also log to file for persistence
-    try:
-        log_dir = 'logs'
-        os.makedirs(log_dir, exist_ok=True)
-        log_file = os.path.join(log_dir, f'errors_{datetime.now().strftime("%Y%m%d")}.log')
-
-        with open(log_file, 'a') as f:
-            f.write(f"{json.dumps(error_entry)}\n")
-    except Exception as e:
-        print(f"Failed to write error log: {e}")
+    """Log monitoring errors through the error pipeline (memory + batched persistence)"""
+    error_pipeline.record(error_message, stack_trace, endpoint, error_type=error_type)
 
 def log_uptime_check(status, response_time_ms):
     """Log uptime checks to in-memory storage"""
@@ -262,38 +248,33 @@ def admin_error_statistics():
 
 @analytics_bp.route('/admin/performance-metrics', methods=['GET'])
 def admin_performance_metrics():
-    """Get performance metrics from in-memory data"""
+    """Per-route latency percentiles, DB time and query counts, plus subsystem stats"""
     try:
-        if not response_times:
-            return jsonify({
-                'response_time_stats': {
-                    'avg_response': 0,
-                    'min_response': 0,
-                    'max_response': 0,
-                    'median_response': 0
-                },
-                'slow_responses_count': 0,
-                'total_checks': 0
-            })
-
-        sorted_times = sorted(response_times)
-        median_idx = len(sorted_times) // 2
-
-        stats = {
-            'avg_response': sum(response_times) / len(response_times),
-            'min_response': min(response_times),
-            'max_response': max(response_times),
-            'median_response': sorted_times[median_idx]
-        }
-
-        slow_count = sum(1 for t in response_times if t > 1000)
+        mysql = current_app.config['MYSQL']
+        pool_stats = mysql.pool_stats() if hasattr(mysql, 'pool_stats') else None
+        sort = request.args.get('sort', 'p99')
+        if sort not in ('p50', 'p95', 'p99', 'avg', 'max', 'count'):
+            return jsonify({'error': 'sort must be one of p50, p95, p99, avg, max, count'}), 400
+        snapshot = request_metrics.snapshot(sort=sort, limit=request.args.get('limit', type=int))
+        overall = snapshot['overall']
 
         return jsonify({
             'response_time_stats': {
-                k: round(v, 2) for k, v in stats.items()
+                'avg_response': overall['avg'] or 0,
+                'min_response': overall['min'] or 0,
+                'max_response': overall['max'] or 0,
+                'median_response': overall['p50'] or 0,
+                'p95_response': overall['p95'] or 0,
+                'p99_response': overall['p99'] or 0
             },
-            'slow_responses_count': slow_count,
+            'slow_responses_count': overall['over_1s'],
+            'total_requests': overall['count'],
             'total_checks': len(response_times),
+            'routes': snapshot['routes'],
+            'connection_pool': pool_stats,
+            'response_cache': response_cache.stats(),
+            'throttle': throttle.stats(),
+            'error_pipeline': error_pipeline.stats(),
             'timestamp': datetime.now(timezone.utc).isoformat()
         })
 
@@ -301,6 +282,48 @@ def admin_performance_metrics():
         log_error_memory('performance_metrics_error', '/admin/performance-metrics', str(e))
         return jsonify({'error': str(e)}), 500
 
+@analytics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Per-route request metrics in Prometheus text format (admin session, or METRICS_TOKEN as a bearer token)"""
+    token = current_app.config.get('METRICS_TOKEN')
+    scraper = token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not scraper and session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized access'}), 403
+    return Response(prometheus_text(), mimetype='text/plain; version=0.0.4')
+
+@analytics_bp.route('/admin/sql-profile', methods=['GET'])
+def admin_sql_profile():
+    """Slowest recent statements and handlers flagged for too many or repeated queries"""
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized access'}), 403
+    try:
+        result = sql_profiler.report(limit=request.args.get('limit', 50, type=int))
+        result['timestamp'] = datetime.now(timezone.utc).isoformat()
+        return jsonify(result)
+    except Exception as e:
+        log_error_memory('sql_profile_error', '/admin/sql-profile', str(e))
+        return jsonify({'error': str(e)}), 500
+
+@analytics_bp.route('/admin/sql-profile/reset', methods=['POST'])
+def admin_sql_profile_reset():
+    """Clear the slow-query log and flagged handler counts"""
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized access'}), 403
+    sql_profiler.reset()
+    return jsonify({'message': 'SQL profile cleared'})
+
+@analytics_bp.route('/admin/reminder-metrics', methods=['GET'])
+def admin_reminder_metrics():
+    """Appointment reminders pending, queued, sent and failed"""
+    try:
+        mysql = current_app.config['MYSQL']
+        lead = timedelta(hours=current_app.config.get('REMINDER_LEAD_HOURS', 24))
+        result = reminders.reminder_metrics(mysql.connection, lead=lead)
+        result['timestamp'] = datetime.now(timezone.utc).isoformat()
+        return jsonify(result)
+    except Exception as e:
+        log_error_memory('reminder_metrics_error', '/admin/reminder-metrics', str(e))
+        return jsonify({'error': str(e)}), 500
 
 @analytics_bp.route('/health', methods=['GET'])
 def health_check():
@@ -346,50 +369,588 @@ def health_check():
 # YOUR EXISTING ANALYTICS ENDPOINTS (Keep all of these!)
 # ============================================================================
 
-# top 5 highest earning services
-@analytics_bp.route('/admin/top-earning-services', methods=['GET'])
-def admin_top_earning_services():
+# ============================================================================
+# ANALYTICS WIDGETS
+# ============================================================================
+# Every dashboard number is a widget: a function taking a DictCursor (and the
+# salon_id for salon widgets) and returning JSON-ready data. The single-widget
+# routes and the batched /admin/dashboard and /salon/<id>/dashboard endpoints
+# all go through the same functions.
+#
+# Revenue and appointment aggregates read from the analytics rollups
+# (utils/rollups.py). Lifetime numbers use the 'all' grain, trends the 'month'
+# grain, so each query touches one row per group instead of the order history.
+
+ADMIN_WIDGETS = {}
+SALON_WIDGETS = {}
+
+def admin_widget(name):
+    def register(fn):
+        ADMIN_WIDGETS[name] = fn
+        return fn
+    return register
+
+def salon_widget(name):
+    def register(fn):
+        SALON_WIDGETS[name] = fn
+        return fn
+    return register
+
+def query_widget(widget, *args):
     mysql = current_app.config['MYSQL']
     cursor = mysql.connection.cursor(DictCursor)
+    try:
+        return widget(cursor, *args)
+    finally:
+        cursor.close()
 
-    query = """
-        select salons.salon_id, salons.name as salon_name, services.service_id, services.name,
-               sum(invoices.total_amount) as revenue
-        from invoices
-        join appointments on appointments.appointment_id = invoices.appointment_id
-        join salons on salons.salon_id = appointments.salon_id
-        join services on appointments.service_id = services.service_id
-        group by services.service_id, salons.salon_id
-        order by revenue desc
+def first_row(rows):
+    """The single object (first row or null) these endpoints have always returned; dashboards get every row."""
+    return rows[0] if rows else None
+
+def stream_query(query, params=None):
+    """Unbounded widget query streamed as a JSON list instead of fetchall + jsonify."""
+    mysql = current_app.config['MYSQL']
+    cursor = server_cursor(mysql.connection)
+    cursor.execute(query, params)
+    return stream_json(iter_rows(cursor), cursor=cursor)
+
+#FOR ADMINS
+TOP_EARNING_SERVICES = """
+    select salons.salon_id, salons.name as salon_name, services.service_id, services.name,
+           r.revenue
+    from analytics_rollups r
+    join salons on salons.salon_id = r.salon_id
+    join services on services.service_id = r.dimension_id
+    where r.grain = 'all' and r.dimension = 'service' and r.quantity > 0
+    order by r.revenue desc
+"""
+
+TOP_EARNING_PRODUCTS = """
+    select salons.salon_id, salons.name as salon_name, products.product_id, products.name,
+           r.revenue
+    from analytics_rollups r
+    join salons on salons.salon_id = r.salon_id
+    join products on products.product_id = r.dimension_id
+    where r.grain = 'all' and r.dimension = 'product' and r.quantity > 0
+    order by r.revenue desc
+"""
+
+LOCATION_DEMOGRAPHICS = """
+    select city, state, count(*) as total_customers
+    from addresses
+    where entity_type = 'customer'
+    group by city, state
+    order by total_customers desc
+"""
+
+@admin_widget('top_earning_services')
+def top_earning_services(cursor, limit=5):
+    query = TOP_EARNING_SERVICES
+    if limit:
+        query += " limit %s"
+    cursor.execute(query, (limit,) if limit else None)
+    return cursor.fetchall()
+
+@admin_widget('top_earning_products')
+def top_earning_products(cursor, limit=5):
+    query = TOP_EARNING_PRODUCTS
+    if limit:
+        query += " limit %s"
+    cursor.execute(query, (limit,) if limit else None)
+    return cursor.fetchall()
+
+@admin_widget('top_salons_by_appointments')
+def top_salons_by_appointments(cursor):
+    cursor.execute("""
+        select salons.salon_id, salons.name, r.appointments as total_appointments
+        from analytics_rollups r
+        join salons on salons.salon_id = r.salon_id
+        where r.grain = 'all' and r.dimension = 'salon' and r.appointments > 0
+        order by total_appointments desc
+        limit 5
+    """)
+    return cursor.fetchall()
+
+def all_salons_by_appointments(cursor):
+    cursor.execute("""
+        select salons.salon_id, salons.name,
+               coalesce(r.appointments, 0) as total_appointments
+        from salons
+        left join analytics_rollups r
+            on r.grain = 'all' and r.dimension = 'salon' and r.dimension_id = salons.salon_id
+        where salons.is_verified = 1
+        order by total_appointments desc, salons.name asc
+    """)
+    return cursor.fetchall()
+
+@admin_widget('total_users')
+def total_users(cursor):
+    cursor.execute("select count(*) as total_users from users")
+    return cursor.fetchone()
+
+@admin_widget('total_salons')
+def total_salons(cursor):
+    cursor.execute("select count(*) as total_salons from salons where is_verified = 1")
+    return cursor.fetchone()
+
+@admin_widget('gender_distribution')
+def gender_distribution(cursor):
+    cursor.execute("""
+        select gender, count(*) as total_count
+        from users
+        group by gender
+    """)
+    return cursor.fetchall()
+
+@admin_widget('retention')
+def retention(cursor, days=30):
+    cursor.execute("""
+        select count(*) as active_users 
+        from users
+        where last_login >= date_sub(curdate(), interval %s day)
+    """, (days,))
+    return cursor.fetchone()
+
+@admin_widget('loyal_customers')
+def loyal_customers(cursor):
+    cursor.execute("""
+        select users.user_id, users.username, count(appointments.appointment_id) as total_appointments
+        from appointments
+        join users on users.user_id = appointments.customer_id
+        group by users.user_id
+        order by total_appointments desc
+        limit 10
+    """)
+    return cursor.fetchall()
+
+@admin_widget('points_redeemed')
+def points_redeemed(cursor):
+    cursor.execute("select sum(points_redeemed) as total_points_redeemed from customer_points")
+    return cursor.fetchone()
+
+@admin_widget('vouchers_redeemed')
+def vouchers_redeemed(cursor):
+    cursor.execute("""
+        select count(*) as total_vouchers_redeemed
+        from customer_vouchers
+        where redeemed = 1
+    """)
+    return cursor.fetchone()
+
+@admin_widget('age_demographics')
+def age_demographics(cursor):
+    cursor.execute("""
+        select 
+            case 
+                when (year(curdate()) - birth_year) < 18 then 'Under 18'
+                when (year(curdate()) - birth_year) between 18 and 24 then '18-24'
+                when (year(curdate()) - birth_year) between 25 and 34 then '25-34'
+                when (year(curdate()) - birth_year) between 35 and 44 then '35-44'
+                when (year(curdate()) - birth_year) between 45 and 54 then '45-54'
+                when (year(curdate()) - birth_year) between 55 and 64 then '55-64'
+                else '65+'
+            end as age_group,
+            count(*) as total_count
+        from users
+        group by age_group
+        order by age_group
+    """)
+    return cursor.fetchall()
+
+@admin_widget('location_demographics')
+def location_demographics(cursor):
+    cursor.execute(LOCATION_DEMOGRAPHICS)
+    return cursor.fetchall()
+
+#FOR SALON OWNERS
+def _salon_totals(cursor, salon_id):
+    cursor.execute("""
+        select revenue, quantity, appointments
+        from analytics_rollups
+        where grain = 'all' and dimension = 'salon' and dimension_id = %s
+    """, (salon_id,))
+    return cursor.fetchone() or {'revenue': None, 'quantity': 0, 'appointments': 0}
+
+@salon_widget('total_appointments')
+def salon_total_appointments_widget(cursor, salon_id):
+    return {'total_appointments': _salon_totals(cursor, salon_id)['appointments']}
+
+@salon_widget('total_revenue')
+def salon_total_revenue_widget(cursor, salon_id):
+    totals = _salon_totals(cursor, salon_id)
+    return {'total_revenue': totals['revenue'] if totals['quantity'] else None}
+
+@salon_widget('transactions_average')
+def salon_avg_transaction_widget(cursor, salon_id):
+    totals = _salon_totals(cursor, salon_id)
+    return {'avg_transaction': totals['revenue'] / totals['quantity'] if totals['quantity'] else None}
+
+@salon_widget('top_services')
+def salon_top_services_widget(cursor, salon_id):
+    cursor.execute("""
+        select services.service_id, services.name, r.appointments as total_appointments
+        from analytics_rollups r
+        join services on services.service_id = r.dimension_id
+        where r.salon_id = %s and r.grain = 'all' and r.dimension = 'service' and r.appointments > 0
+        order by total_appointments desc
+        limit 5
+    """, (salon_id,))
+    return cursor.fetchall()
+
+@salon_widget('top_products')
+def salon_top_products_widget(cursor, salon_id):
+    cursor.execute("""
+        select products.product_id, products.name, r.quantity as total_sold
+        from analytics_rollups r
+        join products on products.product_id = r.dimension_id
+        where r.salon_id = %s and r.grain = 'all' and r.dimension = 'product' and r.quantity > 0
+        order by total_sold desc
         limit 5
+    """, (salon_id,))
+    return cursor.fetchall()
+
+@salon_widget('appointment_trend')
+def salon_appointment_trend_widget(cursor, salon_id):
+    cursor.execute("""
+        select date_format(period, '%%Y-%%m') as month, appointments as total_appointments
+        from analytics_rollups
+        where salon_id = %s and grain = 'month' and dimension = 'salon' and appointments > 0
+        order by period asc
+    """, (salon_id,))
+    return cursor.fetchall()
+
+@salon_widget('revenue_trend')
+def salon_revenue_trend_widget(cursor, salon_id):
+    cursor.execute("""
+        select date_format(period, '%%Y-%%m') as month, revenue
+        from analytics_rollups
+        where salon_id = %s and grain = 'month' and dimension = 'salon' and quantity > 0
+        order by period asc
+    """, (salon_id,))
+    return cursor.fetchall()
+
+@salon_widget('appointments_status')
+def salon_appointment_status_widget(cursor, salon_id):
+    cursor.execute("""
+        select status, appointments as count
+        from analytics_status_rollups
+        where salon_id = %s and grain = 'all' and appointments > 0
+    """, (salon_id,))
+    return cursor.fetchall()
+
+@salon_widget('employees_appointments')
+def salon_employee_appointments_widget(cursor, salon_id):
+    cursor.execute("""
+        select employees.employee_id, employees.first_name, employees.last_name, r.appointments as total_appointments
+        from analytics_rollups r
+        join employees on employees.employee_id = r.dimension_id
+        where r.salon_id = %s and r.grain = 'all' and r.dimension = 'employee' and r.appointments > 0
+        order by total_appointments desc
+    """, (salon_id,))
+    return cursor.fetchall()
+
+@salon_widget('busiest_day')
+def salon_busiest_day_widget(cursor, salon_id):
+    cursor.execute("""
+        select dayofweek(period) as day_of_week, sum(appointments) as total_appointments
+        from analytics_rollups
+        where salon_id = %s and grain = 'day' and dimension = 'salon'
+        group by day_of_week
+        order by total_appointments desc
+        limit 1
+    """, (salon_id,))
+    return cursor.fetchone()
+
+@salon_widget('customers_top')
+def salon_top_customers_widget(cursor, salon_id):
+    cursor.execute("""
+        select users.user_id, users.username, count(appointments.appointment_id) as visits
+        from appointments 
+        join users on users.user_id = appointments.customer_id
+        where appointments.salon_id = %s
+        group by users.user_id
+        order by visits desc
+        limit 5
+    """, (salon_id,))
+    return cursor.fetchall()
+
+@salon_widget('customers_points_redeemed')
+def salon_points_redeemed_widget(cursor, salon_id):
+    cursor.execute("""
+        select customer_id, users.username, sum(points_redeemed) as total_points_redeemed
+        from customer_points
+        join users on customer_points.customer_id = users.user_id
+        where salon_id = %s
+        group by customer_id
+    """, (salon_id,))
+    return cursor.fetchall()
+
+@salon_widget('customers_vouchers_redeemed')
+def salon_vouchers_redeemed_widget(cursor, salon_id):
+    cursor.execute("""
+        select customer_vouchers.customer_id, users.username, count(*) as total_vouchers_redeemed
+        from customer_vouchers
+        join users on customer_vouchers.customer_id = users.user_id
+        where customer_vouchers.salon_id = %s and customer_vouchers.redeemed = 1
+        group by customer_vouchers.customer_id
+    """, (salon_id,))
+    return cursor.fetchall()
+
+# ============================================================================
+# BATCHED DASHBOARDS
+# ============================================================================
+
+# shared across requests; threads are only started on first use, so each
+# gunicorn worker gets its own after the fork
+DASHBOARD_WORKERS = 4
+_dashboard_executor = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix='dashboard')
+
+def _timed(widget, cursor, args):
+    started = time.perf_counter()
+    try:
+        entry = {'data': widget(cursor, *args)}
+    except Exception as e:
+        entry = {'error': str(e)}
+    entry['duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return entry
+
+def _run_lane(conn, widgets, names, args):
+    cursor = conn.cursor(DictCursor)
+    try:
+        return {name: _timed(widgets[name], cursor, args) for name in names}
+    finally:
+        cursor.close()
+
+def run_dashboard(widgets, *args):
+    """
+    Compute the requested widgets and return one document with per-widget
+    timings. With a pooled connection layer the widgets are split over the
+    request's connection and as many spare pooled connections as the pool
+    can give without waiting (keeping DASHBOARD_POOL_RESERVE free for other
+    requests, at most one per dashboard worker thread), so concurrent
+    dashboards never exhaust the pool; with no spare connection, or with
+    ?mode=sequential, they run back to back on the request's connection.
     """
+    requested = request.args.get('widgets')
+    names = [n for n in requested.split(',') if n in widgets] if requested else list(widgets)
+    mode = request.args.get('mode', 'concurrent')
 
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
+    mysql = current_app.config['MYSQL']
+    started = time.perf_counter()
+    results = {}
+    conn = mysql.connection
+
+    with ExitStack() as spares:
+        lanes = [conn]
+        if mode == 'concurrent' and hasattr(mysql, 'checkout_spare'):
+            reserve = current_app.config.get('DASHBOARD_POOL_RESERVE', 1)
+            while len(lanes) < min(len(names), DASHBOARD_WORKERS + 1):
+                spare = spares.enter_context(mysql.checkout_spare(reserve))
+                if spare is None:
+                    break
+                lanes.append(spare)
+        shares = [names[i::len(lanes)] for i in range(len(lanes))]
+        futures = [_dashboard_executor.submit(_run_lane, spare, widgets, share, args)
+                   for spare, share in zip(lanes[1:], shares[1:])]
+        results.update(_run_lane(conn, widgets, shares[0], args))
+        for future in futures:
+            results.update(future.result())
+
+    return {
+        'widgets': {name: results[name] for name in names},
+        'mode': 'concurrent' if len(lanes) > 1 else 'sequential',
+        'connections': len(lanes),
+        'total_ms': round((time.perf_counter() - started) * 1000, 2),
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    }
 
-# top 5 highest earning products
-@analytics_bp.route('/admin/top-earning-products', methods=['GET'])
-def admin_top_earning_products():
+@analytics_bp.route('/admin/dashboard', methods=['GET'])
+def admin_dashboard():
+    """All admin analytics widgets in one response (?widgets=a,b to select)"""
+    try:
+        return jsonify(run_dashboard(ADMIN_WIDGETS)), 200
+    except Exception as e:
+        log_error_memory('dashboard_error', '/admin/dashboard', str(e))
+        return jsonify({'error': str(e)}), 500
+
+@analytics_bp.route('/salon/<int:salon_id>/dashboard', methods=['GET'])
+def salon_dashboard(salon_id):
+    """All salon analytics widgets in one response (?widgets=a,b to select)"""
+    try:
+        result = run_dashboard(SALON_WIDGETS, salon_id)
+        result['salon_id'] = salon_id
+        return jsonify(result), 200
+    except Exception as e:
+        log_error_memory('dashboard_error', f'/salon/{salon_id}/dashboard', str(e))
+        return jsonify({'error': str(e)}), 500
+
+# ============================================================================
+# SINGLE-WIDGET ENDPOINTS
+# ============================================================================
+
+@analytics_bp.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Backfill analytics rollups from appointments and invoices."""
     mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
+    rollups.rebuild(mysql.connection)
+    print("Analytics rollups rebuilt")
 
-    query = """
-        select salons.salon_id, salons.name as salon_name, products.product_id, products.name,
-               sum(invoice_line_items.line_total) as revenue
-        from invoice_line_items
-        join products on invoice_line_items.product_id = products.product_id
-        join salons on salons.salon_id = products.salon_id
-        group by products.product_id, salons.salon_id
-        order by revenue desc
-        limit 5
-    """
+@analytics_bp.route('/admin/analytics/rebuild-rollups', methods=['POST'])
+def admin_rebuild_rollups():
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized access'}), 403
+    try:
+        mysql = current_app.config['MYSQL']
+        started = time.time()
+        rollups.rebuild(mysql.connection)
+        return jsonify({
+            'message': 'Analytics rollups rebuilt',
+            'duration_ms': round((time.time() - started) * 1000, 2)
+        }), 200
+    except Exception as e:
+        log_error_memory('rollup_rebuild', '/admin/analytics/rebuild-rollups', str(e))
+        return jsonify({'error': str(e)}), 500
 
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
+#FOR ADMINS
+# top 5 highest earning services
+@analytics_bp.route('/admin/top-earning-services', methods=['GET'])
+def admin_top_earning_services():
+    return jsonify(query_widget(top_earning_services))
 
-# Add all your other existing analytics endpoints here...
-# (I'm keeping the monitoring ones separate at the top)
+# top 5 highest earning products
+@analytics_bp.route('/admin/top-earning-products', methods=['GET'])
+def admin_top_earning_products():
+    return jsonify(query_widget(top_earning_products))
+
+# top 5 salons with most appointments
+@analytics_bp.route('/admin/top-salons-by-appointments', methods=['GET'])
+def admin_top_salons_by_appointments():
+    return jsonify(query_widget(top_salons_by_appointments))
+
+# ALL salons by appointments (INCLUDING verified salons with 0 appointments)
+@analytics_bp.route('/admin/all-salons-by-appointments', methods=['GET'])
+def admin_all_salons_by_appointments():
+    return jsonify(query_widget(all_salons_by_appointments))
+
+# ALL earning services (no limit)
+@analytics_bp.route('/admin/all-earning-services', methods=['GET'])
+def admin_all_earning_services():
+    return stream_query(TOP_EARNING_SERVICES)
+
+# ALL earning products (no limit)
+@analytics_bp.route('/admin/all-earning-products', methods=['GET'])
+def admin_all_earning_products():
+    return stream_query(TOP_EARNING_PRODUCTS)
+
+# total count of all users
+@analytics_bp.route('/admin/total-users', methods=['GET'])
+def admin_total_users():
+    return jsonify(query_widget(total_users))
+
+# total count of all VERIFIED salons
+@analytics_bp.route('/admin/total-salons', methods=['GET'])
+def admin_total_salons():
+    return jsonify(query_widget(total_salons))
+
+# total count of all genders
+@analytics_bp.route('/admin/gender-distribution', methods=['GET'])
+def admin_gender_distribution():
+    return jsonify(query_widget(gender_distribution))
+
+# retention rates
+@analytics_bp.route('/admin/retention', methods=['GET'])
+def admin_retention():
+    days = request.args.get('days', 30)
+    return jsonify(query_widget(retention, days))
+
+#most loyal customers by appointments made
+@analytics_bp.route('/admin/loyal-customers', methods=['GET'])
+def admin_loyal_customers():
+    return jsonify(query_widget(loyal_customers))
+
+# total points redeeemed platform wide
+@analytics_bp.route('/admin/points-redeemed', methods=['GET'])
+def admin_points_redeemed():
+    return jsonify(query_widget(points_redeemed))
+
+# total vouchers redeemed platform wide
+@analytics_bp.route('/admin/vouchers-redeemed', methods=['GET'])
+def admin_vouchers_redeemed():
+    return jsonify(query_widget(vouchers_redeemed))
+
+# demographics by age groups
+@analytics_bp.route('/admin/age-demographics', methods=['GET'])
+def admin_age_demographics():
+    return jsonify(query_widget(age_demographics))
+
+#demographics by location
+@analytics_bp.route('/admin/location-demographics', methods=['GET'])
+def admin_location_demographics():
+    return stream_query(LOCATION_DEMOGRAPHICS)
+
+#FOR SALON OWNERS
+# get salon's total appointments
+@analytics_bp.route('/salon/<int:salon_id>/total-appointments', methods=['GET'])
+def salon_total_appointments(salon_id):
+    return jsonify(query_widget(salon_total_appointments_widget, salon_id))
+
+# get salon's total revenue
+@analytics_bp.route('/salon/<int:salon_id>/total-revenue', methods=['GET'])
+def salon_total_revenue(salon_id):
+    return jsonify(query_widget(salon_total_revenue_widget, salon_id))
+
+# average transaction amount
+@analytics_bp.route('/salon/<int:salon_id>/transactions-average', methods=['GET'])
+def get_avg_transaction(salon_id):
+    return jsonify(query_widget(salon_avg_transaction_widget, salon_id))
+
+# get salon's top 5 popular services
+@analytics_bp.route('/salon/<int:salon_id>/top-services', methods=['GET'])
+def salon_top_services(salon_id):
+    return jsonify(query_widget(salon_top_services_widget, salon_id))
+
+# get salon's top 5 popular products
+@analytics_bp.route('/salon/<int:salon_id>/top-products', methods=['GET'])
+def salon_top_products(salon_id):
+    return jsonify(query_widget(salon_top_products_widget, salon_id))
+
+# get salon's appointment trends by month
+@analytics_bp.route('/salon/<int:salon_id>/appointment-trend', methods=['GET'])
+def salon_appointment_trend(salon_id):
+    return jsonify(query_widget(salon_appointment_trend_widget, salon_id))
+
+# revenue trend for a salon by month
+@analytics_bp.route('/salon/<int:salon_id>/revenue-trend', methods=['GET'])
+def salon_revenue_trend(salon_id):
+    return jsonify(query_widget(salon_revenue_trend_widget, salon_id))
+
+# number of canceled and completed appointments
+@analytics_bp.route('/salon/<int:salon_id>/appointments-status', methods=['GET'])
+def get_appointment_status_counts(salon_id):
+    return jsonify(query_widget(salon_appointment_status_widget, salon_id))
+
+# appointments per employee
+@analytics_bp.route('/salon/<int:salon_id>/employees-appointments', methods=['GET'])
+def get_employee_appointments(salon_id):
+    return jsonify(first_row(query_widget(salon_employee_appointments_widget, salon_id)))
+
+# busiest day of the week
+@analytics_bp.route('/salon/<int:salon_id>/appointments/busiest-day', methods=['GET'])
+def get_busiest_day(salon_id):
+    return jsonify(query_widget(salon_busiest_day_widget, salon_id))
+
+# top 5 frequent customers for a salon
+@analytics_bp.route('/salon/<int:salon_id>/customers-top', methods=['GET'])
+def get_top_customers(salon_id):
+    return jsonify(query_widget(salon_top_customers_widget, salon_id))
+
+# points redeemed per customer
+@analytics_bp.route('/salon/<int:salon_id>/customers-points-redeemed', methods=['GET'])
+def get_points_redeemed(salon_id):
+    return jsonify(first_row(query_widget(salon_points_redeemed_widget, salon_id)))
+
+# vouchers redeemed per customer
+@analytics_bp.route('/salon/<int:salon_id>/customers-vouchers-redeemed', methods=['GET'])
+def get_vouchers_redeemed(salon_id):
+    return jsonify(first_row(query_widget(salon_vouchers_redeemed_widget, salon_id)))
@@ -1,15 +1,24 @@
 from flask import Flask
-from flask_mysqldb import MySQL
+from werkzeug.middleware.proxy_fix import ProxyFix
+from utils.db_pool import PooledMySQL
 from flask_cors import CORS
 from flask_mail import Mail
 from apscheduler.schedulers.background import BackgroundScheduler
 from flasgger import Swagger
 from datetime import datetime, timedelta, timezone
-from utils.emails import send_email
+import os
+from utils.outbox import start_outbox_workers, OutboxWorker
+from utils import booking, exports, inventory, ratings, reminders, search, summary
+from utils.cache import init_cache
+from utils.credentials import init_credentials, migrate_legacy_passwords
+from utils.throttle import init_throttle
+from utils.logerror import error_pipeline
+from utils.metrics import init_metrics
+from utils.profiler import init_profiler
+from utils.schema import ensure_schema, registered_tables
+from utils.threads import backfill_paths
 from start_time import SERVER_START_TIME
 
-from flask import Blueprint, jsonify, request, current_app
-from MySQLdb.cursors import DictCursor
 
 app = Flask(__name__)
 CORS(app)
@@ -20,7 +29,63 @@ app.config.update(
     MYSQL_HOST='localhost',
     MYSQL_USER='root',
     MYSQL_PASSWORD='Luca15',
-    MYSQL_DB='salon'
+    MYSQL_DB='salon',
+    MYSQL_POOL_SIZE=int(os.environ.get('MYSQL_POOL_SIZE', 5)),
+    MYSQL_POOL_TIMEOUT=10,
+    MYSQL_POOL_RECYCLE=3600,
+    DASHBOARD_POOL_RESERVE=1
+)
+
+app.config.update(
+    EMAIL_OUTBOX_WORKERS=int(os.environ.get('EMAIL_OUTBOX_WORKERS', 2)),
+    EMAIL_OUTBOX_BATCH_SIZE=50,
+    EMAIL_OUTBOX_RATE=10,
+    EMAIL_OUTBOX_MAX_ATTEMPTS=5,
+    REMINDER_LEAD_HOURS=24,
+    REMINDER_SCAN_MINUTES=5,
+    STOCK_RESERVATION_MINUTES=15,
+    STOCK_SWEEP_MINUTES=1,
+    IDEMPOTENCY_KEY_HOURS=24,
+    EXPORT_DIR=os.environ.get('EXPORT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'export_files')),
+    EXPORT_CHUNK_SIZE=5000,
+    EXPORT_POLL_SECONDS=15,
+    EXPORT_RETENTION_DAYS=7,
+    SEARCH_REFRESH_SECONDS=60,
+    SALON_SUMMARY_SYNC_SECONDS=10,
+    SALON_SUMMARY_REBUILD_HOURS=6,
+    RATING_REPAIR_HOURS=24
+)
+
+app.config.update(
+    CACHE_ENABLED=os.environ.get('CACHE_ENABLED', '1') != '0',
+    CACHE_TTL=60,
+    CACHE_MAXSIZE=2048,
+    CACHE_REDIS_URL=os.environ.get('CACHE_REDIS_URL'),
+    CONDITIONAL_GET_ENABLED=True
+)
+
+app.config.update(
+    CREDENTIAL_WORKERS=int(os.environ.get('CREDENTIAL_WORKERS', 2)),
+    CREDENTIAL_MAX_PENDING=32,
+    CREDENTIAL_WAIT_SECONDS=5,
+    LEGACY_PLAINTEXT_PASSWORDS=os.environ.get('LEGACY_PLAINTEXT_PASSWORDS', '1') != '0',
+    THROTTLE_ENABLED=True,
+    THROTTLE_LIMITS={},
+    THROTTLE_REDIS_URL=os.environ.get('THROTTLE_REDIS_URL'),
+    PROXY_FIX_HOPS=int(os.environ.get('PROXY_FIX_HOPS', 0)),
+    ERROR_LOG_QUEUE_SIZE=10000,
+    ERROR_LOG_BATCH_SIZE=500,
+    ERROR_LOG_FLUSH_SECONDS=5
+)
+
+app.config.update(
+    SQL_PROFILER_ENABLED=os.environ.get('SQL_PROFILER_ENABLED', '1') != '0',
+    SQL_PROFILER_SAMPLE_RATE=float(os.environ.get('SQL_PROFILER_SAMPLE_RATE', 0.05)),
+    SQL_SLOW_QUERY_MS=200,
+    SQL_QUERY_LIMIT=25,
+    SQL_REPEAT_LIMIT=5,
+    STREAM_FETCH_SIZE=500,
+    METRICS_TOKEN=os.environ.get('METRICS_TOKEN')
 )
 
 app.config['MAIL_SERVER'] = 'smtp.gmail.com'
@@ -31,9 +96,19 @@ app.config['MAIL_USERNAME'] = "wearevanity.co@gmail.com"
 app.config['MAIL_PASSWORD'] = "xsqlypwrnixgxrct"
 app.config['MAIL_DEFAULT_SENDER'] = app.config['MAIL_USERNAME']
 
-mysql = MySQL(app)
+mysql = PooledMySQL(app)
 mail = Mail(app)
 app.config['MYSQL'] = mysql
+init_cache(app)
+init_credentials(app)
+init_throttle(app)
+#deployments behind reverse proxies set PROXY_FIX_HOPS to how many there are, so
+#remote_addr (the per-IP throttle key) is the client from X-Forwarded-For, not the
+#proxy; off by default, otherwise any client could pick its own IP per request
+if app.config['PROXY_FIX_HOPS']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_HOPS'])
+init_metrics(app)
+init_profiler(app)
 
 app.config[SERVER_START_TIME] = datetime.now(timezone.utc)
 
@@ -49,603 +124,6 @@ swagger_template = {
 
 Swagger(app, template=swagger_template) 
 
-analytics_bp = Blueprint('analytics', __name__)
-
-#FOR ADMINS
-# top 5 highest earning services
-@analytics_bp.route('/admin/top-earning-services', methods=['GET'])
-def admin_top_earning_services():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select salons.salon_id, salons.name as salon_name, services.service_id, services.name,
-               sum(invoices.total_amount) as revenue
-        from invoices
-        join appointments on appointments.appointment_id = invoices.appointment_id
-        join salons on salons.salon_id = appointments.salon_id
-        join services on appointments.service_id = services.service_id
-        group by services.service_id, salons.salon_id
-        order by revenue desc
-        limit 5
-    """
-
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-# top 5 highest earning products
-@analytics_bp.route('/admin/top-earning-products', methods=['GET'])
-def admin_top_earning_products():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select salons.salon_id, salons.name as salon_name, products.product_id, products.name,
-               sum(invoice_line_items.line_total) as revenue
-        from invoice_line_items
-        join products on invoice_line_items.product_id = products.product_id
-        join salons on salons.salon_id = products.salon_id
-        group by products.product_id, salons.salon_id
-        order by revenue desc
-        limit 5
-    """
-
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-# top 5 salons with most appointments
-@analytics_bp.route('/admin/top-salons-by-appointments', methods=['GET'])
-def admin_top_salons_by_appointments():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select salons.salon_id, salons.name, count(appointments.appointment_id) as total_appointments
-        from appointments
-        join salons on salons.salon_id = appointments.salon_id
-        group by salons.salon_id
-        order by total_appointments desc
-        limit 5
-    """
-
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-# total count of all users
-@analytics_bp.route('/admin/total-users', methods=['GET'])
-def admin_total_users():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = "select count(*) as total_users from users"
-    cursor.execute(query)
-    result = cursor.fetchone()
-    cursor.close()
-    return jsonify(result)
-
-# total count of all VERIFIED salons
-@analytics_bp.route('/admin/total-salons', methods=['GET'])
-def admin_total_salons():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = "select count(*) as total_salons from salons where is_verified = 1"
-    cursor.execute(query)
-    result = cursor.fetchone()
-    cursor.close()
-    return jsonify(result)
-
-# system health and uptime monitoring
-@analytics_bp.route('/admin/system-health', methods=['GET'])
-def admin_system_health():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    try:
-        # Count errors in last 24 hours from audit_logs
-        query_errors = """
-            select count(*) as errors_24h
-            from audit_logs
-            where operation = 'DELETE' 
-            and changed_at >= date_sub(now(), interval 24 hour)
-        """
-        cursor.execute(query_errors)
-        errors_result = cursor.fetchone()
-        errors_24h = errors_result['errors_24h'] if errors_result else 0
-
-        # Count total audit log entries (as activity indicator)
-        query_activity = "select count(*) as total_logs from audit_logs"
-        cursor.execute(query_activity)
-        activity_result = cursor.fetchone()
-        total_logs = activity_result['total_logs'] if activity_result else 0
-
-        # Count active users (logged in within last 24 hours)
-        query_active = """
-            select count(*) as active_users
-            from users
-            where last_login >= date_sub(now(), interval 24 hour)
-        """
-        cursor.execute(query_active)
-        active_result = cursor.fetchone()
-        active_users = active_result['active_users'] if active_result else 0
-
-        # Database connection status (if we got here, it's working)
-        db_status = "healthy"
-        
-        # Calculate uptime percentage (placeholder - would need actual uptime tracking)
-        uptime_percentage = 99.9
-
-        cursor.close()
-
-        return jsonify({
-            'uptime_percentage': uptime_percentage,
-            'errors_24h': errors_24h,
-            'active_users_24h': active_users,
-            'total_audit_logs': total_logs,
-            'database_status': db_status,
-            'timestamp': datetime.now(timezone.utc).isoformat()
-        })
-        
-    except Exception as e:
-        if cursor:
-            cursor.close()
-        return jsonify({
-            'error': str(e),
-            'database_status': 'error'
-        }), 500
-
-# total count of all genders
-@analytics_bp.route('/admin/gender-distribution', methods=['GET'])
-def admin_gender_distribution():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select gender, count(*) as total_count
-        from users
-        group by gender
-    """
-
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-# retention rates
-@analytics_bp.route('/admin/retention', methods=['GET'])
-def admin_retention():
-    days = request.args.get('days', 30)
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select count(*) as active_users 
-        from users
-        where last_login >= date_sub(curdate(), interval %s day)
-    """
-
-    cursor.execute(query, (days,))
-    result = cursor.fetchone()
-    cursor.close()
-    return jsonify(result)
-
-#most loyal customers by appointments made
-@analytics_bp.route('/admin/loyal-customers', methods=['GET'])
-def admin_loyal_customers():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select users.user_id, users.username, count(appointments.appointment_id) as total_appointments
-        from appointments
-        join users on users.user_id = appointments.customer_id
-        group by users.user_id
-        order by total_appointments desc
-        limit 10
-    """
-
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-# total points redeeemed platform wide
-@analytics_bp.route('/admin/points-redeemed', methods=['GET'])
-def admin_points_redeemed():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = "select sum(points_redeemed) as total_points_redeemed from customer_points"
-
-    cursor.execute(query)
-    result = cursor.fetchone()
-    cursor.close()
-    return jsonify(result)
-
-# total vouchers redeemed platform wide
-@analytics_bp.route('/admin/vouchers-redeemed', methods=['GET'])
-def admin_vouchers_redeemed():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select count(*) as total_vouchers_redeemed
-        from customer_vouchers
-        where redeemed = 1
-    """
-
-    cursor.execute(query)
-    result = cursor.fetchone()
-    cursor.close()
-    return jsonify(result)
-
-# demographics by age groups
-@analytics_bp.route('/admin/age-demographics', methods=['GET'])
-def admin_age_demographics():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select 
-            case 
-                when (year(curdate()) - birth_year) < 18 then 'Under 18'
-                when (year(curdate()) - birth_year) between 18 and 24 then '18-24'
-                when (year(curdate()) - birth_year) between 25 and 34 then '25-34'
-                when (year(curdate()) - birth_year) between 35 and 44 then '35-44'
-                when (year(curdate()) - birth_year) between 45 and 54 then '45-54'
-                when (year(curdate()) - birth_year) between 55 and 64 then '55-64'
-                else '65+'
-            end as age_group,
-            count(*) as total_count
-        from users
-        group by age_group
-        order by age_group
-    """
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-#demographics by location
-@analytics_bp.route('/admin/location-demographics', methods=['GET'])
-def admin_location_demographics():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select city, state, count(*) as total_customers
-        from addresses
-        where entity_type = 'customer'
-        group by city, state
-        order by total_customers desc
-    """
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-#FOR SALON OWNERS
-# get salon's total appointments
-@analytics_bp.route('/salon/<int:salon_id>/total-appointments', methods=['GET'])
-def salon_total_appointments(salon_id):
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select count(appointments.appointment_id) as total_appointments
-        from appointments
-        where appointments.salon_id = %s
-    """
-
-    cursor.execute(query, (salon_id,))
-    result = cursor.fetchone()
-    cursor.close()
-    return jsonify(result)
-
-# get salon's total revenue
-@analytics_bp.route('/salon/<int:salon_id>/total-revenue', methods=['GET'])
-def salon_total_revenue(salon_id):
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select sum(invoices.total_amount) as total_revenue
-        from invoices
-        join appointments on appointments.appointment_id = invoices.appointment_id
-        where appointments.salon_id = %s
-    """
-
-    cursor.execute(query, (salon_id,))
-    result = cursor.fetchone()
-    cursor.close()
-    return jsonify(result)
-
-# get salon's top 5 popular services
-@analytics_bp.route('/salon/<int:salon_id>/top-services', methods=['GET'])
-def salon_top_services(salon_id):
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select services.service_id, services.name, count(appointments.appointment_id) as total_appointments
-        from appointments
-        join services on appointments.service_id = services.service_id
-        where appointments.salon_id = %s
-        group by services.service_id
-        order by total_appointments desc
-        limit 5
-    """
-
-    cursor.execute(query, (salon_id,))
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-# get salon's top 5 popular products
-@analytics_bp.route('/salon/<int:salon_id>/top-products', methods=['GET'])
-def salon_top_products(salon_id):
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select products.product_id, products.name, sum(invoice_line_items.quantity) as total_sold
-        from invoice_line_items
-        join products on invoice_line_items.product_id = products.product_id
-        where products.salon_id = %s
-        group by products.product_id
-        order by total_sold desc
-        limit 5
-    """
-
-    cursor.execute(query, (salon_id,))
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-# get salon's appointment trends by month
-@analytics_bp.route('/salon/<int:salon_id>/appointment-trend', methods=['GET'])
-def salon_appointment_trend(salon_id):
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select date_format(appointment_date, '%%Y-%%m') as month,
-        count(*) as total_appointments
-        from appointments
-        where salon_id = %s
-        group by month
-        order by month asc
-    """
-
-    cursor.execute(query, (salon_id,))
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-# revenue trend for a salon by month
-@analytics_bp.route('/salon/<int:salon_id>/revenue-trend', methods=['GET'])
-def salon_revenue_trend(salon_id):
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select date_format(invoices.issued_date, '%%Y-%%m') as month,
-               sum(invoices.total_amount) as revenue
-        from invoices
-        join appointments on appointments.appointment_id = invoices.appointment_id
-        where appointments.salon_id = %s
-        group by month
-        order by month asc
-    """
-
-    cursor.execute(query, (salon_id,))
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-# number of canceled and completed appointments
-@analytics_bp.route('/salon/<int:salon_id>/appointments-status', methods=['GET'])
-def get_appointment_status_counts(salon_id):
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select status, count(*) as count
-        from appointments
-        where salon_id = %s
-        group by status
-    """
-
-    cursor.execute(query, (salon_id,))
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-# top 5 frequent customers for a salon
-@analytics_bp.route('/salon/<int:salon_id>/customers-top', methods=['GET'])
-def get_top_customers(salon_id):
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select users.user_id, users.username, count(appointments.appointment_id) as visits
-        from appointments 
-        join users on users.user_id = appointments.customer_id
-        where appointments.salon_id = %s
-        group by users.user_id
-        order by visits desc
-        limit 5
-    """
-
-    cursor.execute(query, (salon_id,))
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-# average transaction amount
-@analytics_bp.route('/salon/<int:salon_id>/transactions-average', methods=['GET'])
-def get_avg_transaction(salon_id):
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select avg(invoices.total_amount) as avg_transaction
-        from invoices 
-        join appointments on appointments.appointment_id = invoices.appointment_id
-        where appointments.salon_id = %s
-    """
-
-    cursor.execute(query, (salon_id,))
-    result = cursor.fetchone()
-    cursor.close()
-    return jsonify(result)
-
-# points redeemed per customer
-@analytics_bp.route('/salon/<int:salon_id>/customers-points-redeemed', methods=['GET'])
-def get_points_redeemed(salon_id):
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select customer_id, users.username, sum(points_redeemed) as total_points_redeemed
-        from customer_points
-        join users on customer_points.customer_id = users.user_id
-        where salon_id = %s
-        group by customer_id
-    """
-    cursor.execute(query, (salon_id,))
-    result = cursor.fetchone()
-    cursor.close()
-    return jsonify(result)
-
-# vouchers redeemed per customer
-@analytics_bp.route('/salon/<int:salon_id>/customers-vouchers-redeemed', methods=['GET'])
-def get_vouchers_redeemed(salon_id):
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select customer_vouchers.customer_id, users.username, count(*) as total_vouchers_redeemed
-        from customer_vouchers
-        join users on customer_vouchers.customer_id = users.user_id
-        where customer_vouchers.salon_id = %s and customer_vouchers.redeemed = 1
-        group by customer_vouchers.customer_id;
-    """
-    cursor.execute(query, (salon_id,))
-    result = cursor.fetchone()
-    cursor.close()
-    return jsonify(result)
-
-# appointments per employee
-@analytics_bp.route('/salon/<int:salon_id>/employees-appointments', methods=['GET'])
-def get_employee_appointments(salon_id):
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select employees.employee_id, employees.first_name, employees.last_name, count(appointments.appointment_id) as total_appointments
-        from appointments
-        join employees on appointments.employee_id = employees.employee_id
-        where appointments.salon_id = %s
-        group by employees.employee_id
-        order by total_appointments desc
-    """
-    cursor.execute(query, (salon_id,))
-    result = cursor.fetchone()
-    cursor.close()
-    return jsonify(result)
-
-# busiest day of the week
-@analytics_bp.route('/salon/<int:salon_id>/appointments/busiest-day', methods=['GET'])
-def get_busiest_day(salon_id):
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select dayofweek(appointment_date) as day_of_week, count(*) as total_appointments
-        from appointments
-        where salon_id = %s
-        group by day_of_week
-        order by total_appointments desc
-        limit 1
-    """
-    cursor.execute(query, (salon_id,))
-    result = cursor.fetchone()
-    cursor.close()
-    return jsonify(result)
-
-# Add these new endpoints to your analytics.py file (after the existing ones)
-
-# ALL salons by appointments (INCLUDING verified salons with 0 appointments)
-@analytics_bp.route('/admin/all-salons-by-appointments', methods=['GET'])
-def admin_all_salons_by_appointments():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        SELECT salons.salon_id, salons.name, 
-               COALESCE(COUNT(appointments.appointment_id), 0) as total_appointments
-        FROM salons
-        LEFT JOIN appointments ON salons.salon_id = appointments.salon_id
-        WHERE salons.is_verified = 1
-        GROUP BY salons.salon_id, salons.name
-        ORDER BY total_appointments DESC, salons.name ASC
-    """
-
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-# ALL earning services (no limit)
-@analytics_bp.route('/admin/all-earning-services', methods=['GET'])
-def admin_all_earning_services():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select salons.salon_id, salons.name as salon_name, services.service_id, services.name,
-               sum(invoices.total_amount) as revenue
-        from invoices
-        join appointments on appointments.appointment_id = invoices.appointment_id
-        join salons on salons.salon_id = appointments.salon_id
-        join services on appointments.service_id = services.service_id
-        group by services.service_id, salons.salon_id
-        order by revenue desc
-    """
-
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
-# ALL earning products (no limit)
-@analytics_bp.route('/admin/all-earning-products', methods=['GET'])
-def admin_all_earning_products():
-    mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-
-    query = """
-        select salons.salon_id, salons.name as salon_name, products.product_id, products.name,
-               sum(invoice_line_items.line_total) as revenue
-        from invoice_line_items
-        join products on invoice_line_items.product_id = products.product_id
-        join salons on salons.salon_id = products.salon_id
-        group by products.product_id, salons.salon_id
-        order by revenue desc
-    """
-
-    cursor.execute(query)
-    result = cursor.fetchall()
-    cursor.close()
-    return jsonify(result)
-
 from login import login_bp
 from register import register_bp
 from services import services_bp
@@ -665,6 +143,7 @@ from user_dashboard import user_dashboard_bp
 from users import users_bp
 from analytics import analytics_bp
 from notifications import notifications_bp
+from exports import exports_bp
 
 app.register_blueprint(login_bp)
 app.register_blueprint(register_bp)
@@ -685,48 +164,140 @@ app.register_blueprint(user_dashboard_bp)
 app.register_blueprint(users_bp)
 app.register_blueprint(analytics_bp)
 app.register_blueprint(notifications_bp)
+app.register_blueprint(exports_bp)
+
+# create tables owned by backend subsystems (rollups, ...) - run once per deploy
+@app.cli.command('init-schema')
+def init_schema_command():
+    with app.app_context():
+        ensure_schema(app.config['MYSQL'].connection)
+    print("Created tables:", ", ".join(registered_tables()))
+
+# send everything currently due in the email outbox, then exit
+@app.cli.command('drain-outbox')
+def drain_outbox_command():
+    worker = OutboxWorker(app, batch_size=app.config['EMAIL_OUTBOX_BATCH_SIZE'], rate=app.config['EMAIL_OUTBOX_RATE'])
+    total = 0
+    while True:
+        processed = worker.drain_once()
+        if not processed:
+            break
+        total += processed
+    print(f"Processed {total} queued emails")
+
+# hash every legacy plaintext password once; afterwards set LEGACY_PLAINTEXT_PASSWORDS=0
+@app.cli.command('migrate-passwords')
+def migrate_passwords_command():
+    with app.app_context():
+        converted = migrate_legacy_passwords(app.config['MYSQL'].connection)
+    print(f"Hashed {converted} legacy passwords")
 
-scheduled_appointments = set()
-#send customer's email updates for appointments 24 hours before the appointment 
+# give replies written before thread paths existed their path/depth (after init-schema)
+@app.cli.command('backfill-reply-paths')
+def backfill_reply_paths_command():
+    with app.app_context():
+        filled = backfill_paths(app.config['MYSQL'].connection)
+    print(f"Filled thread paths of {filled} replies")
+
+# recompute every salon_summary card (first deploy, or after editing data by hand)
+@app.cli.command('rebuild-summaries')
+def rebuild_summaries_command():
+    with app.app_context():
+        cards = summary.rebuild(app.config['MYSQL'].connection)
+    if cards is None:
+        print("Another worker is updating salon summaries, try again")
+    else:
+        print(f"Rebuilt {cards} salon summaries")
+
+# recompute rating sums, counts and star histograms from reviews
+@app.cli.command('rebuild-ratings')
+def rebuild_ratings_command():
+    with app.app_context():
+        scopes = ratings.rebuild(app.config['MYSQL'].connection)
+    if scopes is None:
+        print("Another worker is rebuilding rating aggregates, try again")
+    else:
+        print(f"Rebuilt rating aggregates of {scopes} salons, employees and services")
+
+#queue reminder emails for appointments starting within the next REMINDER_LEAD_HOURS;
+#every worker runs this, the dispatch lock and outbox dedupe make it send once
 def send_appointment_reminder():
     with app.app_context():
-        mysql = app.config['MYSQL']
-        cursor = mysql.connection.cursor()
-
-        now = datetime.now()
-        reminder_time = now + timedelta(hours=24)
-        reminder_window_end = reminder_time + timedelta(hours=8)
-
-        query = """
-            select users.email, appointments.appointment_date, appointments.start_time, salons.name as salon_name, appointments.appointment_id
-            from appointments
-            join users on appointments.customer_id = users.user_id
-            join salons on appointments.salon_id = salons.salon_id
-            where appointments.appointment_date = %s
-        """
-        cursor.execute(query, (reminder_time.date(),))
-        appointments = cursor.fetchall()
-        cursor.close()
-
-        for email, appointment_date, appointment_time, salon_name, appointment_id in appointments:
-            appt_datetime = datetime.combine(appointment_date, appointment_time)
-            if reminder_time <= appt_datetime <= reminder_window_end:
-                if appointment_id in scheduled_appointments:
-                    continue
-
-                subject = f"Reminder: Appointment at {salon_name}"
-                body = (
-                    f"Dear Customer,\n\n"
-                    f"This is a reminder for your appointment at {salon_name} "
-                    f"on {appointment_date} at {appointment_time}.\n\nThank you!"
-                )
-                send_email(email, subject, body)
-
-                scheduled_appointments.add(appointment_id)
-        
+        reminders.dispatch(
+            app.config['MYSQL'].connection,
+            lead=timedelta(hours=app.config['REMINDER_LEAD_HOURS'])
+        )
+
+#hand stock held by abandoned carts back to the shelf
+def release_expired_reservations():
+    with app.app_context():
+        inventory.sweep_expired(app.config['MYSQL'].connection)
+
+#forget idempotency keys once clients can no longer be retrying them
+def purge_idempotency_keys():
+    with app.app_context():
+        booking.purge_keys(app.config['MYSQL'].connection, hours=app.config['IDEMPOTENCY_KEY_HOURS'])
+
+#build queued salon exports; skip locked lets every worker take a different job
+def run_exports():
+    with app.app_context():
+        conn = app.config['MYSQL'].connection
+        while exports.run_once(conn, app.config['EXPORT_DIR'], app.config['EXPORT_CHUNK_SIZE']):
+            pass
+
+def purge_exports():
+    with app.app_context():
+        exports.purge_exports(app.config['MYSQL'].connection, app.config['EXPORT_DIR'],
+                              days=app.config['EXPORT_RETENTION_DAYS'])
+
+#refresh salon_summary cards of salons on the change feed; one worker at a time (get_lock)
+def sync_salon_summaries():
+    with app.app_context():
+        summary.sync(app.config['MYSQL'].connection)
+
+#keep this process's search index synced and rebuild it off the request path when
+#it went stale; searches keep the old index until the new one is swapped in
+def refresh_search_index():
+    with app.app_context():
+        search.salon_search.refresh(app.config['MYSQL'].connection)
+
+#trim the search/summary change feed; rows a projection has not read yet are kept
+def purge_search_changes():
+    with app.app_context():
+        search.purge_changes(app.config['MYSQL'].connection)
+
+#repair job: recompute every card in case a writer forgot to mark its salon;
+#every worker schedules it, the one that gets the lock runs it and the rest skip
+def rebuild_salon_summaries():
+    with app.app_context():
+        summary.rebuild(app.config['MYSQL'].connection, wait=0)
+
+#repair job: recompute rating aggregates in case an increment was missed;
+#every worker schedules it, the one that gets the lock runs it
+def repair_rating_aggregates():
+    with app.app_context():
+        ratings.rebuild(app.config['MYSQL'].connection, wait=0)
+
 scheduler = BackgroundScheduler()
-scheduler.add_job(send_appointment_reminder, 'interval', hours=8)
+scheduler.add_job(send_appointment_reminder, 'interval', minutes=app.config['REMINDER_SCAN_MINUTES'])
+scheduler.add_job(release_expired_reservations, 'interval', minutes=app.config['STOCK_SWEEP_MINUTES'])
+scheduler.add_job(purge_idempotency_keys, 'interval', hours=1)
+scheduler.add_job(run_exports, 'interval', seconds=app.config['EXPORT_POLL_SECONDS'])
+scheduler.add_job(purge_exports, 'interval', hours=6)
+scheduler.add_job(sync_salon_summaries, 'interval', seconds=app.config['SALON_SUMMARY_SYNC_SECONDS'])
+scheduler.add_job(refresh_search_index, 'interval', seconds=app.config['SEARCH_REFRESH_SECONDS'],
+                  next_run_time=datetime.now())
+scheduler.add_job(purge_search_changes, 'interval', hours=1)
+scheduler.add_job(rebuild_salon_summaries, 'interval', hours=app.config['SALON_SUMMARY_REBUILD_HOURS'])
+scheduler.add_job(repair_rating_aggregates, 'interval', hours=app.config['RATING_REPAIR_HOURS'])
 scheduler.start()
 
+#background workers delivering the email outbox (EMAIL_OUTBOX_WORKERS=0 to run them elsewhere)
+if app.config['EMAIL_OUTBOX_WORKERS']:
+    start_outbox_workers(app, app.config['EMAIL_OUTBOX_WORKERS'])
+
+#background flusher writing queued error logs in batches
+error_pipeline.start(app)
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -1,20 +1,14 @@
 from flask import Blueprint, request, jsonify, current_app
-from datetime import datetime, timedelta, time as dt_time, date
+from datetime import datetime, timedelta, date
 from MySQLdb.cursors import DictCursor
 from utils.logerror import log_error
+from utils.availability import WEEK_DAYS, build_day, format_minutes, group_by_day, group_by_date, to_minutes
+from utils import booking, rollups
+from utils.streaming import iter_rows, server_cursor, stream_json
 from flask import session
 
 appointments_bp = Blueprint('appointments_bp', __name__)
 
-# THIS FUNCTION IS SUPER IMPROTANT: some of the time values in the data for some reason returns
-# timedelta, so this function below converts that to something that can be manipulated and etc.
-def timedelta_to_time(td):
-    total_seconds = int(td.total_seconds())
-    hours = total_seconds // 3600
-    minutes = (total_seconds % 3600) // 60
-    seconds = total_seconds % 60
-    return dt_time(hour=hours, minute=minutes, second=seconds)
-
 # here is my appointments booking, when calling this function (appointments/book), it'll need the customer, salon and service id
 # as well as the appointment dates and notes, this can prolly be changed as we move forward thou.
 # add extra function to add image to appointment
@@ -71,15 +65,15 @@ def book_appointment():
 
     mysql = current_app.config['MYSQL']
     cursor = mysql.connection.cursor(DictCursor)
+    idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
 
     try:
-        # gets service duration
-        cursor.execute("SELECT duration_minutes FROM services WHERE service_id = %s", (service_id,))
-        service = cursor.fetchone()
-        if not service:
-            return jsonify({'error': 'Invalid service ID'}), 400
-
-        duration = timedelta(minutes=service['duration_minutes'])
+        # a retry of a request we already answered gets the same answer
+        if idempotency_key:
+            replay = booking.claim_key(mysql.connection, 'appointments.book', idempotency_key, data)
+            if replay:
+                mysql.connection.rollback()
+                return jsonify(replay[0]), replay[1]
 
         # Get start date
         try:
@@ -87,74 +81,25 @@ def book_appointment():
         except ValueError:
             return jsonify({'error': 'Invalid date or time format'}), 400
 
-        # Calc end date
-        end_dt = start_dt + duration
-        end_time_str = end_dt.strftime("%H:%M:%S")
-
         # get the day name (ex. monday, tuesday, wednesday, etc)
         day_name = start_dt.strftime("%A")
 
-        # checks employee schedule, prevent overlap/employee not avaliable
-        cursor.execute("""
-            SELECT start_time, end_time 
-            FROM time_slots
-            WHERE employee_id = %s AND salon_id = %s
-              AND day = %s AND is_available = TRUE
-        """, (employee_id, salon_id, day_name))
-        schedule = cursor.fetchone()
-
-        if not schedule:
-            return jsonify({'error': f'Employee is not scheduled to work on {day_name}'}), 400
-
-        # IMPORTANT: Convert schedule times to datetime.time 
-        schedule_start_time = schedule['start_time']
-        schedule_end_time = schedule['end_time']
-
-        if isinstance(schedule_start_time, timedelta):
-            schedule_start_time = timedelta_to_time(schedule_start_time)
-        if isinstance(schedule_end_time, timedelta):
-            schedule_end_time = timedelta_to_time(schedule_end_time)
-
-        schedule_start_dt = datetime.combine(start_dt.date(), schedule_start_time)
-        schedule_end_dt = datetime.combine(start_dt.date(), schedule_end_time)
-
-        if not (schedule_start_dt <= start_dt < schedule_end_dt):
-            return jsonify({'error': 'Requested time is outside working hours'}), 400
-
-        if not (start_dt < end_dt <= schedule_end_dt):
-            return jsonify({'error': 'Service duration extends beyond working hours'}), 400
-
-        # Make sure no overlapping
-        cursor.execute("""
-            SELECT 1 FROM appointments
-            WHERE employee_id = %s
-              AND salon_id = %s
-              AND appointment_date = %s
-              AND status IN ('booked', 'confirmed')
-              AND (
-                    (start_time < %s AND end_time > %s) OR
-                    (start_time >= %s AND start_time < %s)
-                  )
-            LIMIT 1
-        """, (employee_id, salon_id, appointment_date, end_time_str, start_time, start_time, end_time_str))
-        overlap = cursor.fetchone()
-
-        if overlap:
-            return jsonify({'error': 'Time slot overlaps with another appointment'}), 400
-
-        cursor.execute("""
-            SELECT slot_id
-            FROM time_slots
-            WHERE salon_id = %s AND employee_id = %s AND day = %s AND start_time <= %s AND end_time >= %s AND is_available = TRUE
-            LIMIT 1
-        """, (employee_id, salon_id, day_name, start_time, end_time_str))
-
-        time_slot_id = cursor.fetchone()
-
-        if not time_slot_id:
-            return jsonify({'error': 'No matching time slot found'}), 400
-
-        time_slot_id = time_slot_id['slot_id']
+        # locks the employee's day, then checks the service, schedule, breaks and
+        # overlap in one query; the lock is held until commit so nobody can take
+        # the slot meanwhile
+        try:
+            service_ids = [int(service_id)]
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid service ID'}), 400
+        booking_error, plan = booking.claim_slots(
+            mysql.connection, employee_id, salon_id, appointment_date, day_name,
+            to_minutes(start_dt.time()), service_ids
+        )
+        if booking_error:
+            mysql.connection.rollback()
+            return jsonify({'error': booking_error}), 400
+        _, _, end_minute, time_slot_id = plan[0]
+        end_time_str = format_minutes(end_minute)
 
         # Insert into appoint
         now = datetime.now()
@@ -166,16 +111,143 @@ def book_appointment():
             ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,'booked',%s,%s)
         """, (customer_id, salon_id, employee_id, service_id, time_slot_id,
               appointment_date, start_time, end_time_str, notes, now, now))
+        appointment_id = cursor.lastrowid
+        rollups.record_booking(mysql.connection, salon_id, service_id, employee_id, appointment_date)
 
-        mysql.connection.commit()
-
-        return jsonify({
+        result = {
             'message': 'Appointment booked successfully',
+            'appointment_id': appointment_id,
             'appointment_date': appointment_date,
             'start_time': start_time,
             'end_time': end_time_str,
             'employee_id': employee_id
-        }), 201
+        }
+        if idempotency_key:
+            booking.remember_response(mysql.connection, 'appointments.book', idempotency_key, result, 201)
+        mysql.connection.commit()
+
+        return jsonify(result), 201
+
+    except Exception as e:
+        log_error(str(e), session.get("user_id"))
+        mysql.connection.rollback()
+        return jsonify({'error': str(e)}), 500
+
+    finally:
+        cursor.close()
+
+# books several services back to back for one customer with one employee
+# (a package), all or nothing, checked with a single query under the same
+# employee-day lock as a single booking
+@appointments_bp.route('/appointments/book-package', methods=['POST'])
+def book_package():
+    """
+    Book several services back to back
+    ---
+    tags:
+      - Appointments
+    consumes:
+      - application/json
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          properties:
+            salon_id:
+              type: integer
+            employee_id:
+              type: integer
+            customer_id:
+              type: integer
+            service_ids:
+              type: array
+              items:
+                type: integer
+            appointment_date:
+              type: string
+            start_time:
+              type: string
+            notes:
+              type: string
+    responses:
+      201:
+        description: Appointments booked
+      400:
+        description: Missing or invalid fields, or the services don't fit
+      500:
+        description: Internal server error
+    """
+    data = request.get_json()
+
+    salon_id = data.get('salon_id')
+    employee_id = data.get('employee_id')
+    customer_id = data.get('customer_id')
+    service_ids = data.get('service_ids')
+    appointment_date = data.get('appointment_date')     # YYYY-MM-DD
+    start_time = data.get('start_time')                 # HH:MM:SS, start of the first service
+    notes = data.get('notes', "")
+
+    if not all([salon_id, employee_id, customer_id, service_ids, appointment_date, start_time]):
+        return jsonify({'error': 'Missing required fields'}), 400
+    try:
+        service_ids = [int(service_id) for service_id in service_ids]
+        start_dt = datetime.strptime(f"{appointment_date} {start_time}", "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid service IDs, date or time format'}), 400
+
+    mysql = current_app.config['MYSQL']
+    cursor = mysql.connection.cursor()
+    idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+
+    try:
+        if idempotency_key:
+            replay = booking.claim_key(mysql.connection, 'appointments.book_package', idempotency_key, data)
+            if replay:
+                mysql.connection.rollback()
+                return jsonify(replay[0]), replay[1]
+
+        booking_error, plan = booking.claim_slots(
+            mysql.connection, employee_id, salon_id, appointment_date, start_dt.strftime("%A"),
+            to_minutes(start_dt.time()), service_ids
+        )
+        if booking_error:
+            mysql.connection.rollback()
+            return jsonify({'error': booking_error}), 400
+
+        now = datetime.now()
+        appointments = []
+        for service_id, start_minute, end_minute, time_slot_id in plan:
+            cursor.execute("""
+                INSERT INTO appointments (
+                    customer_id, salon_id, employee_id, service_id, time_slot_id,
+                    appointment_date, start_time, end_time, notes,
+                    status, created_at, last_modified
+                ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,'booked',%s,%s)
+            """, (customer_id, salon_id, employee_id, service_id, time_slot_id, appointment_date,
+                  format_minutes(start_minute), format_minutes(end_minute), notes, now, now))
+            appointments.append({
+                'appointment_id': cursor.lastrowid,
+                'service_id': service_id,
+                'start_time': format_minutes(start_minute),
+                'end_time': format_minutes(end_minute)
+            })
+        rollups.record_bookings(mysql.connection, [
+            (salon_id, service_id, employee_id, appointment_date) for service_id, _, _, _ in plan
+        ])
+
+        result = {
+            'message': 'Appointments booked successfully',
+            'appointment_date': appointment_date,
+            'employee_id': employee_id,
+            'appointments': appointments
+        }
+        if idempotency_key:
+            booking.remember_response(mysql.connection, 'appointments.book_package', idempotency_key, result, 201)
+        mysql.connection.commit()
+
+        return jsonify(result), 201
 
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -232,9 +304,12 @@ def view_appointments():
     except ValueError:
         return jsonify({'error': 'ID must be an integer'}), 400
     
+    if user_type not in ('customer', 'salon'):
+        return jsonify({'error': 'Invalid role specified'}), 400
+
     mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
-    
+    cursor = server_cursor(mysql.connection)
+
     try:
         if user_type == 'customer':
             cursor.execute("""
@@ -263,7 +338,7 @@ def view_appointments():
                 ORDER BY a.appointment_date DESC, a.start_time DESC
             """, (user_id,))
             
-        elif user_type == 'salon':
+        else:
             cursor.execute("""
                 SELECT 
                     a.appointment_id, 
@@ -291,29 +366,17 @@ def view_appointments():
                 WHERE a.salon_id = %s
                 ORDER BY a.appointment_date DESC, a.start_time DESC
             """, (user_id,))
-        else:
-            return jsonify({'error': 'Invalid role specified'}), 400
-        
-        appointments = cursor.fetchall()
+    except Exception as e:
+        cursor.close()
+        return jsonify({'error': str(e)}), 500
 
-        for appointment in appointments:
-            for key in ['appointment_date', 'start_time', 'end_time']:
-                if key in appointment and appointment[key] is not None:
-                    appointment[key] = str(appointment[key])
-            
-            # time slot
+    def appointments():
+        for appointment in iter_rows(cursor):
             if appointment.get('start_time') and appointment.get('end_time'):
                 appointment['time_slot'] = f"{appointment['start_time']} - {appointment['end_time']}"
-        
-        return jsonify({
-            'appointments': appointments,
-            'count': len(appointments)
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cursor.close()
+            yield appointment
+
+    return stream_json(appointments(), key='appointments', count_key='count', cursor=cursor)
 
 
 @appointments_bp.route('/appointments/reviewless/<int:salon_id>', methods=['GET'])
@@ -380,12 +443,7 @@ def reviewless_appointments(salon_id):
         
         appointments = cursor.fetchall()
 
-        # Simple formatting
         for appointment in appointments:
-            for key in ['appointment_date', 'start_time', 'end_time']:
-                if key in appointment and appointment[key] is not None:
-                    appointment[key] = str(appointment[key])
-            
             appointment['time_slot'] = f"{appointment['start_time']} - {appointment['end_time']}"
         
         return jsonify({
@@ -480,8 +538,9 @@ def update_appointment():
     cursor = mysql.connection.cursor(DictCursor)
 
     try:
-        # get existing format
-        cursor.execute("SELECT * FROM appointments WHERE appointment_id = %s", (appointment_id,))
+        # get existing format; a locking read, so it doesn't open the transaction's
+        # snapshot - the day plan must be read after the employee-day lock is held
+        cursor.execute("SELECT * FROM appointments WHERE appointment_id = %s FOR UPDATE", (appointment_id,))
         appointment = cursor.fetchone()
         if not appointment:
             return jsonify({'error': 'Appointment not found'}), 404
@@ -491,84 +550,41 @@ def update_appointment():
         start_time = new_start_time or appointment['start_time']
         notes = new_note if new_note is not None else appointment['notes']
 
-        # getting duration of service
-        cursor.execute("SELECT duration_minutes FROM services WHERE service_id = %s", (appointment['service_id'],))
-        service = cursor.fetchone()
-        if not service:
-            return jsonify({'error': 'Invalid service associated with this appointment'}), 400
-        duration = timedelta(minutes=service['duration_minutes'])
-
-        # calc new start and end time
+        # calc new start time
         try:
             start_dt = datetime.strptime(f"{appointment_date} {start_time}", "%Y-%m-%d %H:%M:%S")
         except ValueError:
             return jsonify({'error': 'Invalid date or time format'}), 400
-        end_dt = start_dt + duration
-        end_time_str = end_dt.strftime("%H:%M:%S")
 
         day_name = start_dt.strftime("%A")
 
-        cursor.execute("""
-            SELECT start_time, end_time
-            FROM time_slots
-            WHERE employee_id = %s AND salon_id = %s
-              AND day = %s AND is_available = TRUE
-        """, (appointment['employee_id'], appointment['salon_id'], day_name))
-        schedule = cursor.fetchone()
-        if not schedule:
-            return jsonify({'error': f'Employee is not scheduled to work on {day_name}'}), 400
-
-        schedule_start_time = schedule['start_time']
-        schedule_end_time = schedule['end_time']
-
-        if isinstance(schedule_start_time, timedelta):
-            schedule_start_time = timedelta_to_time(schedule_start_time)
-        if isinstance(schedule_end_time, timedelta):
-            schedule_end_time = timedelta_to_time(schedule_end_time)
-
-        schedule_start_dt = datetime.combine(start_dt.date(), schedule_start_time)
-        schedule_end_dt = datetime.combine(start_dt.date(), schedule_end_time)
-
-        # checker for working hours
-        if not (schedule_start_dt <= start_dt < schedule_end_dt):
-            return jsonify({'error': 'Requested time is outside working hours'}), 400
-        if not (start_dt < end_dt <= schedule_end_dt):
-            return jsonify({'error': 'Service duration extends beyond working hours'}), 400
-
-        cursor.execute("""
-            SELECT 1 FROM appointments
-            WHERE employee_id = %s
-              AND salon_id = %s
-              AND appointment_date = %s
-              AND status IN ('booked', 'confirmed')
-              AND appointment_id != %s
-              AND (
-                    (start_time < %s AND end_time > %s) OR
-                    (start_time >= %s AND start_time < %s)
-                  )
-            LIMIT 1
-        """, (
-            appointment['employee_id'],
-            appointment['salon_id'],
-            appointment_date,
-            appointment_id,
-            end_time_str, start_time,
-            start_time, end_time_str
-        ))
-        overlap = cursor.fetchone()
-        if overlap:
-            return jsonify({'error': 'Time slot overlaps with another appointment'}), 400
+        # same employee-day lock and single-query check as booking, so a
+        # reschedule can't race a booking; the service's duration comes with it
+        booking_error, plan = booking.claim_slots(
+            mysql.connection, appointment['employee_id'], appointment['salon_id'], appointment_date,
+            day_name, to_minutes(start_dt.time()), [appointment['service_id']],
+            exclude_appointment_id=appointment_id
+        )
+        if booking_error:
+            mysql.connection.rollback()
+            if booking_error == 'Invalid service ID':
+                booking_error = 'Invalid service associated with this appointment'
+            return jsonify({'error': booking_error}), 400
+        _, _, end_minute, time_slot_id = plan[0]
+        end_time_str = format_minutes(end_minute)
 
         # insert updated appoint into data
+        rollups.record_reschedule(mysql.connection, appointment_id, appointment_date)
         cursor.execute("""
             UPDATE appointments
             SET appointment_date = %s,
                 start_time = %s,
                 end_time = %s,
+                time_slot_id = %s,
                 notes = %s,
                 last_modified = %s
             WHERE appointment_id = %s
-        """, (appointment_date, start_time, end_time_str, notes, datetime.now(), appointment_id))
+        """, (appointment_date, start_time, end_time_str, time_slot_id, notes, datetime.now(), appointment_id))
 
         mysql.connection.commit()
         return jsonify({
@@ -632,6 +648,7 @@ def cancel_appointment():
         if not cursor.fetchone():
             return jsonify({'error': 'Appointment not found'}), 404
 
+        rollups.record_status_change(mysql.connection, appointment_id, 'cancelled')
         cursor.execute("""
             UPDATE appointments
             SET status = %s, last_modified = %s
@@ -694,16 +711,7 @@ def get_appointments(role, entity_id):
 
 
 
-        appointments = cursor.fetchall()
-
-        for appt in appointments:
-            for field in ['start_time', 'end_time']:
-                val = appt.get(field)
-                if isinstance(val, timedelta):
-                    t = timedelta_to_time(val)
-                    appt[field] = t.strftime("%H:%M:%S")
-
-        return jsonify({'appointments': appointments}), 200
+        return jsonify({'appointments': cursor.fetchall()}), 200
 
     finally:
         cursor.close()
@@ -760,17 +768,6 @@ def employee_weekly_availability(employee_id):
             return jsonify({'error': 'Employee not found'}), 404
         salon_id = emp['salon_id']
 
-        def normalize_time(t):
-            if isinstance(t, timedelta):
-                hours, remainder = divmod(t.total_seconds(), 3600)
-                minutes, seconds = divmod(remainder, 60)
-                return dt_time(int(hours), int(minutes), int(seconds))
-            if isinstance(t, str):
-                return datetime.strptime(t, "%H:%M:%S").time()
-            return t
-
-        days = ['Monday','Tuesday','Wednesday','Thursday','Friday','Saturday','Sunday']
-
         cursor.execute("""
             SELECT day, open_time, close_time, is_closed
             FROM operating_hours
@@ -779,19 +776,11 @@ def employee_weekly_availability(employee_id):
         op_map = {r['day']: r for r in cursor.fetchall()}
 
         cursor.execute("""
-            SELECT day, start_time, end_time, is_available
+            SELECT slot_id, day, start_time, end_time, is_available
             FROM time_slots
             WHERE employee_id = %s AND salon_id = %s
         """, (employee_id, salon_id))
-        time_slots_rows = cursor.fetchall()
-        
-        sched_map = {}
-        ts_by_day = {}
-        for r in time_slots_rows:
-            day = r['day']
-            ts_by_day.setdefault(day, []).append(r)
-            if r['is_available']:
-                sched_map[day] = r
+        ts_by_day = group_by_day(cursor.fetchall())
 
         # Get appointments for target date if provided
         appointments_on_date = []
@@ -804,101 +793,18 @@ def employee_weekly_availability(employee_id):
                   AND status IN ('booked','confirmed')
             """, (employee_id, salon_id, target_date))
             appointments_on_date = cursor.fetchall()
-
-        # interval checking
-        def is_time_in_intervals(check_time, check_end_time, intervals):
-            """Check if a time period overlaps with any interval"""
-            for interval_start, interval_end in intervals:
-                # Check for overlap
-                latest_start = max(check_time, interval_start)
-                earliest_end = min(check_end_time, interval_end)
-                if latest_start < earliest_end:
-                    return True
-            return False
-
-        # Build results for each day
-        week_result = []
-
-        for day in days:
-            day_entry = {
-                'day': day,
-                'salon_closed': False,
-                'operating_hours': None,
-                'employee_schedule': None,
-                'timeline': []
-            }
-
-            op = op_map.get(day)
-            if not op or op['is_closed']:
-                # Handle salon closed or no operating hours
-                day_entry['salon_closed'] = True
-                if op:
-                    day_entry['operating_hours'] = {
-                        'open_time': normalize_time(op['open_time']).strftime("%H:%M:%S"),
-                        'close_time': normalize_time(op['close_time']).strftime("%H:%M:%S")
-                    }
-                week_result.append(day_entry)
-                continue
-
-            # get operating hours
-            open_time = normalize_time(op['open_time'])
-            close_time = normalize_time(op['close_time'])
-            day_entry['operating_hours'] = {
-                'open_time': open_time.strftime("%H:%M:%S"),
-                'close_time': close_time.strftime("%H:%M:%S")
-            }
-
-            # Check employee schedule
-            sched = sched_map.get(day)
-            if sched:
-                sched_start = normalize_time(sched['start_time'])
-                sched_end = normalize_time(sched['end_time'])
-                day_entry['employee_schedule'] = {
-                    'start_time': sched_start.strftime("%H:%M:%S"),
-                    'end_time': sched_end.strftime("%H:%M:%S")
-                }
-
-            # Prepare intervals for checking
-            unavailable_intervals = []
-            for ts in ts_by_day.get(day, []):
-                if not ts['is_available']:
-                    start = normalize_time(ts['start_time'])
-                    end = normalize_time(ts['end_time'])
-                    unavailable_intervals.append((start, end))
-
-            appt_intervals = []
-            if target_date and target_date.strftime("%A") == day:
-                for appt in appointments_on_date:
-                    start = normalize_time(appt['start_time'])
-                    end = normalize_time(appt['end_time'])
-                    appt_intervals.append((start, end))
-
-            # Build timeline
-            current = datetime.combine(datetime.today(), open_time)
-            end_dt = datetime.combine(datetime.today(), close_time)
-            
-            while current <= end_dt:
-                slot_time = current.time()
-                slot_end = (current + timedelta(minutes=increment_minutes)).time()
-                
-                # Determine status with clear priority
-                if not sched or not (sched_start <= slot_time < sched_end):
-                    status = 'not_working'
-                elif is_time_in_intervals(slot_time, slot_end, unavailable_intervals):
-                    status = 'unavailable'
-                elif is_time_in_intervals(slot_time, slot_end, appt_intervals):
-                    status = 'booked'
-                else:
-                    status = 'available'
-
-                day_entry['timeline'].append({
-                    'time': slot_time.strftime("%H:%M:%S"),
-                    'status': status
-                })
-
-                current += timedelta(minutes=increment_minutes)
-
-            week_result.append(day_entry)
+        target_day = target_date.strftime("%A") if target_date else None
+
+        week_result = [
+            build_day(
+                day,
+                op_map.get(day),
+                ts_by_day.get(day, []),
+                appointments_on_date if day == target_day else [],
+                increment_minutes
+            )
+            for day in WEEK_DAYS
+        ]
 
         return jsonify({
             'employee_id': employee_id,
@@ -942,15 +848,6 @@ def sunday_based_availability(employee_id):
             return jsonify({'error': 'Employee not found'}), 404
         salon_id = emp['salon_id']
 
-        def normalize_time(t):
-            if isinstance(t, timedelta):
-                hours, remainder = divmod(t.total_seconds(), 3600)
-                minutes, seconds = divmod(remainder, 60)
-                return dt_time(int(hours), int(minutes), int(seconds))
-            if isinstance(t, str):
-                return datetime.strptime(t, "%H:%M:%S").time()
-            return t
-        
         days = ['Sunday','Monday','Tuesday','Wednesday','Thursday','Friday','Saturday']
 
         cursor.execute("""
@@ -961,19 +858,11 @@ def sunday_based_availability(employee_id):
         op_map = {r['day']: r for r in cursor.fetchall()}
 
         cursor.execute("""
-            SELECT day, start_time, end_time, is_available
+            SELECT slot_id, day, start_time, end_time, is_available
             FROM time_slots
             WHERE employee_id = %s AND salon_id = %s
         """, (employee_id, salon_id))
-        time_slots_rows = cursor.fetchall()
-
-        sched_map = {}
-        ts_by_day = {}
-        for r in time_slots_rows:
-            day = r['day']
-            ts_by_day.setdefault(day, []).append(r)
-            if r['is_available']:
-                sched_map[day] = r
+        ts_by_day = group_by_day(cursor.fetchall())
 
         cursor.execute("""
             SELECT appointment_date, start_time, end_time
@@ -981,107 +870,23 @@ def sunday_based_availability(employee_id):
             WHERE 
                 employee_id=%s AND 
                 salon_id=%s AND 
-                DATE(appointment_date) BETWEEN %s AND %s AND 
+                appointment_date BETWEEN %s AND %s AND 
                 status IN ('booked', 'confirmed')
         """, (employee_id, salon_id, week_start, week_end))
-
-        appts_by_date = {}
-
-        for row in cursor.fetchall():
-            ad = row['appointment_date']
-            if isinstance(ad, datetime):
-                ad = ad.date()
-            appts_by_date.setdefault(ad, []).append(row)
-
-        # interval checking
-        def is_time_in_intervals(check_time, check_end_time, intervals):
-            """Check if a time period overlaps with any interval"""
-            for interval_start, interval_end in intervals:
-                # Check for overlap
-                latest_start = max(check_time, interval_start)
-                earliest_end = min(check_end_time, interval_end)
-                if latest_start < earliest_end:
-                    return True
-            return False
+        appts_by_date = group_by_date(cursor.fetchall())
 
         week_result = []
-
         for i, day in enumerate(days):
             day_date = week_start + timedelta(days=i)
-            op = op_map.get(day)
-
-            day_entry = {
-                "day": day,
-                "date": day_date.isoformat(),
-                "salon_closed": False,
-                "operating_hours": None,
-                "employee_schedule": None,
-                "timeline" : []
-            }
-
-            if not op or op['is_closed']:
-                day_entry['salon_closed'] = True
-                week_result.append(day_entry)
-                continue
-
-            # get operating hours
-            open_time = normalize_time(op['open_time'])
-            close_time = normalize_time(op['close_time'])
-            day_entry['operating_hours'] = {
-                'open_time': open_time.strftime("%H:%M:%S"),
-                'close_time': close_time.strftime("%H:%M:%S")
-            }
-
-             # Check employee schedule
-            sched = sched_map.get(day)
-            if sched:
-                sched_start = normalize_time(sched['start_time'])
-                sched_end = normalize_time(sched['end_time'])
-                day_entry['employee_schedule'] = {
-                    'start_time': sched_start.strftime("%H:%M:%S"),
-                    'end_time': sched_end.strftime("%H:%M:%S")
-                }
-
-            # Prepare intervals for checking
-            unavailable_intervals = []
-            for ts in ts_by_day.get(day, []):
-                if not ts['is_available']:
-                    start = normalize_time(ts['start_time'])
-                    end = normalize_time(ts['end_time'])
-                    unavailable_intervals.append((start, end))
-
-            # Appointments for this day
-            appt_intervals = []
-            for appt in appts_by_date.get(day_date, []):
-                start = normalize_time(appt['start_time'])
-                end = normalize_time(appt['end_time'])
-                appt_intervals.append((start, end))
-
-            # Build timeline
-            current = datetime.combine(datetime.today(), open_time)
-            end_dt = datetime.combine(datetime.today(), close_time)
-
-            while current <= end_dt:
-                slot_time = current.time()
-                slot_end = (current + timedelta(minutes=increment_minutes)).time()
-                
-                # Determine status with clear priority
-                if not sched or not (sched_start <= slot_time < sched_end):
-                    status = 'not_working'
-                elif is_time_in_intervals(slot_time, slot_end, unavailable_intervals):
-                    status = 'unavailable'
-                elif is_time_in_intervals(slot_time, slot_end, appt_intervals):
-                    status = 'booked'
-                else:
-                    status = 'available'
-
-                day_entry['timeline'].append({
-                    'time': slot_time.strftime("%H:%M:%S"),
-                    'status': status
-                })
-
-                current += timedelta(minutes=increment_minutes)
-
+            day_entry = build_day(
+                day,
+                op_map.get(day),
+                ts_by_day.get(day, []),
+                appts_by_date.get(day_date.isoformat(), []),
+                increment_minutes,
+                closed_hours=False
+            )
+            day_entry['date'] = day_date.isoformat()
             week_result.append(day_entry)
 
         return jsonify({
@@ -1099,15 +904,6 @@ def sunday_based_availability(employee_id):
     finally:
         cursor.close()
 
-def timedelta_to_time(td):
-    """Convert timedelta to time object"""
-    total_seconds = int(td.total_seconds())
-    hours = total_seconds // 3600
-    minutes = (total_seconds % 3600) // 60
-    seconds = total_seconds % 60
-    return dt_time(hour=hours, minute=minutes, second=seconds)
-
-
 @appointments_bp.route('/employees/<int:employee_id>/breaks', methods=['GET'])
 def get_employee_breaks(employee_id):
     """
@@ -1137,13 +933,6 @@ def get_employee_breaks(employee_id):
 
         breaks = cursor.fetchall()
 
-        # Convert timedelta to string if needed
-        for break_item in breaks:
-            if isinstance(break_item['start_time'], timedelta):
-                break_item['start_time'] = str(timedelta_to_time(break_item['start_time']))
-            if isinstance(break_item['end_time'], timedelta):
-                break_item['end_time'] = str(timedelta_to_time(break_item['end_time']))
-
         return jsonify({
             'employee_id': employee_id,
             'salon_id': employee['salon_id'],
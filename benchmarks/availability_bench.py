@@ -0,0 +1,110 @@
+"""
+Week-grid generation for many employees: bitmap engine vs. the old
+datetime.combine / interval-scan loop.
+
+    python benchmarks/availability_bench.py [employees]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.availability import WEEK_DAYS, build_day, to_minutes
+
+INCREMENT = 15
+
+def td(hour, minute=0):
+    return timedelta(hours=hour, minutes=minute)
+
+def fake_employee(rng):
+    op_map = {
+        day: {'day': day, 'open_time': td(8), 'close_time': td(20), 'is_closed': day == 'Sunday'}
+        for day in WEEK_DAYS
+    }
+    slots = {}
+    appointments = {}
+    for day in WEEK_DAYS:
+        start = rng.choice([8, 9, 10])
+        slots[day] = [
+            {'slot_id': 1, 'day': day, 'start_time': td(start), 'end_time': td(start + 8), 'is_available': 1},
+            {'slot_id': 2, 'day': day, 'start_time': td(12), 'end_time': td(12, 30), 'is_available': 0},
+        ]
+        appointments[day] = []
+        for _ in range(rng.randint(0, 8)):
+            hour = rng.randint(start, start + 7)
+            minute = rng.choice([0, 15, 30, 45])
+            appointments[day].append({'start_time': td(hour, minute), 'end_time': td(hour, minute + 45)})
+    return op_map, slots, appointments
+
+def legacy_day(day, op, slot_rows, appt_rows):
+    def normalize_time(t):
+        hours, remainder = divmod(t.total_seconds(), 3600)
+        minutes, seconds = divmod(remainder, 60)
+        return datetime.min.replace(hour=int(hours), minute=int(minutes)).time()
+
+    def is_time_in_intervals(check_time, check_end_time, intervals):
+        for interval_start, interval_end in intervals:
+            if max(check_time, interval_start) < min(check_end_time, interval_end):
+                return True
+        return False
+
+    timeline = []
+    if not op or op['is_closed']:
+        return timeline
+    sched = None
+    for r in slot_rows:
+        if r['is_available']:
+            sched = r
+    if sched:
+        sched_start = normalize_time(sched['start_time'])
+        sched_end = normalize_time(sched['end_time'])
+    unavailable = [(normalize_time(r['start_time']), normalize_time(r['end_time'])) for r in slot_rows if not r['is_available']]
+    booked = [(normalize_time(r['start_time']), normalize_time(r['end_time'])) for r in appt_rows]
+
+    current = datetime.combine(date.today(), normalize_time(op['open_time']))
+    end_dt = datetime.combine(date.today(), normalize_time(op['close_time']))
+    while current <= end_dt:
+        slot_time = current.time()
+        slot_end = (current + timedelta(minutes=INCREMENT)).time()
+        if not sched or not (sched_start <= slot_time < sched_end):
+            status = 'not_working'
+        elif is_time_in_intervals(slot_time, slot_end, unavailable):
+            status = 'unavailable'
+        elif is_time_in_intervals(slot_time, slot_end, booked):
+            status = 'booked'
+        else:
+            status = 'available'
+        timeline.append({'time': slot_time.strftime("%H:%M:%S"), 'status': status})
+        current += timedelta(minutes=INCREMENT)
+    return timeline
+
+def run(employees):
+    rng = random.Random(490)
+    data = [fake_employee(rng) for _ in range(employees)]
+
+    started = time.perf_counter()
+    legacy = [
+        [legacy_day(day, op_map.get(day), slots[day], appts[day]) for day in WEEK_DAYS]
+        for op_map, slots, appts in data
+    ]
+    legacy_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    engine = [
+        [build_day(day, op_map.get(day), slots[day], appts[day], INCREMENT)['timeline'] for day in WEEK_DAYS]
+        for op_map, slots, appts in data
+    ]
+    engine_s = time.perf_counter() - started
+
+    assert legacy == engine, "engine timeline differs from legacy timeline"
+
+    print(f"employees:       {employees}")
+    print(f"legacy loop:     {legacy_s * 1000:9.1f} ms")
+    print(f"bitmap engine:   {engine_s * 1000:9.1f} ms")
+    print(f"speedup:         {legacy_s / engine_s:9.1f}x")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
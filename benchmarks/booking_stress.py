@@ -0,0 +1,200 @@
+"""
+Concurrent booking stress test against a local MySQL: many threads book
+random 60 minute appointments for a few employees, and some clients retry
+with the same idempotency key. Runs the same load twice:
+
+    unlocked   the old flow (overlap SELECT, then INSERT)
+    locked     utils.booking.claim_slots (employee-day lock, then one-query check)
+
+and reports throughput, conflict rate, replays and double bookings.
+Uses a scratch database (created if missing); never point it at the
+application database.
+
+    MYSQL_HOST=localhost MYSQL_USER=root MYSQL_PASSWORD=... \\
+        python benchmarks/booking_stress.py [threads] [requests_per_thread] [employees] [days]
+"""
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MySQLdb
+from utils import booking
+from utils.schema import ensure_schema
+
+DB = os.environ.get('STRESS_DB', 'salon_booking_stress')
+DEADLOCK = 1213
+SALON = 1
+FIRST_DAY = date(2030, 1, 7)   # a Monday
+
+def connect(db=DB):
+    return MySQLdb.connect(
+        host=os.environ.get('MYSQL_HOST', 'localhost'),
+        user=os.environ.get('MYSQL_USER', 'root'),
+        passwd=os.environ.get('MYSQL_PASSWORD', ''),
+        db=db
+    )
+
+def setup(employees):
+    conn = connect(db='')
+    cursor = conn.cursor()
+    cursor.execute(f"create database if not exists {DB}")
+    cursor.execute(f"use {DB}")
+    for table in ('appointments', 'services', 'time_slots', 'employee_day_locks', 'idempotency_keys'):
+        cursor.execute(f"drop table if exists {table}")
+    cursor.execute("create table services (service_id int primary key, duration_minutes int not null)")
+    cursor.execute("insert into services values (1, 60)")
+    cursor.execute("""
+        create table time_slots (
+            slot_id int auto_increment primary key,
+            employee_id int not null,
+            salon_id int not null,
+            day varchar(10) not null,
+            start_time time not null,
+            end_time time not null,
+            is_available boolean not null
+        )
+    """)
+    cursor.execute("""
+        create table appointments (
+            appointment_id int auto_increment primary key,
+            employee_id int not null,
+            salon_id int not null,
+            appointment_date date not null,
+            start_time time not null,
+            end_time time not null,
+            status varchar(16) not null default 'booked',
+            key idx_employee_day (employee_id, appointment_date)
+        )
+    """)
+    # importing utils.booking registered its two tables
+    ensure_schema(conn)
+    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    cursor.executemany("""
+        insert into time_slots (employee_id, salon_id, day, start_time, end_time, is_available)
+        values (%s, %s, %s, '09:00:00', '17:00:00', true)
+    """, [(e, SALON, d) for e in range(1, employees + 1) for d in days])
+    conn.commit()
+    conn.close()
+
+def reset():
+    conn = connect()
+    cursor = conn.cursor()
+    for table in ('appointments', 'employee_day_locks', 'idempotency_keys'):
+        cursor.execute(f"delete from {table}")
+    conn.commit()
+    conn.close()
+
+def book(conn, key, request):
+    """One /appointments/book request; returns booked, conflict or replayed."""
+    replay = booking.claim_key(conn, 'appointments.book', key, request)
+    if replay:
+        conn.rollback()
+        return 'replayed'
+    cursor = conn.cursor()
+    try:
+        day = FIRST_DAY + timedelta(days=request['day'])
+        error, plan = booking.claim_slots(conn, request['employee_id'], SALON, day, day.strftime('%A'),
+                                          request['start'], [1])
+        if error:
+            conn.rollback()
+            return 'conflict'
+        _, start, end, _ = plan[0]
+        cursor.execute("""
+            insert into appointments (employee_id, salon_id, appointment_date, start_time, end_time)
+            values (%s, %s, %s, sec_to_time(%s), sec_to_time(%s))
+        """, (request['employee_id'], SALON, day, start * 60, end * 60))
+        booking.remember_response(conn, 'appointments.book', key, {'appointment_id': cursor.lastrowid}, 201)
+        conn.commit()
+        return 'booked'
+    finally:
+        cursor.close()
+
+def client(worker, requests, employees, days, counts, lock):
+    rng = random.Random(worker)
+    conn = connect()
+    for _ in range(requests):
+        request = {
+            'employee_id': rng.randint(1, employees),
+            'day': rng.randrange(days),
+            'start': 9 * 60 + 30 * rng.randrange(15),
+        }
+        key = uuid.uuid4().hex
+        # a third of the clients time out and send the request again
+        for _attempt in range(2 if rng.random() < 0.3 else 1):
+            while True:
+                try:
+                    outcome = book(conn, key, request)
+                    break
+                except MySQLdb.OperationalError as e:
+                    conn.rollback()
+                    if e.args[0] != DEADLOCK:
+                        raise
+                    outcome = 'deadlock'
+                    with lock:
+                        counts['deadlock'] += 1
+            with lock:
+                counts[outcome] += 1
+    conn.close()
+
+def double_bookings():
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        select count(*)
+        from appointments a
+        join appointments b
+          on a.employee_id = b.employee_id
+         and a.appointment_date = b.appointment_date
+         and a.appointment_id < b.appointment_id
+         and a.start_time < b.end_time
+         and b.start_time < a.end_time
+    """)
+    overlaps = cursor.fetchone()[0]
+    conn.close()
+    return overlaps
+
+def run(label, threads, requests, employees, days):
+    reset()
+    counts = {'booked': 0, 'conflict': 0, 'replayed': 0, 'deadlock': 0}
+    lock = threading.Lock()
+    workers = [threading.Thread(target=client, args=(w, requests, employees, days, counts, lock))
+               for w in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+    total = counts['booked'] + counts['conflict'] + counts['replayed']
+    overlaps = double_bookings()
+    print(f"{label:<9} {total / elapsed:>9.0f} {counts['booked']:>7} "
+          f"{counts['conflict'] / total:>9.1%} {counts['replayed']:>8} {counts['deadlock']:>9} {overlaps:>14}")
+    return overlaps
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    employees = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    days = int(sys.argv[4]) if len(sys.argv) > 4 else 3
+
+    setup(employees)
+    print(f"{threads} threads x {requests} requests, {employees} employees x {days} days")
+    print(f"{'mode':<9} {'req/s':>9} {'booked':>7} {'conflicts':>9} {'replayed':>8} {'deadlocks':>9} {'double-booked':>14}")
+
+    lock_day = booking.lock_employee_day
+    booking.lock_employee_day = lambda conn, employee_id, day: None
+    run('unlocked', threads, requests, employees, days)
+    booking.lock_employee_day = lock_day
+    overlaps = run('locked', threads, requests, employees, days)
+    if overlaps:
+        print("FAIL: the locked engine double-booked")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Database round trips per checkout: the old per-item processPayment flow vs.
+utils.checkout.place_order. Each statement sleeps for a simulated round trip
+so the wall time shows how long the transaction holds its row locks.
+
+    python benchmarks/checkout_bench.py [items] [salons] [rtt_ms]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MySQLdb.cursors import RE_INSERT_VALUES
+from utils.checkout import place_order
+
+class CountingCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lastrowid = None
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.conn.round_trip()
+        self.lastrowid = self.conn.next_id()
+        # every product in the stock update qualifies
+        if 'where product_id in (' in sql:
+            self.rowcount = sql.split('where product_id in (')[1].split(')')[0].count('%s')
+
+    def executemany(self, sql, rows):
+        # mysqlclient folds an INSERT whose VALUES tuple is all placeholders into
+        # one multi-row statement; anything else is executed row by row
+        if RE_INSERT_VALUES.match(sql):
+            if rows:
+                self.conn.round_trip()
+        else:
+            for _ in rows:
+                self.conn.round_trip()
+
+    def fetchone(self):
+        return (1, 0, 0, 0)
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+class CountingConnection:
+    def __init__(self, rtt):
+        self.rtt = rtt
+        self.round_trips = 0
+        self.ids = 0
+
+    def round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.rtt)
+
+    def next_id(self):
+        self.ids += 1
+        return self.ids
+
+    def cursor(self):
+        return CountingCursor(self)
+
+    def commit(self):
+        self.round_trip()
+
+def legacy_checkout(conn, user_id, cart_items, applied_rewards):
+    cursor = conn.cursor()
+    salon_totals = {}
+    for item in cart_items:
+        salon = salon_totals.setdefault(str(item['salon_id']), {'items': [], 'subtotal': 0})
+        salon['items'].append(item)
+        salon['subtotal'] += float(item['line_total'])
+    for salon_id, salon in salon_totals.items():
+        cursor.execute("insert into invoices ...")
+        for item in salon['items']:
+            cursor.execute("insert into invoice_line_items ...")
+        for item in salon['items']:
+            cursor.execute("update products ...")     # no stock check at all
+        cursor.executemany("insert into analytics_rollups ...", [])
+        cursor.execute("select ... from customer_points ...")
+        cursor.execute("update customer_points ...")
+        if applied_rewards.get(salon_id):
+            cursor.execute("select points_required from loyalty_programs ...")
+            cursor.execute("update customer_points ...")
+    cursor.execute("update carts ...")
+    cursor.execute("select user_history_id from user_history ...")
+    cursor.execute("update user_history ...")
+
+def make_cart(items, salons):
+    return [{
+        'cart_id': 100 + i % salons, 'salon_id': 1 + i % salons, 'product_id': i + 1,
+        'product_name': f'product {i + 1}',
+        'quantity': 1 + i % 3, 'unit_price': 12.5, 'line_total': 12.5 * (1 + i % 3)
+    } for i in range(items)]
+
+def run(flow, cart, rewards, rtt):
+    conn = CountingConnection(rtt)
+    started = time.perf_counter()
+    flow(conn, 42, cart, rewards)
+    conn.commit()
+    return conn.round_trips, (time.perf_counter() - started) * 1000
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    salons = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    rtt = (float(sys.argv[3]) if len(sys.argv) > 3 else 0.5) / 1000
+
+    print(f"{'items':>6} {'salons':>7} {'legacy trips':>13} {'legacy ms':>10} {'batched trips':>14} {'batched ms':>11}")
+    for n, s in sorted({(5, 1), (30, 3), (items, salons), (100, 5)}):
+        cart = make_cart(n, s)
+        rewards = {str(1 + i): {'loyalty_program_id': 1, 'discount_value': 5} for i in range(s)}
+        legacy_trips, legacy_ms = run(legacy_checkout, cart, rewards, rtt)
+        trips, ms = run(place_order, cart, rewards, rtt)
+        print(f"{n:>6} {s:>7} {legacy_trips:>13} {legacy_ms:>10.1f} {trips:>14} {ms:>11.1f}")
+
+if __name__ == '__main__':
+    main()
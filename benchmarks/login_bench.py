@@ -0,0 +1,86 @@
+"""
+Login throughput: the old flow (rehash + UPDATE + three extra SELECTs on
+every login) vs. the credential subsystem (one SELECT, one verification on
+the bounded pool). Database round trips are simulated with a fixed sleep.
+
+    python benchmarks/login_bench.py [logins] [request_threads] [rtt_ms]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import check_password_hash, generate_password_hash
+from utils.credentials import CredentialPool, CredentialsBusy
+import utils.credentials as credentials
+
+PASSWORD = "correct horse battery staple"
+
+def round_trip(rtt):
+    time.sleep(rtt)
+
+def legacy_login(stored, rtt):
+    round_trip(rtt)                                   # select user_id, password
+    rehashed = generate_password_hash(stored, method="scrypt")
+    round_trip(rtt)                                   # update users set password
+    round_trip(rtt)                                   # commit
+    ok = check_password_hash(rehashed, PASSWORD)
+    round_trip(rtt)                                   # select first_name
+    round_trip(rtt)                                   # select role
+    round_trip(rtt)                                   # select salon_id, is_verified
+    return ok
+
+def pooled_login(stored, rtt):
+    round_trip(rtt)                                   # one select for every session field
+    try:
+        return credentials.verify_password(stored, PASSWORD)[0]
+    except CredentialsBusy:
+        return None
+
+def measure(fn, stored, logins, threads, rtt):
+    latencies = []
+
+    def one(_):
+        started = time.perf_counter()
+        result = fn(stored, rtt)
+        latencies.append(time.perf_counter() - started)
+        return result
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as request_threads:
+        results = list(request_threads.map(one, range(logins)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'elapsed': elapsed,
+        'per_sec': logins / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'ok': sum(1 for r in results if r),
+        'busy': sum(1 for r in results if r is None),
+    }
+
+def run(logins, threads, rtt_ms):
+    rtt = rtt_ms / 1000
+    hashed = generate_password_hash(PASSWORD)
+    credentials.credential_pool = CredentialPool(workers=os.cpu_count() or 2, max_pending=threads)
+
+    # the legacy flow only "worked" for plaintext rows, so feed it one
+    legacy = measure(legacy_login, PASSWORD, logins, threads, rtt)
+    pooled = measure(pooled_login, hashed, logins, threads, rtt)
+
+    print(f"logins: {logins}  request threads: {threads}  simulated rtt: {rtt_ms} ms  kdf workers: {credentials.credential_pool.workers}")
+    for name, r in (('legacy rehash', legacy), ('credential pool', pooled)):
+        print(f"{name:16} {r['per_sec']:8.1f} logins/s  p50 {r['p50_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms"
+              f"  ok {r['ok']}  busy {r['busy']}")
+    print(f"speedup:         {pooled['per_sec'] / legacy['per_sec']:8.1f}x")
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    run(
+        int(args[0]) if len(args) > 0 else 200,
+        int(args[1]) if len(args) > 1 else 16,
+        float(args[2]) if len(args) > 2 else 0.5
+    )
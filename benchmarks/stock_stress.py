@@ -0,0 +1,212 @@
+"""
+Concurrency stress test for stock reservations against a local MySQL.
+Worker threads add random products to carts (reserve), check out
+(commit_stock) or abandon the cart, while a sweeper releases expired holds.
+At the end every product must satisfy
+
+    initial stock - units sold == stock_quantity >= 0
+    reserved_quantity == units still held by reservations
+
+Uses a scratch database (created if missing) with just the tables the
+inventory module touches; never point it at the application database.
+
+    MYSQL_HOST=localhost MYSQL_USER=root MYSQL_PASSWORD=... \\
+        python benchmarks/stock_stress.py [threads] [carts_per_thread] [products] [stock]
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MySQLdb
+from utils import inventory
+
+DB = os.environ.get('STRESS_DB', 'salon_stock_stress')
+DEADLOCK = 1213
+
+def connect(db=DB):
+    return MySQLdb.connect(
+        host=os.environ.get('MYSQL_HOST', 'localhost'),
+        user=os.environ.get('MYSQL_USER', 'root'),
+        passwd=os.environ.get('MYSQL_PASSWORD', ''),
+        db=db
+    )
+
+def setup(products, stock):
+    conn = connect(db='')
+    cursor = conn.cursor()
+    cursor.execute(f"create database if not exists {DB}")
+    cursor.execute(f"use {DB}")
+    cursor.execute("drop table if exists products")
+    cursor.execute("drop table if exists stock_reservations")
+    cursor.execute("""
+        create table products (
+            product_id int primary key,
+            stock_quantity int not null,
+            reserved_quantity int not null default 0,
+            last_modified datetime
+        )
+    """)
+    cursor.execute("""
+        create table stock_reservations (
+            reservation_id bigint auto_increment primary key,
+            cart_id int not null,
+            product_id int not null,
+            quantity int not null,
+            expires_at datetime not null,
+            unique key uq_stock_reservations_cart_product (cart_id, product_id),
+            key idx_stock_reservations_expires (expires_at)
+        )
+    """)
+    cursor.executemany("insert into products (product_id, stock_quantity) values (%s, %s)",
+                       [(p, stock) for p in range(1, products + 1)])
+    conn.commit()
+    conn.close()
+
+class Totals:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sold = {}
+        self.counts = {'checkouts': 0, 'rejected_at_cart': 0, 'rejected_at_checkout': 0,
+                       'abandoned': 0, 'deadlocks': 0, 'released': 0}
+
+    def add(self, name, n=1):
+        with self.lock:
+            self.counts[name] += n
+
+    def add_sold(self, items):
+        with self.lock:
+            for item in items:
+                self.sold[item['product_id']] = self.sold.get(item['product_id'], 0) + item['quantity']
+
+def retrying(conn, totals, fn):
+    while True:
+        try:
+            result = fn()
+            conn.commit()
+            return result
+        except MySQLdb.OperationalError as e:
+            conn.rollback()
+            if e.args[0] != DEADLOCK:
+                raise
+            totals.add('deadlocks')
+        except Exception:
+            conn.rollback()
+            raise
+
+def shopper(worker, carts, products, totals):
+    rng = random.Random(worker)
+    conn = connect()
+    cursor = conn.cursor()
+    for n in range(carts):
+        cart_id = worker * 100000 + n
+        abandon = rng.random() < 0.2
+        items = []
+        for product_id in rng.sample(range(1, products + 1), rng.randint(1, min(3, products))):
+            quantity = rng.randint(1, 3)
+            try:
+                # abandoned carts expire at once so the sweeper has work
+                retrying(conn, totals, lambda: inventory.reserve(
+                    cursor, cart_id, product_id, quantity, minutes=0 if abandon else 15))
+                items.append({'product_id': product_id, 'quantity': quantity})
+            except inventory.InsufficientStock:
+                totals.add('rejected_at_cart')
+        if abandon:
+            totals.add('abandoned')
+            continue
+        if not items:
+            continue
+        try:
+            retrying(conn, totals, lambda: inventory.commit_stock(cursor, [cart_id], items))
+            totals.add('checkouts')
+            totals.add_sold(items)
+        except inventory.InsufficientStock:
+            totals.add('rejected_at_checkout')
+            # give the holds back the way the cart endpoints do
+            retrying(conn, totals, lambda: release(cursor, cart_id))
+    conn.close()
+
+def release(cursor, cart_id):
+    cursor.execute("select product_id, quantity from stock_reservations where cart_id = %s order by product_id for update",
+                   (cart_id,))
+    for product_id, quantity in cursor.fetchall():
+        cursor.execute("update products set reserved_quantity = greatest(reserved_quantity - %s, 0) where product_id = %s",
+                       (quantity, product_id))
+    cursor.execute("delete from stock_reservations where cart_id = %s", (cart_id,))
+
+def sweeper(stop, totals):
+    conn = connect()
+    while not stop.is_set():
+        try:
+            totals.add('released', inventory.sweep_expired(conn, batch_size=50))
+        except MySQLdb.OperationalError as e:
+            if e.args[0] != DEADLOCK:
+                raise
+            totals.add('deadlocks')
+        time.sleep(0.05)
+    conn.close()
+
+def verify(stock, totals):
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        select products.product_id, products.stock_quantity, products.reserved_quantity,
+               coalesce(sum(stock_reservations.quantity), 0)
+        from products
+        left join stock_reservations on stock_reservations.product_id = products.product_id
+        group by products.product_id, products.stock_quantity, products.reserved_quantity
+        order by products.product_id
+    """)
+    problems = []
+    for product_id, on_hand, reserved, held in cursor.fetchall():
+        sold = totals.sold.get(product_id, 0)
+        if on_hand < 0:
+            problems.append(f"product {product_id}: oversold, stock {on_hand}")
+        if stock - sold != on_hand:
+            problems.append(f"product {product_id}: sold {sold} but stock went {stock} -> {on_hand}")
+        if reserved != held:
+            problems.append(f"product {product_id}: reserved_quantity {reserved}, reservations hold {held}")
+    conn.close()
+    return problems
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    carts = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    products = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    stock = int(sys.argv[4]) if len(sys.argv) > 4 else 300
+
+    setup(products, stock)
+    totals = Totals()
+    stop = threading.Event()
+    sweep = threading.Thread(target=sweeper, args=(stop, totals))
+    sweep.start()
+    workers = [threading.Thread(target=shopper, args=(w + 1, carts, products, totals)) for w in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    sweep.join()
+    # abandoned carts expired immediately; hand the last of them back
+    conn = connect()
+    totals.add('released', inventory.sweep_expired(conn))
+    conn.close()
+
+    print(f"{threads} threads x {carts} carts over {products} products ({stock} each) in {elapsed:.1f}s")
+    for name, value in totals.counts.items():
+        print(f"  {name:<22} {value}")
+    print(f"  {'units sold':<22} {sum(totals.sold.values())} of {products * stock}")
+    problems = verify(stock, totals)
+    for problem in problems:
+        print("FAIL", problem)
+    if problems:
+        sys.exit(1)
+    print("OK: no oversell, reservations consistent")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Peak memory of a list endpoint: fetchall + list of dicts + jsonify (the old
+admin.get_users) vs. utils.streaming (server-side cursor, chunked encoding).
+The cursor generates rows on demand the way an SSCursor reads them off the
+socket, so no MySQL is needed; peak Python allocations are measured with
+tracemalloc while the whole response body is consumed.
+
+    python benchmarks/stream_memory.py [rows ...]
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+from utils.streaming import iter_rows, stream_json
+
+COLUMNS = ('user_id', 'first_name', 'last_name', 'email', 'phone_number', 'role', 'created_at')
+
+class GeneratedCursor:
+    """Yields `rows` synthetic users rows; fetchall materializes them like a buffered cursor."""
+
+    description = [(name,) for name in COLUMNS]
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.next_id = 0
+
+    def _row(self, i):
+        return (i, f"first{i}", f"last{i}", f"user{i}@example.com", f"555{i:07d}", 'customer', '2025-03-14 10:00:00')
+
+    def fetchmany(self, size):
+        end = min(self.next_id + size, self.rows)
+        batch = [self._row(i) for i in range(self.next_id, end)]
+        self.next_id = end
+        return batch
+
+    def fetchall(self):
+        return self.fetchmany(self.rows)
+
+    def close(self):
+        pass
+
+def make_app():
+    app = Flask(__name__)
+    app.config['STREAM_FETCH_SIZE'] = 500
+
+    @app.route('/buffered/<int:rows>')
+    def buffered(rows):
+        cursor = GeneratedCursor(rows)
+        data = [dict(zip(COLUMNS, row)) for row in cursor.fetchall()]
+        return jsonify({'users': data})
+
+    @app.route('/streamed/<int:rows>')
+    def streamed(rows):
+        cursor = GeneratedCursor(rows)
+        return stream_json(iter_rows(cursor), key='users', cursor=cursor)
+
+    return app
+
+def peak(client, path):
+    tracemalloc.start()
+    response = client.get(path, buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    _, top = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return top / 2 ** 20, size / 2 ** 20
+
+def main():
+    counts = [int(n) for n in sys.argv[1:]] or [10000, 50000, 200000]
+    client = make_app().test_client()
+    print(f"{'rows':>8} {'body MB':>8} {'buffered peak MB':>17} {'streamed peak MB':>17}")
+    for rows in counts:
+        buffered, size = peak(client, f'/buffered/{rows}')
+        streamed, _ = peak(client, f'/streamed/{rows}')
+        print(f"{rows:>8} {size:>8.1f} {buffered:>17.1f} {streamed:>17.1f}")
+
+if __name__ == '__main__':
+    main()
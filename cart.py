@@ -1,9 +1,14 @@
 from flask import Blueprint, request, jsonify, current_app, session
 from datetime import datetime
 from utils.logerror import log_error
+from utils.checkout import place_order
+from utils.inventory import InsufficientStock, reserve, resize
 
 cart_bp = Blueprint('cart', __name__)
 
+def out_of_stock(e):
+    return jsonify({'error': 'Insufficient stock', 'shortfalls': e.shortfalls}), 409
+
 #view cart
 @cart_bp.route('/cart/<int:customer_id>/<int:salon_id>', methods=['GET'])
 def view_cart(customer_id, salon_id):
@@ -67,12 +72,12 @@ def view_cart(customer_id, salon_id):
                 'cart_item_id': cart_item_id,
                 'product_id': product_id,
                 'name': name,
-                'price': float(price),
+                'price': price,
                 'quantity': quantity,
-                'subtotal': float(subtotal),
+                'subtotal': subtotal,
                 'stock_quantity': stock_quantity
             })
-        return jsonify({'cart': cart_list, 'total': float(total)}), 200
+        return jsonify({'cart': cart_list, 'total': total}), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
         return jsonify({'error': 'Error displaying cart'}), 500
@@ -148,9 +153,15 @@ def add_to_cart():
             cursor.execute('update cart_items set quantity = %s where cart_id = %s and product_id = %s', (new_quantity, cart_id, product_id))
         else:
             cursor.execute('insert into cart_items(cart_id, product_id, quantity) values(%s, %s, %s)', (cart_id, product_id, quantity))
+        #hold the stock for this cart until checkout or expiry
+        reserve(cursor, cart_id, product_id, quantity, current_app.config.get('STOCK_RESERVATION_MINUTES', 15))
         mysql.connection.commit()
         cursor.close()
         return jsonify({'message': 'Product added to cart', 'cart_id': cart_id}), 201
+    except InsufficientStock as e:
+        mysql.connection.rollback()
+        cursor.close()
+        return out_of_stock(e)
     except Exception as e:
         log_error(str(e), session.get("user_id"))
         return jsonify({'error': 'Error adding product'}), 500
@@ -187,6 +198,7 @@ def remove_from_cart():
 
         mysql = current_app.config['MYSQL']
         cursor = mysql.connection.cursor()
+        resize(cursor, cart_item_id, 0)
         query = """
             delete from cart_items
             where cart_item_id = %s
@@ -237,15 +249,17 @@ def update_cart_quantity():
         cursor = mysql.connection.cursor()
 
         if quantity < 1:
+            resize(cursor, cart_item_id, 0)
             query = """
                 delete from cart_items
                 where cart_item_id = %s
             """
-            cursor.execute(cart_item_id,)
+            cursor.execute(query, (cart_item_id,))
             mysql.connection.commit()
             cursor.close()
             return jsonify({'message': 'Cart item removed'}), 200 
         
+        resize(cursor, cart_item_id, quantity, current_app.config.get('STOCK_RESERVATION_MINUTES', 15))
         query = """
             update cart_items 
             set quantity = %s 
@@ -256,6 +270,10 @@ def update_cart_quantity():
         mysql.connection.commit()
         cursor.close()
         return jsonify({'message': 'Cart quantity updated'}), 200
+    except InsufficientStock as e:
+        mysql.connection.rollback()
+        cursor.close()
+        return out_of_stock(e)
     except Exception as e:
         log_error(str(e), session.get("user_id"))
         return jsonify({'error': 'Error updating cart'}), 500
@@ -528,125 +546,8 @@ def processPayment():
             ))
             wallet_id = cursor.lastrowid
         
-        salon_totals = {}
-        for item in cart_items_list:
-            salon_id = str(item['salon_id'])
-            if salon_id not in salon_totals:
-                salon_totals[salon_id] = {
-                    'items': [],
-                    'subtotal': 0
-                }
-            salon_totals[salon_id]['items'].append(item)
-            salon_totals[salon_id]['subtotal'] += float(item['line_total'])
-        
-        invoice_ids = []
-        for salon_id, salon_data in salon_totals.items():
-            subtotal = salon_data['subtotal']
+        invoice_ids = place_order(conn, user_id, cart_items_list, applied_rewards, wallet_id)
 
-            discount = 0
-            reward_used = None
-            if salon_id in applied_rewards and applied_rewards[salon_id]:
-                reward = applied_rewards[salon_id]
-                if reward.get('is_percentage'):
-                    discount = subtotal * (float(reward.get('discount_value', 0)) / 100)
-                else:
-                    discount = float(reward.get('discount_value', 0))
-                reward_used = reward.get('loyalty_program_id')
-            
-            final_subtotal = subtotal - discount
-            tax = final_subtotal * 0.07 
-            total = final_subtotal + tax
-            
-            invoice_insert = """
-                INSERT INTO invoices (customer_id, wallet_id, issued_date, status, subtotal_amount, tax_amount, total_amount)
-                VALUES (%s, %s, CURDATE(), 'paid', %s, %s, %s)
-            """
-            cursor.execute(invoice_insert, (user_id, wallet_id, final_subtotal, tax, total))
-            invoice_id = cursor.lastrowid
-            invoice_ids.append(invoice_id)
-            
-            for item in salon_data['items']:
-                line_item_insert = """
-                    INSERT INTO invoice_line_items (invoice_id, item_type, product_id, description, quantity, unit_price)
-                    VALUES (%s, 'product', %s, %s, %s, %s)
-                """
-                cursor.execute(line_item_insert, (
-                    invoice_id,
-                    item['product_id'],
-                    item['product_name'],
-                    item['quantity'],
-                    item['unit_price']
-                ))
-            
-            for item in salon_data['items']:
-                stock_update = """
-                    UPDATE products 
-                    SET stock_quantity = stock_quantity - %s 
-                    WHERE product_id = %s
-                """
-                cursor.execute(stock_update, (item['quantity'], item['product_id']))
-            
-            points_earned = int(final_subtotal)
-            points_check = """
-                SELECT points_id, points_earned, points_redeemed, available_points 
-                FROM customer_points 
-                WHERE salon_id = %s AND customer_id = %s
-            """
-            cursor.execute(points_check, (salon_id, user_id))
-            existing_points = cursor.fetchone()
-            
-            if existing_points:
-                points_update = """
-                    UPDATE customer_points 
-                    SET points_earned = points_earned + %s,
-                        available_points = available_points + %s
-                    WHERE salon_id = %s AND customer_id = %s
-                """
-                cursor.execute(points_update, (points_earned, points_earned, salon_id, user_id))
-            else:
-                points_insert = """
-                    INSERT INTO customer_points (salon_id, customer_id, points_per_dollar, points_earned, points_redeemed, available_points)
-                    VALUES (%s, %s, 1.00, %s, 0, %s)
-                """
-                cursor.execute(points_insert, (salon_id, user_id, points_earned, points_earned))
-            
-            if reward_used:
-                points_deduct = """
-                    UPDATE customer_points 
-                    SET points_redeemed = points_redeemed + %s,
-                        available_points = available_points - %s
-                    WHERE salon_id = %s AND customer_id = %s
-                """
-                reward_points_query = """
-                    SELECT points_required FROM loyalty_programs WHERE loyalty_program_id = %s
-                """
-                cursor.execute(reward_points_query, (reward_used,))
-                reward_points_result = cursor.fetchone()
-                points_to_deduct = reward_points_result[0] if reward_points_result else 0
-                
-                cursor.execute(points_deduct, (points_to_deduct, points_to_deduct, salon_id, user_id))
-        
-        cursor.execute("UPDATE carts SET status = 'completed' WHERE customer_id = %s AND status = 'active'", (user_id,))
-        total_spent = sum([float(st['subtotal']) for st in salon_totals.values()])
-        history_check = "SELECT user_history_id FROM user_history WHERE user_id = %s"
-        cursor.execute(history_check, (user_id,))
-        existing_history = cursor.fetchone()
-        
-        if existing_history:
-            history_update = """
-                UPDATE user_history 
-                SET total_spent = total_spent + %s,
-                    last_visit_date = CURDATE()
-                WHERE user_id = %s
-            """
-            cursor.execute(history_update, (total_spent, user_id))
-        else:
-            history_insert = """
-                INSERT INTO user_history (user_id, total_spent, last_visit_date)
-                VALUES (%s, %s, CURDATE())
-            """
-            cursor.execute(history_insert, (user_id, total_spent))
-        
         conn.commit()
         cursor.close()
         
@@ -655,6 +556,10 @@ def processPayment():
             'invoice_ids': invoice_ids
         }), 200
         
+    except InsufficientStock as e:
+        conn.rollback()
+        cursor.close()
+        return out_of_stock(e)
     except Exception as e:
         conn.rollback()
         cursor.close()
@@ -716,7 +621,7 @@ def validatePromo():
                 'valid': True,
                 'promo_id': promo_data['promo_id'],
                 'name': promo_data['name'],
-                'discount_value': float(promo_data['discount_value']),
+                'discount_value': promo_data['discount_value'],
                 'is_percentage': bool(promo_data['is_percentage'])
             }), 200
         else:
@@ -820,7 +725,7 @@ def allAvailableRewards():
                     'loyalty_program_id': row_dict['loyalty_program_id'],
                     'reward_name': row_dict['reward_name'],
                     'points_required': row_dict['points_required'],
-                    'discount_value': float(row_dict['discount_value']),
+                    'discount_value': row_dict['discount_value'],
                     'is_percentage': bool(row_dict['is_percentage']),
                     'tags': tags_list
                 })
@@ -2,7 +2,10 @@ from flask import Blueprint, request, jsonify, session
 from flask import current_app
 from datetime import datetime
 from utils.logerror import log_error
+from utils.availability import format_minutes, to_minutes
+from utils.search import mark_salon_changed
 import json
+from utils.cache import invalidate_salon
 
 employees_bp = Blueprint('employees', __name__)
 
@@ -161,7 +164,9 @@ def add_employee(salon_id):
             """
             cursor.execute(query, ('employees', employee_id, master_tag_id))
     
+        mark_salon_changed(mysql.connection, salon_id)
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         cursor.close()
 
         return jsonify({"message": "Employee added successfully", "employee_id": employee_id}), 201
@@ -249,8 +254,9 @@ def edit_employee(salon_id, employee_id):
             """
             cursor.execute(query, ('employees', employee_id, tag_id))
 
-        
+        mark_salon_changed(mysql.connection, salon_id)
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         cursor.close()
         return jsonify({"message": "Employee updated successfully"}), 200
     except Exception as e:
@@ -314,7 +320,9 @@ def delete_employee(salon_id, employee_id):
             where employee_id = %s
         """
         cursor.execute(query, (employee_id,))
+        mark_salon_changed(mysql.connection, salon_id)
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         cursor.close()
         return jsonify({"message": "Employee deleted successfully"}), 200
     except Exception as e:
@@ -390,15 +398,13 @@ def add_timeslot(salon_id, employee_id):
             cursor.close()
             return jsonify({"error": f"No operating hours set for {day}."}), 400
         
-        open_time, close_time = hours
-        open_time = (datetime.min + open_time).time()
-        close_time = (datetime.min + close_time).time()
+        open_minute, close_minute = to_minutes(hours[0]), to_minutes(hours[1])
 
         #check if within operating hours
-        if not (open_time <= start_time < end_time <= close_time):
+        if not (open_minute <= to_minutes(start_time) < to_minutes(end_time) <= close_minute):
             cursor.close()
             return jsonify({
-                "error": f"Time slot must be between {open_time} and {close_time} for {day}."}), 400
+                "error": f"Time slot must be between {format_minutes(open_minute)} and {format_minutes(close_minute)} for {day}."}), 400
         
         #check for overlapping times
         query = """
@@ -419,6 +425,7 @@ def add_timeslot(salon_id, employee_id):
         """
         cursor.execute(query, (salon_id, employee_id, day, start_time, end_time))
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         cursor.close()
         return jsonify({"message": "Time slot added successfully"}), 201
     except Exception as e:
@@ -459,15 +466,9 @@ def get_timeslots(salon_id, employee_id):
         """
         cursor.execute(query, (salon_id, employee_id))
 
-        #convert datetime to strings
         columns = [desc[0] for desc in cursor.description]
         timeslots = [dict(zip(columns, row)) for row in cursor.fetchall()]
         cursor.close()
-
-        for timeslot in timeslots:
-            for key in ['day', 'start_time', 'end_time', 'created_at', 'last_modified']:
-                if key in timeslot and timeslot[key] is not None:
-                    timeslot[key] = str(timeslot[key])
         return jsonify(timeslots), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -542,15 +543,13 @@ def edit_timeslot(salon_id, employee_id, slot_id):
             cursor.close()
             return jsonify({"error": f"No operating hours set for {day}."}), 400
         
-        open_time, close_time = hours
-        open_time = (datetime.min + open_time).time()
-        close_time = (datetime.min + close_time).time()
+        open_minute, close_minute = to_minutes(hours[0]), to_minutes(hours[1])
 
         #check if within operating hours
-        if not (open_time <= start_time < end_time <= close_time):
+        if not (open_minute <= to_minutes(start_time) < to_minutes(end_time) <= close_minute):
             cursor.close()
             return jsonify({
-                "error": f"Time slot must be between {open_time} and {close_time} for {day}."}), 400
+                "error": f"Time slot must be between {format_minutes(open_minute)} and {format_minutes(close_minute)} for {day}."}), 400
         
         #check for overlapping times
         query = """
@@ -573,6 +572,7 @@ def edit_timeslot(salon_id, employee_id, slot_id):
         """
         cursor.execute(query, (day, start_time, end_time, slot_id, employee_id, salon_id))
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         cursor.close()
         return jsonify({"message": "Time slot updated successfully"}), 200
     except Exception as e:
@@ -614,6 +614,7 @@ def delete_timeslot(salon_id, employee_id, slot_id):
         """
         cursor.execute(query, (slot_id, employee_id, salon_id))
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         cursor.close()
         return jsonify({"message": "Time slot deleted successfully"}), 200
     except Exception as e:
@@ -713,12 +714,11 @@ def save_full_schedule(salon_id, employee_id):
             if not hours or hours[2]:  # is_closed = True
                 continue  # Skip if salon is closed on this day
 
-            open_time = (datetime.min + hours[0]).time()
-            close_time = (datetime.min + hours[1]).time()
+            open_minute, close_minute = to_minutes(hours[0]), to_minutes(hours[1])
 
             # Validate within operating hours
-            if not (open_time <= start_time_obj <= close_time and 
-                    open_time <= end_time_obj <= close_time):
+            if not (open_minute <= to_minutes(start_time_obj) <= close_minute and
+                    open_minute <= to_minutes(end_time_obj) <= close_minute):
                 continue  # Skip invalid hours
 
             # Insert timeslot
@@ -728,6 +728,7 @@ def save_full_schedule(salon_id, employee_id):
             """, (salon_id, employee_id, day, start_time_obj, end_time_obj, is_available))
 
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         cursor.close()
         
         return jsonify({
@@ -845,6 +846,7 @@ def add_salary(salon_id, employee_id):
         """
         cursor.execute(query, (salon_id, employee_id, salary_value, effective_date))
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         cursor.close()
         return jsonify({"message": "Salary added successfully"}), 201
     except Exception as e:
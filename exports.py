@@ -0,0 +1,162 @@
+import os
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app, session, send_file
+from utils.logerror import log_error
+from utils import exports
+
+exports_bp = Blueprint('exports', __name__)
+
+def can_export(salon_id):
+    role = session.get('role')
+    return role == 'admin' or (role == 'owner' and session.get('salon_id') == salon_id)
+
+def job_response(job):
+    job['download_url'] = (f"/salon/{job['salon_id']}/exports/{job['export_id']}/download"
+                           if job['status'] == 'done' else None)
+    return job
+
+# queue an export of appointments, invoices or customers; the file is built in the background
+@exports_bp.route('/salon/<int:salon_id>/exports', methods=['POST'])
+def create_export(salon_id):
+    """
+    Queue a data export for a salon
+    ---
+    tags:
+      - Exports
+    parameters:
+      - name: salon_id
+        in: path
+        required: true
+        type: integer
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            dataset:
+              type: string
+              enum: [appointments, invoices, customers]
+            format:
+              type: string
+              enum: [csv, parquet]
+            date_from:
+              type: string
+              example: "2024-01-01"
+            date_to:
+              type: string
+              example: "2024-12-31"
+    responses:
+      202:
+        description: Export queued
+      400:
+        description: Invalid dataset, format or date
+      403:
+        description: Not the salon's owner
+    """
+    if not can_export(salon_id):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    data = request.get_json(silent=True) or {}
+    dataset = data.get('dataset')
+    fmt = data.get('format', 'csv')
+    date_from = data.get('date_from')
+    date_to = data.get('date_to')
+
+    if dataset not in exports.DATASETS:
+        return jsonify({'error': f"dataset must be one of {', '.join(exports.DATASETS)}"}), 400
+    if fmt not in exports.FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(exports.FORMATS)}"}), 400
+    if not exports.format_available(fmt):
+        return jsonify({'error': f"{fmt} exports are not available on this server"}), 400
+    try:
+        for value in (date_from, date_to):
+            if value:
+                datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+
+    try:
+        mysql = current_app.config['MYSQL']
+        export_id = exports.create_job(mysql.connection, salon_id, dataset, fmt,
+                                       session.get('user_id'), date_from, date_to)
+        mysql.connection.commit()
+        return jsonify({
+            'export_id': export_id,
+            'status': 'queued',
+            'status_url': f"/salon/{salon_id}/exports/{export_id}"
+        }), 202
+    except Exception as e:
+        log_error(str(e), session.get("user_id"))
+        return jsonify({'error': 'Failed to queue export'}), 500
+
+@exports_bp.route('/salon/<int:salon_id>/exports', methods=['GET'])
+def list_exports(salon_id):
+    """
+    Recent exports of a salon
+    ---
+    tags:
+      - Exports
+    responses:
+      200:
+        description: Export jobs, newest first
+    """
+    if not can_export(salon_id):
+        return jsonify({'error': 'Unauthorized'}), 403
+    mysql = current_app.config['MYSQL']
+    jobs = exports.list_jobs(mysql.connection, salon_id)
+    return jsonify({'exports': [job_response(job) for job in jobs]}), 200
+
+@exports_bp.route('/salon/<int:salon_id>/exports/<int:export_id>', methods=['GET'])
+def export_status(salon_id, export_id):
+    """
+    Status of one export
+    ---
+    tags:
+      - Exports
+    responses:
+      200:
+        description: Export job
+      404:
+        description: Export not found
+    """
+    if not can_export(salon_id):
+        return jsonify({'error': 'Unauthorized'}), 403
+    mysql = current_app.config['MYSQL']
+    job = exports.get_job(mysql.connection, salon_id, export_id)
+    if not job:
+        return jsonify({'error': 'Export not found'}), 404
+    return jsonify(job_response(job)), 200
+
+# send_file answers Range and If-None-Match itself, so large files can be resumed
+@exports_bp.route('/salon/<int:salon_id>/exports/<int:export_id>/download', methods=['GET'])
+def download_export(salon_id, export_id):
+    """
+    Download a finished export (supports Range requests)
+    ---
+    tags:
+      - Exports
+    responses:
+      200:
+        description: The export file
+      206:
+        description: Requested byte range
+      404:
+        description: Export not found
+      409:
+        description: Export not finished yet
+    """
+    if not can_export(salon_id):
+        return jsonify({'error': 'Unauthorized'}), 403
+    mysql = current_app.config['MYSQL']
+    job = exports.get_job(mysql.connection, salon_id, export_id)
+    if not job:
+        return jsonify({'error': 'Export not found'}), 404
+    if job['status'] != 'done':
+        return jsonify({'error': f"Export is {job['status']}"}), 409
+
+    path = exports.file_path(current_app.config['EXPORT_DIR'], export_id, job['format'])
+    if not os.path.exists(path):
+        return jsonify({'error': 'Export file has expired'}), 404
+    return send_file(path, mimetype=exports.FORMATS[job['format']], as_attachment=True,
+                     download_name=exports.download_name(job), conditional=True)
@@ -1,13 +1,19 @@
 from flask import Blueprint, request, jsonify, session, current_app, url_for
-from werkzeug.security import check_password_hash, generate_password_hash
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 from flasgger import swag_from
 from utils.logerror import log_error
-from utils.emails import send_email
-from utils.logerror import log_error
+from utils.outbox import queue_email
+from utils.credentials import DUMMY_PASSWORD_HASH, CredentialsBusy, hash_password, upgrade_password, verify_password
+from utils.throttle import throttle
+import math
 
 login_bp = Blueprint('login', __name__)
 
+def too_many_attempts(retry_after):
+    response = jsonify({'error': 'Too many attempts, try again later'})
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response, 429
+
 #works with login may lose some of the login stuff
 #backend intended so they'll have to look it over
 @login_bp.route('/login', methods=['POST'])
@@ -42,6 +48,11 @@ def login():
     username = data.get('username')
     password = data.get('password')
 
+    #throttle before any db or hashing work (rejections are counted, not logged to the db)
+    retry_after = throttle.check(('login_ip', request.remote_addr), ('login_user', username))
+    if retry_after:
+        return too_many_attempts(retry_after)
+
     #check if form is filled out
     if not username or not password:
         log_error("Login attempt with missing fields", None)
@@ -49,85 +60,49 @@ def login():
 
     mysql = current_app.config['MYSQL']
     cursor = mysql.connection.cursor()
-    cursor.execute("""select user_id, password from users where username = %s""", (username,))
+    #everything the session needs in one round trip
+    cursor.execute("""
+        select u.user_id, u.password, u.first_name, u.role, s.salon_id, s.is_verified
+        from users u
+        left join salons s on s.owner_id = u.user_id
+        where u.username = %s
+        limit 1
+    """, (username,))
     user = cursor.fetchone()
-    
-    #check if user exists
-    if not user:
-        cursor.close()
-        session.clear()
-        log_error("Invalid login attempt for username: {}".format(username), None)
-        return jsonify({'error': 'Invalid username or password'}), 401
-    
-    #check if password is correct
-    '''user_id, hashed_password = user
-    if not check_password_hash(hashed_password, password):
-        cursor.close()
-        session.clear()
-        log_error("Invalid login attempt for username: {}".format(username), None)
-        return jsonify({'error': 'Invalid username or password'}), 401'''
-    user_id, stored_password = user
-
-    if not stored_password.startswith("scrypt:"):
-        mysql = current_app.config['MYSQL']
-        cursor = mysql.connection.cursor()
-
-    new_hashed_password = generate_password_hash(
-        stored_password,
-        method="scrypt"
-    )
-
-    cursor.execute(
-        "UPDATE users SET password = %s WHERE user_id = %s",
-        (new_hashed_password, user_id)
-    )
-    mysql.connection.commit()
     cursor.close()
+    
+    #an unknown username still pays for one scrypt check, so response time
+    #doesn't tell which usernames exist
+    stored_password = user[1] if user else DUMMY_PASSWORD_HASH
 
-    stored_password = new_hashed_password
+    #check if password is correct
+    try:
+        valid, upgraded = verify_password(
+            stored_password,
+            password,
+            allow_plaintext=current_app.config.get('LEGACY_PLAINTEXT_PASSWORDS', True)
+        )
+    except CredentialsBusy:
+        response = jsonify({'error': 'Too many login attempts in progress, try again shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
 
-    if not check_password_hash(stored_password, password):
+    if not user or not valid:
+        session.clear()
         log_error("Invalid login attempt for username: {}".format(username), None)
         return jsonify({'error': 'Invalid username or password'}), 401
 
-    
-    # Get first_name
-    first_name = None
-    try:
-        cursor.execute("select first_name from users where user_id = %s limit 1", (user_id,))
-        r = cursor.fetchone()
-        if r and r[0]:
-            first_name = r[0]
-    except Exception:
-        first_name = None
+    user_id, stored_password, first_name, role, salon_id, is_verified = user
 
-    # Get role
-    role = None
-    try:
-        cursor.execute("select role from users where user_id = %s limit 1", (user_id,))
-        r = cursor.fetchone()
-        if r and r[0]:
-            role = str(r[0]).lower()
-    except Exception:
-        role = None
+    if upgraded:
+        upgrade_password(mysql.connection, user_id, stored_password, upgraded)
 
-    # Get salon_id and is_verified for salon owners
-    salon_id = None
-    is_verified = None
-    
+    role = str(role).lower() if role else None
     if role == 'owner':
-        try:
-            cursor.execute("select salon_id, is_verified from salons where owner_id = %s limit 1", (user_id,))
-            r = cursor.fetchone()
-            if r:
-                salon_id = r[0]
-                is_verified = bool(r[1]) if r[1] is not None else False
-        except Exception as e:
-            log_error(f"Error fetching salon: {e}", user_id)
-            salon_id = None
-            is_verified = None
-
-    cursor.close()
+        is_verified = bool(is_verified) if salon_id is not None else None
+    else:
+        salon_id = None
+        is_verified = None
 
     if not role:
         role = 'customer'
@@ -194,6 +169,10 @@ def forgot_password():
 
     if not email:
       return jsonify({"error": "Email is required"}), 400
+
+    retry_after = throttle.check(('forgot_ip', request.remote_addr), ('forgot_email', email))
+    if retry_after:
+      return too_many_attempts(retry_after)
     try:  
       mysql = current_app.config['MYSQL']
       cursor = mysql.connection.cursor()
@@ -222,7 +201,8 @@ Click the link below to reset it:
 This link expires in 30 minutes.
 """
 
-      send_email(to=email, subject=subject, body=body)
+      queue_email(mysql.connection, email, subject, body)
+      mysql.connection.commit()
 
       return jsonify({"message": "If the email exists, a reset link will be sent"}), 200
     except Exception as e:
@@ -257,7 +237,7 @@ def reset_password(token):
         cursor = mysql.connection.cursor()
         cursor.execute(
           "update users set password = %s where user_id = %s",
-          (generate_password_hash(new_password), user_id)
+          (hash_password(new_password), user_id)
         )
         mysql.connection.commit()
         cursor.close()
@@ -1,11 +1,13 @@
 from flask import Blueprint, request, jsonify, session
 from flask import current_app
 from utils.logerror import log_error
+from utils.cache import cached, invalidate_namespace, invalidate_salon
 
 loyalty_bp = Blueprint('loyalty', __name__)
 
 #customers/salons can view active loyalty
 @loyalty_bp.route('/loyalty/<int:salon_id>', methods=['GET'])
+@cached('loyalty')
 def get_active_loyalty(salon_id):
     """
     Get active loyalty programs for a salon
@@ -207,6 +209,7 @@ def add_loyalty(salon_id):
                 tag_id = tag[0]
                 cursor.execute("insert into entity_tags (entity_type, entity_id, tag_id) values (%s, %s, %s)", ('loyalty', loyalty_program_id, tag_id))
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         cursor.close()
         return jsonify({"message": "Loyalty program added successfully"}), 201
     except Exception as e:
@@ -292,6 +295,7 @@ def edit_loyalty(loyalty_program_id):
                 tag_id = tag[0]
                 cursor.execute("insert into entity_tags (entity_type, entity_id, tag_id) values (%s, %s, %s)", ('loyalty', loyalty_program_id, tag_id))
         mysql.connection.commit()
+        invalidate_namespace('loyalty')
         cursor.close()
         return jsonify({"message": "Loyalty program updated successfully"}), 200
     except Exception as e:
@@ -327,6 +331,7 @@ def disable_loyalty(loyalty_program_id):
         """
         cursor.execute(query, (loyalty_program_id,))
         mysql.connection.commit()
+        invalidate_namespace('loyalty')
         return jsonify({"message": "Loyalty program disabled"}), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -361,6 +366,7 @@ def enable_loyalty(loyalty_program_id):
         """
         cursor.execute(query, (loyalty_program_id,))
         mysql.connection.commit()
+        invalidate_namespace('loyalty')
         return jsonify({"message": "Loyalty program enabled"}), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -500,6 +506,7 @@ def claim_voucher(salon_id):
         """
         cursor.execute(query, (customer_id, salon_id, loyalty_program_id))
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         return jsonify({"message": "Voucher claimed successfully"}), 201
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -1,5 +1,4 @@
 from flask import Blueprint, request, jsonify, current_app, session
-from datetime import datetime
 
 notifications_bp = Blueprint('notifications', __name__)
 
@@ -42,7 +41,8 @@ def get_notifications():
         cursor = mysql.connection.cursor()
         
         query = """
-            SELECT notification_id, user_id, title, message, is_read, created_at
+            SELECT notification_id, user_id, title, message, is_read, created_at,
+                   TIMESTAMPDIFF(SECOND, created_at, NOW())
             FROM notifications
             WHERE user_id = %s
             ORDER BY created_at DESC
@@ -61,8 +61,8 @@ def get_notifications():
                 'title': row[2],
                 'message': row[3],
                 'is_read': bool(row[4]),
-                'created_at': row[5].strftime('%Y-%m-%d %H:%M:%S') if row[5] else None,
-                'time_ago': get_time_ago(row[5]) if row[5] else 'Just now'
+                'created_at': row[5],
+                'time_ago': get_time_ago(row[6]) if row[6] is not None else 'Just now'
             })
         
         return jsonify({'notifications': notifications}), 200
@@ -298,13 +298,8 @@ def send_notification(salon_id):
         return jsonify({'error': 'Failed to send notification'}), 500
 
 # Helper function to calculate "time ago"
-def get_time_ago(timestamp):
-    """Calculate human-readable time difference"""
-    now = datetime.now()
-    diff = now - timestamp
-    
-    seconds = diff.total_seconds()
-    
+def get_time_ago(seconds):
+    """Human-readable age of something `seconds` old"""
     if seconds < 60:
         return "Just now"
     elif seconds < 3600:
@@ -1,8 +1,12 @@
 import random
 import string
+from itertools import chain
 from flask import Blueprint, request, jsonify, current_app, session
-from datetime import datetime
+from datetime import date, datetime
 from utils.logerror import log_error
+from utils import rollups
+from utils.inventory import InsufficientStock, commit_stock
+from utils.streaming import iter_rows, server_cursor, stream_json
 
 payment_bp = Blueprint('payment', __name__)
 
@@ -115,7 +119,6 @@ def award_loyalty_points(mysql, customer_id, salon_id, total_amount, default_poi
 
     if row:
         points_id, points_per_dollar = row
-        points_per_dollar = float(points_per_dollar)
         points_earned = int(total_amount * points_per_dollar)
 
         #add points earned to their existing points
@@ -237,7 +240,8 @@ def apply_discount(mysql, customer_id, salon_id, service_id, subtotal, loyalty_v
             return None, "Invalid promo code"
         
         promo_id, discount_value, is_percentage, start_date, end_date, is_active = promo
-        curr_date = datetime.now().date()
+        # DATE columns arrive as 'YYYY-MM-DD', which compares in date order
+        curr_date = date.today().isoformat()
         if not is_active or not(start_date <= curr_date <= end_date):
             cursor.close()
             return None, "Promo code expired or inactive"
@@ -357,7 +361,6 @@ def pay_appointment():
         return jsonify({'error': error}), 400
 
     subtotal = max(round(subtotal - discount_amount, 2), 0)
-    subtotal = float(subtotal)
     tax = round(subtotal * 0.08875, 2)
     total = round(subtotal + tax, 2)
 
@@ -403,6 +406,7 @@ def pay_appointment():
         """
         cursor.execute(query, (invoice_id, 'service', service_id, 1, subtotal, 'Appointment service charge'))
 
+        rollups.record_appointment_payment(mysql.connection, appointment_id, total)
         query = """
             update appointments
             set status = 'paid' 
@@ -432,6 +436,7 @@ def pay_appointment():
         }), 201
     except Exception as e:
         log_error(str(e), session.get("user_id"))
+        mysql.connection.rollback()
         return jsonify({'error': f'Payment was not processed: {str(e)}'}), 500
     
 @payment_bp.route('/cart/payment', methods=['POST'])
@@ -568,7 +573,6 @@ def pay_cart():
         return jsonify({'error': error}), 400
         
     subtotal = max(round(subtotal - discount_amount, 2), 0)
-    subtotal = float(subtotal)
     tax = round(subtotal * 0.08875, 2)
     total = round(subtotal + tax, 2)
 
@@ -585,24 +589,34 @@ def pay_cart():
         cursor.execute(query, (customer_id, wallet_id, subtotal, tax, total))
         invoice_id = cursor.lastrowid
 
-        for product_id, quantity, price, name, stock in items:
-            if stock < quantity:
-                cursor.close()
-                return jsonify({'error': f'Insufficient stock for {name}'}), 400
-            query = """
-                insert into invoice_line_items(invoice_id, item_type, product_id, service_id, quantity, unit_price, description)
-                values (%s, %s, %s, %s, %s, %s, %s)
-            """
-            cursor.execute(query, (invoice_id, 'product', product_id, None, quantity, price, name))
-
-            query = """
-                update products
-                set stock_quantity = stock_quantity - %s
-                where product_id = %s
-            """
-            cursor.execute(query, (quantity, product_id))
+        query = """
+            insert into invoice_line_items(invoice_id, item_type, product_id, service_id, quantity, unit_price, description)
+            values (%s, %s, %s, %s, %s, %s, %s)
+        """
+        cursor.executemany(query, [
+            (invoice_id, 'product', product_id, None, quantity, price, name)
+            for product_id, quantity, price, name, stock in items
+        ])
+
+        #conditional decrement of every product at once, releasing the cart's holds
+        try:
+            commit_stock(cursor, [cart_id], [
+                {'product_id': product_id, 'quantity': quantity}
+                for product_id, quantity, price, name, stock in items
+            ])
+        except InsufficientStock as e:
+            mysql.connection.rollback()
+            cursor.close()
+            names = {product_id: name for product_id, quantity, price, name, stock in items}
+            short = ", ".join(str(names.get(s['product_id'], s['product_id'])) for s in e.shortfalls)
+            return jsonify({'error': f'Insufficient stock for {short}', 'shortfalls': e.shortfalls}), 400
 
         cursor.execute("update carts set status='completed' where cart_id = %s", (cart_id,))
+        rollups.record_product_sale(
+            mysql.connection,
+            salon_id,
+            [(product_id, quantity, price * quantity) for product_id, quantity, price, name, stock in items]
+        )
 
         points_earned = award_loyalty_points(mysql, customer_id, salon_id, total)
 
@@ -635,7 +649,7 @@ def payment_history(customer_id):
     """
     try:
         mysql = current_app.config['MYSQL']
-        cursor = mysql.connection.cursor()
+        cursor = server_cursor(mysql.connection)
 
         query = """
             SELECT
@@ -669,67 +683,62 @@ def payment_history(customer_id):
         """
 
         cursor.execute(query, (customer_id,))
-        rows = cursor.fetchall()
-        cursor.close()
-
-        if not rows:
-            return jsonify({'message': 'No payment history found'}), 404
-
-        invoices = {}
-
-        for row in rows:
-            invoice_id = row[0]
-
-            issued_date = row[2]
-            if hasattr(issued_date, 'strftime'):
-                issued_date = issued_date.strftime('%Y-%m-%d')
-
-            # Create invoice once
-            if invoice_id not in invoices:
-                invoices[invoice_id] = {
-                    'invoice_id': invoice_id,
-                    'appointment_id': row[1],
-                    'issued_date': issued_date,
-                    'subtotal': float(row[3]),
-                    'tax': float(row[4]),
-                    'total': float(row[5]),
-                    'status': row[6],
-                    'items': []
-                }
-
-            # Add line item
-            line_item_id = row[7]
-            if line_item_id:
-                item = {
-                    'line_item_id': line_item_id,
-                    'type': row[8],
-                    'quantity': int(row[9]),
-                    'unit_price': float(row[10]),
-                    'line_total': float(row[11])
-                }
-
-                # Product details
-                if row[8] == 'product':
-                    item['product'] = {
-                        'product_id': row[12],
-                        'name': row[13],
-                        'salon_id': row[14],
-                        'salon_name': row[15]
-                    }
-
-                invoices[invoice_id]['items'].append(item)
-
-        return jsonify({
-            'customer_id': customer_id,
-            'payments': list(invoices.values())
-        }), 200
-
+        rows = iter_rows(cursor)
+        first = next(rows, None)
     except Exception as e:
         log_error(str(e), session.get("user_id"))
         return jsonify({
             'error': f'Error fetching payment history: {str(e)}'
         }), 500
-    
+
+    if first is None:
+        cursor.close()
+        return jsonify({'message': 'No payment history found'}), 404
+
+    return stream_json(group_invoices(chain([first], rows)), key='payments',
+                       head={'customer_id': customer_id}, cursor=cursor)
+
+def group_invoices(rows):
+    """Folds line-item rows into invoices; rows of one invoice arrive next to each other."""
+    invoice = None
+    for row in rows:
+        if invoice is None or invoice['invoice_id'] != row['invoice_id']:
+            if invoice is not None:
+                yield invoice
+            invoice = {
+                'invoice_id': row['invoice_id'],
+                'appointment_id': row['appointment_id'],
+                'issued_date': row['issued_date'][:10] if row['issued_date'] else None,
+                'subtotal': row['subtotal_amount'],
+                'tax': row['tax_amount'],
+                'total': row['total_amount'],
+                'status': row['status'],
+                'items': []
+            }
+
+        # Add line item
+        if row['line_item_id']:
+            item = {
+                'line_item_id': row['line_item_id'],
+                'type': row['item_type'],
+                'quantity': int(row['quantity']),
+                'unit_price': row['unit_price'],
+                'line_total': row['line_total']
+            }
+
+            # Product details
+            if row['item_type'] == 'product':
+                item['product'] = {
+                    'product_id': row['product_id'],
+                    'name': row['name'],
+                    'salon_id': row['salon_id'],
+                    'salon_name': row['salon_name']
+                }
+
+            invoice['items'].append(item)
+    if invoice is not None:
+        yield invoice
+
 @payment_bp.route('/payments/refund/<int:invoice_id>', methods=['POST'])
 def refund_payment(invoice_id):
     """
@@ -774,7 +783,7 @@ def refund_payment(invoice_id):
             return jsonify({'error': 'This invoice has already been refunded'}), 400
         
         appointment_id = invoice[0]
-        total_amount = float(invoice[1])
+        total_amount = invoice[1]
         status = invoice[2]
 
         if status == 'cancelled':
@@ -784,6 +793,7 @@ def refund_payment(invoice_id):
         refund_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
         timestamp = datetime.now().isoformat()
 
+        rollups.record_refund(mysql.connection, invoice_id)
         query = """
             update invoices
             set status = 'cancelled', last_modified = %s
@@ -3,11 +3,20 @@ from MySQLdb.cursors import DictCursor
 from datetime import datetime
 from flasgger import swag_from
 from utils.logerror import log_error
+from utils.conditional import conditional
 
 products_bp = Blueprint('products_bp', __name__)
 
+# inserts change the count/id checksum, updates (including stock) bump last_modified
+PRODUCTS_VALIDATOR = """
+    select count(*), max(last_modified) as last_modified, bit_xor(product_id)
+    from products
+    where salon_id = %s
+"""
+
 # View all products for a salon
 @products_bp.route('/products/view', methods=['GET'])
+@conditional('products', PRODUCTS_VALIDATOR)
 def get_products():
     """
     View products
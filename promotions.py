@@ -1,11 +1,21 @@
 from flask import Blueprint, request, jsonify, current_app, session
 from datetime import datetime
 from utils.logerror import log_error
+from utils.conditional import conditional
 
 promotions_bp = Blueprint('promotions', __name__)
 
+ACTIVE_PROMOTIONS_VALIDATOR = """
+    select count(*), bit_xor(promo_id),
+           -- over every promotion, so deactivating one moves it too
+           (select max(last_modified) from promotions where salon_id = %s) as last_modified
+    from promotions
+    where salon_id = %s and is_active = true
+"""
+
 #view only active promotions
 @promotions_bp.route('/salon/<int:salon_id>/promotions', methods=['GET'])
+@conditional('promotions', ACTIVE_PROMOTIONS_VALIDATOR)
 def get_promotions(salon_id):
     """
     Get active promotions for a salon
@@ -53,8 +63,8 @@ def get_promotions(salon_id):
                 'promo_id': promotion[0],
                 'name': promotion[1],
                 'description': promotion[2],
-                'start_date': promotion[3].strftime('%Y-%m-%d'),
-                'end_date': promotion[4].strftime('%Y-%m-%d'),
+                'start_date': promotion[3],
+                'end_date': promotion[4],
                 'promo_code': promotion[5],
                 'discount_display': promotion[6]
             })
@@ -111,8 +121,8 @@ responses:
                 'promo_id': promotion[0],
                 'name': promotion[1],
                 'description': promotion[2],
-                'start_date': promotion[3].strftime('%Y-%m-%d'),
-                'end_date': promotion[4].strftime('%Y-%m-%d'),
+                'start_date': promotion[3],
+                'end_date': promotion[4],
                 'promo_code': promotion[5],
                 'discount_display': promotion[6]
             })
@@ -1,8 +1,9 @@
 from flask import Blueprint, request, jsonify, session
-from werkzeug.security import generate_password_hash
+from utils.credentials import hash_password
 from datetime import datetime
 from flask import current_app
 from utils.logerror import log_error
+from utils.search import mark_salon_changed
 
 register_bp = Blueprint('register', __name__)
 
@@ -59,7 +60,7 @@ responses:
         cursor.close()  
         return jsonify({'error': 'This user already exists'}), 400
     
-    hashed_password = generate_password_hash(password)
+    hashed_password = hash_password(password)
     #send username and password to next page
     session['register_username'] = username
     session['register_password'] = hashed_password
@@ -348,6 +349,7 @@ responses:
                     ('salon', salon_id, master_tag_id)
                 )
         
+        mark_salon_changed(mysql.connection, salon_id)
         mysql.connection.commit()
         
         session['salon_id'] = salon_id
@@ -451,6 +453,7 @@ def register_salon_part2():
                             ('employees', employee_id, master_tag_id)
                         )
         
+        mark_salon_changed(mysql.connection, salon_id)
         mysql.connection.commit()
         return jsonify({'message': 'Services and employees added successfully'}), 201
     
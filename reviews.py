@@ -1,11 +1,58 @@
 from flask import Blueprint, request, jsonify, current_app, session
-import json
 from datetime import datetime
 from utils.logerror import log_error
+from utils.pagination import InvalidCursor, cached_count, decode_cursor, encode_cursor, generate_iter_pages, keyset_condition
+from utils.schema import register_index
+from utils.search import mark_review_salon_changed, mark_salon_changed
+from utils.conditional import conditional
+from utils.cache import invalidate_salon
+from utils import ratings
+from utils.threads import MAX_REPLY_DEPTH, REPLY_COLUMNS, InvalidReply, add_reply, delete_subtree, load_subtrees, load_threads
 
 reviews_bp = Blueprint('reviews', __name__)
 
+#keyset paging walks these instead of sorting every review/reply of the salon
+register_index('reviews', 'idx_reviews_salon_date', 'salon_id, review_date, review_id')
+register_index('reviews', 'idx_reviews_salon_rating', 'salon_id, rating, review_id')
+register_index('review_replies', 'idx_replies_review_created', 'review_id, created_at, reply_id')
+
+# reviews and replies are only added or deleted, which the id checksums catch;
+# users.last_modified covers renamed reviewers
+REVIEWS_VALIDATOR = """
+    select count(*), bit_xor(r.review_id), max(u.last_modified),
+           (
+               select concat_ws(':', count(*), bit_xor(rr.reply_id), max(ru.last_modified))
+               from review_replies rr
+               join reviews r2 on r2.review_id = rr.review_id
+               left join users ru on ru.user_id = rr.user_id
+               where r2.salon_id = %s
+           )
+    from reviews r
+    left join users u on u.user_id = r.customer_id
+    where r.salon_id = %s
+"""
+
+def reply_author(user_id, first_name, last_name, owner_id):
+    if user_id == owner_id:
+        return "Owner"
+    return f"{first_name} {last_name[0].upper()}." if first_name and last_name else first_name or "Anonymous"
+
+def format_reply(reply, owner_id):
+    """Reply tree from utils.threads -> response dict, children nested under 'replies'."""
+    return {
+        "reply_id": reply["reply_id"],
+        "user_id": reply["user_id"],
+        "user": reply_author(reply["user_id"], reply["first_name"], reply["last_name"], owner_id),
+        "parent_reply_id": reply["parent_reply_id"],
+        "message": reply["message"],
+        "created_at": reply["created_at"],
+        "depth": reply["depth"],
+        "has_replies": reply["has_replies"],
+        "replies": [format_reply(child, owner_id) for child in reply["replies"]]
+    }
+
 @reviews_bp.route('/salon/<int:salon_id>/reviews', methods=['GET'])
+@conditional('reviews', REVIEWS_VALIDATOR)
 def get_reviews(salon_id):
     """
 Get all reviews for a salon with replies
@@ -58,23 +105,6 @@ responses:
                 r.comment,
                 r.image_url,
                 r.review_date,
-                (
-                    select COALESCE(
-                        JSON_ARRAYAGG(
-                            JSON_OBJECT(
-                                'reply_id', rr.reply_id,
-                                'user_id', rr.user_id,
-                                'first_name', uu.first_name,
-                                'last_name', uu.last_name,
-                                'message', rr.message,
-                                'created_at', rr.created_at
-                            )
-                        ), JSON_ARRAY()
-                    )
-                    from review_replies rr
-                    left join users uu on rr.user_id = uu.user_id
-                    where rr.review_id = r.review_id
-                ) as replies_json,
                 u.first_name,
                 u.last_name,
                 u.user_id
@@ -86,32 +116,12 @@ responses:
         cursor.execute(query, (salon_id,))
         reviews = cursor.fetchall()
 
+        #every reply of every review in one range query, linked into trees
+        threads = load_threads(mysql.connection, [review[0] for review in reviews])
+
         result = []
         for review in reviews:
-            try:
-                replies = json.loads(review[7]) if review[7] else []
-            except Exception:
-                replies = []
-
-            customer_name = f"{review[8]} {review[9][0].upper()}." if review[8] and review[9] else review[8] or "Anonymous"
-            formatted_replies = []
-
-            for reply in replies:
-                if reply["user_id"] == owner_id:
-                    display_name = "Owner"
-                else:
-                    fn = reply.get("first_name", "")
-                    ln = reply.get("last_name", "")
-                    display_name = f"{fn} {ln[0].upper()}." if fn and ln else fn or "Anonymous"
-
-                formatted_replies.append({
-                    "reply_id": reply["reply_id"],
-                    "user_id": reply["user_id"],
-                    "user": display_name,
-                    "message": reply["message"],
-                    "created_at": reply["created_at"]
-                })
-
+            customer_name = f"{review[7]} {review[8][0].upper()}." if review[7] and review[8] else review[7] or "Anonymous"
             result.append({
                 "review_id": review[0],
                 "rating": review[3],
@@ -119,8 +129,8 @@ responses:
                 "image_url": review[5],
                 "review_date": review[6],
                 "customer_name": customer_name,
-                "customer_id": review[10],  
-                "replies": formatted_replies
+                "customer_id": review[9],  
+                "replies": [format_reply(reply, owner_id) for reply in threads.get(review[0], [])]
             })
 
         cursor.close()
@@ -128,28 +138,15 @@ responses:
     except Exception as e:
         return jsonify({'error': 'Failed to fetch reviews', 'details': str(e)}), 500
 
-def generate_iter_pages(current_page, total_pages, left_edge=2, right_edge=2, left_current=2, right_current=2):
-    last = 0
-    pages = []
-    for num in range(1, total_pages + 1):
-        if (
-            num <= left_edge or
-            (current_page - left_current - 1 < num < current_page + right_current) or
-            num > total_pages - right_edge
-        ):
-            if last + 1 != num:
-                pages.append('...')  # gap
-            pages.append(num)
-            last = num
-    return pages
-
 @reviews_bp.route('/salon/<int:salon_id>/reviews/pagination', methods=['GET'])
 def get_paginated_reviews(salon_id):
     try:
         mysql = current_app.config['MYSQL']
         cursor = mysql.connection.cursor()
 
+        #?cursor= continues after the previous page (keyset); ?page= is the old offset mode
         page = request.args.get('page', default=1, type=int)
+        token = request.args.get('cursor')
         per_page = 10
         offset = (page - 1) * per_page
 
@@ -169,6 +166,9 @@ def get_paginated_reviews(salon_id):
         if direction not in valid_direction:
             direction = "desc"
 
+        #?reply_depth=n embeds n levels of each review's replies (0 = just has_replies)
+        reply_depth = min(max(request.args.get('reply_depth', default=0, type=int), 0), MAX_REPLY_DEPTH)
+
         valid_rating = {-1,1,2,3,4,5}
         if rating not in valid_rating:
             rating = -1
@@ -185,7 +185,7 @@ def get_paginated_reviews(salon_id):
         salon = cursor.fetchone()
         if not salon:
             return jsonify({"error": "Salon not found"}), 404
-        owner_id = salon[1] #not used in new method might remove here
+        owner_id = salon[1]
 
         #tbd keywords is difficult to implement
         if keywords:
@@ -207,13 +207,29 @@ def get_paginated_reviews(salon_id):
 
         where_clause = "WHERE " + " AND ".join(filters) if filters else ""
 
-        review_count_query = f"""
-            select count(*)
-            from reviews r
-            {where_clause}
-        """
-        cursor.execute(review_count_query, params)
-        total = cursor.fetchone()[0]
+        #the star histogram answers the unfiltered and per-rating counts without a scan
+        aggregate = ratings.get_aggregate(mysql.connection, 'salon', salon_id)
+        if keywords:
+            review_count_query = f"""
+                select count(*)
+                from reviews r
+                {where_clause}
+            """
+            total = cached_count(cursor, review_count_query, params)
+        elif rating == -1:
+            total = aggregate['rating_count']
+        else:
+            total = aggregate['histogram'][str(rating)]
+
+        #review_id breaks ties so the keyset order is total
+        sort_columns = [f"r.{order_by}", "r.review_id"]
+        if token:
+            after, page = decode_cursor(token)
+            condition, condition_params = keyset_condition(sort_columns, [direction, direction], after)
+            filters.append(condition)
+            params.extend(condition_params)
+            where_clause = "WHERE " + " AND ".join(filters)
+            offset = 0
 
         query = f"""
             select 
@@ -237,21 +253,30 @@ def get_paginated_reviews(salon_id):
             from reviews r
             left join users u on u.user_id = r.customer_id
             {where_clause}
-            order by r.{order_by} {direction}
+            order by r.{order_by} {direction}, r.review_id {direction}
             limit %s offset %s
         """
-        cursor.execute(query, (*params, per_page, offset))
+        cursor.execute(query, (*params, per_page + 1, offset))
         reviews = cursor.fetchall()
 
+        has_more = len(reviews) > per_page
+        reviews = reviews[:per_page]
+        sort_index = 3 if order_by == "rating" else 6
+        next_cursor = encode_cursor([reviews[-1][sort_index], reviews[-1][0]], page + 1) if has_more else None
+
         total_pages = -(-total // per_page)
         iter_pages = generate_iter_pages(current_page=page, total_pages=total_pages)
 
+        threads = {}
+        if reply_depth:
+            threads = load_threads(mysql.connection, [review[0] for review in reviews], max_depth=reply_depth - 1)
+
         result = []
         for review in reviews:
 
             customer_name = f"{review[8]} {review[9][0].upper()}." if review[8] and review[9] else review[8] or "Anonymous"
 
-            result.append({
+            item = {
                 "review_id": review[0],
                 "rating": review[3],
                 "comment": review[4],
@@ -260,15 +285,23 @@ def get_paginated_reviews(salon_id):
                 "user": customer_name,
                 "user_id": review[10],  
                 "has_replies": bool(review[7])
-            })
+            }
+            if reply_depth:
+                item["replies"] = [format_reply(reply, owner_id) for reply in threads.get(review[0], [])]
+            result.append(item)
         return jsonify({
             'reviews': result, 
             "page": page,
             "review_count": total,
+            "average_rating": aggregate['average_rating'],
+            "rating_histogram": aggregate['histogram'],
             "total_retrieved": len(reviews),
             'total_pages' : total_pages,
-            'iter_pages': iter_pages
+            'iter_pages': iter_pages,
+            'next_cursor': next_cursor
         }), 200
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Failed to fetch reviews', 'details': str(e)}), 500
     finally:
@@ -280,7 +313,12 @@ def get_children_replies(salon_id, review_id):
         mysql = current_app.config['MYSQL']
         cursor = mysql.connection.cursor()
 
+        #replies directly under parent_id (0 = top level), newest first; ?depth=n nests
+        #n levels of each one's thread, loaded with one range query on the reply paths
         parent_id = request.args.get('parent_id', default=0, type=int)
+        per_page = min(request.args.get('limit', default=20, type=int), 100)
+        depth = min(max(request.args.get('depth', default=0, type=int), 0), MAX_REPLY_DEPTH)
+        token = request.args.get('cursor')
 
         salon_query = """
             select salon_id, owner_id
@@ -298,61 +336,100 @@ def get_children_replies(salon_id, review_id):
             FROM review_replies rr
             WHERE rr.review_id = %s
         """
-        cursor.execute(reply_count_query, (review_id,))
-        reply_count = cursor.fetchone()[0]
+        reply_count = cached_count(cursor, reply_count_query, (review_id,))
 
-        replies_query = """
+        filters = ["rr.review_id = %s"]
+        params = [review_id]
+        if parent_id:
+            filters.append("rr.parent_reply_id = %s")
+            params.append(parent_id)
+        else:
+            filters.append("rr.parent_reply_id is null")
+        page = 1
+        if token:
+            after, page = decode_cursor(token)
+            condition, condition_params = keyset_condition(["rr.created_at", "rr.reply_id"], ["desc", "desc"], after)
+            filters.append(condition)
+            params.extend(condition_params)
+        where_clause = "WHERE " + " AND ".join(filters)
+
+        replies_query = f"""
             SELECT 
                 rr.reply_id,
+                rr.review_id,
+                rr.parent_reply_id,
                 rr.user_id,
                 u.first_name,
                 u.last_name,
-                rr.parent_reply_id,
                 rr.message,
                 rr.created_at,
-                (
-                    select EXISTS(
-                        select 1 
-                        from review_replies c
-                        where c.parent_reply_id = rr.reply_id
-                    )
-                ) as has_replies
+                rr.depth,
+                rr.path
             FROM review_replies rr
             LEFT JOIN users u ON rr.user_id = u.user_id
-            WHERE rr.review_id = %s
-            ORDER BY rr.created_at DESC
+            {where_clause}
+            ORDER BY rr.created_at DESC, rr.reply_id DESC
+            LIMIT %s
         """
-        cursor.execute(replies_query, (review_id,))
-        replies = cursor.fetchall()
+        cursor.execute(replies_query, (*params, per_page + 1))
+        replies = [dict(zip(REPLY_COLUMNS + ('path',), row)) for row in cursor.fetchall()]
+
+        has_more = len(replies) > per_page
+        replies = replies[:per_page]
+        next_cursor = encode_cursor([replies[-1]['created_at'], replies[-1]['reply_id']], page + 1) if has_more else None
+
+        #children are always loaded one level deep so has_replies needs no per-row EXISTS
+        children = load_subtrees(mysql.connection, review_id, replies, max_depth=max(depth, 1))
 
         result = []
         for reply in replies:
-            if reply[1] == owner_id:
-                display_name = "Owner"
-            else:
-                fn = reply[2]
-                ln = reply[3]
-                display_name = f"{fn} {ln[0].upper()}." if fn and ln else fn or "Anonymous"
-
-            result.append({
-                "reply_id": reply[0],
-                "user_id": reply[1],
-                "user": display_name,
-                "parent_reply_id": reply[4],
-                "message": reply[5],
-                "created_at": reply[6],
-                "has_replies": bool(reply[7])
-            })
+            reply['replies'] = children.get(reply['reply_id'], [])
+            reply['has_replies'] = bool(reply['replies'])
+            if depth == 0:
+                reply['replies'] = []
+            item = format_reply(reply, owner_id)
+            if depth == 0:
+                del item['replies']
+            result.append(item)
 
         return jsonify({
             'replies': result,
-            'reply_count': reply_count #all replies but this query returns one level of replies
+            'reply_count': reply_count, #all replies of the review, at any depth
+            'next_cursor': next_cursor
         }), 200
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Failed to fetch replies', 'details': str(e)}), 500
     finally:
         cursor.close()
 
+@reviews_bp.route('/salon/<int:salon_id>/ratings', methods=['GET'])
+def get_rating_breakdown(salon_id):
+    """
+Rating average, count and star histogram of a salon and of each of its employees and services
+---
+tags:
+  - Reviews
+parameters:
+  - name: salon_id
+    in: path
+    required: true
+    type: integer
+    description: Salon ID
+responses:
+  200:
+    description: Rating aggregates
+  500:
+    description: Error fetching ratings
+"""
+    try:
+        mysql = current_app.config['MYSQL']
+        return jsonify(ratings.salon_breakdown(mysql.connection, salon_id)), 200
+    except Exception as e:
+        log_error(str(e), session.get("user_id"))
+        return jsonify({'error': 'Failed to fetch ratings'}), 500
+
 @reviews_bp.route('/salon/<int:salon_id>/dashboard/reviews', methods=['GET'])
 def recent_three(salon_id):
     """
@@ -454,6 +531,10 @@ def post_review(appointment_id):
         
         if not rating or not comment: 
             return jsonify({'error': 'Missing rating or comment'}), 400
+        #whole stars only, the histogram has one bucket per star; "4" from form-style clients is fine
+        rating = ratings.parse_stars(rating)
+        if rating is None:
+            return jsonify({'error': 'Rating must be a whole number from 1 to 5'}), 400
         
         mysql = current_app.config['MYSQL']
         cursor = mysql.connection.cursor()
@@ -488,8 +569,11 @@ def post_review(appointment_id):
             values(%s, %s, %s, %s, %s, %s, %s)
         """
         cursor.execute(query, (appointment_id, user_id, salon_id, rating, comment, image_url, now))
+        ratings.add_review(mysql.connection, cursor.lastrowid)
+        mark_salon_changed(mysql.connection, salon_id)
         mysql.connection.commit()
         cursor.close()
+        invalidate_salon(salon_id)
         return jsonify({'message': 'Review posted successfully'}), 201
     except Exception as e:
         current_app.logger.error(f"Error adding review: {e}")
@@ -559,40 +643,18 @@ def post_reply(review_id):
         """, (salon_id,))
         owner_id = cursor.fetchone()[0]
 
-        # Insert reply
-        now = datetime.now()
-        if parent_reply_id is None:
-            query = """
-                insert into review_replies(review_id, user_id, message, created_at)
-                values(%s, %s, %s, %s)
-            """
-            cursor.execute(query, (review_id, user_id, reply, now))
-        else:
-            query = """
-                insert into review_replies(review_id, user_id, parent_reply_id, message, created_at)
-                values(%s, %s, %s, %s, %s)
-            """
-            cursor.execute(query, (review_id, user_id, parent_reply_id, reply, now))
+        # Insert reply with its thread path
+        try:
+            new_reply_id, depth = add_reply(mysql.connection, review_id, user_id, reply, datetime.now(), parent_reply_id)
+        except InvalidReply as e:
+            mysql.connection.rollback()
+            cursor.close()
+            return jsonify({'error': str(e)}), 400
         mysql.connection.commit()
 
-        new_reply_id = cursor.lastrowid
         # Fetch newly inserted reply in SAME FORMAT as get_children_replies
         cursor.execute("""
-            SELECT 
-                rr.reply_id,
-                rr.user_id,
-                u.first_name,
-                u.last_name,
-                rr.parent_reply_id,
-                rr.message,
-                rr.created_at,
-                (
-                    SELECT EXISTS(
-                        SELECT 1
-                        FROM review_replies c
-                        WHERE c.parent_reply_id = rr.reply_id
-                    )
-                ) AS has_replies
+            SELECT u.first_name, u.last_name, rr.created_at
             FROM review_replies rr
             LEFT JOIN users u ON rr.user_id = u.user_id
             WHERE rr.reply_id = %s
@@ -601,24 +663,19 @@ def post_reply(review_id):
         row = cursor.fetchone()
         cursor.close()
 
-        # Build display name (same logic as get_children_replies)
-        reply_user_id = row[1]
-        if reply_user_id == owner_id:
-            display_name = "Owner"
-        else:
-            fn = row[2] or ""
-            ln = row[3] or ""
-            display_name = f"{fn} {ln[0].upper()}." if fn and ln else fn or "Anonymous"
-
-        reply_data = {
-            "reply_id": row[0],
-            "user_id": row[1],
-            "user": display_name,
-            "parent_reply_id": row[4],
-            "message": row[5],
-            "created_at": row[6],
-            "has_replies": bool(row[7])
-        }
+        reply_data = format_reply({
+            "reply_id": new_reply_id,
+            "review_id": review_id,
+            "parent_reply_id": parent_reply_id,
+            "user_id": user_id,
+            "first_name": row[0],
+            "last_name": row[1],
+            "message": reply,
+            "created_at": row[2],
+            "depth": depth,
+            "has_replies": False,
+            "replies": []
+        }, owner_id)
 
         return jsonify({
             'message': 'Reply posted successfully',
@@ -656,7 +713,7 @@ responses:
 
         #find out who posted the review
         query = """
-            select customer_id
+            select customer_id, salon_id
             from reviews
             where review_id = %s
         """
@@ -671,6 +728,9 @@ responses:
         if user_role != 'admin' and user_id != reviewer_id:
             return jsonify({'error': 'Unauthorized'}), 401
 
+        #the salon's rating changes, reindex it
+        mark_review_salon_changed(mysql.connection, review_id)
+        ratings.remove_review(mysql.connection, review_id)
         query = """
             delete from review_replies
             where review_id = %s
@@ -683,6 +743,7 @@ responses:
         cursor.execute(query, (review_id,))
         mysql.connection.commit()
         cursor.close()
+        invalidate_salon(row[1])
         return jsonify({'message': 'Review deleted successfully'}), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -731,14 +792,11 @@ responses:
         if user_role != 'admin' and user_id != replier_id:
             return jsonify({'error': 'Unauthorized'}), 401
 
-        query = """
-            delete from review_replies
-            where reply_id = %s
-        """
-        cursor.execute(query, (reply_id,))
+        #answers to the reply go with it; its thread path covers them all
+        deleted = delete_subtree(mysql.connection, reply_id)
         mysql.connection.commit()
         cursor.close()
-        return jsonify({'message': 'Reply deleted successfully'}), 200
+        return jsonify({'message': 'Reply deleted successfully', 'deleted': deleted}), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
         import traceback
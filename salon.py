@@ -1,12 +1,16 @@
 from flask import Blueprint, request, jsonify, session
 from flask import current_app
 import json
-from utils.emails import send_email
+from utils.outbox import queue_emails
 from flask_mail import Message
 from apscheduler.schedulers.background import BackgroundScheduler
 scheduler = BackgroundScheduler()
 from datetime import datetime, timedelta
 from utils.logerror import log_error
+from utils.search import salon_search
+from utils.summary import card, summary_select
+from utils.pagination import InvalidCursor, cached_count, decode_cursor, encode_cursor, generate_iter_pages, keyset_condition
+from utils.cache import cached, invalidate_salon
 
 salon_bp = Blueprint('salon', __name__)
 
@@ -17,10 +21,9 @@ def salonData():
         mysql = current_app.config['MYSQL']
         cursor = mysql.connection.cursor()
         query = """
-            select s.name, s.salon_id, avg(r.rating) as average_rating
-            from salons s
-            join reviews r on r.salon_id = s.salon_id
-            group by s.name, s.salon_id
+            select name, salon_id, average_rating
+            from salon_summary
+            where rating_count > 0
             limit 6;
         """
         cursor.execute(query)
@@ -33,21 +36,6 @@ def salonData():
         log_error(str(e), session.get("user_id"))
         return jsonify({'error': 'Failed to fetch salons', 'details': str(e)}), 500
 
-    
-def generate_iter_pages(current_page, total_pages, left_edge=2, right_edge=2, left_current=2, right_current=2):
-    last = 0
-    pages = []
-    for num in range(1, total_pages + 1):
-        if (
-            num <= left_edge or
-            (current_page - left_current - 1 < num < current_page + right_current) or
-            num > total_pages - right_edge
-        ):
-            if last + 1 != num:
-                pages.append('...')  # gap
-            pages.append(num)
-            last = num
-    return pages
 
 @salon_bp.route('/salon/all', methods=['GET'])
 def get_salons():
@@ -55,7 +43,9 @@ def get_salons():
         mysql = current_app.config['MYSQL']
         cursor = mysql.connection.cursor()
 
+        #?cursor= continues after the previous page (keyset); ?page= is the old offset mode
         page = request.args.get('page', default=1, type=int)
+        token = request.args.get('cursor')
         per_page = 7
         offset = (page - 1) * per_page
 
@@ -64,18 +54,26 @@ def get_salons():
         employee_first = request.args.get('employee_first', default="", type=str)
         employee_last = request.args.get('employee_last', default="", type=str)
 
-        filters = ["s.is_verified = 1"]
+        filters = ["ss.is_verified = 1"]
         params = []
 
+        #name and employee matching come from the search index (no leading-wildcard LIKE)
+        def matching_salons(text, field):
+            ids = salon_search.get(mysql.connection).match_ids(text, fields=(field,))
+            if not ids:
+                return "false", []
+            return "ss.salon_id IN (" + ", ".join(["%s"] * len(ids)) + ")", ids
+
         if business_name:
-            filters.append("s.name LIKE %s")
-            params.append(f"%{business_name}%")
+            condition, ids = matching_salons(business_name, 'name')
+            filters.append(condition)
+            params.extend(ids)
         
         if categories:
             placeholders = ', '.join(['%s'] * len(categories))
 
             category_filter = f"""
-                s.salon_id IN (
+                ss.salon_id IN (
                     SELECT e.entity_id 
                     FROM entity_master_tags e 
                     LEFT JOIN master_tags m
@@ -92,84 +90,61 @@ def get_salons():
             params.append(len(categories))
 
         if employee_first or employee_last:
-            employee_filter = "s.salon_id IN (SELECT salon_id FROM employees WHERE "
-            subconditions = []
-            subparams = []
-
-            if employee_first:
-                subconditions.append("first_name LIKE %s")
-                subparams.append(f"%{employee_first}%")
-            if employee_last:
-                subconditions.append("last_name LIKE %s")
-                subparams.append(f"%{employee_last}%")
-
-            employee_filter += " AND ".join(subconditions) + ")"
-            filters.append(employee_filter)
-            params.extend(subparams)
+            condition, ids = matching_salons(f"{employee_first} {employee_last}", 'employee')
+            filters.append(condition)
+            params.extend(ids)
 
         where_clause = "WHERE " + " AND ".join(filters) if filters else ""
 
+        #cards come precomputed from salon_summary, so count and page read one table
         count_query = f"""
-            SELECT COUNT(DISTINCT s.salon_id)
-            from salons s
-            left join entity_master_tags e
-                on e.entity_id = s.salon_id and e.entity_type = 'salon'
-            left join master_tags m 
-                on m.master_tag_id = e.master_tag_id
-            left join salon_analytics sa
-                on sa.salon_id = s.salon_id
+            SELECT COUNT(*)
+            from salon_summary ss
             {where_clause}
         """
-        cursor.execute(count_query, params)
-        total = cursor.fetchone()[0]
+        total = cached_count(cursor, count_query, params)
+
+        if token:
+            after, page = decode_cursor(token)
+            condition, condition_params = keyset_condition(['ss.salon_id'], ['asc'], after)
+            filters.append(condition)
+            params.extend(condition_params)
+            where_clause = "WHERE " + " AND ".join(filters)
+            offset = 0
 
         query = f"""
-            select s.salon_id, 
-                    s.owner_id,
-                    s.name as salon_name,
-                    COALESCE(
-                        JSON_ARRAYAGG(m.name), 
-                        JSON_ARRAY()
-                    ) as tag_names,
-                    s.description, 
-                    s.email, 
-                    s.phone_number,
-                    sa.average_rating
-            from salons s
-            left join entity_master_tags e
-                on e.entity_id = s.salon_id and e.entity_type = 'salon'
-            left join master_tags m 
-                on m.master_tag_id = e.master_tag_id
-            left join salon_analytics sa
-                on sa.salon_id = s.salon_id
+            select {summary_select()}
+            from salon_summary ss
             {where_clause}
-            group by s.salon_id
-            order by s.salon_id
+            order by ss.salon_id
             limit %s offset %s
         """
-        cursor.execute(query, (*params, per_page, offset))
+        cursor.execute(query, (*params, per_page + 1, offset))
         salons = cursor.fetchall()
         cursor.close()
 
+        has_more = len(salons) > per_page
+        salons = salons[:per_page]
+        next_cursor = encode_cursor([salons[-1][0]], page + 1) if has_more else None
+
         total_pages = -(-total // per_page)
         iter_pages = generate_iter_pages(current_page=page, total_pages=total_pages)
 
         result = []
-        for salon in salons:
-            try:
-                tags = json.loads(salon[3]) if salon[3] else []
-            except Exception:
-                tags = []
-
+        for salon in map(card, salons):
             result.append({
-                "salon_id": salon[0],
-                "owner_id": salon[1],
-                "salon_name": salon[2],
-                "tag_names": tags,
-                "description": salon[4],
-                "email": salon[5],
-                "phone_number": salon[6],
-                "average_rating": salon[7]
+                "salon_id": salon['salon_id'],
+                "owner_id": salon['owner_id'],
+                "salon_name": salon['name'],
+                "tag_names": salon['master_tags'],
+                "description": salon['description'],
+                "email": salon['email'],
+                "phone_number": salon['phone_number'],
+                "average_rating": salon['average_rating'],
+                "review_count": salon['review_count'],
+                "city": salon['city'],
+                "state": salon['state'],
+                "primary_image_url": salon['primary_image_url']
             })
 
         return jsonify({
@@ -177,13 +152,17 @@ def get_salons():
             'page' : page,
             'total_retrieved' : len(salons),
             'total_pages' : total_pages,
-            'iter_pages': iter_pages
+            'iter_pages': iter_pages,
+            'next_cursor': next_cursor
         }), 200
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         log_error(str(e), session.get("user_id"))
         return jsonify({'error': 'Failed to fetch salons', 'details': str(e)}), 500
     
 @salon_bp.route('/salon/<int:salon_id>/header', methods=['GET'])
+@cached('salon_header')
 def get_salon_info(salon_id):
     try: 
         mysql = current_app.config['MYSQL']
@@ -237,8 +216,8 @@ def get_salon_info(salon_id):
             from salons s
             left join addresses ad
             on ad.salon_id = s.salon_id
-            left join salon_analytics sa
-            on sa.salon_id = s.salon_id
+            left join rating_aggregates sa
+            on sa.scope = 'salon' and sa.scope_id = s.salon_id
             where s.salon_id=%s
         """
         cursor.execute(salon_query, (salon_id,))
@@ -299,7 +278,7 @@ def send_promotional_email(salon_id):
             from users
             join saved_salons on users.user_id = saved_salons.customer_id
             left join appointments on users.user_id = appointments.customer_id
-            where (saved_salons.salon_id = 1 or appointments.salon_id = 1)
+            where (saved_salons.salon_id = %s or appointments.salon_id = %s)
         """
         cursor.execute(query, (salon_id, salon_id))
         customers = cursor.fetchall()
@@ -308,18 +287,19 @@ def send_promotional_email(salon_id):
         if not customers:
             return jsonify({'message': 'No customers found for promotional email'}), 200
 
+        #queued in one insert; the outbox workers deliver them in batches
         subject = "Exclusive Promotion from Your Favorite Salon!"
-        for customer in customers:
-            customer_email = customer[0]
-            body = f"Dear Customer,\n\n{promotional_message}\n\nBest regards,\nYour Favorite Salon"
-            send_email(to_address=customer_email, subject=subject, body=body)
-        return jsonify({'message': 'Promotional emails sent successfully'}), 200
+        body = f"Dear Customer,\n\n{promotional_message}\n\nBest regards,\nYour Favorite Salon"
+        queued = queue_emails(mysql.connection, [customer[0] for customer in customers], subject, body)
+        mysql.connection.commit()
+        return jsonify({'message': 'Promotional emails sent successfully', 'queued': queued}), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
         return jsonify({'error': 'Failed to send promotional emails', 'details': str(e)}), 500
 
         # GET operating hours
 @salon_bp.route('/salon/<int:salon_id>/operating-hours', methods=['GET'])
+@cached('operating_hours')
 def get_operating_hours(salon_id):
     try:
         mysql = current_app.config['MYSQL']
@@ -339,8 +319,8 @@ def get_operating_hours(salon_id):
         for row in rows:
             hours.append({
                 'day': row[0],
-                'open_time': str(row[1]),
-                'close_time': str(row[2]),
+                'open_time': row[1],
+                'close_time': row[2],
                 'is_closed': bool(row[3])
             })
         
@@ -407,6 +387,7 @@ def save_operating_hours(salon_id):
             cursor.execute(query, (salon_id, day, open_time, close_time, is_closed))
         
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         cursor.close()
         
         return jsonify({'message': 'Operating hours saved successfully'}), 200
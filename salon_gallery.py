@@ -3,11 +3,21 @@ from flask import Blueprint, request, jsonify, current_app, session
 from datetime import datetime
 from utils.logerror import log_error
 from s3_uploads import S3Uploader #???? import
+from utils.cache import invalidate_salon
+from utils.conditional import conditional
+from utils.search import mark_gallery_salon_changed, mark_salon_changed
 
 salon_gallery_bp = Blueprint('salon_gallery', __name__)
 
+GALLERY_VALIDATOR = """
+    select count(*), max(last_modified) as last_modified, bit_xor(gallery_id)
+    from salon_gallery
+    where salon_id = %s
+"""
+
 #get salon pictures
 @salon_gallery_bp.route('/salon/<int:salon_id>/gallery', methods=['GET'])
+@conditional('gallery', GALLERY_VALIDATOR)
 def get_gallery(salon_id):
     """
 Get all gallery images for a salon
@@ -52,8 +62,8 @@ responses:
                     'salon_id': image[1],
                     'image_url': image[2],
                     'description': image[3],
-                    'created_at': image[4].strftime('%Y-%m-%d %H:%M:%S') if image[4] else None,
-                    'last_modified': image[5].strftime('%Y-%m-%d %H:%M:%S') if image[5] else None
+                    'created_at': image[4],
+                    'last_modified': image[5]
                 })
         
         return jsonify({'salon_id': salon_id, 'gallery': gallery}), 200
@@ -99,8 +109,8 @@ responses:
             'gallery_id': image[0],
             'salon_id': image[1],
             'image_url': image[2],
-            'created_at': image[3].strftime('%Y-%m-%d %H:%M:%S') if image[3] else None,
-            'last_modified': image[4].strftime('%Y-%m-%d %H:%M:%S') if image[4] else None
+            'created_at': image[3],
+            'last_modified': image[4]
         }), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -148,8 +158,8 @@ responses:
             'salon_id': image[1],
             'employee_id': image[2],
             'image_url': image[3],
-            'created_at': image[4].strftime('%Y-%m-%d %H:%M:%S') if image[4] else None,
-            'last_modified': image[5].strftime('%Y-%m-%d %H:%M:%S') if image[5] else None
+            'created_at': image[4],
+            'last_modified': image[5]
         }), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -197,8 +207,8 @@ responses:
             'salon_id': image[1],
             'product_id': image[2],
             'image_url': image[3],
-            'created_at': image[4].strftime('%Y-%m-%d %H:%M:%S') if image[4] else None,
-            'last_modified': image[5].strftime('%Y-%m-%d %H:%M:%S') if image[5] else None
+            'created_at': image[4],
+            'last_modified': image[5]
         }), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -231,7 +241,7 @@ def get_before_image(salon_id, appointment_id):
                 "appointment_id": image[2],
                 "image_url": image[3],
                 "description": image[4],
-                "created_at": image[5].strftime('%Y-%m-%d %H:%M:%S')
+                "created_at": image[5]
             }
             for image in images
         ]), 200
@@ -265,7 +275,7 @@ def get_after_image(salon_id, appointment_id):
                 "appointment_id": image[2],
                 "image_url": image[3],
                 "description": image[4],
-                "created_at": image[5].strftime('%Y-%m-%d %H:%M:%S')
+                "created_at": image[5]
             }
             for image in images
         ]), 200
@@ -381,7 +391,10 @@ responses:
             values (%s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
         cursor.execute(query, (salon_id, employee_id, product_id, appointment_id, image_url, description, is_primary, datetime.now(), datetime.now()))
+        if is_primary and not employee_id and not product_id:
+            mark_salon_changed(mysql.connection, salon_id)
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         gallery_id = cursor.lastrowid
         cursor.close()
 
@@ -463,6 +476,7 @@ responses:
             where gallery_id = %s
         """
         cursor.execute(query, (new_image_url, description, gallery_id))
+        mark_gallery_salon_changed(mysql.connection, gallery_id)
         mysql.connection.commit()
         cursor.close()
         return jsonify({'message': 'Image updated successfully'}), 200
@@ -506,6 +520,7 @@ responses:
             cursor.close()
             return jsonify({'error': 'Image not found'}), 404
         
+        mark_gallery_salon_changed(mysql.connection, gallery_id)
         query = """
             delete from salon_gallery
             where gallery_id = %s
@@ -567,8 +582,8 @@ responses:
                     'salon_id': image[1],
                     'image_url': image[2],
                     'description': image[3],
-                    'created_at': image[4].strftime('%Y-%m-%d %H:%M:%S') if image[4] else None,
-                    'last_modified': image[5].strftime('%Y-%m-%d %H:%M:%S') if image[5] else None
+                    'created_at': image[4],
+                    'last_modified': image[5]
                 })
         
         return jsonify({'salon_id': salon_id, 'gallery': gallery}), 200
@@ -614,8 +629,8 @@ responses:
             'gallery_id': image[0],
             'salon_id': image[1],
             'image_url': image[2],
-            'created_at': image[3].strftime('%Y-%m-%d %H:%M:%S') if image[3] else None,
-            'last_modified': image[4].strftime('%Y-%m-%d %H:%M:%S') if image[4] else None
+            'created_at': image[3],
+            'last_modified': image[4]
         }), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -663,8 +678,8 @@ responses:
             'salon_id': image[1],
             'employee_id': image[2],
             'image_url': image[3],
-            'created_at': image[4].strftime('%Y-%m-%d %H:%M:%S') if image[4] else None,
-            'last_modified': image[5].strftime('%Y-%m-%d %H:%M:%S') if image[5] else None
+            'created_at': image[4],
+            'last_modified': image[5]
         }), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -712,8 +727,8 @@ responses:
             'salon_id': image[1],
             'product_id': image[2],
             'image_url': image[3],
-            'created_at': image[4].strftime('%Y-%m-%d %H:%M:%S') if image[4] else None,
-            'last_modified': image[5].strftime('%Y-%m-%d %H:%M:%S') if image[5] else None
+            'created_at': image[4],
+            'last_modified': image[5]
         }), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -830,8 +845,11 @@ responses:
             (salon_id, image_url, description, employee_id, product_id, is_primary, created_at, last_modified)
             VALUES (%s, %s, %s, %s, %s, %s, NOW(), NOW())
         """, (salon_id, image_url, description, employee_id, product_id, is_primary))
+        if is_primary and not employee_id and not product_id:
+            mark_salon_changed(mysql.connection, salon_id)
 
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         gallery_id = cursor.lastrowid
         cursor.close()
 
@@ -921,6 +939,7 @@ responses:
                 last_modified = NOW()
             WHERE gallery_id = %s
         """, (new_image_url, description, gallery_id))
+        mark_gallery_salon_changed(mysql.connection, gallery_id)
 
         mysql.connection.commit()
         cursor.close()
@@ -974,6 +993,7 @@ responses:
         if image_url:
             S3Uploader.delete_image_from_s3(image_url)
 
+        mark_gallery_salon_changed(mysql.connection, gallery_id)
         cursor.execute("""
             DELETE FROM salon_gallery
             WHERE gallery_id = %s
@@ -1045,7 +1065,7 @@ def get_live_before_image(salon_id, appointment_id):
             "appointment_id": image[2],
             "image_url": image[3],
             "description": image[4],
-            "created_at": image[5].strftime('%Y-%m-%d %H:%M:%S') if image[5] else None
+            "created_at": image[5]
         } for image in images]), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -1103,7 +1123,7 @@ def get_live_after_image(salon_id, appointment_id):
             "appointment_id": image[2],
             "image_url": image[3],
             "description": image[4],
-            "created_at": image[5].strftime('%Y-%m-%d %H:%M:%S') if image[5] else None
+            "created_at": image[5]
         } for image in images]), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -1161,7 +1181,7 @@ def get_live_reference_images(salon_id, appointment_id):
             "appointment_id": image[2],
             "image_url": image[3],
             "description": image[4],
-            "created_at": image[5].strftime('%Y-%m-%d %H:%M:%S') if image[5] else None
+            "created_at": image[5]
         } for image in images]), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
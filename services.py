@@ -2,10 +2,29 @@ from flask import Blueprint, request, jsonify, session
 from flask import current_app
 import json
 from utils.logerror import log_error
+from utils.search import mark_salon_changed
+from utils.cache import cached, invalidate_salon
+from utils.conditional import conditional
 
 services_bp = Blueprint('services', __name__)
 
+# services have no last_modified, so checksum the listed columns and tag links
+SERVICES_VALIDATOR = """
+    select count(*),
+           bit_xor(crc32(concat_ws('|', s.service_id, s.name, s.description, s.duration_minutes, s.price, s.is_active))),
+           (
+               select bit_xor(crc32(concat_ws('|', e.entity_id, e.tag_id)))
+               from entity_tags e
+               join services s2 on s2.service_id = e.entity_id
+               where e.entity_type = 'service' and s2.salon_id = %s
+           )
+    from services s
+    where s.salon_id = %s
+"""
+
 @services_bp.route('/salon/<int:salon_id>/services', methods=['GET'])
+@conditional('services', SERVICES_VALIDATOR)
+@cached('services')
 def get_services(salon_id):
     try:
         mysql = current_app.config['MYSQL']
@@ -106,7 +125,9 @@ def add_service(salon_id):
                 values(%s, %s, %s)
             """
             cursor.execute(query, ('service', service_id, tag_id))
+        mark_salon_changed(mysql.connection, salon_id)
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         cursor.close()
         return jsonify({'message': 'Service added successfully'}), 201
     except Exception as e:
@@ -158,7 +179,9 @@ def edit_service(salon_id, service_id):
                 values(%s, %s, %s)
             """
             cursor.execute(query, ('service', service_id, tag_id))
+        mark_salon_changed(mysql.connection, salon_id)
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         cursor.close()
         return jsonify({'message': 'Service updated successfully'}), 200
     except Exception as e:
@@ -181,7 +204,9 @@ def delete_service(salon_id, service_id):
         cursor.execute(query, (service_id,))
         query = "delete from services where service_id = %s and salon_id = %s"
         cursor.execute(query, (service_id, salon_id))
+        mark_salon_changed(mysql.connection, salon_id)
         mysql.connection.commit()
+        invalidate_salon(salon_id)
         cursor.close()
         return jsonify({'message': 'Service deleted successfully'}), 200
     except Exception as e:
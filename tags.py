@@ -1,9 +1,11 @@
 from flask import Blueprint, jsonify, current_app, session
 from utils.logerror import log_error
+from utils.cache import cached
 
 tags_bp = Blueprint('tags', __name__)
 
 @tags_bp.route('/master-tags', methods=['GET'])
+@cached('tags', ttl=600)
 def get_master_tags():
     try:
         mysql = current_app.config['MYSQL']
@@ -27,6 +29,7 @@ def get_master_tags():
         return jsonify({'error': 'Failed to fetch master tags', 'details': str(e)}), 500
     
 @tags_bp.route('/tags/<int:master_tag_id>', methods=['GET'])
+@cached('tags', ttl=600)
 def get_tags(master_tag_id):
     try:
         mysql = current_app.config['MYSQL']
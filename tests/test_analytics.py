@@ -0,0 +1,96 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from app import app
+from flask import json
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def mock_mysql():
+    cursor = MagicMock()
+    cursor.fetchone.return_value = {'total_users': 3}
+    cursor.fetchall.return_value = []
+    mysql = MagicMock()
+    mysql.connection.cursor.return_value = cursor
+    mysql.checkout_spare.return_value.__enter__.return_value.cursor.return_value = cursor
+    return mysql, cursor
+
+def test_admin_dashboard_selected_widgets(client):
+    with app.app_context():
+        mysql_obj, cursor = mock_mysql()
+        with patch('analytics.current_app') as mock_app:
+            mock_app.config = {'MYSQL': mysql_obj}
+
+            response = client.get('/admin/dashboard?widgets=total_users,gender_distribution,bogus')
+            data = json.loads(response.data)
+
+            assert response.status_code == 200
+            assert data['mode'] == 'concurrent'
+            assert set(data['widgets']) == {'total_users', 'gender_distribution'}
+            assert data['widgets']['total_users']['data'] == {'total_users': 3}
+            assert 'duration_ms' in data['widgets']['gender_distribution']
+            # the request's connection plus one spare, one widget each
+            assert data['connections'] == 2
+            assert mysql_obj.checkout_spare.call_count == 1
+            assert mysql_obj.checkout_spare.call_args.args == (1,)
+
+def test_salon_dashboard_sequential_reports_widget_errors(client):
+    with app.app_context():
+        mysql_obj, cursor = mock_mysql()
+        cursor.fetchall.side_effect = Exception("db down")
+        with patch('analytics.current_app') as mock_app:
+            mock_app.config = {'MYSQL': mysql_obj}
+
+            response = client.get('/salon/1/dashboard?widgets=top_services,customers_top&mode=sequential')
+            data = json.loads(response.data)
+
+            assert response.status_code == 200
+            assert data['mode'] == 'sequential'
+            assert data['salon_id'] == 1
+            assert data['widgets']['top_services']['error'] == 'db down'
+            mysql_obj.checkout_spare.assert_not_called()
+
+def test_dashboard_runs_on_the_request_connection_when_the_pool_is_nearly_full(client):
+    with app.app_context():
+        mysql_obj, cursor = mock_mysql()
+        mysql_obj.checkout_spare.return_value.__enter__.return_value = None
+        with patch('analytics.current_app') as mock_app:
+            mock_app.config = {'MYSQL': mysql_obj}
+
+            data = client.get('/admin/dashboard?widgets=total_users,total_salons,gender_distribution').get_json()
+
+            assert data['mode'] == 'sequential' and data['connections'] == 1
+            assert set(data['widgets']) == {'total_users', 'total_salons', 'gender_distribution'}
+            mysql_obj.checkout_spare.assert_called_once()
+
+def test_per_customer_endpoints_keep_the_single_object_shape(client):
+    with app.app_context():
+        mysql_obj, cursor = mock_mysql()
+        cursor.fetchall.return_value = [{'customer_id': 4, 'username': 'ana', 'total_points_redeemed': 30},
+                                        {'customer_id': 5, 'username': 'bo', 'total_points_redeemed': 10}]
+        with patch('analytics.current_app') as mock_app:
+            mock_app.config = {'MYSQL': mysql_obj}
+            assert client.get('/salon/1/customers-points-redeemed').get_json()['customer_id'] == 4
+
+            cursor.fetchall.return_value = []
+            assert client.get('/salon/1/customers-vouchers-redeemed').get_json() is None
+
+def test_profiler_and_metrics_endpoints_require_admin(client):
+    with client.session_transaction() as sess:
+        sess['role'] = 'customer'
+    assert client.get('/admin/sql-profile').status_code == 403
+    assert client.post('/admin/sql-profile/reset').status_code == 403
+    assert client.get('/metrics').status_code == 403
+
+    with client.session_transaction() as sess:
+        sess['role'] = 'admin'
+    assert client.get('/admin/sql-profile').status_code == 200
+    assert client.get('/metrics').status_code == 200
+
+def test_metrics_accepts_the_scrape_token(client):
+    with patch.dict(app.config, {'METRICS_TOKEN': 's3cret'}):
+        assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+        assert client.get('/metrics', headers={'Authorization': 'Bearer nope'}).status_code == 403
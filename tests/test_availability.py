@@ -0,0 +1,53 @@
+from datetime import timedelta, time
+from utils.availability import DayMask, build_day, to_minutes
+
+def td(hour, minute=0):
+    return timedelta(hours=hour, minutes=minute)
+
+SLOTS = [
+    {'slot_id': 7, 'start_time': td(9), 'end_time': td(17), 'is_available': 1},
+    {'slot_id': 8, 'start_time': td(12), 'end_time': td(12, 30), 'is_available': 0},
+]
+APPOINTMENTS = [{'start_time': td(10), 'end_time': td(10, 45)}]
+
+def test_to_minutes_accepts_mysql_time_types():
+    assert to_minutes(td(9, 30)) == 570
+    assert to_minutes(time(9, 30)) == 570
+    assert to_minutes("09:30:00") == 570
+
+def test_timeline_statuses():
+    day = DayMask.from_rows(SLOTS, APPOINTMENTS)
+    timeline = {t['time']: t['status'] for t in day.timeline(8 * 60, 18 * 60, 15)}
+
+    assert timeline['08:45:00'] == 'not_working'
+    assert timeline['09:00:00'] == 'available'
+    assert timeline['10:30:00'] == 'booked'
+    assert timeline['10:45:00'] == 'available'
+    assert timeline['12:15:00'] == 'unavailable'
+    assert timeline['17:00:00'] == 'not_working'
+    assert '18:00:00' in timeline
+
+def test_booking_error_reasons():
+    day = DayMask.from_rows(SLOTS, APPOINTMENTS)
+
+    assert day.booking_error(9 * 60, 9 * 60 + 30, 'Monday') is None
+    assert day.booking_error(8 * 60, 9 * 60, 'Monday') == 'Requested time is outside working hours'
+    assert day.booking_error(16 * 60 + 30, 17 * 60 + 30, 'Monday') == 'Service duration extends beyond working hours'
+    assert day.booking_error(11 * 60 + 45, 12 * 60 + 15, 'Monday') == 'Requested time overlaps with a break'
+    assert day.booking_error(10 * 60 + 30, 11 * 60, 'Monday') == 'Time slot overlaps with another appointment'
+    assert DayMask.from_rows([]).booking_error(600, 630, 'Sunday') == 'Employee is not scheduled to work on Sunday'
+
+def test_build_day_closed_salon():
+    op = {'open_time': td(9), 'close_time': td(17), 'is_closed': 1}
+    entry = build_day('Sunday', op, SLOTS, [], 15)
+    assert entry['salon_closed'] is True
+    assert entry['operating_hours'] == {'open_time': '09:00:00', 'close_time': '17:00:00'}
+    assert entry['timeline'] == []
+
+    assert build_day('Sunday', op, SLOTS, [], 15, closed_hours=False)['operating_hours'] is None
+
+def test_build_day_reports_shift():
+    op = {'open_time': td(8), 'close_time': td(18), 'is_closed': 0}
+    entry = build_day('Monday', op, SLOTS, APPOINTMENTS, 15)
+    assert entry['employee_schedule'] == {'start_time': '09:00:00', 'end_time': '17:00:00'}
+    assert len(entry['timeline']) == 41
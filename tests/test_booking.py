@@ -0,0 +1,83 @@
+import json
+from unittest.mock import MagicMock, patch
+from MySQLdb import IntegrityError
+from utils import booking
+from app import app
+
+def mock_conn(fetchone=None, insert_error=None):
+    cursor = MagicMock()
+    cursor.fetchone.return_value = fetchone
+    if insert_error:
+        def execute(sql, params=None):
+            if sql.strip().startswith('insert'):
+                raise insert_error
+        cursor.execute.side_effect = execute
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+def test_new_key_is_claimed():
+    conn, cursor = mock_conn()
+    assert booking.claim_key(conn, 'appointments.book', 'k1', {'a': 1}) is None
+    assert 'insert into idempotency_keys' in cursor.execute.call_args.args[0]
+
+def test_retry_replays_stored_response():
+    payload = {'employee_id': 3, 'start_time': '10:00:00'}
+    stored = (booking.request_hash(payload), 201, json.dumps({'appointment_id': 9}))
+    conn, _ = mock_conn(fetchone=stored, insert_error=IntegrityError(1062, 'Duplicate entry'))
+    assert booking.claim_key(conn, 'appointments.book', 'k1', payload) == ({'appointment_id': 9}, 201)
+
+def test_key_reused_for_other_request_is_rejected():
+    stored = (booking.request_hash({'employee_id': 3}), 201, '{}')
+    conn, _ = mock_conn(fetchone=stored, insert_error=IntegrityError(1062, 'Duplicate entry'))
+    body, status = booking.claim_key(conn, 'appointments.book', 'k1', {'employee_id': 4})
+    assert status == 422
+
+def test_claim_slots_locks_day_then_checks_in_one_query():
+    conn, cursor = mock_conn()
+    cursor.fetchall.return_value = [
+        ('service', 5, 60, None, None),
+        ('slot', 1, 9 * 60, 17 * 60, 1),
+        ('appointment', 40, 10 * 60, 11 * 60, None),
+    ]
+    error, plan = booking.claim_slots(conn, 3, 1, '2025-03-14', 'Friday', 10 * 60 + 30, [5])
+
+    assert error == 'Time slot overlaps with another appointment' and plan == []
+    lock, day = cursor.execute.call_args_list
+    assert 'employee_day_locks' in lock.args[0] and lock.args[1] == (3, '2025-03-14')
+    assert day.args[1] == [5, 3, 1, 'Friday', 3, 1, '2025-03-14', 0]
+
+def test_package_is_placed_back_to_back():
+    durations = {5: 60, 6: 30}
+    slots = [{'slot_id': 1, 'start_time': 9 * 60, 'end_time': 17 * 60, 'is_available': 1},
+             {'slot_id': 2, 'start_time': 12 * 60, 'end_time': 13 * 60, 'is_available': 0}]
+    error, plan = booking.fit_services(durations, slots, [], 'Friday', 10 * 60, [5, 6, 6])
+    assert error is None
+    assert plan == [(5, 600, 660, 1), (6, 660, 690, 1), (6, 690, 720, 1)]
+
+    # the third service would run into the lunch break
+    error, _ = booking.fit_services(durations, slots, [], 'Friday', 10 * 60, [5, 6, 5])
+    assert error == 'Requested time overlaps with a break'
+    assert booking.fit_services(durations, slots, [], 'Friday', 10 * 60, [7])[0] == 'Invalid service ID'
+
+def test_reschedule_reads_the_day_plan_only_after_the_lock(client):
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = [
+        {'appointment_id': 7, 'employee_id': 3, 'salon_id': 1, 'service_id': 5,
+         'appointment_date': '2025-03-14', 'start_time': '10:00:00', 'notes': '', 'status': 'booked'},
+        None,
+    ]
+    cursor.fetchall.return_value = [('service', 5, 60, None, None), ('slot', 1, 9 * 60, 17 * 60, 1)]
+
+    with app.app_context(), patch('appointments.current_app') as mock_app:
+        mock_app.config = {'MYSQL': MagicMock()}
+        mock_app.config['MYSQL'].connection.cursor.return_value = cursor
+        response = client.put('/appointments/update', json={'appointment_id': 7, 'new_start_time': '13:00:00'})
+
+    assert response.status_code == 200
+    sql = [c.args[0].lower() for c in cursor.execute.call_args_list]
+    lock = next(i for i, q in enumerate(sql) if 'employee_day_locks' in q)
+    day_plan = next(i for i, q in enumerate(sql) if "select 'service'" in q)
+    # nothing before the lock may open the snapshot: only locking reads
+    assert all('for update' in q or 'for share' in q for q in sql[:lock] if q.lstrip().startswith('select'))
+    assert lock < day_plan
@@ -0,0 +1,86 @@
+import pytest
+from flask import Flask, jsonify
+from utils.cache import LocalTier, ResponseCache, cached, invalidate_namespace, invalidate_salon
+
+@pytest.fixture
+def cache_app():
+    app = Flask(__name__)
+    calls = []
+
+    @app.route('/salon/<int:salon_id>/services')
+    @cached('services')
+    def services(salon_id):
+        calls.append(salon_id)
+        return jsonify({'salon_id': salon_id, 'calls': len(calls)})
+
+    @app.route('/salon/<int:salon_id>/missing')
+    @cached('services')
+    def missing(salon_id):
+        calls.append(salon_id)
+        return jsonify({'error': 'not found'}), 404
+
+    yield app.test_client(), calls
+
+def test_repeat_reads_are_served_from_cache(cache_app):
+    client, calls = cache_app
+    first = client.get('/salon/101/services')
+    second = client.get('/salon/101/services')
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_json() == first.get_json()
+    assert calls == [101]
+
+    # other salon and other query string are separate entries
+    client.get('/salon/102/services')
+    client.get('/salon/101/services?page=2')
+    assert calls == [101, 102, 101]
+
+def test_invalidate_salon_only_drops_that_salon(cache_app):
+    client, calls = cache_app
+    client.get('/salon/201/services')
+    client.get('/salon/202/services')
+    invalidate_salon(201)
+    assert client.get('/salon/201/services').headers['X-Cache'] == 'MISS'
+    assert client.get('/salon/202/services').headers['X-Cache'] == 'HIT'
+    assert calls == [201, 202, 201]
+
+    invalidate_namespace('services')
+    assert client.get('/salon/202/services').headers['X-Cache'] == 'MISS'
+
+def test_errors_and_testing_mode_are_not_cached(cache_app):
+    client, calls = cache_app
+    client.get('/salon/301/missing')
+    client.get('/salon/301/missing')
+    assert calls == [301, 301]
+
+    client.application.config['TESTING'] = True
+    client.get('/salon/302/services')
+    response = client.get('/salon/302/services')
+    assert 'X-Cache' not in response.headers
+    assert calls == [301, 301, 302, 302]
+
+def test_local_tier_expires_and_evicts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('utils.cache.time.monotonic', lambda: now[0])
+    tier = LocalTier(maxsize=2)
+    tier.set('a', 1, ttl=10)
+    tier.set('b', 2, ttl=10)
+    tier.get('a')
+    tier.set('c', 3, ttl=10)
+    assert tier.get('b') is None
+    assert tier.get('a') == 1
+    assert tier.evictions == 1
+
+    now[0] += 11
+    assert tier.get('a') is None
+
+def test_stats_count_hits_and_misses():
+    cache = ResponseCache(maxsize=10, ttl=30)
+    key = cache.key('tags', 'global', '')
+    assert cache.get(key) is None
+    cache.set(key, (b'[]', 200, 'application/json'))
+    assert cache.get(key) == (b'[]', 200, 'application/json')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['stores']) == (1, 1, 1)
+    assert stats['hit_ratio'] == 0.5
+    assert stats['shared_tier'] is False
@@ -0,0 +1,61 @@
+from unittest.mock import MagicMock
+from MySQLdb.cursors import RE_INSERT_VALUES
+from utils import checkout
+
+def cart_item(salon_id, product_id, quantity, price):
+    return {
+        'cart_id': 50 + salon_id, 'salon_id': salon_id, 'product_id': product_id,
+        'product_name': f'product {product_id}', 'quantity': quantity, 'unit_price': price, 'line_total': quantity * price
+    }
+
+def mock_conn(reward_rows=(), products=2):
+    cursor = MagicMock()
+    # reward costs, then the carts' reservations (none)
+    cursor.fetchall.side_effect = [list(reward_rows), []] if reward_rows else [[]]
+    cursor.rowcount = products
+    ids = iter(range(100, 200))
+    type(cursor).lastrowid = property(lambda self: next(ids))
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+def statements(cursor):
+    return [call.args[0] for call in cursor.execute.call_args_list + cursor.executemany.call_args_list]
+
+def test_round_trips_scale_with_salons_not_items():
+    items = [cart_item(1 + i % 2, i, 1, 10.0) for i in range(30)]
+    conn, cursor = mock_conn(products=30)
+    invoice_ids = checkout.place_order(conn, 7, items)
+
+    assert invoice_ids == [100, 101]
+    # 2 invoices + reservations + stock + release + cart + history;
+    # line items, rollups and points as executemany
+    assert cursor.execute.call_count == 7
+    assert cursor.executemany.call_count == 3
+    line_items = cursor.executemany.call_args_list[0].args[1]
+    assert len(line_items) == 30 and {row[0] for row in line_items} == {100, 101}
+    # only an all-placeholder VALUES tuple is sent as one multi-row INSERT
+    for call in cursor.executemany.call_args_list:
+        assert RE_INSERT_VALUES.match(call.args[0]), call.args[0]
+
+def test_stock_update_sums_repeated_products():
+    conn, cursor = mock_conn()
+    checkout.place_order(conn, 7, [cart_item(1, 5, 2, 3.0), cart_item(1, 5, 1, 3.0), cart_item(1, 6, 4, 1.0)])
+
+    stock = next(call for call in cursor.execute.call_args_list if 'update products' in call.args[0])
+    quantities = [5, 3, 6, 4]
+    holds = [5, 0, 6, 0]
+    assert stock.args[1] == quantities + holds + [5, 6] + quantities + holds + quantities
+
+def test_rewards_prefetched_once_and_netted_into_points():
+    items = [cart_item(1, 1, 1, 50.0), cart_item(2, 2, 1, 20.0)]
+    rewards = {
+        '1': {'loyalty_program_id': 9, 'is_percentage': True, 'discount_value': 10},
+        '2': {'loyalty_program_id': 4, 'is_percentage': False, 'discount_value': 5},
+    }
+    conn, cursor = mock_conn(reward_rows=[(4, 50), (9, 100)])
+    checkout.place_order(conn, 7, items, rewards)
+
+    assert sum('from loyalty_programs' in sql for sql in statements(cursor)) == 1
+    points = next(call.args[1] for call in cursor.executemany.call_args_list if 'customer_points' in call.args[0])
+    assert points == [('1', 7, 1.00, 45, 100, -55), ('2', 7, 1.00, 15, 50, -35)]
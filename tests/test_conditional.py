@@ -0,0 +1,112 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+from flask import Flask, jsonify
+from utils.conditional import conditional
+
+@pytest.fixture
+def cond_app():
+    app = Flask(__name__)
+    cursor = MagicMock()
+    cursor.fetchone.return_value = (3, '2025-05-01 10:00:00', 7)
+    cursor.description = [('count(*)',), ('last_modified',), ('bit_xor(gallery_id)',)]
+    app.config['MYSQL'] = MagicMock()
+    app.config['MYSQL'].connection.cursor.return_value = cursor
+    calls = []
+
+    @app.route('/salon/<int:salon_id>/gallery')
+    @conditional('gallery', "select count(*), max(last_modified) as last_modified, bit_xor(gallery_id) "
+                            "from salon_gallery where salon_id = %s")
+    def gallery(salon_id):
+        calls.append(salon_id)
+        return jsonify({'salon_id': salon_id}), 200
+
+    @app.route('/products/view')
+    @conditional('products', "select count(*) from products where salon_id = %s")
+    def products():
+        calls.append('products')
+        return jsonify({'products': []}), 200
+
+    yield app.test_client(), cursor, calls
+
+def test_matching_etag_skips_the_view(cond_app):
+    client, cursor, calls = cond_app
+    first = client.get('/salon/1/gallery')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/"')
+    assert cursor.execute.call_args.args[1] == (1,)
+
+    second = client.get('/salon/1/gallery', headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == etag
+    assert calls == [1]
+
+def test_changed_validator_returns_full_body(cond_app):
+    client, cursor, calls = cond_app
+    etag = client.get('/salon/2/gallery').headers['ETag']
+    cursor.fetchone.return_value = (2, '2025-05-01 10:00:00', 5)  # a row was deleted
+    response = client.get('/salon/2/gallery', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert calls == [2, 2]
+
+def test_if_modified_since(cond_app):
+    client, cursor, calls = cond_app
+    first = client.get('/salon/3/gallery')
+    last_modified = first.headers['Last-Modified']
+    assert last_modified == 'Thu, 01 May 2025 10:00:00 GMT'
+    assert client.get('/salon/3/gallery', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+    cursor.fetchone.return_value = (4, '2025-05-02 08:30:00', 9)
+    changed = client.get('/salon/3/gallery', headers={'If-Modified-Since': last_modified})
+    assert changed.status_code == 200
+    assert changed.headers['Last-Modified'] == 'Fri, 02 May 2025 08:30:00 GMT'
+
+def test_last_modified_is_the_same_on_every_worker():
+    # two processes see the same validator row, so they send the same validator
+    headers = set()
+    for _ in range(2):
+        app = Flask(__name__)
+        cursor = MagicMock()
+        cursor.fetchone.return_value = (1, datetime(2025, 5, 1, 10, 0, 0, 250000), 3)
+        cursor.description = [('count(*)',), ('last_modified',), ('checksum',)]
+        app.config['MYSQL'] = MagicMock()
+        app.config['MYSQL'].connection.cursor.return_value = cursor
+
+        @app.route('/salon/<int:salon_id>/gallery')
+        @conditional('gallery', "select 1 where %s")
+        def gallery(salon_id):
+            return jsonify({}), 200
+
+        headers.add(app.test_client().get('/salon/1/gallery').headers['Last-Modified'])
+    assert headers == {'Thu, 01 May 2025 10:00:00 GMT'}
+
+def test_validator_without_last_modified_sends_only_the_etag(cond_app):
+    client, cursor, calls = cond_app
+    cursor.description = [('count(*)',)]
+    response = client.get('/products/view?salon_id=5', headers={'If-Modified-Since': 'Thu, 01 May 2025 10:00:00 GMT'})
+    assert response.status_code == 200
+    assert 'Last-Modified' not in response.headers and 'ETag' in response.headers
+
+def test_enabled_in_testing_mode(cond_app):
+    client, cursor, calls = cond_app
+    client.application.testing = True
+    etag = client.get('/salon/6/gallery').headers['ETag']
+    assert client.get('/salon/6/gallery', headers={'If-None-Match': etag}).status_code == 304
+
+    client.application.config['CONDITIONAL_GET_ENABLED'] = False
+    response = client.get('/salon/6/gallery', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and 'ETag' not in response.headers
+
+def test_query_string_param_and_missing_param(cond_app):
+    client, cursor, calls = cond_app
+    response = client.get('/products/view?salon_id=5')
+    assert response.status_code == 200
+    assert cursor.execute.call_args.args[1] == ('5',)
+
+    cursor.execute.reset_mock()
+    client.get('/products/view')
+    cursor.execute.assert_not_called()
+    assert calls == ['products', 'products']
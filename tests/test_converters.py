@@ -0,0 +1,32 @@
+from datetime import date
+from MySQLdb.constants import FIELD_TYPE
+from MySQLdb.converters import conversions
+from utils.availability import group_by_date
+from utils.converters import json_conversions
+
+def test_temporal_and_decimal_columns_decode_json_ready():
+    conv = json_conversions()
+    assert conv[FIELD_TYPE.TIME] is str
+    assert conv[FIELD_TYPE.DATETIME] is str
+    assert conv[FIELD_TYPE.NEWDECIMAL]('12.50') == 12.5
+    # parameter encoders stay the driver's, and the shared mapping is untouched
+    assert conv[int] is conversions[int]
+    assert conversions[FIELD_TYPE.TIME] is not str
+
+def test_pool_always_installs_the_decoders_over_custom_ones():
+    from flask import Flask
+    from utils.db_pool import PooledMySQL
+    app = Flask(__name__)
+    app.config['MYSQL_CUSTOM_OPTIONS'] = {'conv': {FIELD_TYPE.DATE: date.fromisoformat, int: conversions[int]}}
+    PooledMySQL(app)
+
+    conv = app.config['MYSQL_CUSTOM_OPTIONS']['conv']
+    assert conv[FIELD_TYPE.DATE] is str and conv[FIELD_TYPE.NEWDECIMAL] is float
+    assert conv[int] is conversions[int]
+
+def test_group_by_date_keys_by_iso_day():
+    grouped = group_by_date([
+        {'appointment_date': '2025-03-14', 'start_time': '10:00:00'},
+        {'appointment_date': date(2025, 3, 14), 'start_time': '11:00:00'},
+    ])
+    assert list(grouped) == ['2025-03-14'] and len(grouped['2025-03-14']) == 2
@@ -0,0 +1,51 @@
+import threading
+import pytest
+from unittest.mock import MagicMock
+from werkzeug.security import check_password_hash, generate_password_hash
+from utils.credentials import CredentialPool, CredentialsBusy, migrate_legacy_passwords, verify_password
+
+def test_verify_hashed_and_plaintext():
+    hashed = generate_password_hash("secret")
+    assert verify_password(hashed, "secret") == (True, None)
+    assert verify_password(hashed, "nope") == (False, None)
+
+    # plaintext only counts while the legacy flag allows it, and comes back hashed
+    assert verify_password("secret", "secret") == (False, None)
+    ok, upgraded = verify_password("secret", "secret", allow_plaintext=True)
+    assert ok and check_password_hash(upgraded, "secret")
+    assert verify_password(None, "secret", allow_plaintext=True) == (False, None)
+
+def test_pool_rejects_when_saturated():
+    pool = CredentialPool(workers=1, max_pending=0, wait=0.05)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(2)
+        return 'done'
+
+    result = []
+    t = threading.Thread(target=lambda: result.append(pool.run(slow)))
+    t.start()
+    started.wait(1)
+    with pytest.raises(CredentialsBusy):
+        pool.run(lambda: 'late')
+    release.set()
+    t.join()
+    assert result == ['done']
+    assert pool.run(lambda: 'next') == 'next'
+
+def test_migrate_legacy_passwords_batches():
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [[(1, 'pw1'), (4, 'pw4')], [(9, 'pw9')], []]
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+
+    assert migrate_legacy_passwords(conn, batch_size=2) == 3
+    # keyset over user_id
+    assert [c.args[1][0] for c in cursor.execute.call_args_list] == [0, 4, 9]
+    first_batch = cursor.executemany.call_args_list[0].args[1]
+    assert [(uid, old) for _, uid, old in first_batch] == [(1, 'pw1'), (4, 'pw4')]
+    assert check_password_hash(first_batch[0][0], 'pw1')
+    assert conn.commit.call_count == 2
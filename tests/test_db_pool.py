@@ -0,0 +1,102 @@
+import threading
+import pytest
+from unittest.mock import MagicMock
+from utils.db_pool import ConnectionPool, PoolTimeout
+
+def make_pool(**kwargs):
+    made = []
+    def connect():
+        conn = MagicMock()
+        made.append(conn)
+        return conn
+    return ConnectionPool(connect, **kwargs), made
+
+def test_pool_reuses_released_connection():
+    pool, made = make_pool(size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+    again = pool.acquire()
+
+    assert again is conn
+    assert len(made) == 1
+    conn.rollback.assert_called_once()
+    assert pool.stats()['checkouts'] == 2
+
+def test_pool_is_bounded_and_times_out():
+    pool, made = make_pool(size=1, timeout=0.05)
+    pool.acquire()
+
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+    stats = pool.stats()
+    assert stats['timeouts'] == 1
+    assert stats['in_use'] == 1
+    assert len(made) == 1
+
+def test_waiting_checkout_gets_released_connection():
+    pool, made = make_pool(size=1, timeout=2)
+    conn = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(conn,)).start()
+
+    assert pool.acquire() is conn
+    assert pool.stats()['waits'] == 1
+
+def test_failed_ping_replaces_connection():
+    pool, made = make_pool(size=1)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.ping.side_effect = Exception("MySQL server has gone away")
+
+    fresh = pool.acquire()
+    assert fresh is not conn
+    conn.close.assert_called_once()
+    assert pool.stats()['ping_failures'] == 1
+
+def test_old_connection_is_recycled():
+    pool, made = make_pool(size=1, recycle=0.01)
+    conn = pool.acquire()
+    pool.release(conn)
+    threading.Event().wait(0.02)
+
+    assert pool.acquire() is not conn
+    assert pool.stats()['connections_recycled'] == 1
+
+def test_broken_connection_is_discarded_on_release():
+    pool, made = make_pool(size=1)
+    conn = pool.acquire()
+    conn.rollback.side_effect = Exception("lost connection")
+    pool.release(conn)
+
+    stats = pool.stats()
+    assert stats['open'] == 0
+    assert stats['idle'] == 0
+
+def test_timed_connection_reports_statements():
+    from utils.db_pool import TimedConnection
+    seen = []
+    raw = MagicMock()
+    raw.cursor.return_value.fetchone.return_value = (1,)
+    conn = TimedConnection(raw, lambda stmt, args, secs: seen.append((stmt, args)))
+
+    cursor = conn.cursor()
+    cursor.execute("select %s", (1,))
+    assert cursor.fetchone() == (1,)
+    conn.commit()
+    conn.rollback()
+
+    assert seen == [("select %s", (1,)), ("commit", None)]
+    raw.rollback.assert_called_once()
+
+def test_try_acquire_never_waits_and_keeps_the_reserve():
+    pool, made = make_pool(size=3, timeout=5)
+    held = pool.acquire()
+
+    spare = pool.try_acquire(reserve=1)
+    assert spare is not None
+    # one connection left: it stays for requests
+    assert pool.try_acquire(reserve=1) is None
+    pool.release(spare)
+    assert pool.try_acquire(reserve=1) is spare
+    assert pool.stats()['waits'] == 0 and pool.stats()['in_use'] == 2
+    pool.release(held)
@@ -0,0 +1,80 @@
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from app import app
+from utils import exports
+
+def fake_cursor(batches):
+    cursor = MagicMock()
+    cursor.description = [('invoice_id',), ('total_amount',)]
+    cursor.fetchmany.side_effect = batches + [[]]
+    return cursor
+
+def test_dataset_query_scopes_salon_and_dates():
+    query, params = exports.dataset_query('invoices', 3, '2024-01-01', None)
+    assert params == [3, 3, '2024-01-01']
+    assert 'i.issued_date >= %s' in query and '{dates}' not in query
+
+def test_csv_export_streams_chunks_into_file(tmp_path):
+    conn = MagicMock()
+    cursor = fake_cursor([[(1, 10.5), (2, 3.0)], [(3, 7.25)]])
+    conn.cursor.return_value = cursor
+    job = {'export_id': 12, 'salon_id': 3, 'dataset': 'invoices', 'format': 'csv', 'date_from': None, 'date_to': None}
+
+    rows, size = exports.write_export(conn, job, str(tmp_path), chunk_size=2)
+
+    path = tmp_path / '12.csv'
+    assert rows == 3 and size == path.stat().st_size
+    assert path.read_text().splitlines() == ['invoice_id,total_amount', '1,10.5', '2,3.0', '3,7.25']
+    assert os.listdir(tmp_path) == ['12.csv']
+    cursor.fetchmany.assert_called_with(2)
+    cursor.close.assert_called_once()
+
+def test_parquet_schema_comes_from_column_types(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    from MySQLdb.constants import FIELD_TYPE
+    conn = MagicMock()
+    cursor = MagicMock()
+    cursor.description = [('invoice_id', FIELD_TYPE.LONG, None, 11, 11, 0, False),
+                          ('issued_date', FIELD_TYPE.DATETIME, None, 19, 19, 0, True),
+                          ('total_amount', FIELD_TYPE.NEWDECIMAL, None, 12, 12, 2, True)]
+    # the first chunk is all nulls in two columns; later chunks must still fit
+    cursor.fetchmany.side_effect = [[(1, None, None)], [(2, '2025-03-14 10:00:00', 10.5)], []]
+    conn.cursor.return_value = cursor
+    job = {'export_id': 13, 'salon_id': 3, 'dataset': 'invoices', 'format': 'parquet', 'date_from': None, 'date_to': None}
+
+    rows, _ = exports.write_export(conn, job, str(tmp_path), chunk_size=1)
+
+    table = pq.read_table(tmp_path / '13.parquet')
+    assert rows == 2 and table.num_rows == 2
+    assert [str(t) for t in table.schema.types] == ['int64', 'timestamp[us]', 'decimal128(38, 2)']
+    assert str(table.column('total_amount')[1].as_py()) == '10.50'
+
+def test_failed_export_is_recorded_and_leaves_no_file(tmp_path):
+    claim, stream, finish = MagicMock(), MagicMock(), MagicMock()
+    claim.fetchone.return_value = (5, 3, 'appointments', 'csv', None, None)
+    stream.description = [('appointment_id',)]
+    stream.fetchmany.side_effect = Exception('lost connection')
+    conn = MagicMock()
+    conn.cursor.side_effect = [claim, stream, finish]
+
+    assert exports.run_once(conn, str(tmp_path)) == 5
+    status, _, _, error, export_id = finish.execute.call_args.args[1]
+    assert (status, error, export_id) == ('failed', 'lost connection', 5)
+    assert os.listdir(tmp_path) == []
+
+def test_download_supports_range(client, tmp_path):
+    (tmp_path / '7.csv').write_text('invoice_id,total_amount\n1,10.5\n')
+    mysql = MagicMock()
+    mysql.connection.cursor.return_value.fetchone.return_value = (
+        7, 3, 'invoices', 'csv', None, None, 'done', 1, 31, None, '2025-03-14 10:00:00', '2025-03-14 10:00:05'
+    )
+    with client.session_transaction() as sess:
+        sess['role'] = 'owner'
+        sess['salon_id'] = 3
+    with app.app_context(), patch('exports.current_app') as mock_app:
+        mock_app.config = {'MYSQL': mysql, 'EXPORT_DIR': str(tmp_path)}
+        response = client.get('/salon/3/exports/7/download', headers={'Range': 'bytes=0-9'})
+        assert response.status_code == 206
+        assert response.data == b'invoice_id'
+        assert client.get('/salon/4/exports/7/download').status_code == 403
@@ -0,0 +1,50 @@
+import pytest
+from unittest.mock import MagicMock
+from utils import inventory
+
+def test_reserve_fails_when_shelf_is_short():
+    cursor = MagicMock()
+    cursor.rowcount = 0
+    cursor.fetchall.return_value = [(7, 1)]
+
+    with pytest.raises(inventory.InsufficientStock) as e:
+        inventory.reserve(cursor, 3, 7, 2)
+    assert e.value.shortfalls == [{'product_id': 7, 'requested': 2, 'available': 1}]
+    hold = cursor.execute.call_args_list[1]
+    assert 'stock_quantity - reserved_quantity >= %s' in hold.args[0]
+
+def test_resize_of_missing_item_is_noop():
+    cursor = MagicMock()
+    cursor.fetchone.return_value = None
+    assert inventory.resize(cursor, 99, 3) is False
+    assert cursor.execute.call_count == 1
+
+def test_checkout_counts_own_holds_and_reports_every_shortfall():
+    cursor = MagicMock()
+    # this cart holds 2 of product 4; products 4 and 9 then have 1 and 0 free
+    cursor.fetchall.side_effect = [[(4, 2)], [(4, 1), (9, 0)]]
+    cursor.rowcount = 1
+
+    with pytest.raises(inventory.InsufficientStock) as e:
+        inventory.commit_stock(cursor, [5], [
+            {'product_id': 9, 'quantity': 1},
+            {'product_id': 4, 'quantity': 3},
+            {'product_id': 4, 'quantity': 1},
+        ])
+    assert e.value.shortfalls == [
+        {'product_id': 4, 'requested': 4, 'available': 3},
+        {'product_id': 9, 'requested': 1, 'available': 0},
+    ]
+    assert not any('delete from stock_reservations' in call.args[0] for call in cursor.execute.call_args_list)
+
+def test_sweep_returns_expired_holds_per_product():
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [[(1, 4, 2), (2, 4, 1), (3, 8, 5)]]
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+
+    assert inventory.sweep_expired(conn, batch_size=10) == 3
+    update, delete = cursor.execute.call_args_list[1:]
+    assert update.args[1] == [4, 3, 8, 5, 4, 8]
+    assert delete.args[1] == [1, 2, 3]
+    conn.commit.assert_called_once()
@@ -0,0 +1,68 @@
+import json
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+from flask import Flask
+from utils.logerror import ErrorPipeline, error_pipeline, log_error
+
+def fake_app(conn=None, fail=False):
+    app = Flask(__name__)
+    mysql = MagicMock()
+
+    @contextmanager
+    def checkout():
+        if fail:
+            raise ConnectionError("db down")
+        yield conn
+
+    mysql.checkout = checkout
+    app.config['MYSQL'] = mysql
+    return app
+
+def test_repeats_are_collapsed_into_one_row():
+    conn = MagicMock()
+    pipeline = ErrorPipeline(batch_size=100)
+    pipeline.app = fake_app(conn)
+    for _ in range(3):
+        pipeline.record("boom", "Traceback ...", "/cart/add", "POST")
+    pipeline.record("other", None, "/login", "POST", user_id=7)
+
+    assert pipeline.flush() == 4
+    sql, rows = conn.cursor.return_value.executemany.call_args.args
+    assert "insert into error_logs" in sql
+    assert sorted((r[0], r[6]) for r in rows) == [("boom", 3), ("other", 1)]
+    conn.commit.assert_called_once()
+    stats = pipeline.stats()
+    assert (stats['rows_written'], stats['deduplicated'], stats['queued']) == (2, 2, 0)
+    assert len(pipeline.recent) == 4
+    assert pipeline.by_endpoint['/cart/add']['count'] == 3
+
+def test_full_queue_drops_but_keeps_ring_buffer():
+    pipeline = ErrorPipeline(maxsize=2)
+    for i in range(5):
+        pipeline.record(f"e{i}")
+    assert pipeline.stats()['dropped'] == 3
+    assert pipeline.stats()['queued'] == 2
+    assert [e['error_message'] for e in pipeline.recent] == ["e0", "e1", "e2", "e3", "e4"]
+
+def test_failed_flush_spills_to_file(tmp_path):
+    pipeline = ErrorPipeline(log_dir=str(tmp_path))
+    pipeline.app = fake_app(fail=True)
+    pipeline.record("db gone", endpoint="/health", error_type='database_connection')
+    assert pipeline.flush() == 1
+    [log_file] = tmp_path.iterdir()
+    entry = json.loads(log_file.read_text().strip())
+    assert entry['error_message'] == "db gone" and entry['endpoint'] == "/health"
+    assert pipeline.stats()['spilled_to_file'] == 1
+
+def test_log_error_queues_redacted_payload_without_touching_the_db():
+    app = Flask(__name__)
+    mysql = MagicMock()
+    app.config['MYSQL'] = mysql
+    before = error_pipeline.queue.qsize()
+    with app.test_request_context('/login', method='POST', json={'username': 'ana', 'password': 'secret'}):
+        log_error("Invalid login attempt", None)
+    mysql.connection.commit.assert_not_called()
+    assert error_pipeline.queue.qsize() == before + 1
+    entry = error_pipeline.queue.queue[-1]
+    assert entry[2:4] == ('/login', 'POST')
+    assert json.loads(entry[4]) == {'username': 'ana', 'password': '***'}
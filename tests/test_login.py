@@ -1,7 +1,10 @@
 import pytest
 from unittest.mock import MagicMock, patch
 from app import app 
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import generate_password_hash
+from utils.credentials import DUMMY_PASSWORD_HASH
+from utils.throttle import Throttle
 
 @pytest.fixture
 def client():
@@ -32,12 +35,27 @@ def test_login_invalid_username(client):
             assert 'Invalid username or password' in data['error']
 
 
+def test_login_unknown_username_still_runs_the_kdf(client):
+    with app.app_context():
+        with patch('login.current_app') as mock_app, patch('login.verify_password') as verify:
+            verify.return_value = (False, None)
+            mock_cursor = MagicMock()
+            mock_cursor.fetchone.return_value = None
+            mock_mysql = MagicMock()
+            mock_mysql.connection.cursor.return_value = mock_cursor
+            mock_app.config = {'MYSQL': mock_mysql}
+
+            response = client.post('/login', json={"username": "ghost", "password": "123"})
+            assert response.status_code == 401
+            assert verify.call_args.args[:2] == (DUMMY_PASSWORD_HASH, "123")
+
+
 def test_login_invalid_password(client):
     hashed_pw = generate_password_hash("correctpw")
     with app.app_context():
         with patch('login.current_app') as mock_app:
             mock_cursor = MagicMock()
-            mock_cursor.fetchone.return_value = (1, hashed_pw)
+            mock_cursor.fetchone.return_value = (1, hashed_pw, "User", "customer", None, None)
             mock_mysql = MagicMock()
             mock_mysql.connection.cursor.return_value = mock_cursor
             mock_app.config = {'MYSQL': mock_mysql}
@@ -47,13 +65,12 @@ def test_login_invalid_password(client):
             assert response.status_code == 401
             assert 'Invalid username or password' in data['error']
 
-'''
 def test_login_success(client):
     hashed_pw = generate_password_hash("mypassword")
     with app.app_context():
         with patch('login.current_app') as mock_app:
             mock_cursor = MagicMock()
-            mock_cursor.fetchone.return_value = (42, hashed_pw)
+            mock_cursor.fetchone.return_value = (42, hashed_pw, "Ana", "owner", 7, 1)
             mock_mysql = MagicMock()
             mock_mysql.connection.cursor.return_value = mock_cursor
             mock_app.config = {'MYSQL': mock_mysql}
@@ -66,7 +83,77 @@ def test_login_success(client):
             with client.session_transaction() as sess:
                 assert sess['user_id'] == 42
                 assert sess['username'] == "user1"
-'''
+                assert sess['salon_id'] == 7
+                assert sess['is_verified'] is True
+            #one select, no rehash/update
+            mock_cursor.execute.assert_called_once()
+            mock_mysql.connection.commit.assert_not_called()
+
+def test_login_upgrades_legacy_plaintext(client):
+    with app.app_context():
+        with patch('login.current_app') as mock_app:
+            mock_cursor = MagicMock()
+            mock_cursor.fetchone.return_value = (5, "plainpw", "Bo", "customer", None, None)
+            mock_mysql = MagicMock()
+            mock_mysql.connection.cursor.return_value = mock_cursor
+            mock_app.config = {'MYSQL': mock_mysql, 'LEGACY_PLAINTEXT_PASSWORDS': True}
+
+            response = client.post('/login', json={"username": "user5", "password": "plainpw"})
+            assert response.status_code == 200
+            sql, params = mock_cursor.execute.call_args.args
+            assert sql.startswith("update users set password")
+            assert params[0].startswith("scrypt:") and params[1:] == (5, "plainpw")
+
+            mock_app.config['LEGACY_PLAINTEXT_PASSWORDS'] = False
+            response = client.post('/login', json={"username": "user5", "password": "plainpw"})
+            assert response.status_code == 401
+
+def test_login_throttled_before_db(client):
+    with app.app_context():
+        with patch('login.current_app') as mock_app, \
+             patch('login.throttle', Throttle(limits={'login_user': (1, 60)})):
+            mock_cursor = MagicMock()
+            mock_cursor.fetchone.return_value = None
+            mock_mysql = MagicMock()
+            mock_mysql.connection.cursor.return_value = mock_cursor
+            mock_app.config = {'MYSQL': mock_mysql}
+
+            assert client.post('/login', json={"username": "slow", "password": "x"}).status_code == 401
+            mock_cursor.execute.reset_mock()
+            response = client.post('/login', json={"username": "slow", "password": "x"})
+            assert response.status_code == 429
+            assert int(response.headers['Retry-After']) > 0
+            mock_cursor.execute.assert_not_called()
+
+def login_from(client, forwarded_for):
+    return client.post('/login', json={"username": "u", "password": "x"},
+                       headers={'X-Forwarded-For': forwarded_for}).status_code
+
+@pytest.fixture
+def no_such_user():
+    with app.app_context():
+        with patch('login.current_app') as mock_app, \
+             patch('login.throttle', Throttle(limits={'login_ip': (1, 60)})):
+            mock_cursor = MagicMock()
+            mock_cursor.fetchone.return_value = None
+            mock_mysql = MagicMock()
+            mock_mysql.connection.cursor.return_value = mock_cursor
+            mock_app.config = {'MYSQL': mock_mysql}
+            yield
+
+def test_forwarded_for_is_ignored_without_a_configured_proxy(client, no_such_user):
+    assert app.config['PROXY_FIX_HOPS'] == 0
+    # a client can't get a fresh bucket by sending a new X-Forwarded-For
+    assert login_from(client, '203.0.113.1') == 401
+    assert login_from(client, '203.0.113.2') == 429
+
+def test_login_ip_throttle_keys_on_the_forwarded_client_behind_a_proxy(client, no_such_user):
+    with patch.object(app, 'wsgi_app', ProxyFix(app.wsgi_app, x_for=1)):
+        # every request arrives from the proxy; clients get their own buckets
+        assert login_from(client, '203.0.113.1') == 401
+        assert login_from(client, '203.0.113.2') == 401
+        assert login_from(client, '203.0.113.1') == 429
+
 # /auth/status tests
 def test_auth_status_authenticated(client):
     with client.session_transaction() as sess:
@@ -0,0 +1,51 @@
+from flask import Flask, jsonify
+from utils.metrics import Histogram, RequestMetrics, init_metrics, observe_query, prometheus_text
+
+def test_histogram_percentiles_within_bucket_precision():
+    hist = Histogram()
+    for v in range(1, 1001):
+        hist.record(v)
+    for p, exact in ((50, 500), (95, 950), (99, 990)):
+        assert abs(hist.percentile(p) - exact) / exact < 0.1
+    assert hist.percentile(100) == hist.max
+    assert Histogram().percentile(50) is None
+    assert hist.count_above(2000) == 0
+
+def make_app(metrics):
+    app = Flask(__name__)
+    init_metrics(app, metrics)
+
+    @app.route('/salon/<int:salon_id>/services')
+    def services(salon_id):
+        observe_query("select 1", None, 0.002)
+        observe_query("select 2", None, 0.003)
+        return jsonify({'salon_id': salon_id})
+
+    return app.test_client()
+
+def test_middleware_records_per_route():
+    metrics = RequestMetrics()
+    client = make_app(metrics)
+    client.get('/salon/1/services')
+    client.get('/salon/2/services')
+    client.get('/nope')
+
+    routes = {(r['method'], r['route']): r for r in metrics.snapshot()['routes']}
+    services = routes[('GET', '/salon/<int:salon_id>/services')]
+    assert services['latency_ms']['count'] == 2
+    assert services['avg_queries'] == 2
+    assert 4 <= services['db_ms']['p50'] <= 5.5
+    assert services['avg_response_bytes'] > 0
+    assert services['statuses'] == {'200': 2}
+    assert routes[('GET', '<unmatched>')]['statuses'] == {'404': 1}
+    assert metrics.snapshot()['overall']['count'] == 3
+
+def test_prometheus_text():
+    metrics = RequestMetrics()
+    client = make_app(metrics)
+    client.get('/salon/1/services')
+    text = prometheus_text(metrics)
+    assert '# TYPE http_request_duration_seconds summary' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/salon/<int:salon_id>/services"} 1' in text
+    assert 'http_requests_total{method="GET",route="/salon/<int:salon_id>/services",status="200"} 1' in text
+    assert 'http_request_queries_total{method="GET",route="/salon/<int:salon_id>/services"} 2' in text
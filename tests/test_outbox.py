@@ -0,0 +1,74 @@
+import time
+import pytest
+from unittest.mock import MagicMock
+from flask import Flask
+from flask_mail import Mail
+from utils.outbox import OutboxWorker, RateLimiter, queue_emails
+
+# Flask-Mail with MAIL_SUPPRESS_SEND stands in for the SMTP server:
+# connect() opens no socket and record_messages() captures what was sent.
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(MAIL_SUPPRESS_SEND=True, MAIL_DEFAULT_SENDER='salon@example.com')
+    Mail(app)
+    return app
+
+def rows(*emails, attempts=1):
+    return [(n, to, 'Subject', 'Body', None, attempts) for n, to in enumerate(emails, start=1)]
+
+def test_queue_emails_is_one_multi_row_insert():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+
+    assert queue_emails(conn, ['a@x.com', 'b@x.com'], 'Promo', 'Hi') == 2
+    sql, params = cursor.executemany.call_args.args
+    assert 'insert into email_outbox' in sql
+    assert params == [('a@x.com', 'Promo', 'Hi', None, None, None), ('b@x.com', 'Promo', 'Hi', None, None, None)]
+    conn.commit.assert_not_called()
+
+def test_batch_is_sent_over_one_connection(app):
+    mail = app.extensions['mail']
+    worker = OutboxWorker(app, rate=0)
+    connections = []
+    original = mail.connect
+    mail.connect = lambda: connections.append(1) or original()
+
+    with app.app_context(), mail.record_messages() as outbox:
+        sent, failures = worker.send(rows('a@x.com', 'b@x.com', 'c@x.com'))
+
+    assert sent == [1, 2, 3]
+    assert failures == []
+    assert len(connections) == 1
+    assert [m.recipients for m in outbox] == [['a@x.com'], ['b@x.com'], ['c@x.com']]
+
+def test_failed_connection_retries_whole_batch(app):
+    app.extensions['mail'].connect = MagicMock(side_effect=OSError("connection refused"))
+    worker = OutboxWorker(app, rate=0)
+
+    with app.app_context():
+        sent, failures = worker.send(rows('a@x.com', 'b@x.com'))
+
+    assert sent == []
+    assert [(f[0], f[2]) for f in failures] == [(1, 'connection refused'), (2, 'connection refused')]
+
+def test_record_backs_off_then_gives_up(app):
+    worker = OutboxWorker(app, max_attempts=3, backoff=30)
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+
+    worker.record(conn, [5], [(6, 1, 'timeout'), (7, 3, 'mailbox full')])
+
+    assert 'status = \'sent\'' in cursor.execute.call_args.args[0]
+    assert cursor.executemany.call_args.args[1] == [
+        ('pending', 30, 'timeout', 6),
+        ('failed', 120, 'mailbox full', 7),
+    ]
+    conn.commit.assert_called_once()
+
+def test_rate_limiter_spaces_sends():
+    limiter = RateLimiter(50)
+    started = time.monotonic()
+    for _ in range(5):
+        limiter.wait()
+    assert time.monotonic() - started >= 0.08
@@ -0,0 +1,42 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+from flask import Flask
+from utils.pagination import (InvalidCursor, cached_count, decode_cursor, encode_cursor,
+                              generate_iter_pages, keyset_condition)
+
+@pytest.fixture
+def app_ctx():
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    with app.app_context():
+        yield
+
+def test_cursor_round_trip(app_ctx):
+    token = encode_cursor([datetime(2025, 3, 14, 10, 30), 42], 3)
+    assert decode_cursor(token) == (['2025-03-14 10:30:00', 42], 3)
+
+def test_tampered_cursor_is_rejected(app_ctx):
+    token = encode_cursor([42], 2)
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token[:-2] + 'xx')
+
+def test_keyset_condition_expands_mixed_order():
+    sql, params = keyset_condition(['r.rating', 'r.review_id'], ['desc', 'desc'], [4, 17])
+    assert sql == "((r.rating < %s) or (r.rating = %s and r.review_id < %s))"
+    assert params == [4, 4, 17]
+
+    sql, params = keyset_condition(['s.salon_id'], ['asc'], [7])
+    assert sql == "((s.salon_id > %s))"
+    assert params == [7]
+
+def test_cached_count_reuses_total():
+    cursor = MagicMock()
+    cursor.fetchone.return_value = (120,)
+
+    assert cached_count(cursor, "select count(*) from reviews where salon_id = %s", [9]) == 120
+    assert cached_count(cursor, "select count(*) from reviews where salon_id = %s", [9]) == 120
+    cursor.execute.assert_called_once()
+
+def test_iter_pages_keeps_edges_and_neighbours():
+    assert generate_iter_pages(current_page=10, total_pages=20) == [1, 2, '...', 8, 9, 10, 11, '...', 19, 20]
@@ -0,0 +1,47 @@
+from flask import Flask, jsonify
+from utils.profiler import SqlProfiler, fingerprint, init_profiler
+
+def test_fingerprint_folds_literals_and_lists():
+    assert fingerprint("SELECT *  FROM products\n WHERE product_id = %s") == \
+        "select * from products where product_id = ?"
+    assert fingerprint("select * from t where id in (%s, %s, %s) and name = 'x -- y'") == \
+        fingerprint("select * from t where id in (1,2) and name = 'z'")
+    assert fingerprint("insert into t (a, b) values (%s, %s), (%s, %s)") == \
+        "insert into t (a, b) values (...)"
+
+def make_app(profiler):
+    app = Flask(__name__)
+    app.config['SQL_PROFILER_SAMPLE_RATE'] = 1.0
+    init_profiler(app, profiler)
+
+    @app.route('/cart/<int:user_id>')
+    def cart(user_id):
+        for product_id in range(6):
+            profiler.observe(f"select stock from products where product_id = {product_id}", None, 0.001)
+        profiler.observe("update carts set total = %s where user_id = %s", None, 0.5)
+        return jsonify({'user_id': user_id})
+
+    return app.test_client()
+
+def test_flags_repeated_query_and_logs_slow_statement():
+    profiler = SqlProfiler()
+    make_app(profiler).get('/cart/3')
+
+    report = profiler.report()
+    flag = report['recent_flags'][0]
+    assert flag['route'] == 'GET /cart/<int:user_id>'
+    assert flag['problems'] == ['repeated_query']
+    assert flag['queries'] == 7
+    assert flag['repeated'] == [{'fingerprint': 'select stock from products where product_id = ?', 'count': 6}]
+    assert [q['fingerprint'] for q in report['slow_queries']] == ['update carts set total = ? where user_id = ?']
+    assert report['counters']['statements'] == 7
+
+def test_unsampled_requests_only_feed_slow_log():
+    profiler = SqlProfiler()
+    client = make_app(profiler)
+    profiler.sample_rate = 0
+    client.get('/cart/3')
+
+    report = profiler.report()
+    assert report['routes'] == [] and report['recent_flags'] == []
+    assert len(report['slow_queries']) == 1
@@ -0,0 +1,92 @@
+from unittest.mock import MagicMock, patch
+from app import app
+from utils import ratings
+
+def mock_conn(fetchone=()):
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = list(fetchone)
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+def test_add_review_increments_every_scope_in_one_statement():
+    conn, cursor = mock_conn()
+    ratings.add_review(conn, 42)
+
+    cursor.execute.assert_called_once()
+    sql, params = cursor.execute.call_args.args
+    assert "'employee'" in sql and "'service'" in sql
+    assert 'stars_5 = stars_5 + values(stars_5)' in sql
+    assert params == [1] * 7 + [42] * 3
+
+def test_remove_review_subtracts():
+    conn, cursor = mock_conn()
+    ratings.remove_review(conn, 42)
+    assert cursor.execute.call_args.args[1] == [-1] * 7 + [42] * 3
+
+def test_rebuild_overwrites_and_zeroes_scopes_without_reviews():
+    conn, cursor = mock_conn([(1,), (3,), (1,)])
+
+    assert ratings.rebuild(conn) == 3
+    lock, upsert, zero = [c.args[0] for c in cursor.execute.call_args_list[:3]]
+    assert 'get_lock' in lock
+    assert 'rating_sum = values(rating_sum)' in upsert
+    assert 'totals.scope_id is null' in zero
+    conn.commit.assert_called_once()
+    assert 'release_lock' in cursor.execute.call_args.args[0]
+
+def test_rebuild_skips_when_another_worker_holds_the_lock():
+    conn, cursor = mock_conn([(0,)])
+
+    assert ratings.rebuild(conn, wait=0) is None
+    assert cursor.execute.call_args.args[1] == (ratings.LOCK_NAME, 0)
+    cursor.execute.assert_called_once()
+
+def test_parse_stars():
+    assert [ratings.parse_stars(v) for v in (4, 4.0, "4", " 5 ")] == [4, 4, 4, 5]
+    assert [ratings.parse_stars(v) for v in (4.5, "4.5", 0, 6, True, "four", None)] == [None] * 7
+
+def test_aggregate_dict():
+    assert ratings.aggregate_dict((9, 2, 0, 0, 0, 1, 1)) == {
+        'average_rating': 4.5, 'rating_count': 2,
+        'histogram': {'1': 0, '2': 0, '3': 0, '4': 1, '5': 1}
+    }
+    assert ratings.aggregate_dict(None)['average_rating'] is None
+
+def test_rating_filter_count_comes_from_the_histogram(client):
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = [(1, 10), (115, 25, 0, 0, 0, 5, 20)]
+    cursor.fetchall.return_value = []
+
+    with app.app_context(), patch('reviews.current_app') as mock_app:
+        mock_app.config = {'MYSQL': MagicMock()}
+        mock_app.config['MYSQL'].connection.cursor.return_value = cursor
+        response = client.get('/salon/79/reviews/pagination?rating=4')
+
+    assert response.status_code == 200
+    assert response.get_json()['review_count'] == 5
+    assert not any('count(*)' in c.args[0] for c in cursor.execute.call_args_list)
+
+def test_post_review_rejects_partial_stars(client):
+    with client.session_transaction() as sess:
+        sess['user_id'] = 20
+    with app.app_context(), patch('reviews.current_app') as mock_app:
+        mock_app.config = {'MYSQL': MagicMock()}
+        response = client.post('/appointments/1/review', json={'rating': 4.5, 'comment': 'Nice'})
+
+    assert response.status_code == 400
+    mock_app.config['MYSQL'].connection.cursor.assert_not_called()
+
+def test_post_review_accepts_a_string_rating(client):
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = [(5, 20, 'completed'), None]
+    with client.session_transaction() as sess:
+        sess['user_id'] = 20
+    with app.app_context(), patch('reviews.current_app') as mock_app:
+        mock_app.config = {'MYSQL': MagicMock()}
+        mock_app.config['MYSQL'].connection.cursor.return_value = cursor
+        response = client.post('/appointments/1/review', json={'rating': '4', 'comment': 'Nice'})
+
+    assert response.status_code == 201
+    insert = next(c for c in cursor.execute.call_args_list if 'insert into reviews' in c.args[0])
+    assert insert.args[1][3] == 4
@@ -0,0 +1,69 @@
+from datetime import date, datetime, timedelta
+from unittest.mock import MagicMock
+from utils import reminders
+
+NOW = datetime(2025, 3, 14, 9, 0)
+
+def mock_conn(lock, *batches):
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = [(lock,), (1,)]
+    cursor.fetchall.side_effect = list(batches)
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+def test_dispatch_queues_one_reminder_per_appointment():
+    conn, cursor = mock_conn(1, [
+        (7, 'a@x.com', date(2025, 3, 15), timedelta(hours=8), 'Glow'),
+        (8, 'b@x.com', date(2025, 3, 15), timedelta(hours=9), 'Glow'),
+    ])
+
+    assert reminders.dispatch(conn, now=NOW, batch_size=10) == 2
+
+    messages = cursor.executemany.call_args.args[1]
+    assert [(m[0], m[4], m[5]) for m in messages] == [
+        ('a@x.com', 'appointment_reminder', 7),
+        ('b@x.com', 'appointment_reminder', 8),
+    ]
+    assert messages[0][1] == 'Reminder: Appointment at Glow'
+    conn.commit.assert_called_once()
+    assert 'release_lock' in cursor.execute.call_args.args[0]
+
+def test_dispatch_scans_an_indexed_date_range():
+    conn, cursor = mock_conn(1, [])
+    reminders.dispatch(conn, now=NOW, lead=timedelta(hours=24), batch_size=10)
+
+    sql, params = cursor.execute.call_args_list[1].args
+    assert 'appointment_date between %s and %s' in sql
+    assert params == (date(2025, 3, 14), date(2025, 3, 15), NOW, NOW + timedelta(hours=24), 10)
+
+def test_dispatch_leaves_out_customers_without_an_email():
+    conn, cursor = mock_conn(1, [
+        (7, None, date(2025, 3, 15), timedelta(hours=8), 'Glow'),
+        (8, 'b@x.com', date(2025, 3, 15), timedelta(hours=9), 'Glow'),
+    ])
+
+    assert reminders.dispatch(conn, now=NOW, batch_size=10) == 1
+
+    sql = cursor.execute.call_args_list[1].args[0]
+    assert "users.email <> ''" in sql
+    messages = cursor.executemany.call_args.args[1]
+    assert [(m[0], m[5]) for m in messages] == [('b@x.com', 8)]
+    conn.commit.assert_called_once()
+
+def test_dispatch_skips_when_another_worker_holds_the_lock():
+    conn, cursor = mock_conn(0)
+
+    assert reminders.dispatch(conn, now=NOW) is None
+    cursor.executemany.assert_not_called()
+    assert reminders.last_run['lock_held_elsewhere'] is True
+
+def test_metrics_split_outbox_states():
+    cursor = MagicMock()
+    cursor.fetchone.return_value = (3,)
+    cursor.fetchall.return_value = [('pending', 2), ('sending', 1), ('sent', 40), ('failed', 1)]
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+
+    metrics = reminders.reminder_metrics(conn, now=NOW)
+    assert (metrics['pending'], metrics['queued'], metrics['sent'], metrics['failed']) == (3, 3, 40, 1)
@@ -20,12 +20,12 @@ def test_get_reviews_success(client):
                 (3,), 
             ]
 
-            review_row = (
-                1, 1, 20, 5, "Great!", None, "2023-01-01",
-                '[{"reply_id":1,"user_id":10,"first_name":"Sam","last_name":"Owner","message":"Thanks!","created_at":"2023"}]',
-                "John", "Doe", 20
-            )
-            salon_cursor.fetchall.return_value = [review_row]
+            review_row = (1, 1, 20, 5, "Great!", None, "2023-01-01", "John", "Doe", 20)
+            reply_rows = [
+                (1, 1, None, 10, "Sam", "Owner", "Thanks!", "2023", 0),
+                (2, 1, 1, 20, "John", "Doe", "You're welcome", "2023", 1),
+            ]
+            salon_cursor.fetchall.side_effect = [[review_row], reply_rows]
 
             mock_mysql = MagicMock()
             mock_mysql.connection.cursor.return_value = salon_cursor
@@ -38,6 +38,7 @@ def test_get_reviews_success(client):
             assert data["review_count"] == 3
             assert data["reviews"][0]["comment"] == "Great!"
             assert data["reviews"][0]["replies"][0]["user"] == "Owner"
+            assert data["reviews"][0]["replies"][0]["replies"][0]["user"] == "John D."
 
 def test_get_reviews_not_found(client):
     with app.app_context():
@@ -187,7 +188,7 @@ def test_delete_review_success(client):
         with patch("reviews.current_app") as mock_app:
 
             cursor = MagicMock()
-            cursor.fetchone.return_value = (20,)
+            cursor.fetchone.return_value = (20, 1)
 
             mock_mysql = MagicMock()
             mock_mysql.connection.cursor.return_value = cursor
@@ -207,7 +208,8 @@ def test_delete_reply_success(client):
         with patch("reviews.current_app") as mock_app:
 
             cursor = MagicMock()
-            cursor.fetchone.return_value = (20,)  # reply owner
+            cursor.fetchone.side_effect = [(20,), (1, '0000000001/')]  # reply owner, thread path
+            cursor.rowcount = 2
 
             mock_mysql = MagicMock()
             mock_mysql.connection.cursor.return_value = cursor
@@ -217,3 +219,56 @@ def test_delete_reply_success(client):
 
             assert response.status_code == 200
             assert b"Reply deleted successfully" in response.data
+            # the reply's answers are deleted with it
+            assert cursor.execute.call_args.args[1] == (1, '0000000001/%')
+            assert response.get_json()["deleted"] == 2
+
+# /salon/<int:salon_id>/reviews/pagination tests
+def test_paginated_reviews_keyset_cursor(client):
+    with app.app_context():
+        with patch("reviews.current_app") as mock_app:
+
+            cursor = MagicMock()
+            # salon, rating aggregate (sum, count, 1-5 star buckets) per request
+            aggregate = (115, 25, 0, 0, 0, 5, 20)
+            cursor.fetchone.side_effect = [(1, 10), aggregate, (1, 10), aggregate]
+            cursor.fetchall.return_value = [
+                (review_id, 77, 20, 5, "Great!", None, "2023-01-01 10:00:00", 0, "John", "Doe", 20)
+                for review_id in range(30, 19, -1)
+            ]
+
+            mock_mysql = MagicMock()
+            mock_mysql.connection.cursor.return_value = cursor
+            mock_app.config = {"MYSQL": mock_mysql}
+
+            response = client.get("/salon/77/reviews/pagination")
+            data = response.get_json()
+
+            assert response.status_code == 200
+            assert len(data["reviews"]) == 10
+            assert data["next_cursor"]
+            assert data["review_count"] == 25
+            assert data["rating_histogram"]["5"] == 20 and data["average_rating"] == 4.6
+
+            response = client.get("/salon/77/reviews/pagination?cursor=" + data["next_cursor"])
+            data = response.get_json()
+            query, params = cursor.execute.call_args.args
+
+            assert response.status_code == 200
+            assert data["page"] == 2
+            assert "offset" in query and params[-1] == 0
+            assert list(params[1:4]) == ["2023-01-01 10:00:00", "2023-01-01 10:00:00", 21]
+
+def test_paginated_reviews_bad_cursor(client):
+    with app.app_context():
+        with patch("reviews.current_app") as mock_app:
+
+            cursor = MagicMock()
+            cursor.fetchone.side_effect = [(1, 10), (100, 25, 0, 0, 5, 5, 15)]
+
+            mock_mysql = MagicMock()
+            mock_mysql.connection.cursor.return_value = cursor
+            mock_app.config = {"MYSQL": mock_mysql}
+
+            response = client.get("/salon/78/reviews/pagination?cursor=garbage")
+            assert response.status_code == 400
@@ -0,0 +1,71 @@
+from datetime import date
+from decimal import Decimal
+import pytest
+from unittest.mock import MagicMock
+from utils import rollups
+
+def mock_conn(*fetchone):
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = list(fetchone)
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+def written_rows(cursor, table):
+    for call in cursor.executemany.call_args_list:
+        if table in call.args[0]:
+            return call.args[1]
+    return []
+
+def test_booking_counts_every_grain_and_dimension():
+    conn, cursor = mock_conn()
+    rollups.record_booking(conn, 1, 2, 3, '2025-03-14')
+
+    metrics = written_rows(cursor, 'revenue = revenue')
+    assert len(metrics) == 9
+    assert ('day', date(2025, 3, 14), 1, 'salon', 1, 0.0, 0, 1) in metrics
+    assert ('month', date(2025, 3, 1), 1, 'service', 2, 0.0, 0, 1) in metrics
+    assert ('all', rollups.ALL_TIME, 1, 'employee', 3, 0.0, 0, 1) in metrics
+
+    statuses = written_rows(cursor, 'into analytics_status_rollups')
+    assert ('all', rollups.ALL_TIME, 1, 'booked', 1) in statuses
+
+def test_appointment_payment_adds_revenue_and_moves_status():
+    conn, cursor = mock_conn((1, 2, 3, date(2025, 3, 14), 'booked'))
+    rollups.record_appointment_payment(conn, 10, 54.45, issued_date=date(2025, 3, 10))
+
+    metrics = written_rows(cursor, 'revenue = revenue')
+    assert ('month', date(2025, 3, 1), 1, 'service', 2, Decimal('54.45'), 1, 0) in metrics
+
+    statuses = written_rows(cursor, 'into analytics_status_rollups')
+    assert ('all', rollups.ALL_TIME, 1, 'booked', -1) in statuses
+    assert ('all', rollups.ALL_TIME, 1, 'paid', 1) in statuses
+
+def test_refund_reverses_appointment_revenue():
+    conn, cursor = mock_conn(
+        (10, date(2025, 3, 10), Decimal('54.45'), 'paid'),
+        (1, 2, 3, date(2025, 3, 14), 'paid'),
+    )
+    rollups.record_refund(conn, 99)
+
+    metrics = written_rows(cursor, 'revenue = revenue')
+    assert ('all', rollups.ALL_TIME, 1, 'salon', 1, Decimal('-54.45'), -1, 0) in metrics
+
+def test_refund_of_cancelled_invoice_is_noop():
+    conn, cursor = mock_conn((10, date(2025, 3, 10), Decimal('54.45'), 'cancelled'))
+    rollups.record_refund(conn, 99)
+    cursor.executemany.assert_not_called()
+
+def test_revenue_is_summed_in_exact_cents():
+    conn, cursor = mock_conn()
+    rollups.record_product_sale(conn, 1, [(5, 1, 0.1), (5, 2, 0.2)], issued_date=date(2025, 3, 10))
+
+    metrics = written_rows(cursor, 'revenue = revenue')
+    assert ('day', date(2025, 3, 10), 1, 'product', 5, Decimal('0.30'), 3, 0) in metrics
+
+def test_rollup_failure_reaches_the_callers_rollback():
+    conn, cursor = mock_conn()
+    cursor.executemany.side_effect = Exception("Deadlock found when trying to get lock")
+    with pytest.raises(Exception, match='Deadlock'):
+        rollups.record_booking(conn, 1, 2, 3, '2025-03-14')
+    cursor.close.assert_called_once()
@@ -0,0 +1,145 @@
+from unittest.mock import MagicMock, patch
+from utils import search
+from utils.search import SalonSearch, SearchIndex
+
+def doc(salon_id, name, rating=None, verified=True, city='Newark', tags=(), employees=(), description=''):
+    return {
+        'salon_id': salon_id, 'name': name, 'average_rating': rating, 'is_verified': verified,
+        'city': city, 'fields': {
+            'name': name, 'description': description, 'location': [city, 'NJ'],
+            'tag': list(tags), 'service': [], 'employee': list(employees)
+        }
+    }
+
+def build(*docs):
+    index = SearchIndex()
+    for d in docs:
+        index.upsert(d)
+    return index
+
+def test_exact_prefix_and_typo_matches():
+    index = build(doc(1, 'Glow Studio'), doc(2, 'Fade Masters Barbershop'))
+
+    assert index.match_ids('glow') == [1]
+    assert index.match_ids('barb') == [2]
+    assert index.match_ids('barbrshop') == [2]
+    assert index.match_ids('studoi') == [1]
+    assert index.match_ids('stdoiu') == []
+
+def test_every_query_token_must_match():
+    index = build(doc(1, 'Glow Studio', tags=['Nails']), doc(2, 'Glow Lounge', tags=['Hair']))
+    assert index.match_ids('glow nails') == [1]
+
+def test_ranking_weighs_field_rating_and_verification():
+    index = build(
+        doc(1, 'Downtown Cuts', description='great color work'),
+        doc(2, 'Color Bar', rating=3.0),
+        doc(3, 'Color House', rating=4.8),
+        doc(4, 'Color Room', rating=4.8, verified=False),
+    )
+    assert index.match_ids('color') == [3, 2, 4, 1]
+
+def test_field_restricted_search():
+    index = build(doc(1, 'Ana Beauty'), doc(2, 'Luxe', employees=['Ana Lopez']))
+    assert index.match_ids('ana', fields=('employee',)) == [2]
+    assert index.match_ids('ana', fields=('name',)) == [1]
+
+def test_upsert_replaces_and_remove_forgets_terms():
+    index = build(doc(1, 'Glow Studio'))
+    index.upsert(doc(1, 'Radiance Studio'))
+
+    assert index.match_ids('glow') == []
+    assert index.match_ids('radiance') == [1]
+
+    index.remove(1)
+    assert index.match_ids('studio') == []
+    assert 'studio' not in index.postings
+
+def test_sync_reloads_only_changed_salons():
+    salons = SalonSearch(sync_interval=0)
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.fetchone.return_value = (10,)
+
+    with patch.object(search, 'load_documents', return_value={1: doc(1, 'Glow'), 2: doc(2, 'Fade')}):
+        salons.get(conn)
+    assert salons.last_change_id == 10
+
+    cursor.fetchall.return_value = [(11, 1, 90), (12, 2, 90)]
+    with patch.object(search, 'load_documents', return_value={1: doc(1, 'Shine')}) as load:
+        index = salons.get(conn)
+
+    load.assert_called_once_with(conn, [1, 2])
+    assert index.match_ids('shine') == [1]
+    assert index.match_ids('fade') == []
+    assert salons.last_change_id == 12
+
+def test_advance_offset_does_not_skip_a_recent_gap():
+    # 12 is not visible yet: its transaction may still commit
+    assert search.advance_offset(10, [(11, 4, 1), (13, 5, 1)]) == 11
+    # an old gap was a rollback and no longer holds the offset back
+    assert search.advance_offset(10, [(11, 4, 300), (13, 5, 300)]) == 13
+
+def test_sync_applies_changes_past_a_gap_but_reads_them_again():
+    salons = SalonSearch(sync_interval=0)
+    salons.index, salons.last_change_id = SearchIndex(), 10
+    salons.loaded_at = search.time.monotonic()
+    conn = MagicMock()
+    conn.cursor.return_value.fetchall.return_value = [(11, 1, 2), (13, 2, 2)]
+
+    with patch.object(search, 'load_documents', return_value={1: doc(1, 'Glow'), 2: doc(2, 'Fade')}):
+        index = salons.get(conn)
+
+    assert index.match_ids('fade') == [2]
+    assert salons.last_change_id == 11
+
+def test_refresh_rebuilds_an_idle_index_in_the_background():
+    salons = SalonSearch(sync_interval=0, max_idle=0)
+    salons.index = SearchIndex()
+    conn = MagicMock()
+    conn.cursor.return_value.fetchone.return_value = (40,)
+
+    with patch.object(search, 'load_documents', return_value={}):
+        assert salons.refresh(conn) is True
+
+    assert salons.last_change_id == 40
+    conn.cursor.return_value.fetchall.assert_not_called()
+
+def test_searches_keep_the_old_index_while_a_rebuild_builds():
+    salons = SalonSearch(sync_interval=60)
+    old = salons.index = build(doc(1, 'Glow'))
+    salons.synced_at = salons.loaded_at = search.time.monotonic()
+    conn = MagicMock()
+    conn.cursor.return_value.fetchone.return_value = (40,)
+    served = []
+
+    def load(conn, salon_ids=None):
+        # a search arriving mid-rebuild is answered at once, from the old index
+        served.append(salons.get(conn))
+        return {2: doc(2, 'Fade')}
+
+    with patch.object(search, 'load_documents', side_effect=load):
+        new = salons.rebuild(conn)
+
+    assert served == [old]
+    assert salons.get(conn) is new and new.match_ids('fade') == [2]
+
+def test_refresh_syncs_a_fresh_index():
+    salons = SalonSearch(sync_interval=60)
+    salons.index, salons.last_change_id = SearchIndex(), 10
+    salons.loaded_at = search.time.monotonic()
+    conn = MagicMock()
+    conn.cursor.return_value.fetchall.return_value = []
+
+    assert salons.refresh(conn) is False
+    assert conn.cursor.return_value.execute.call_args.args[1] == (10,)
+
+def test_purge_keeps_changes_a_projection_has_not_read():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.rowcount = 3
+
+    assert search.purge_changes(conn, hours=24, batch_size=10) == 3
+    sql, params = cursor.execute.call_args.args
+    assert 'min(last_change_id), 0) from projection_offsets' in sql
+    assert params == (24, 10)
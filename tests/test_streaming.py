@@ -0,0 +1,54 @@
+import json
+from unittest.mock import MagicMock
+from flask import Flask
+from utils.streaming import iter_rows, stream_json
+from payment import group_invoices
+
+def fake_cursor(rows):
+    cursor = MagicMock()
+    cursor.description = [('id',), ('name',)]
+    batches = [rows[i:i + 2] for i in range(0, len(rows), 2)] + [()]
+    cursor.fetchmany.side_effect = batches
+    return cursor
+
+def make_app(rows):
+    app = Flask(__name__)
+    app.config['STREAM_FETCH_SIZE'] = 2
+    cursor = fake_cursor(rows)
+
+    @app.route('/rows')
+    def rows_view():
+        return stream_json(iter_rows(cursor), key='rows', head={'salon_id': 7}, count_key='count', cursor=cursor)
+    return app, cursor
+
+def test_streams_usual_json_shape_in_batches():
+    app, cursor = make_app([(1, 'a'), (2, 'b'), (3, 'c')])
+    response = app.test_client().get('/rows')
+
+    assert json.loads(response.data) == {
+        'salon_id': 7, 'rows': [{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}, {'id': 3, 'name': 'c'}], 'count': 3
+    }
+    assert cursor.fetchmany.call_count == 3
+    cursor.close.assert_called_once()
+
+def test_ndjson_on_request():
+    app, _ = make_app([(1, 'a'), (2, 'b')])
+    response = app.test_client().get('/rows', headers={'Accept': 'application/x-ndjson'})
+
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.data.splitlines()] == [{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}]
+
+def test_empty_result_is_valid_json():
+    app, _ = make_app([])
+    assert json.loads(app.test_client().get('/rows').data) == {'salon_id': 7, 'rows': [], 'count': 0}
+
+def test_invoice_rows_fold_into_invoices():
+    def row(invoice_id, line_item_id):
+        return {'invoice_id': invoice_id, 'appointment_id': None, 'issued_date': '2025-03-14 10:00:00',
+                'subtotal_amount': 10.0, 'tax_amount': 0.89, 'total_amount': 10.89, 'status': 'paid',
+                'line_item_id': line_item_id, 'item_type': 'service', 'quantity': 1, 'unit_price': 10.0,
+                'line_total': 10.0, 'product_id': None, 'name': None, 'salon_id': None, 'salon_name': None}
+
+    invoices = list(group_invoices(iter([row(9, 1), row(9, 2), row(4, 3)])))
+    assert [(i['invoice_id'], len(i['items'])) for i in invoices] == [(9, 2), (4, 1)]
+    assert invoices[0]['issued_date'] == '2025-03-14'
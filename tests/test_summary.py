@@ -0,0 +1,81 @@
+from unittest.mock import MagicMock, patch
+from app import app
+from utils import summary
+
+def mock_conn(fetchone, fetchall=()):
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = list(fetchone)
+    cursor.fetchall.side_effect = list(fetchall)
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+def executed(cursor):
+    return [c.args[0] for c in cursor.execute.call_args_list]
+
+def test_refresh_groups_each_aggregate_before_joining():
+    conn, cursor = mock_conn([])
+    summary.refresh(conn, [3, 5])
+
+    upsert, params = cursor.execute.call_args_list[0].args
+    assert 'on duplicate key update' in upsert
+    assert 'rating_aggregates' in upsert and 'from reviews' not in upsert
+    assert upsert.count('group by') == 2
+    assert params == [3, 5] * 3
+    delete, params = cursor.execute.call_args_list[1].args
+    assert 'not in (select salon_id from salons)' in delete
+    assert params == [3, 5]
+
+def test_sync_refreshes_changed_salons_and_stores_offset():
+    conn, cursor = mock_conn([(1,), (10,), (1,)], [[(11, 4, 90), (12, 7, 90), (13, 4, 90)]])
+
+    assert summary.sync(conn, batch_size=10) == 2
+    sql = executed(cursor)
+    assert 'insert into salon_summary' in sql[3]
+    assert cursor.execute.call_args_list[3].args[1] == [4, 7] * 3
+    assert cursor.execute.call_args_list[5].args[1] == ('salon_summary', 13)
+    conn.commit.assert_called_once()
+    assert 'release_lock' in sql[-1]
+
+def test_sync_skips_when_another_worker_holds_the_lock():
+    conn, cursor = mock_conn([(0,)])
+
+    assert summary.sync(conn) is None
+    assert len(executed(cursor)) == 1
+
+def test_card_decodes_tag_arrays():
+    row = (1, 2, 'Glow', 'd', 'e', 'p', 1, None, 'a', 'Newark', 'NJ', '07102',
+           '["Hair", "Nails"]', '[]', 4.5, 2, '/gallery/1.jpg')
+    data = summary.card(row)
+    assert data['master_tags'] == ['Hair', 'Nails']
+    assert data['specific_tags'] == []
+    assert data['review_count'] == 2
+    assert data['is_verified'] is True
+
+def test_favorited_salons_read_only_the_summary(client):
+    row = {column: None for column in summary.CARD_COLUMNS}
+    row.update(salon_id=1, name='Glow', is_verified=1, master_tags='["Hair"]', specific_tags='["Fade"]',
+               average_rating=4.5, rating_count=2)
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [row]
+    with client.session_transaction() as sess:
+        sess['user_id'] = 9
+
+    with app.app_context(), patch('user_dashboard.current_app') as mock_app:
+        mock_app.config = {'MYSQL': MagicMock()}
+        mock_app.config['MYSQL'].connection.cursor.return_value = cursor
+        response = client.get('/session/favorited_salons')
+
+    assert response.status_code == 200
+    salon = response.get_json()['favorited_salons'][0]
+    assert salon['master_tags'] == ['Hair'] and salon['specific_tags'] == ['Fade']
+    assert salon['review_count'] == 2
+    sql = cursor.execute.call_args.args[0]
+    assert 'salon_summary' in sql and 'reviews' not in sql
+
+def test_scheduled_rebuild_does_not_wait_for_the_lock():
+    import app as app_module
+    with patch.object(app_module.summary, 'rebuild') as rebuild, \
+         patch.dict(app.config, {'MYSQL': MagicMock()}):
+        app_module.rebuild_salon_summaries()
+    assert rebuild.call_args.kwargs == {'wait': 0}
@@ -0,0 +1,78 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from app import app
+from utils import threads
+
+def reply(reply_id, parent=None, depth=0, review_id=1):
+    return (reply_id, review_id, parent, 20, "John", "Doe", f"m{reply_id}", "2025-03-14 10:00:00", depth)
+
+def mock_conn(fetchall=(), fetchone=()):
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = list(fetchall)
+    cursor.fetchone.side_effect = list(fetchone)
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+def test_load_threads_builds_every_tree_from_one_query():
+    conn, cursor = mock_conn([[
+        reply(1), reply(2, 1, 1), reply(4, 2, 2), reply(3, 1, 1), reply(5, review_id=2)
+    ]])
+
+    forest = threads.load_threads(conn, [1, 2])
+
+    cursor.execute.assert_called_once()
+    sql, params = cursor.execute.call_args.args
+    assert 'order by rr.review_id, rr.path' in sql
+    assert params == [1, 2]
+    root = forest[1][0]
+    assert [r['reply_id'] for r in root['replies']] == [2, 3]
+    assert root['replies'][0]['replies'][0]['reply_id'] == 4
+    assert forest[2][0]['reply_id'] == 5
+
+def test_depth_limit_cuts_the_tree_and_flags_hidden_replies():
+    conn, cursor = mock_conn([[reply(1), reply(2, 1, 1), reply(3, 2, 2)]])
+
+    root = threads.load_threads(conn, [1], max_depth=1)[1][0]
+
+    # one level past the limit is read to know what has replies
+    assert cursor.execute.call_args.args[1] == [1, 2]
+    child = root['replies'][0]
+    assert child['replies'] == [] and child['has_replies'] is True
+
+def test_children_arriving_before_their_parent_are_still_linked():
+    rows = [dict(zip(threads.REPLY_COLUMNS, row)) for row in (reply(2, 1, 1), reply(1))]
+    forest = threads.build_forest(rows)
+    assert forest[1][0]['replies'][0]['reply_id'] == 2
+
+def test_add_reply_extends_the_parent_path():
+    conn, cursor = mock_conn(fetchone=[('0000000007/', 0)])
+    cursor.lastrowid = 12
+
+    assert threads.add_reply(conn, 1, 20, "hi", "2025-03-14", parent_reply_id=7) == (12, 1)
+    assert cursor.execute.call_args.args[1] == ('0000000007/0000000012/', 12)
+
+def test_add_reply_rejects_threads_past_the_depth_limit():
+    conn, cursor = mock_conn(fetchone=[('x/', threads.MAX_REPLY_DEPTH)])
+    with pytest.raises(threads.InvalidReply):
+        threads.add_reply(conn, 1, 20, "hi", "2025-03-14", parent_reply_id=7)
+
+def test_child_replies_page_loads_subtrees_with_one_query(client):
+    page = [(9, 1, None, 10, "Sam", "Owner", "Thanks", "2025-03-14 10:00:00", 0, '0000000009/')]
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = [(1, 10), (3,)]
+    cursor.fetchall.side_effect = [page, [reply(11, 9, 1), reply(12, 11, 2)]]
+
+    with app.app_context(), patch('reviews.current_app') as mock_app:
+        mock_app.config = {'MYSQL': MagicMock()}
+        mock_app.config['MYSQL'].connection.cursor.return_value = cursor
+        response = client.get('/salon/1/reviews/1/replies?depth=1')
+
+    assert response.status_code == 200
+    top = response.get_json()['replies'][0]
+    assert top['user'] == 'Owner' and top['has_replies'] is True
+    assert top['replies'][0]['reply_id'] == 11
+    assert top['replies'][0]['has_replies'] is True and top['replies'][0]['replies'] == []
+    sql, params = cursor.execute.call_args.args
+    assert 'rr.path like %s' in sql
+    assert params == [1, '0000000009/_%', 2]
@@ -0,0 +1,53 @@
+from utils.throttle import LocalBuckets, Throttle
+
+def test_bucket_allows_burst_then_refills():
+    buckets = LocalBuckets()
+    assert [buckets.take('k', 3, 60, now=0) for _ in range(3)] == [0, 0, 0]
+    assert buckets.take('k', 3, 60, now=0) == 20  # one token per 20s
+    assert buckets.take('k', 3, 60, now=10) == 10
+    assert buckets.take('k', 3, 60, now=20) == 0
+    assert buckets.take('other', 3, 60, now=20) == 0
+
+def test_prune_drops_refilled_buckets():
+    buckets = LocalBuckets(max_keys=2)
+    buckets.take('a', 1, 10, now=0)
+    buckets.take('b', 1, 10, now=0)
+    buckets.take('c', 1, 10, now=30)
+    assert set(buckets.buckets) == {'c'}
+
+def test_prune_refills_each_bucket_at_its_own_rate():
+    buckets = LocalBuckets(max_keys=2)
+    buckets.take('forgot_email:a', 3, 3600, now=0)
+    buckets.take('login_ip:b', 20, 60, now=0)
+    # the trigger has a fast limit; the hourly bucket must not look refilled
+    buckets.take('login_ip:c', 20, 60, now=60)
+    assert set(buckets.buckets) == {'forgot_email:a', 'login_ip:c'}
+
+def test_throttle_checks_every_rule_and_counts():
+    throttle = Throttle(limits={'login_ip': (10, 60), 'login_user': (2, 60)})
+    assert throttle.check(('login_ip', '1.2.3.4'), ('login_user', 'Ana')) == 0
+    assert throttle.check(('login_ip', '1.2.3.4'), ('login_user', 'ana')) == 0
+    assert throttle.check(('login_ip', '1.2.3.4'), ('login_user', 'ANA')) > 0
+    # a different account from the same ip still gets through
+    assert throttle.check(('login_ip', '1.2.3.4'), ('login_user', 'bo')) == 0
+    # missing identities are skipped
+    assert throttle.check(('login_ip', None), ('login_user', '')) == 0
+
+    stats = throttle.stats()
+    assert stats['limits']['login_user']['rejected'] == 1
+    assert stats['limits']['login_user']['throttled_now'] == 1
+    assert stats['limits']['login_ip']['allowed'] == 4
+    assert stats['shared_store'] is False
+
+def test_disabled_throttle_and_store_errors_let_requests_through():
+    throttle = Throttle(limits={'login_user': (1, 60)})
+    throttle.enabled = False
+    assert throttle.check(('login_user', 'x'), ('login_user', 'x')) == 0
+
+    class Broken:
+        def take(self, *args):
+            raise ConnectionError("redis down")
+
+    throttle = Throttle(store=Broken())
+    assert throttle.check(('login_user', 'x')) == 0
+    assert throttle.counts['login_user']['errors'] == 1
@@ -1,29 +1,30 @@
 from flask import Blueprint, request, jsonify, current_app, session
-from datetime import datetime, timedelta, time as dt_time, date
 from MySQLdb.cursors import DictCursor
 from utils.logerror import log_error
+from utils import ratings
+from utils.search import salon_search
+from utils.schema import register_index
+from utils.summary import card, summary_select
+
+SEARCH_RESULT_FIELDS = (
+    'salon_id', 'name', 'description', 'email', 'phone_number', 'is_verified', 'created_at',
+    'address', 'city', 'state', 'postal_code', 'master_tags', 'specific_tags',
+    'average_rating', 'review_count'
+)
+
+register_index('saved_salons', 'idx_saved_salons_customer', 'customer_id, salon_id')
+
+#saved salons joined to their precomputed cards (utils/summary.py)
+FAVORITED_SALONS = f"""
+    select {summary_select()}
+    from saved_salons sv
+    join salon_summary ss on ss.salon_id = sv.salon_id
+    where sv.customer_id = %s
+    order by ss.is_verified desc, ss.average_rating desc, ss.name asc
+"""
 
 user_dashboard_bp = Blueprint('user_dashboard_bp', __name__)
 
-def convert_mysql_objects(obj):
-    if isinstance(obj, timedelta):
-        total_seconds = int(obj.total_seconds())
-        hours = total_seconds // 3600
-        minutes = (total_seconds % 3600) // 60
-        seconds = total_seconds % 60
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-
-    elif isinstance(obj, (datetime, date, dt_time)):
-        return obj.isoformat()
-
-    elif isinstance(obj, list):
-        return [convert_mysql_objects(x) for x in obj]
-
-    elif isinstance(obj, dict):
-        return {k: convert_mysql_objects(v) for k, v in obj.items()}
-
-    return obj
-
 # to populate user dash
 
 @user_dashboard_bp.route('/user_dashboard', methods=['GET'])
@@ -106,7 +107,7 @@ def customer_dashboard():
             'verified_salons': verified_salons
         }
 
-        return jsonify(convert_mysql_objects(response_data)), 200
+        return jsonify(response_data), 200
 
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -131,82 +132,54 @@ def search_salons():
     verified_only = request.args.get('verified_only', 'false').lower() == 'true'
     
     mysql = current_app.config['MYSQL']
-    cursor = mysql.connection.cursor(DictCursor)
+
+    #served from the in-process index instead of a LIKE scan over a six-way join
+    def wanted(salon):
+        return (
+            (not city or city.casefold() in (salon['city'] or '').casefold()) and
+            (not state or salon['state'] == state) and
+            (not master_tag or master_tag in salon['master_tags']) and
+            (not tag_name or tag_name in salon['specific_tags']) and
+            (not verified_only or salon['is_verified'])
+        )
 
     try:
-        query = """
-            SELECT DISTINCT s.salon_id, s.name, s.description, s.email, s.phone_number, 
-                   s.is_verified, s.created_at,
-                   a.address, a.city, a.state, a.postal_code,
-                   GROUP_CONCAT(DISTINCT mt.name) as master_tags,
-                   GROUP_CONCAT(DISTINCT t.name) as specific_tags,
-                   AVG(r.rating) as average_rating,
-                   COUNT(r.review_id) as review_count
-            FROM salons s
-            LEFT JOIN addresses a ON s.salon_id = a.salon_id AND a.entity_type = 'salon'
-            LEFT JOIN entity_master_tags emt ON s.salon_id = emt.entity_id AND emt.entity_type = 'salon'
-            LEFT JOIN master_tags mt ON emt.master_tag_id = mt.master_tag_id
-            LEFT JOIN entity_tags et ON s.salon_id = et.entity_id AND et.entity_type = 'service'
-            LEFT JOIN tags t ON et.tag_id = t.tag_id
-            LEFT JOIN reviews r ON s.salon_id = r.salon_id
-            WHERE 1=1
-        """
-        
-        params = []
-        
-        if search_query:
-            query += " AND (s.name LIKE %s OR s.description LIKE %s)"
-            params.extend([f'%{search_query}%', f'%{search_query}%'])
-        
-        if city:
-            query += " AND a.city LIKE %s"
-            params.append(f'%{city}%')
-            
-        if state:
-            query += " AND a.state = %s"
-            params.append(state)
-            
-        if master_tag:
-            query += " AND mt.name = %s"
-            params.append(master_tag)
-            
-        if tag_name:
-            query += " AND t.name = %s"
-            params.append(tag_name)
-            
-        if verified_only:
-            query += " AND s.is_verified = TRUE"
-        
-        query += """
-            GROUP BY s.salon_id, s.name, s.description, s.email, s.phone_number, 
-                     s.is_verified, s.created_at, a.address, a.city, a.state, a.postal_code
-            ORDER BY s.is_verified DESC, average_rating DESC, s.name ASC
-        """
-        
-        cursor.execute(query, params)
-        salons = [dict(row) for row in cursor.fetchall()]
-        
-        for salon in salons:
-            if salon['master_tags']:
-                salon['master_tags'] = list(set(salon['master_tags'].split(',')))
-            else:
-                salon['master_tags'] = []
-                
-            if salon['specific_tags']:
-                salon['specific_tags'] = list(set(salon['specific_tags'].split(',')))
-            else:
-                salon['specific_tags'] = []
-        
-        return jsonify(convert_mysql_objects({
+        index = salon_search.get(mysql.connection)
+        salons = [
+            {field: salon[field] for field in SEARCH_RESULT_FIELDS}
+            for salon in index.search(search_query, where=wanted)
+        ]
+
+        return jsonify({
             'salons': salons,
             'count': len(salons)
-        })), 200
+        }), 200
 
     except Exception as e:
         log_error(str(e), session.get("user_id"))
         return jsonify({'error': str(e)}), 500
-    finally:
-        cursor.close()
+
+
+# autocomplete for the salon search box: prefix and typo tolerant
+
+@user_dashboard_bp.route('/search_salons/autocomplete', methods=['GET'])
+def autocomplete_salons():
+    search_query = request.args.get('q', '')
+    limit = min(request.args.get('limit', default=8, type=int), 20)
+    if not search_query.strip():
+        return jsonify({'suggestions': []}), 200
+
+    mysql = current_app.config['MYSQL']
+    try:
+        index = salon_search.get(mysql.connection)
+        suggestions = [
+            {'salon_id': salon['salon_id'], 'name': salon['name'], 'city': salon['city'], 'state': salon['state']}
+            for salon in index.search(search_query, limit=limit)
+        ]
+        return jsonify({'suggestions': suggestions}), 200
+    except Exception as e:
+        log_error(str(e), session.get("user_id"))
+        return jsonify({'error': str(e)}), 500
 
 
 # Get all available master tags for filtering
@@ -228,9 +201,9 @@ def get_available_master_tags():
         
         master_tags = [dict(row) for row in cursor.fetchall()]
         
-        return jsonify(convert_mysql_objects({
+        return jsonify({
             'master_tags': master_tags
-        })), 200
+        }), 200
 
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -313,20 +286,18 @@ def get_salon_details(salon_id):
         """, (salon_id,))
         salon['operating_hours'] = [dict(row) for row in cursor.fetchall()]
         
-        # Get reviews summary
-        cursor.execute("""
-            SELECT 
-                AVG(rating) as average_rating,
-                COUNT(*) as total_reviews,
-                COUNT(CASE WHEN rating = 5 THEN 1 END) as five_star,
-                COUNT(CASE WHEN rating = 4 THEN 1 END) as four_star,
-                COUNT(CASE WHEN rating = 3 THEN 1 END) as three_star,
-                COUNT(CASE WHEN rating = 2 THEN 1 END) as two_star,
-                COUNT(CASE WHEN rating = 1 THEN 1 END) as one_star
-            FROM reviews
-            WHERE salon_id = %s
-        """, (salon_id,))
-        salon['reviews_summary'] = dict(cursor.fetchone())
+        # Get reviews summary (maintained by utils.ratings)
+        aggregate = ratings.get_aggregate(mysql.connection, 'salon', salon_id)
+        histogram = aggregate['histogram']
+        salon['reviews_summary'] = {
+            'average_rating': aggregate['average_rating'],
+            'total_reviews': aggregate['rating_count'],
+            'five_star': histogram['5'],
+            'four_star': histogram['4'],
+            'three_star': histogram['3'],
+            'two_star': histogram['2'],
+            'one_star': histogram['1']
+        }
         
         # Get recent reviews
         cursor.execute("""
@@ -340,7 +311,7 @@ def get_salon_details(salon_id):
         """, (salon_id,))
         salon['recent_reviews'] = [dict(row) for row in cursor.fetchall()]
         
-        return jsonify(convert_mysql_objects(salon)), 200
+        return jsonify(salon), 200
 
     except Exception as e:
         log_error(str(e), session.get("user_id"))
@@ -428,45 +399,13 @@ def get_favorited_salons():
     cursor = mysql.connection.cursor(DictCursor)
 
     try:
-        cursor.execute("""
-            select s.salon_id, s.name, s.description, s.email, s.phone_number, 
-                   s.is_verified, s.created_at,
-                   a.address, a.city, a.state, a.postal_code,
-                   group_concat(distinct mt.name) as master_tags,
-                   group_concat(distinct t.name) as specific_tags,
-                   avg(r.rating) as average_rating,
-                   count(r.review_id) as review_count
-            from saved_salons ss
-            join salons s on ss.salon_id = s.salon_id
-            left join addresses a on s.salon_id = a.salon_id and a.entity_type = 'salon'
-            left join entity_master_tags emt on s.salon_id = emt.entity_id and emt.entity_type = 'salon'
-            left join master_tags mt on emt.master_tag_id = mt.master_tag_id
-            left join entity_tags et on s.salon_id = et.entity_id and et.entity_type = 'service'
-            left join tags t on et.tag_id = t.tag_id
-            left join reviews r on s.salon_id = r.salon_id
-            where ss.customer_id = %s
-            group by s.salon_id, s.name, s.description, s.email, s.phone_number, 
-                     s.is_verified, s.created_at, a.address, a.city, a.state, a.postal_code
-            order by s.is_verified desc, average_rating desc, s.name asc
-        """, (customer_id,))
+        cursor.execute(FAVORITED_SALONS, (customer_id,))
+        salons = [card(row) for row in cursor.fetchall()]
         
-        salons = [dict(row) for row in cursor.fetchall()]
-        
-        for salon in salons:
-            if salon['master_tags']:
-                salon['master_tags'] = list(set(salon['master_tags'].split(',')))
-            else:
-                salon['master_tags'] = []
-                
-            if salon['specific_tags']:
-                salon['specific_tags'] = list(set(salon['specific_tags'].split(',')))
-            else:
-                salon['specific_tags'] = []
-        
-        return jsonify(convert_mysql_objects({
+        return jsonify({
             'favorited_salons': salons,
             'count': len(salons)
-        })), 200
+        }), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
         return jsonify({'error': str(e)}), 500
@@ -553,45 +492,13 @@ def session_get_favorited_salons():
     cursor = mysql.connection.cursor(DictCursor)
 
     try:
-        cursor.execute("""
-            select s.salon_id, s.name, s.description, s.email, s.phone_number, 
-                   s.is_verified, s.created_at,
-                   a.address, a.city, a.state, a.postal_code,
-                   group_concat(distinct mt.name) as master_tags,
-                   group_concat(distinct t.name) as specific_tags,
-                   avg(r.rating) as average_rating,
-                   count(r.review_id) as review_count
-            from saved_salons ss
-            join salons s on ss.salon_id = s.salon_id
-            left join addresses a on s.salon_id = a.salon_id and a.entity_type = 'salon'
-            left join entity_master_tags emt on s.salon_id = emt.entity_id and emt.entity_type = 'salon'
-            left join master_tags mt on emt.master_tag_id = mt.master_tag_id
-            left join entity_tags et on s.salon_id = et.entity_id and et.entity_type = 'service'
-            left join tags t on et.tag_id = t.tag_id
-            left join reviews r on s.salon_id = r.salon_id
-            where ss.customer_id = %s
-            group by s.salon_id, s.name, s.description, s.email, s.phone_number, 
-                     s.is_verified, s.created_at, a.address, a.city, a.state, a.postal_code
-            order by s.is_verified desc, average_rating desc, s.name asc
-        """, (customer_id,))
-        
-        salons = [dict(row) for row in cursor.fetchall()]
-        
-        for salon in salons:
-            if salon['master_tags']:
-                salon['master_tags'] = list(set(salon['master_tags'].split(',')))
-            else:
-                salon['master_tags'] = []
-                
-            if salon['specific_tags']:
-                salon['specific_tags'] = list(set(salon['specific_tags'].split(',')))
-            else:
-                salon['specific_tags'] = []
+        cursor.execute(FAVORITED_SALONS, (customer_id,))
+        salons = [card(row) for row in cursor.fetchall()]
         
-        return jsonify(convert_mysql_objects({
+        return jsonify({
             'favorited_salons': salons,
             'count': len(salons)
-        })), 200
+        }), 200
     except Exception as e:
         log_error(str(e), session.get("user_id"))
         return jsonify({'error': str(e)}), 500
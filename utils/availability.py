@@ -0,0 +1,155 @@
+from datetime import timedelta
+from functools import lru_cache
+
+# Availability is computed on minute bitmaps: bit N of an int is minute N of
+# the day. Shifts, breaks and appointments are OR-ed into one mask each, so
+# every slot check is a single AND instead of a scan over every interval.
+
+MINUTES_PER_DAY = 24 * 60
+WEEK_DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+def to_minutes(value):
+    """Minute of day for a MySQL TIME (timedelta), datetime.time, 'HH:MM[:SS]' string or minutes."""
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, timedelta):
+        return int(value.total_seconds()) // 60
+    if isinstance(value, str):
+        parts = value.split(':')
+        return int(parts[0]) * 60 + int(parts[1])
+    return value.hour * 60 + value.minute
+
+def format_minutes(minute):
+    if 0 <= minute < MINUTES_PER_DAY:
+        return _LABELS[minute]
+    return f"{minute // 60:02d}:{minute % 60:02d}:00"
+
+_LABELS = tuple(f"{m // 60:02d}:{m % 60:02d}:00" for m in range(MINUTES_PER_DAY))
+
+@lru_cache(maxsize=4096)
+def span(start, end):
+    """Bitmap with minutes [start, end) set."""
+    start = max(start, 0)
+    end = min(end, MINUTES_PER_DAY)
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+class DayMask:
+    """Working, blocked (breaks) and booked minutes for one employee-day."""
+
+    __slots__ = ('working', 'blocked', 'booked', 'shift', 'shift_id')
+
+    def __init__(self, working=0, blocked=0, booked=0, shift=None, shift_id=None):
+        self.working = working
+        self.blocked = blocked
+        self.booked = booked
+        self.shift = shift
+        self.shift_id = shift_id
+
+    @classmethod
+    def from_rows(cls, slot_rows, appointment_rows=()):
+        """
+        slot_rows are time_slots rows for the day (is_available = true is a
+        shift, false is a break); appointment_rows need start_time/end_time.
+        """
+        day = cls()
+        for row in slot_rows:
+            start = to_minutes(row['start_time'])
+            end = to_minutes(row['end_time'])
+            if row['is_available']:
+                day.working |= span(start, end)
+                day.shift = (start, end)
+                day.shift_id = row.get('slot_id')
+            else:
+                day.blocked |= span(start, end)
+        for row in appointment_rows:
+            day.booked |= span(to_minutes(row['start_time']), to_minutes(row['end_time']))
+        return day
+
+    def timeline(self, open_minute, close_minute, increment):
+        working, unavailable, booked = self.working, self.blocked, self.booked
+        result = []
+        for minute in range(open_minute, close_minute + 1, increment):
+            window = span(minute, minute + increment)
+            if not (working >> minute) & 1:
+                status = 'not_working'
+            elif unavailable & window:
+                status = 'unavailable'
+            elif booked & window:
+                status = 'booked'
+            else:
+                status = 'available'
+            result.append({'time': format_minutes(minute), 'status': status})
+        return result
+
+    def booking_error(self, start, end, day_name):
+        """Reason the interval [start, end) can't be booked, or None if it's free."""
+        if not self.working:
+            return f'Employee is not scheduled to work on {day_name}'
+        if not (self.working >> start) & 1:
+            return 'Requested time is outside working hours'
+        window = span(start, end)
+        if end > MINUTES_PER_DAY or window & ~self.working:
+            return 'Service duration extends beyond working hours'
+        if window & self.blocked:
+            return 'Requested time overlaps with a break'
+        if window & self.booked:
+            return 'Time slot overlaps with another appointment'
+        return None
+
+def group_by_day(rows, key='day'):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row[key], []).append(row)
+    return grouped
+
+def group_by_date(rows):
+    """Rows keyed by 'YYYY-MM-DD' of their appointment_date."""
+    grouped = {}
+    for row in rows:
+        day = row['appointment_date']
+        if not isinstance(day, str):
+            day = day.isoformat()
+        grouped.setdefault(day[:10], []).append(row)
+    return grouped
+
+def build_day(day, operating_hours, slot_rows, appointment_rows, increment, closed_hours=True):
+    """
+    One entry of the weekly-availability response. operating_hours is the
+    operating_hours row for the day (or None), slot_rows/appointment_rows are
+    that day's time_slots and booked appointments.
+    """
+    entry = {
+        'day': day,
+        'salon_closed': False,
+        'operating_hours': None,
+        'employee_schedule': None,
+        'timeline': []
+    }
+
+    if not operating_hours or operating_hours['is_closed']:
+        entry['salon_closed'] = True
+        if operating_hours and closed_hours:
+            entry['operating_hours'] = {
+                'open_time': format_minutes(to_minutes(operating_hours['open_time'])),
+                'close_time': format_minutes(to_minutes(operating_hours['close_time']))
+            }
+        return entry
+
+    open_minute = to_minutes(operating_hours['open_time'])
+    close_minute = to_minutes(operating_hours['close_time'])
+    entry['operating_hours'] = {
+        'open_time': format_minutes(open_minute),
+        'close_time': format_minutes(close_minute)
+    }
+
+    mask = DayMask.from_rows(slot_rows, appointment_rows)
+    if mask.shift:
+        entry['employee_schedule'] = {
+            'start_time': format_minutes(mask.shift[0]),
+            'end_time': format_minutes(mask.shift[1])
+        }
+
+    entry['timeline'] = mask.timeline(open_minute, close_minute, increment)
+    return entry
@@ -0,0 +1,193 @@
+import hashlib
+import json
+from MySQLdb import IntegrityError
+from utils.availability import DayMask, span
+from utils.schema import register_table
+
+# Booking concurrency. The overlap check reads the employee's appointments
+# for the day and the insert comes after it, so two requests for the same
+# slot could both pass the check. claim_slot first takes an exclusive lock on
+# the (employee, date) row of employee_day_locks - one upsert, which also
+# works for a day nobody has booked yet - so bookings and reschedules for the
+# same employee-day run one at a time while every other employee-day is
+# unaffected. The lock is held until the caller commits or rolls back.
+# Under REPEATABLE READ the first plain SELECT of a transaction fixes its
+# snapshot, so a caller must not run one before claim_slots (use locking
+# reads): otherwise the day plan comes from before the lock was granted and
+# misses a booking committed while this request waited for it.
+# The check itself is a single query (service durations, the day's shifts
+# and breaks, the day's appointments) evaluated on the DayMask bitmaps.
+#
+# Idempotency keys (Idempotency-Key header) make client retries safe: the
+# key row is inserted in the booking's own transaction, so a concurrent retry
+# blocks on it and then replays the stored response instead of booking twice.
+
+register_table('employee_day_locks', """
+    create table if not exists employee_day_locks (
+        employee_id int not null,
+        day date not null,
+        version int not null default 0,
+        primary key (employee_id, day)
+    )
+""")
+
+register_table('idempotency_keys', """
+    create table if not exists idempotency_keys (
+        scope varchar(64) not null,
+        idem_key varchar(128) not null,
+        request_hash char(64) not null,
+        status_code smallint,
+        response text,
+        created_at datetime not null default current_timestamp,
+        primary key (scope, idem_key),
+        key idx_idempotency_created (created_at)
+    )
+""")
+
+def lock_employee_day(conn, employee_id, day):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            insert into employee_day_locks (employee_id, day, version)
+            values (%s, %s, 1)
+            on duplicate key update version = version + 1
+        """, (employee_id, day))
+    finally:
+        cursor.close()
+
+# everything a booking check needs for one employee-day, as one result set;
+# times come back as minutes of the day so every column stays an integer
+_DAY_PLAN = """
+    select 'service', service_id, duration_minutes, null, null
+    from services
+    where service_id in ({services})
+    union all
+    select 'slot', slot_id, time_to_sec(start_time) div 60, time_to_sec(end_time) div 60, is_available
+    from time_slots
+    where employee_id = %s and salon_id = %s and day = %s
+    union all
+    select 'appointment', appointment_id, time_to_sec(start_time) div 60, time_to_sec(end_time) div 60, null
+    from appointments
+    where employee_id = %s and salon_id = %s and appointment_date = %s
+      and status in ('booked', 'confirmed') and appointment_id != %s
+"""
+
+def load_day(conn, employee_id, salon_id, appointment_date, day_name, service_ids, exclude_appointment_id=None):
+    """({service_id: duration minutes}, time_slots rows, appointment rows) in one round trip."""
+    service_ids = list(dict.fromkeys(service_ids))
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            _DAY_PLAN.format(services=", ".join(["%s"] * len(service_ids))),
+            service_ids + [employee_id, salon_id, day_name,
+                           employee_id, salon_id, appointment_date, exclude_appointment_id or 0]
+        )
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    durations, slots, appointments = {}, [], []
+    for kind, row_id, start, end, available in rows:
+        if kind == 'service':
+            durations[row_id] = int(start)
+        elif kind == 'slot':
+            slots.append({'slot_id': row_id, 'start_time': int(start), 'end_time': int(end), 'is_available': available})
+        else:
+            appointments.append({'start_time': int(start), 'end_time': int(end)})
+    return durations, slots, appointments
+
+def fit_services(durations, slots, appointments, day_name, start_minute, service_ids):
+    """
+    Places the services back to back from start_minute. Returns (error, plan):
+    error is the reason it can't be booked or None, plan a list of
+    (service_id, start_minute, end_minute, slot_id).
+    """
+    day_mask = DayMask.from_rows(slots, appointments)
+    plan = []
+    start = start_minute
+    for service_id in service_ids:
+        if service_id not in durations:
+            return 'Invalid service ID', []
+        end = start + durations[service_id]
+        error = day_mask.booking_error(start, end, day_name)
+        if error:
+            return error, []
+        shift = next((slot for slot in slots if slot['is_available']
+                      and slot['start_time'] <= start and slot['end_time'] >= end), None)
+        if not shift:
+            return 'No matching time slot found', []
+        plan.append((service_id, start, end, shift['slot_id']))
+        day_mask.booked |= span(start, end)
+        start = end
+    return None, plan
+
+def claim_slots(conn, employee_id, salon_id, appointment_date, day_name, start_minute, service_ids,
+                exclude_appointment_id=None):
+    """
+    Locks the employee-day, then loads and checks everything in one query.
+    Returns fit_services' (error, plan); the caller writes the plan and
+    commits, which releases the lock. Call it before any non-locking read
+    in the transaction.
+    """
+    lock_employee_day(conn, employee_id, appointment_date)
+    durations, slots, appointments = load_day(
+        conn, employee_id, salon_id, appointment_date, day_name, service_ids, exclude_appointment_id
+    )
+    return fit_services(durations, slots, appointments, day_name, start_minute, service_ids)
+
+def request_hash(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def claim_key(conn, scope, key, payload):
+    """
+    Registers the key in the current transaction. Returns None for a new key,
+    otherwise the (body, status) to answer with: the stored response of the
+    original request, or an error if the key was used for a different request.
+    """
+    digest = request_hash(payload)
+    cursor = conn.cursor()
+    try:
+        try:
+            cursor.execute("""
+                insert into idempotency_keys (scope, idem_key, request_hash)
+                values (%s, %s, %s)
+            """, (scope, key, digest))
+            return None
+        except IntegrityError:
+            pass
+        cursor.execute("""
+            select request_hash, status_code, response
+            from idempotency_keys
+            where scope = %s and idem_key = %s
+        """, (scope, key))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if not row:
+        return {'error': 'Request with this idempotency key is in progress, retry shortly'}, 409
+    stored_hash, status_code, response = row
+    if stored_hash != digest:
+        return {'error': 'Idempotency key was already used for a different request'}, 422
+    if status_code is None:
+        return {'error': 'Request with this idempotency key is in progress, retry shortly'}, 409
+    return json.loads(response), status_code
+
+def remember_response(conn, scope, key, body, status_code):
+    """Stores the response with the key; call just before committing."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            update idempotency_keys
+            set status_code = %s, response = %s
+            where scope = %s and idem_key = %s
+        """, (status_code, json.dumps(body, default=str), scope, key))
+    finally:
+        cursor.close()
+
+def purge_keys(conn, hours=24):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("delete from idempotency_keys where created_at < now() - interval %s hour", (hours,))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
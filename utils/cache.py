@@ -0,0 +1,206 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request
+
+# Read-through response cache for near-static GET endpoints (salon header,
+# services, tags, operating hours, loyalty programs).
+#
+# Entries live in a per-process LRU with a TTL and, when CACHE_REDIS_URL is
+# set, in a shared Redis tier as well. Keys embed generation counters for the
+# namespace and the salon, so invalidate_salon(salon_id) drops every cached
+# response of that salon by bumping one number instead of hunting keys. With
+# the shared tier the counters live in Redis and invalidation reaches every
+# worker; without it other workers catch up within the TTL.
+
+class LocalTier:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+class RedisTier:
+    """Shared tier; needs the redis package, only loaded when configured."""
+
+    def __init__(self, url, prefix='salon-cache:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(int(ttl), 1))
+
+    def generation(self, scope):
+        return int(self.client.get(self.prefix + 'gen:' + scope) or 0)
+
+    def bump(self, scope):
+        self.client.incr(self.prefix + 'gen:' + scope)
+
+class ResponseCache:
+    def __init__(self, maxsize=1024, ttl=60, shared=None):
+        self.local = LocalTier(maxsize)
+        self.ttl = ttl
+        self.shared = shared
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'stores': 0, 'invalidations': 0, 'errors': 0}
+
+    def configure(self, maxsize=None, ttl=None, shared=None):
+        if maxsize:
+            self.local.maxsize = maxsize
+        if ttl:
+            self.ttl = ttl
+        self.shared = shared
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def generation(self, scope):
+        if self.shared is not None:
+            try:
+                return self.shared.generation(scope)
+            except Exception:
+                self.count('errors')
+        return self.generations.get(scope, 0)
+
+    def invalidate(self, scope):
+        with self.lock:
+            self.generations[scope] = self.generations.get(scope, 0) + 1
+            self.counters['invalidations'] += 1
+        if self.shared is not None:
+            try:
+                self.shared.bump(scope)
+            except Exception:
+                self.count('errors')
+
+    def key(self, namespace, scope, parts):
+        return "|".join([
+            namespace, scope,
+            f"{self.generation('ns:' + namespace)}.{self.generation(scope)}",
+            parts
+        ])
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            self.count('hits')
+            return value
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception:
+                self.count('errors')
+                value = None
+            if value is not None:
+                self.count('shared_hits')
+                self.local.set(key, value, self.ttl)
+                return value
+        self.count('misses')
+        return None
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl or self.ttl
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, ttl)
+            except Exception:
+                self.count('errors')
+        self.count('stores')
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+        lookups = counters['hits'] + counters['shared_hits'] + counters['misses']
+        counters.update(
+            hit_ratio=round((counters['hits'] + counters['shared_hits']) / lookups, 4) if lookups else None,
+            entries=len(self.local),
+            evictions=self.local.evictions,
+            shared_tier=self.shared is not None
+        )
+        return counters
+
+response_cache = ResponseCache()
+
+def init_cache(app):
+    shared = RedisTier(app.config['CACHE_REDIS_URL']) if app.config.get('CACHE_REDIS_URL') else None
+    response_cache.configure(
+        maxsize=app.config.get('CACHE_MAXSIZE'),
+        ttl=app.config.get('CACHE_TTL'),
+        shared=shared
+    )
+
+def _scope(kwargs):
+    return f"salon:{kwargs['salon_id']}" if 'salon_id' in kwargs else 'global'
+
+def cached(namespace, ttl=None):
+    """
+    Cache a GET view's 200 responses (the serialized body, so hits skip the
+    query and jsonify). The key covers the view arguments and query string;
+    views taking salon_id are invalidated by invalidate_salon.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if current_app.testing or not current_app.config.get('CACHE_ENABLED', True):
+                return view(**kwargs)
+
+            parts = ",".join(f"{k}={kwargs[k]}" for k in sorted(kwargs))
+            key = response_cache.key(namespace, _scope(kwargs), parts + "?" + request.query_string.decode())
+            hit = response_cache.get(key)
+            if hit is not None:
+                body, status, mimetype = hit
+                response = current_app.response_class(body, status=status, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = current_app.make_response(view(**kwargs))
+            if response.status_code == 200:
+                response_cache.set(key, (response.get_data(), response.status_code, response.mimetype), ttl)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+def invalidate_salon(salon_id):
+    """Drop every cached response of one salon; call after the write commits."""
+    response_cache.invalidate(f"salon:{salon_id}")
+
+def invalidate_namespace(namespace):
+    """Drop a whole namespace, for writes that don't know their salon_id."""
+    response_cache.invalidate('ns:' + namespace)
@@ -0,0 +1,139 @@
+from collections import OrderedDict
+from utils import inventory, rollups
+from utils.schema import register_index
+
+# Set-based checkout for /cart/processPayment. The old flow issued one
+# statement per line item, per stock update, and a SELECT then UPDATE/INSERT
+# per salon for points and history, all while holding the transaction's row
+# locks. Here the number of round trips depends on the number of salons in
+# the cart, not the number of items:
+#
+#   1                   reward costs for every applied reward (only if any)
+#   1 per salon         invoice (its id is needed for the line items)
+#   1                   all invoice line items (multi-row insert)
+#   2                   the carts' stock reservations, then all stock
+#                       decrements in one conditional UPDATE ... CASE
+#   1                   analytics rollups
+#   1                   customer points for every salon (upsert)
+#   1                   close the cart
+#   1                   user history (upsert)
+#
+# The upserts need unique keys on customer_points and user_history, created
+# by `flask --app app init-schema`.
+
+TAX_RATE = 0.07
+POINTS_PER_DOLLAR = 1.00
+
+register_index('customer_points', 'uq_customer_points_salon_customer', 'salon_id, customer_id', unique=True)
+register_index('user_history', 'uq_user_history_user', 'user_id', unique=True)
+
+def group_by_salon(cart_items):
+    """cart_items: dicts from the cart query -> {salon_id (str): {'items': [...], 'subtotal': float}}."""
+    salons = OrderedDict()
+    for item in cart_items:
+        salon = salons.setdefault(str(item['salon_id']), {'items': [], 'subtotal': 0})
+        salon['items'].append(item)
+        salon['subtotal'] += float(item['line_total'])
+    return salons
+
+def price_invoice(subtotal, reward=None):
+    """(discounted subtotal, tax, total, loyalty_program_id of the reward used)."""
+    discount = 0
+    reward_used = None
+    if reward:
+        if reward.get('is_percentage'):
+            discount = subtotal * (float(reward.get('discount_value', 0)) / 100)
+        else:
+            discount = float(reward.get('discount_value', 0))
+        reward_used = reward.get('loyalty_program_id')
+    final_subtotal = subtotal - discount
+    tax = final_subtotal * TAX_RATE
+    return final_subtotal, tax, final_subtotal + tax, reward_used
+
+def reward_costs(cursor, program_ids):
+    program_ids = sorted({p for p in program_ids if p})
+    if not program_ids:
+        return {}
+    placeholders = ", ".join(["%s"] * len(program_ids))
+    cursor.execute(f"""
+        select loyalty_program_id, points_required
+        from loyalty_programs
+        where loyalty_program_id in ({placeholders})
+    """, program_ids)
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+def place_order(conn, user_id, cart_items, applied_rewards=None, wallet_id=None):
+    """
+    Writes invoices, line items, stock, rollups, points and history for the
+    customer's active cart inside the caller's transaction (the caller
+    commits or rolls back). Returns the invoice ids, one per salon; raises
+    inventory.InsufficientStock when the shelf can't cover the order.
+    """
+    applied_rewards = applied_rewards or {}
+    salons = group_by_salon(cart_items)
+    cursor = conn.cursor()
+    try:
+        priced = OrderedDict(
+            (salon_id, price_invoice(salon['subtotal'], applied_rewards.get(salon_id)))
+            for salon_id, salon in salons.items()
+        )
+        costs = reward_costs(cursor, [reward_used for _, _, _, reward_used in priced.values()])
+
+        invoice_ids = []
+        line_items = []
+        for salon_id, (final_subtotal, tax, total, _) in priced.items():
+            cursor.execute("""
+                insert into invoices (customer_id, wallet_id, issued_date, status, subtotal_amount, tax_amount, total_amount)
+                values (%s, %s, curdate(), 'paid', %s, %s, %s)
+            """, (user_id, wallet_id, final_subtotal, tax, total))
+            invoice_id = cursor.lastrowid
+            invoice_ids.append(invoice_id)
+            line_items.extend(
+                (invoice_id, 'product', item['product_id'], item['product_name'], item['quantity'], item['unit_price'])
+                for item in salons[salon_id]['items']
+            )
+
+        # all-placeholder VALUES, or the driver falls back to one statement per row
+        cursor.executemany("""
+            insert into invoice_line_items (invoice_id, item_type, product_id, description, quantity, unit_price)
+            values (%s, %s, %s, %s, %s, %s)
+        """, line_items)
+
+        inventory.commit_stock(
+            cursor,
+            [item['cart_id'] for item in cart_items if item.get('cart_id')],
+            [item for salon in salons.values() for item in salon['items']]
+        )
+
+        rollups.record_product_sales(conn, [
+            (salon_id, item['product_id'], item['quantity'], item['line_total'])
+            for salon_id, salon in salons.items() for item in salon['items']
+        ])
+
+        points = []
+        for salon_id, (final_subtotal, _, _, reward_used) in priced.items():
+            earned = int(final_subtotal)
+            redeemed = (costs.get(reward_used) or 0) if reward_used else 0
+            points.append((salon_id, user_id, POINTS_PER_DOLLAR, earned, redeemed, earned - redeemed))
+        cursor.executemany("""
+            insert into customer_points (salon_id, customer_id, points_per_dollar, points_earned, points_redeemed, available_points)
+            values (%s, %s, %s, %s, %s, %s)
+            on duplicate key update
+                points_earned = points_earned + values(points_earned),
+                points_redeemed = points_redeemed + values(points_redeemed),
+                available_points = available_points + values(available_points)
+        """, points)
+
+        cursor.execute("update carts set status = 'completed' where customer_id = %s and status = 'active'", (user_id,))
+
+        total_spent = sum(salon['subtotal'] for salon in salons.values())
+        cursor.execute("""
+            insert into user_history (user_id, total_spent, last_visit_date)
+            values (%s, %s, curdate())
+            on duplicate key update
+                total_spent = total_spent + values(total_spent),
+                last_visit_date = values(last_visit_date)
+        """, (user_id, total_spent))
+        return invoice_ids
+    finally:
+        cursor.close()
@@ -0,0 +1,77 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, request
+
+# Conditional GET. A view wrapped in conditional(query) first runs a cheap
+# validator query (row counts, max(last_modified), id checksums) instead of
+# the full read. When the client's If-None-Match / If-Modified-Since still
+# matches it gets a 304 without the view running; otherwise the view runs
+# and its 200 response carries ETag and Last-Modified.
+#
+# The ETag is a digest of the validator row. Last-Modified is the
+# validator's column aliased `last_modified` (a max(last_modified)), so
+# every worker sends the same one; validators without it send only the
+# ETag. max(last_modified) doesn't move when a row is deleted, which is why
+# If-None-Match wins whenever the client sends both.
+
+def make_etag(scope, row):
+    digest = hashlib.sha1(repr((scope,) + tuple(row)).encode()).hexdigest()
+    return digest[:20]
+
+def validator_last_modified(description, row):
+    """The row's `last_modified` column as an aware UTC datetime (whole seconds), or None."""
+    names = [desc[0] for desc in description or ()]
+    if row is None or 'last_modified' not in names:
+        return None
+    value = row[names.index('last_modified')]
+    if isinstance(value, str):
+        # request connections decode DATETIME as 'YYYY-MM-DD HH:MM:SS'
+        value = datetime.strptime(value[:19], "%Y-%m-%d %H:%M:%S")
+    if not isinstance(value, datetime):
+        return None
+    return value.replace(microsecond=0, tzinfo=value.tzinfo or timezone.utc)
+
+def not_modified(etag, last_modified):
+    # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return since is not None and last_modified is not None and last_modified <= since
+
+def conditional(namespace, query, param='salon_id'):
+    """
+    `query` returns one row that changes whenever the response would; every
+    %s in it is bound to `param`, taken from the view arguments or, for views
+    like products, the query string.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            value = kwargs.get(param, request.args.get(param))
+            if not current_app.config.get('CONDITIONAL_GET_ENABLED', True) or value is None:
+                return view(**kwargs)
+
+            cursor = current_app.config['MYSQL'].connection.cursor()
+            try:
+                cursor.execute(query, (value,) * query.count('%s'))
+                row = cursor.fetchone()
+                last_modified = validator_last_modified(cursor.description, row)
+            finally:
+                cursor.close()
+
+            scope = f"{namespace}:{value}?{request.query_string.decode()}"
+            etag = make_etag(scope, row)
+            if not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,28 @@
+from MySQLdb.constants import FIELD_TYPE
+from MySQLdb.converters import conversions
+
+# Result decoders for request connections. MySQL sends every value as text
+# that is already in the format the API answers with - TIME as 'HH:MM:SS',
+# DATE as 'YYYY-MM-DD', DATETIME as 'YYYY-MM-DD HH:MM:SS' - so those columns
+# are decoded straight to str (the driver's C fast path) instead of being
+# parsed into timedelta/date/datetime and formatted back row by row in every
+# handler. DECIMAL becomes float so prices can go into jsonify and into
+# arithmetic with Python floats as they are. ISO strings compare in date
+# order, so comparisons between dates still work on the strings.
+# Handlers rely on these types, so every pooled connection gets them.
+# Encoders (query parameters) are the driver's defaults.
+
+JSON_DECODERS = {
+    FIELD_TYPE.TIME: str,
+    FIELD_TYPE.DATE: str,
+    FIELD_TYPE.DATETIME: str,
+    FIELD_TYPE.TIMESTAMP: str,
+    FIELD_TYPE.DECIMAL: float,
+    FIELD_TYPE.NEWDECIMAL: float,
+}
+
+def json_conversions(base=None):
+    """conv mapping for MySQLdb.connect: `base` (default conversions) with JSON_DECODERS on top."""
+    conv = dict(conversions if base is None else base)
+    conv.update(JSON_DECODERS)
+    return conv
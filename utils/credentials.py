@@ -0,0 +1,122 @@
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Password hashing and verification. The KDF (scrypt) is deliberately slow,
+# so it runs on a small fixed pool instead of the request thread, and a
+# bounded number of jobs may wait for it: when more logins arrive than the
+# pool can absorb, callers get CredentialsBusy (a 503) instead of every
+# request thread queueing behind the KDF.
+#
+# Some old accounts still hold a plaintext password. While
+# LEGACY_PLAINTEXT_PASSWORDS is on, a matching plaintext login is accepted
+# once and replaced by a hash; `flask migrate-passwords` converts the rest in
+# bulk, after which the flag should be turned off.
+
+HASH_PREFIXES = ('scrypt:', 'pbkdf2:')
+
+# verified against when the username doesn't exist, so an unknown account
+# costs the same scrypt work as a wrong password (same parameters as new hashes)
+DUMMY_PASSWORD_HASH = (
+    'scrypt:32768:8:1$FTIbC7Ei27NvdtGn$79f59331098d0ba6453ac07b1def835e3acbee234864e3e062245a763745e500'
+    'd1bf315c3ed4d1fcefa6e171fc284f29c086a8b568ffed5f5a043ce38760ea08'
+)
+
+class CredentialsBusy(Exception):
+    pass
+
+def is_hashed(stored):
+    return bool(stored) and stored.startswith(HASH_PREFIXES)
+
+class CredentialPool:
+    def __init__(self, workers=2, max_pending=32, wait=5):
+        self.configure(workers, max_pending, wait)
+
+    def configure(self, workers=2, max_pending=32, wait=5):
+        self.workers = workers
+        self.wait = wait
+        self.slots = threading.BoundedSemaphore(workers + max_pending)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='credentials')
+
+    def run(self, fn, *args):
+        if not self.slots.acquire(timeout=self.wait):
+            raise CredentialsBusy("Too many logins in progress")
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future.result()
+
+credential_pool = CredentialPool()
+
+def init_credentials(app):
+    credential_pool.configure(
+        workers=app.config.get('CREDENTIAL_WORKERS', 2),
+        max_pending=app.config.get('CREDENTIAL_MAX_PENDING', 32),
+        wait=app.config.get('CREDENTIAL_WAIT_SECONDS', 5)
+    )
+
+def hash_password(password):
+    return credential_pool.run(generate_password_hash, password)
+
+def verify_password(stored, password, allow_plaintext=False):
+    """
+    Returns (ok, upgraded_hash). upgraded_hash is set when a legacy plaintext
+    password matched and should be written back.
+    """
+    if not stored:
+        return False, None
+    if is_hashed(stored):
+        return credential_pool.run(check_password_hash, stored, password), None
+    if allow_plaintext and hmac.compare_digest(stored.encode(), password.encode()):
+        return True, hash_password(password)
+    return False, None
+
+def upgrade_password(conn, user_id, old_value, new_hash):
+    """Replace a plaintext password, unless a concurrent login already did."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "update users set password = %s where user_id = %s and password = %s",
+            (new_hash, user_id, old_value)
+        )
+    finally:
+        cursor.close()
+    conn.commit()
+
+def migrate_legacy_passwords(conn, batch_size=500):
+    """Hash every remaining plaintext password; returns the number converted."""
+    cursor = conn.cursor()
+    converted = 0
+    last_id = 0
+    try:
+        while True:
+            cursor.execute("""
+                select user_id, password
+                from users
+                where user_id > %s
+                  and password not like 'scrypt:%%'
+                  and password not like 'pbkdf2:%%'
+                order by user_id
+                limit %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            updates = [
+                (generate_password_hash(plain), user_id, plain)
+                for user_id, plain in rows if plain
+            ]
+            cursor.executemany(
+                "update users set password = %s where user_id = %s and password = %s",
+                updates
+            )
+            conn.commit()
+            converted += len(updates)
+            last_id = rows[-1][0]
+    finally:
+        cursor.close()
+    return converted
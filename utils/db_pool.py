@@ -0,0 +1,325 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_app_context
+from flask_mysqldb import MySQL
+from utils.converters import json_conversions
+
+class PoolTimeout(RuntimeError):
+    pass
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of MySQLdb connections.
+
+    Connections are handed out LIFO so the idle tail can age out, pinged
+    before reuse and replaced once they are older than `recycle` seconds.
+    """
+
+    def __init__(self, connect, size=5, timeout=10, recycle=3600, pre_ping=True):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self._cond = threading.Condition()
+        self._idle = []         # [(conn, created_at)]
+        self._born = {}         # id(conn) -> created_at for checked out conns
+        self._open = 0
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._ping_failures = 0
+
+    def _new(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created += 1
+        return conn, time.monotonic()
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, created_at = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    conn, created_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                waited = True
+                self._cond.wait(remaining)
+
+        return self._ready(conn, created_at, started, waited)
+
+    def try_acquire(self, reserve=0):
+        """
+        A connection only if one is free right now and `reserve` more stay
+        free after taking it; None otherwise. Never waits.
+        """
+        started = time.monotonic()
+        with self._cond:
+            if len(self._idle) + self.size - self._open <= reserve:
+                return None
+            if self._idle:
+                conn, created_at = self._idle.pop()
+            else:
+                self._open += 1
+                conn, created_at = None, None
+        return self._ready(conn, created_at, started, False)
+
+    def _ready(self, conn, created_at, started, waited):
+        # an empty slot is connected here; an idle connection is recycled or pinged first
+        if conn is None:
+            conn, created_at = self._new()
+        elif self.recycle and time.monotonic() - created_at > self.recycle:
+            self._close(conn)
+            with self._cond:
+                self._recycled += 1
+            conn, created_at = self._new()
+        elif self.pre_ping:
+            try:
+                conn.ping()
+            except Exception:
+                self._close(conn)
+                with self._cond:
+                    self._ping_failures += 1
+                conn, created_at = self._new()
+
+        wait = time.monotonic() - started
+        with self._cond:
+            self._born[id(conn)] = created_at
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+        return conn
+
+    def release(self, conn):
+        with self._cond:
+            created_at = self._born.pop(id(conn), None)
+        if created_at is None:
+            return
+
+        # never hand an open transaction to the next request
+        try:
+            conn.rollback()
+        except Exception:
+            self.discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, created_at))
+            self._cond.notify()
+
+    def discard(self, conn):
+        with self._cond:
+            self._born.pop(id(conn), None)
+            self._open -= 1
+            self._cond.notify()
+        self._close(conn)
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': len(self._born),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'avg_wait_ms': round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0,
+                'max_wait_ms': round(self._wait_max * 1000, 3),
+                'connections_created': self._created,
+                'connections_recycled': self._recycled,
+                'ping_failures': self._ping_failures
+            }
+
+class TimedCursor:
+    """Cursor wrapper reporting each statement and its duration to observers."""
+
+    def __init__(self, cursor, observe):
+        self._cursor = cursor
+        self._observe = observe
+
+    def _timed(self, method, statement, args):
+        started = time.perf_counter()
+        try:
+            return method(statement, args)
+        finally:
+            self._observe(statement, args, time.perf_counter() - started)
+
+    def execute(self, statement, args=None):
+        return self._timed(self._cursor.execute, statement, args)
+
+    def executemany(self, statement, args):
+        return self._timed(self._cursor.executemany, statement, args)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class TimedConnection:
+    """Connection wrapper whose cursors (and commits) are timed."""
+
+    def __init__(self, conn, observe):
+        self._conn = conn
+        self._observe = observe
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._conn.cursor(*args, **kwargs), self._observe)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return self._conn.commit()
+        finally:
+            self._observe('commit', None, time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class PooledMySQL(MySQL):
+    """
+    Drop-in replacement for flask_mysqldb.MySQL.
+
+    `mysql.connection` still returns a plain MySQLdb connection bound to the
+    app context, but it is borrowed from a per-worker pool and given back on
+    teardown instead of being closed.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault("MYSQL_POOL_SIZE", 5)
+        app.config.setdefault("MYSQL_POOL_TIMEOUT", 10)
+        app.config.setdefault("MYSQL_POOL_RECYCLE", 3600)
+        app.config.setdefault("MYSQL_POOL_PRE_PING", True)
+        # TIME/DATE/DATETIME arrive as strings and DECIMAL as float, see utils/converters.py;
+        # not optional, handlers slice and compare those strings
+        options = dict(app.config.get("MYSQL_CUSTOM_OPTIONS") or {})
+        options["conv"] = json_conversions(options.get("conv"))
+        app.config["MYSQL_CUSTOM_OPTIONS"] = options
+        self.app = app
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+        self._observers = []
+        super().init_app(app)
+
+    def _connect(self):
+        if has_app_context():
+            return MySQL.connect.fget(self)
+        with self.app.app_context():
+            return MySQL.connect.fget(self)
+
+    @property
+    def pool(self):
+        # gunicorn forks after import, so every worker builds its own pool
+        # instead of sharing sockets inherited from the master
+        pid = os.getpid()
+        if self._pool is None or self._pool_pid != pid:
+            with self._pool_lock:
+                if self._pool is None or self._pool_pid != pid:
+                    config = self.app.config
+                    self._pool = ConnectionPool(
+                        self._connect,
+                        size=config["MYSQL_POOL_SIZE"],
+                        timeout=config["MYSQL_POOL_TIMEOUT"],
+                        recycle=config["MYSQL_POOL_RECYCLE"],
+                        pre_ping=config["MYSQL_POOL_PRE_PING"]
+                    )
+                    self._pool_pid = pid
+        return self._pool
+
+    def add_query_observer(self, observe):
+        """observe(statement, args, seconds) is called for every statement on request connections."""
+        self._observers.append(observe)
+
+    def _observe(self, statement, args, seconds):
+        for observe in self._observers:
+            try:
+                observe(statement, args, seconds)
+            except Exception:
+                pass
+
+    def _wrap(self, conn):
+        return TimedConnection(conn, self._observe) if self._observers else conn
+
+    @property
+    def connection(self):
+        if not has_app_context():
+            return None
+        if "mysql_db" not in g:
+            g.mysql_db = self.pool.acquire()
+            g.mysql_db_wrapped = self._wrap(g.mysql_db)
+        return g.mysql_db_wrapped
+
+    def teardown(self, exception):
+        g.pop("mysql_db_wrapped", None)
+        conn = g.pop("mysql_db", None)
+        if conn is not None:
+            self.pool.release(conn)
+
+    @contextmanager
+    def checkout(self):
+        """Borrow a connection outside of the request-bound one (background jobs, fan-out)."""
+        conn = self.pool.acquire()
+        try:
+            yield self._wrap(conn)
+        finally:
+            self.pool.release(conn)
+
+    @contextmanager
+    def checkout_spare(self, reserve=1):
+        """
+        Like checkout(), but yields None instead of waiting when the pool
+        can't spare a connection while keeping `reserve` free for requests.
+        """
+        conn = self.pool.try_acquire(reserve)
+        if conn is None:
+            yield None
+            return
+        try:
+            yield self._wrap(conn)
+        finally:
+            self.pool.release(conn)
+
+    def pool_stats(self):
+        return self.pool.stats()
@@ -0,0 +1,292 @@
+import csv
+import importlib.util
+import os
+from MySQLdb.constants import FIELD_TYPE
+from MySQLdb.cursors import SSCursor
+from utils.schema import register_table
+
+# Bulk exports for salon owners. A request only inserts an export_jobs row;
+# a background job claims queued rows (skip locked, so several workers never
+# take the same one), streams the dataset from a server-side cursor
+# EXPORT_CHUNK_SIZE rows at a time into a file under EXPORT_DIR and records
+# the row count and size. Downloads are served from that file with Range
+# support, so neither the export nor the download holds the data in memory.
+#
+#   status  'queued' -> 'running' (claimed) -> 'done' | 'failed'
+#
+# A 'running' job whose worker died is claimed again after stale_after
+# seconds. Files are written to <id>.<ext>.part and renamed when complete.
+
+register_table('export_jobs', """
+    create table if not exists export_jobs (
+        export_id bigint auto_increment primary key,
+        salon_id int not null,
+        requested_by int null,
+        dataset varchar(32) not null,
+        format varchar(16) not null,
+        date_from date null,
+        date_to date null,
+        status enum('queued', 'running', 'done', 'failed') not null default 'queued',
+        row_count int null,
+        size_bytes bigint null,
+        error varchar(512) null,
+        claimed_at datetime null,
+        finished_at datetime null,
+        created_at datetime not null default current_timestamp,
+        key idx_export_jobs_status (status, export_id),
+        key idx_export_jobs_salon (salon_id, created_at)
+    )
+""")
+
+# dataset -> (query, date column); {dates} becomes the optional date range filter
+DATASETS = {
+    'appointments': ("""
+        select a.appointment_id, a.appointment_date, a.start_time, a.end_time, a.status, a.notes,
+               u.user_id as customer_id, concat(u.first_name, ' ', u.last_name) as customer_name,
+               u.email as customer_email, u.phone_number as customer_phone,
+               sv.service_id, sv.name as service_name, sv.price as service_price,
+               e.employee_id, concat(e.first_name, ' ', e.last_name) as employee_name
+        from appointments a
+        join users u on u.user_id = a.customer_id
+        join services sv on sv.service_id = a.service_id
+        join employees e on e.employee_id = a.employee_id
+        where a.salon_id = %s {dates}
+        order by a.appointment_date, a.start_time, a.appointment_id
+    """, 'a.appointment_date'),
+    'invoices': ("""
+        select i.invoice_id, i.issued_date, i.customer_id, i.appointment_id, i.status,
+               i.subtotal_amount, i.tax_amount, i.total_amount,
+               ili.line_item_id, ili.item_type, ili.product_id, ili.quantity, ili.unit_price, ili.line_total
+        from invoices i
+        join invoice_line_items ili on ili.invoice_id = i.invoice_id
+        left join appointments a on a.appointment_id = i.appointment_id
+        left join products p on p.product_id = ili.product_id
+        where (a.salon_id = %s or p.salon_id = %s) {dates}
+        order by i.invoice_id, ili.line_item_id
+    """, 'i.issued_date'),
+    'customers': ("""
+        select u.user_id as customer_id, u.first_name, u.last_name, u.email, u.phone_number,
+               count(*) as appointments, min(a.appointment_date) as first_visit,
+               max(a.appointment_date) as last_visit
+        from appointments a
+        join users u on u.user_id = a.customer_id
+        where a.salon_id = %s {dates}
+        group by u.user_id, u.first_name, u.last_name, u.email, u.phone_number
+        order by u.user_id
+    """, 'a.appointment_date'),
+}
+
+FORMATS = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+def format_available(fmt):
+    # parquet needs pyarrow, which is only installed where exports run
+    return fmt == 'csv' or (fmt == 'parquet' and importlib.util.find_spec('pyarrow') is not None)
+
+def dataset_query(dataset, salon_id, date_from=None, date_to=None):
+    query, column = DATASETS[dataset]
+    # every placeholder in the template is the salon
+    params = [salon_id] * query.count('%s')
+    dates = ''
+    if date_from:
+        dates += f" and {column} >= %s"
+        params.append(date_from)
+    if date_to:
+        dates += f" and {column} <= %s"
+        params.append(date_to)
+    return query.format(dates=dates), params
+
+def file_path(export_dir, export_id, fmt):
+    return os.path.join(export_dir, f"{export_id}.{fmt}")
+
+def download_name(job):
+    return f"salon-{job['salon_id']}-{job['dataset']}-{job['export_id']}.{job['format']}"
+
+def create_job(conn, salon_id, dataset, fmt, requested_by=None, date_from=None, date_to=None):
+    """Queue an export in the caller's transaction; returns its export_id."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            insert into export_jobs (salon_id, requested_by, dataset, format, date_from, date_to)
+            values (%s, %s, %s, %s, %s, %s)
+        """, (salon_id, requested_by, dataset, fmt, date_from, date_to))
+        return cursor.lastrowid
+    finally:
+        cursor.close()
+
+_JOB_COLUMNS = ('export_id', 'salon_id', 'dataset', 'format', 'date_from', 'date_to', 'status',
+                'row_count', 'size_bytes', 'error', 'created_at', 'finished_at')
+
+def get_job(conn, salon_id, export_id):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"select {', '.join(_JOB_COLUMNS)} from export_jobs where salon_id = %s and export_id = %s",
+                       (salon_id, export_id))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return dict(zip(_JOB_COLUMNS, row)) if row else None
+
+def list_jobs(conn, salon_id, limit=50):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            select {', '.join(_JOB_COLUMNS)} from export_jobs
+            where salon_id = %s
+            order by created_at desc, export_id desc
+            limit %s
+        """, (salon_id, limit))
+        return [dict(zip(_JOB_COLUMNS, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def claim_job(conn, stale_after=3600):
+    """Claims the oldest queued (or abandoned) job and commits; returns it or None."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            select export_id, salon_id, dataset, format, date_from, date_to
+            from export_jobs
+            where status = 'queued'
+               or (status = 'running' and claimed_at < now() - interval %s second)
+            order by export_id
+            limit 1
+            for update skip locked
+        """, (stale_after,))
+        row = cursor.fetchone()
+        if row:
+            cursor.execute("update export_jobs set status = 'running', claimed_at = now() where export_id = %s",
+                           (row[0],))
+        conn.commit()
+        return dict(zip(('export_id', 'salon_id', 'dataset', 'format', 'date_from', 'date_to'), row)) if row else None
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def _write_csv(cursor, path, chunk_size):
+    rows = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([desc[0] for desc in cursor.description])
+        while True:
+            batch = cursor.fetchmany(chunk_size)
+            if not batch:
+                return rows
+            writer.writerows(batch)
+            rows += len(batch)
+
+_INTEGER_TYPES = {FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.INT24,
+                  FIELD_TYPE.LONGLONG, FIELD_TYPE.YEAR}
+
+def _parquet_type(pa, desc):
+    """Arrow type of a cursor.description entry (name, type_code, ..., scale at 5, ...)."""
+    type_code = desc[1]
+    if type_code in _INTEGER_TYPES:
+        return pa.int64()
+    if type_code in (FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE):
+        return pa.float64()
+    if type_code in (FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL):
+        return pa.decimal128(38, desc[5] or 0)
+    if type_code == FIELD_TYPE.DATE:
+        return pa.date32()
+    if type_code in (FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP):
+        return pa.timestamp('us')
+    # TIME (may exceed 24h), text, enum, JSON, ...
+    return pa.string()
+
+def _parquet_column(pa, values, arrow_type):
+    # request connections decode dates as str and DECIMAL as float (utils/converters.py);
+    # arrow casts those to the column type
+    if pa.types.is_string(arrow_type):
+        values = [v if v is None or isinstance(v, str)
+                  else v.decode('utf-8', 'replace') if isinstance(v, bytes) else str(v)
+                  for v in values]
+        return pa.array(values, pa.string())
+    return pa.array(values).cast(arrow_type)
+
+def _write_parquet(cursor, path, chunk_size):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # the schema comes from the column types, so every chunk (one row group each)
+    # has the same one whatever values it happens to hold
+    schema = pa.schema([pa.field(desc[0], _parquet_type(pa, desc)) for desc in cursor.description])
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        while True:
+            batch = cursor.fetchmany(chunk_size)
+            if not batch:
+                return rows
+            columns = [_parquet_column(pa, [row[i] for row in batch], field.type)
+                       for i, field in enumerate(schema)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            rows += len(batch)
+
+_WRITERS = {'csv': _write_csv, 'parquet': _write_parquet}
+
+def write_export(conn, job, export_dir, chunk_size=5000):
+    """Streams the job's dataset into its file; returns (rows, bytes)."""
+    os.makedirs(export_dir, exist_ok=True)
+    path = file_path(export_dir, job['export_id'], job['format'])
+    partial = path + '.part'
+    query, params = dataset_query(job['dataset'], job['salon_id'], job['date_from'], job['date_to'])
+    cursor = conn.cursor(SSCursor)
+    try:
+        cursor.execute(query, params)
+        rows = _WRITERS[job['format']](cursor, partial, chunk_size)
+    except Exception:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        cursor.close()
+    os.replace(partial, path)
+    return rows, os.path.getsize(path)
+
+def _finish(conn, export_id, status, rows=None, size=None, error=None):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            update export_jobs
+            set status = %s, row_count = %s, size_bytes = %s, error = %s, finished_at = now()
+            where export_id = %s
+        """, (status, rows, size, error[:512] if error else None, export_id))
+        conn.commit()
+    finally:
+        cursor.close()
+
+def run_once(conn, export_dir, chunk_size=5000, stale_after=3600):
+    """Claims and runs one job. Returns its export_id, or None when nothing is queued."""
+    job = claim_job(conn, stale_after)
+    if not job:
+        return None
+    try:
+        rows, size = write_export(conn, job, export_dir, chunk_size)
+    except Exception as e:
+        conn.rollback()
+        _finish(conn, job['export_id'], 'failed', error=str(e))
+        return job['export_id']
+    _finish(conn, job['export_id'], 'done', rows, size)
+    return job['export_id']
+
+def purge_exports(conn, export_dir, days=7):
+    """Deletes jobs (and their files) finished more than `days` ago."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            select export_id, format from export_jobs
+            where status in ('done', 'failed') and finished_at < now() - interval %s day
+        """, (days,))
+        expired = cursor.fetchall()
+        for export_id, fmt in expired:
+            path = file_path(export_dir, export_id, fmt)
+            if os.path.exists(path):
+                os.remove(path)
+        if expired:
+            ids = [row[0] for row in expired]
+            cursor.execute("delete from export_jobs where export_id in (" + ", ".join(["%s"] * len(ids)) + ")", ids)
+        conn.commit()
+        return len(expired)
+    finally:
+        cursor.close()
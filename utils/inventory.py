@@ -0,0 +1,220 @@
+from collections import OrderedDict
+from utils.schema import register_column, register_table
+
+# Stock reservations. products.stock_quantity is stock on hand and
+# products.reserved_quantity the part of it held by carts. Adding to a cart
+# reserves stock with a conditional increment, so two customers can't both
+# hold the last unit; checkout turns the cart's reservations into a
+# conditional decrement of stock_quantity. Neither ever reads stock and then
+# writes it, so there is nothing to oversell between the read and the write.
+#
+# Reservations expire (STOCK_RESERVATION_MINUTES after the last change) and
+# sweep_expired hands expired holds back to the shelf.
+#
+# Locking: every path locks stock_reservations rows before products rows, and
+# multi-product statements touch products in product_id order (a primary key
+# IN list is scanned in ascending order), so concurrent checkouts of
+# overlapping carts queue on the first shared product instead of deadlocking.
+
+register_column('products', 'reserved_quantity', 'int not null default 0')
+
+register_table('stock_reservations', """
+    create table if not exists stock_reservations (
+        reservation_id bigint auto_increment primary key,
+        cart_id int not null,
+        product_id int not null,
+        quantity int not null,
+        expires_at datetime not null,
+        unique key uq_stock_reservations_cart_product (cart_id, product_id),
+        key idx_stock_reservations_expires (expires_at)
+    )
+""")
+
+class InsufficientStock(Exception):
+    def __init__(self, shortfalls):
+        # shortfalls: [{'product_id', 'requested', 'available'}]
+        self.shortfalls = shortfalls
+        super().__init__(", ".join(
+            f"product {s['product_id']}: requested {s['requested']}, available {s['available']}"
+            for s in shortfalls
+        ))
+
+def _in(values):
+    return ", ".join(["%s"] * len(values))
+
+def available(cursor, product_ids, held=None):
+    """{product_id: units this caller could take}, counting its own holds as available."""
+    product_ids = sorted(product_ids)
+    if not product_ids:
+        return {}
+    cursor.execute(f"""
+        select product_id, stock_quantity - reserved_quantity
+        from products
+        where product_id in ({_in(product_ids)})
+    """, product_ids)
+    held = held or {}
+    return {row[0]: int(row[1]) + held.get(row[0], 0) for row in cursor.fetchall()}
+
+def _shortfalls(cursor, requested, held=None):
+    free = available(cursor, requested, held)
+    return [
+        {'product_id': product_id, 'requested': quantity, 'available': max(free.get(product_id, 0), 0)}
+        for product_id, quantity in sorted(requested.items())
+        if free.get(product_id, 0) < quantity
+    ]
+
+def reserve(cursor, cart_id, product_id, quantity, minutes=15):
+    """
+    Adds `quantity` to the cart's hold on the product; raises InsufficientStock
+    when the shelf can't cover it. Runs in the caller's transaction, which must
+    be rolled back on failure (the reservation row was already written).
+    """
+    cursor.execute("""
+        insert into stock_reservations (cart_id, product_id, quantity, expires_at)
+        values (%s, %s, %s, now() + interval %s minute)
+        on duplicate key update
+            quantity = quantity + values(quantity),
+            expires_at = values(expires_at)
+    """, (cart_id, product_id, quantity, minutes))
+    _hold(cursor, product_id, quantity)
+
+def resize(cursor, cart_item_id, quantity, minutes=15):
+    """
+    Sets the hold behind a cart item to `quantity` (0 releases it). Returns
+    False if the cart item doesn't exist; raises InsufficientStock like reserve.
+    """
+    cursor.execute("""
+        select cart_items.cart_id, cart_items.product_id, coalesce(stock_reservations.quantity, 0)
+        from cart_items
+        left join stock_reservations
+            on stock_reservations.cart_id = cart_items.cart_id
+            and stock_reservations.product_id = cart_items.product_id
+        where cart_items.cart_item_id = %s
+        for update
+    """, (cart_item_id,))
+    row = cursor.fetchone()
+    if not row:
+        return False
+    cart_id, product_id, held = row
+    if quantity > 0:
+        cursor.execute("""
+            insert into stock_reservations (cart_id, product_id, quantity, expires_at)
+            values (%s, %s, %s, now() + interval %s minute)
+            on duplicate key update
+                quantity = values(quantity),
+                expires_at = values(expires_at)
+        """, (cart_id, product_id, quantity, minutes))
+    else:
+        cursor.execute("delete from stock_reservations where cart_id = %s and product_id = %s", (cart_id, product_id))
+    _hold(cursor, product_id, quantity - held)
+    return True
+
+def _hold(cursor, product_id, delta):
+    if delta <= 0:
+        if delta:
+            cursor.execute("""
+                update products
+                set reserved_quantity = greatest(reserved_quantity + %s, 0)
+                where product_id = %s
+            """, (delta, product_id))
+        return
+    cursor.execute("""
+        update products
+        set reserved_quantity = reserved_quantity + %s
+        where product_id = %s and stock_quantity - reserved_quantity >= %s
+    """, (delta, product_id, delta))
+    if cursor.rowcount == 0:
+        raise InsufficientStock(_shortfalls(cursor, {product_id: delta}))
+
+def commit_stock(cursor, cart_ids, items):
+    """
+    Checkout: takes items ({'product_id', 'quantity'} dicts) off the shelf
+    and drops the carts' reservations. All or nothing - raises
+    InsufficientStock listing every product that can't be covered, and the
+    caller rolls back.
+    """
+    requested = OrderedDict()
+    for item in sorted(items, key=lambda i: i['product_id']):
+        if item['quantity'] > 0:
+            requested[item['product_id']] = requested.get(item['product_id'], 0) + item['quantity']
+    if not requested:
+        return
+
+    cart_ids = sorted(set(cart_ids))
+    held = {}
+    if cart_ids:
+        cursor.execute(f"""
+            select product_id, sum(quantity)
+            from stock_reservations
+            where cart_id in ({_in(cart_ids)})
+            group by product_id
+            order by product_id
+            for update
+        """, cart_ids)
+        held = {row[0]: int(row[1]) for row in cursor.fetchall()}
+
+    # holds on products no longer in the order are released in the same statement
+    product_ids = sorted(set(requested) | set(held))
+    case = " ".join(["when %s then %s"] * len(product_ids))
+    quantities = [v for p in product_ids for v in (p, requested.get(p, 0))]
+    holds = [v for p in product_ids for v in (p, held.get(p, 0))]
+    # a product qualifies when stock not held by someone else covers the order
+    cursor.execute(f"""
+        update products
+        set stock_quantity = stock_quantity - (case product_id {case} end),
+            reserved_quantity = greatest(reserved_quantity - (case product_id {case} end), 0),
+            last_modified = now()
+        where product_id in ({_in(product_ids)})
+          and ((case product_id {case} end) = 0
+               or stock_quantity - reserved_quantity + (case product_id {case} end)
+                  >= (case product_id {case} end))
+    """, quantities + holds + product_ids + quantities + holds + quantities)
+    if cursor.rowcount != len(product_ids):
+        # the update took the rows that qualified; the caller's rollback undoes them
+        raise InsufficientStock(_shortfalls(cursor, requested, held) or [
+            {'product_id': p, 'requested': q, 'available': None} for p, q in requested.items()
+        ])
+
+    if cart_ids:
+        cursor.execute(f"delete from stock_reservations where cart_id in ({_in(cart_ids)})", cart_ids)
+
+def sweep_expired(conn, batch_size=500):
+    """Releases expired reservations; returns how many were released."""
+    released = 0
+    cursor = conn.cursor()
+    try:
+        while True:
+            cursor.execute("""
+                select reservation_id, product_id, quantity
+                from stock_reservations
+                where expires_at <= now()
+                order by product_id
+                limit %s
+                for update skip locked
+            """, (batch_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            per_product = OrderedDict()
+            for _, product_id, quantity in rows:
+                per_product[product_id] = per_product.get(product_id, 0) + quantity
+            product_ids = list(per_product)
+            cases = " ".join(["when %s then %s"] * len(product_ids))
+            cursor.execute(f"""
+                update products
+                set reserved_quantity = greatest(reserved_quantity - (case product_id {cases} end), 0)
+                where product_id in ({_in(product_ids)})
+            """, [v for p in product_ids for v in (p, per_product[p])] + product_ids)
+            reservation_ids = [row[0] for row in rows]
+            cursor.execute(f"delete from stock_reservations where reservation_id in ({_in(reservation_ids)})",
+                           reservation_ids)
+            conn.commit()
+            released += len(rows)
+            if len(rows) < batch_size:
+                break
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return released
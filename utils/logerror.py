@@ -1,30 +1,198 @@
+import atexit
 import traceback
+import hashlib
 import json
-from flask import request, current_app
+import os
+import queue
+import threading
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from flask import request, has_request_context
+from utils.schema import register_column
 
-def log_error(error_message, user_id=None):
-    try:
-        mysql = current_app.config.get('MYSQL')
-        if not mysql:
-            print("MYSQL not initialized in current_app.config!")
+# Error ingestion. log_error (persisted errors) and analytics.log_error_memory
+# (monitoring errors) both hand an entry to error_pipeline, which
+#   - keeps the last N entries in memory for /admin/error-logs,
+#   - queues them in a bounded queue (full queue -> dropped and counted),
+#   - has a background flusher collapse repeats of the same error into one
+#     row with an occurrence count and write each batch with one multi-row
+#     insert on its own pooled connection.
+# Nothing touches the caller's connection, so logging can no longer commit a
+# request's half-done transaction. Batches that can't be written (database
+# down) are appended to logs/errors_YYYYMMDD.log instead.
+
+register_column('error_logs', 'occurrences', 'int not null default 1')
+
+_INSERT = """
+    insert into error_logs (message, details, endpoint, method, payload, user_id, occurrences)
+    values (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+SENSITIVE_KEYS = ('password', 'card_number', 'cvv')
+
+def _redact(payload):
+    if isinstance(payload, dict):
+        return {k: '***' if any(s in str(k).lower() for s in SENSITIVE_KEYS) else _redact(v)
+                for k, v in payload.items()}
+    if isinstance(payload, list):
+        return [_redact(v) for v in payload]
+    return payload
+
+class ErrorPipeline:
+    def __init__(self, maxsize=10000, batch_size=500, flush_interval=5, ring_size=1000, log_dir='logs'):
+        self.queue = queue.Queue(maxsize)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.log_dir = log_dir
+        self.recent = deque(maxlen=ring_size)
+        self.by_endpoint = defaultdict(lambda: {'count': 0, 'last_error': None})
+        self.lock = threading.Lock()
+        self.counters = {'received': 0, 'dropped': 0, 'rows_written': 0, 'deduplicated': 0,
+                         'flush_failures': 0, 'spilled_to_file': 0}
+        self.app = None
+        self.wake = threading.Event()
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def record(self, message, details=None, endpoint=None, method=None, payload=None,
+               user_id=None, error_type='application', persist=True):
+        now = datetime.now(timezone.utc)
+        self.recent.append({
+            'timestamp': now.isoformat(),
+            'error_type': error_type,
+            'endpoint': endpoint,
+            'error_message': message,
+            'stack_trace': details if details != message else None
+        })
+        with self.lock:
+            self.counters['received'] += 1
+            self.by_endpoint[endpoint]['count'] += 1
+            self.by_endpoint[endpoint]['last_error'] = now
+        if not persist:
+            return
+        try:
+            self.queue.put_nowait((message, details or message, endpoint, method, payload, user_id, now))
+        except queue.Full:
+            self.count('dropped')
             return
+        if self.queue.qsize() >= self.batch_size:
+            self.wake.set()
+
+    def drain(self):
+        entries = []
+        while len(entries) < self.batch_size:
+            try:
+                entries.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return entries
+
+    @staticmethod
+    def fingerprint(entry):
+        message, details, endpoint, method = entry[:4]
+        return hashlib.sha1(f"{endpoint}|{method}|{message}|{details}".encode()).hexdigest()
 
-        conn = mysql.connection
+    def group(self, entries):
+        """One row per distinct error: (message, details, endpoint, method, payload, user_id, occurrences)."""
+        rows = {}
+        for entry in entries:
+            key = self.fingerprint(entry)
+            if key in rows:
+                rows[key][6] += 1
+            else:
+                rows[key] = list(entry[:6]) + [1]
+        self.count('deduplicated', len(entries) - len(rows))
+        return [tuple(row) for row in rows.values()]
+
+    def write(self, conn, rows):
         cursor = conn.cursor()
+        try:
+            cursor.executemany(_INSERT, rows)
+            conn.commit()
+        finally:
+            cursor.close()
+
+    def spill(self, entries):
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            path = os.path.join(self.log_dir, f'errors_{datetime.now().strftime("%Y%m%d")}.log')
+            with open(path, 'a') as f:
+                for message, details, endpoint, method, payload, user_id, at in entries:
+                    f.write(json.dumps({
+                        'timestamp': at.isoformat(), 'endpoint': endpoint, 'method': method,
+                        'error_message': message, 'stack_trace': details, 'user_id': user_id
+                    }) + "\n")
+            self.count('spilled_to_file', len(entries))
+        except Exception as e:
+            print(f"Failed to write error log: {e}")
+            self.count('dropped', len(entries))
 
+    def flush_once(self):
+        """Write one batch; returns the number of entries taken off the queue."""
+        entries = self.drain()
+        if not entries:
+            return 0
+        rows = self.group(entries)
         try:
+            with self.app.app_context():
+                with self.app.config['MYSQL'].checkout() as conn:
+                    self.write(conn, rows)
+            self.count('rows_written', len(rows))
+        except Exception as e:
+            print("Failed to write to error_logs:", e)
+            self.count('flush_failures')
+            self.spill(entries)
+        return len(entries)
+
+    def flush(self):
+        total = 0
+        while True:
+            n = self.flush_once()
+            if not n:
+                return total
+            total += n
+
+    def run(self, stop):
+        while not stop.is_set():
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+        self.flush()
+
+    def start(self, app):
+        self.app = app
+        self.batch_size = app.config.get('ERROR_LOG_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('ERROR_LOG_FLUSH_SECONDS', self.flush_interval)
+        self.queue.maxsize = app.config.get('ERROR_LOG_QUEUE_SIZE', self.queue.maxsize)
+        stop = threading.Event()
+        threading.Thread(target=self.run, args=(stop,), name='error-log-flusher', daemon=True).start()
+        # whatever is still queued at shutdown
+        atexit.register(self.flush)
+        return stop
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+        counters.update(queued=self.queue.qsize(), capacity=self.queue.maxsize, in_memory=len(self.recent))
+        return counters
+
+error_pipeline = ErrorPipeline()
+
+def log_error(error_message, user_id=None):
+    try:
+        if has_request_context():
             endpoint = request.path
             method = request.method
-            payload = request.get_json(silent=True)
-        except Exception:
-            endpoint = None
-            method = None
-            payload = None
+            payload = _redact(request.get_json(silent=True))
+        else:
+            endpoint = method = payload = None
 
-        payload_json = json.dumps(payload) if payload is not None else None
+        payload_json = json.dumps(payload, default=str) if payload is not None else None
 
         tb = traceback.format_exc()
-        if tb.strip() == "NoneType: None\n" or tb.strip() == "":
+        if tb.strip() == "NoneType: None" or tb.strip() == "":
             details = error_message
         else:
             details = tb
@@ -32,28 +200,7 @@ def log_error(error_message, user_id=None):
         if not isinstance(details, str):
             details = str(details)
 
-        cursor.execute("""
-            insert into error_logs (
-                message,
-                details,
-                endpoint,
-                method,
-                payload,
-                user_id
-            ) values (%s, %s, %s, %s, %s, %s)
-        """, (
-            error_message,
-            details,
-            endpoint,
-            method,
-            payload_json,
-            user_id
-        ))
-
-        conn.commit()
-        cursor.close()
-
-        print("Error logged successfully")
+        error_pipeline.record(error_message, details, endpoint, method, payload_json, user_id)
 
     except Exception as e:
-        print("Failed to write to error_logs:", e)
+        print("Failed to queue error log:", e)
@@ -0,0 +1,215 @@
+import math
+import threading
+import time
+from flask import g, has_request_context, request
+
+# Per-route request metrics. A before/after_request pair times every request
+# and records latency, time spent in the database, statement count and
+# response size under the route's URL rule (so /salon/1/services and
+# /salon/2/services share one series). Latencies go into fixed log-scale
+# histograms (HDR style: constant relative precision, O(1) record, no
+# samples kept), which give p50/p95/p99 without sorting anything.
+#
+# DB time and statement count come from PooledMySQL query observers, which
+# see every statement run on the request's connection.
+
+class Histogram:
+    """Milliseconds from `low` to `high` in buckets growing by `growth` (~9% wide)."""
+
+    def __init__(self, low=0.01, high=300000.0, growth=2 ** 0.125):
+        self.low = low
+        self.log_growth = math.log(growth)
+        self.bounds = []
+        bound = low
+        while bound < high:
+            self.bounds.append(bound)
+            bound *= growth
+        self.bounds.append(bound)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def index(self, value):
+        if value <= self.low:
+            return 0
+        i = math.ceil(math.log(value / self.low) / self.log_growth)
+        return min(i, len(self.bounds))
+
+    def record(self, value):
+        self.counts[self.index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile, capped at the max seen."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                bound = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def count_above(self, value):
+        return sum(self.counts[self.index(value) + 1:])
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'avg': round(self.total / self.count, 3) if self.count else None,
+            'min': round(self.min, 3) if self.min is not None else None,
+            'max': round(self.max, 3) if self.max is not None else None,
+            'p50': _round(self.percentile(50)),
+            'p95': _round(self.percentile(95)),
+            'p99': _round(self.percentile(99)),
+        }
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+class RouteStats:
+    def __init__(self, method, rule, endpoint):
+        self.method = method
+        self.rule = rule
+        self.endpoint = endpoint
+        self.latency = Histogram()
+        self.db_time = Histogram()
+        self.queries = 0
+        self.max_queries = 0
+        self.bytes = 0
+        self.max_bytes = 0
+        self.statuses = {}
+        self.lock = threading.Lock()
+
+    def record(self, latency_ms, db_ms, queries, nbytes, status):
+        with self.lock:
+            self.latency.record(latency_ms)
+            self.db_time.record(db_ms)
+            self.queries += queries
+            self.max_queries = max(self.max_queries, queries)
+            self.bytes += nbytes
+            self.max_bytes = max(self.max_bytes, nbytes)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            count = self.latency.count
+            return {
+                'method': self.method,
+                'route': self.rule,
+                'endpoint': self.endpoint,
+                'latency_ms': self.latency.summary(),
+                'db_ms': self.db_time.summary(),
+                'avg_queries': round(self.queries / count, 2) if count else None,
+                'max_queries': self.max_queries,
+                'avg_response_bytes': round(self.bytes / count) if count else None,
+                'max_response_bytes': self.max_bytes,
+                'statuses': {str(k): v for k, v in sorted(self.statuses.items())},
+            }
+
+class RequestMetrics:
+    def __init__(self):
+        self.routes = {}
+        self.overall = Histogram()
+        self.lock = threading.Lock()
+
+    def route(self, method, rule, endpoint):
+        key = (method, rule)
+        stats = self.routes.get(key)
+        if stats is None:
+            with self.lock:
+                stats = self.routes.setdefault(key, RouteStats(method, rule, endpoint))
+        return stats
+
+    def record(self, method, rule, endpoint, latency_ms, db_ms, queries, nbytes, status):
+        self.route(method, rule, endpoint).record(latency_ms, db_ms, queries, nbytes, status)
+        with self.lock:
+            self.overall.record(latency_ms)
+
+    def snapshot(self, sort='p99', limit=None):
+        routes = [stats.snapshot() for stats in list(self.routes.values())]
+        routes.sort(key=lambda r: r['latency_ms'].get(sort) or 0, reverse=True)
+        with self.lock:
+            overall = self.overall.summary()
+            overall['over_1s'] = self.overall.count_above(1000)
+        return {'overall': overall, 'routes': routes[:limit] if limit else routes}
+
+request_metrics = RequestMetrics()
+
+def observe_query(statement, args, seconds):
+    if has_request_context():
+        current = g.get('request_metrics')
+        if current is not None:
+            current['db'] += seconds
+            current['queries'] += 1
+
+def init_metrics(app, metrics=request_metrics):
+    mysql = app.config.get('MYSQL')
+    if hasattr(mysql, 'add_query_observer'):
+        mysql.add_query_observer(observe_query)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_metrics = {'start': time.perf_counter(), 'db': 0.0, 'queries': 0}
+
+    @app.after_request
+    def record_request_metrics(response):
+        current = g.pop('request_metrics', None)
+        if current is not None:
+            rule = request.url_rule.rule if request.url_rule else '<unmatched>'
+            metrics.record(
+                request.method, rule, request.endpoint,
+                (time.perf_counter() - current['start']) * 1000,
+                current['db'] * 1000,
+                current['queries'],
+                response.content_length or 0,
+                response.status_code
+            )
+        return response
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus_text(metrics=request_metrics, quantiles=(0.5, 0.95, 0.99)):
+    """Prometheus text exposition: latency and DB time as summaries, counters for the rest."""
+    lines = [
+        "# HELP http_request_duration_seconds Request latency per route.",
+        "# TYPE http_request_duration_seconds summary",
+    ]
+    db_lines = [
+        "# HELP http_request_db_seconds Database time per request per route.",
+        "# TYPE http_request_db_seconds summary",
+    ]
+    counters = {
+        'http_requests_total': ["# HELP http_requests_total Requests per route and status.",
+                                "# TYPE http_requests_total counter"],
+        'http_request_queries_total': ["# HELP http_request_queries_total SQL statements run per route.",
+                                       "# TYPE http_request_queries_total counter"],
+        'http_response_bytes_total': ["# HELP http_response_bytes_total Response body bytes per route.",
+                                      "# TYPE http_response_bytes_total counter"],
+    }
+    for stats in list(metrics.routes.values()):
+        with stats.lock:
+            labels = f'method="{_label(stats.method)}",route="{_label(stats.rule)}"'
+            for name, hist, out in (('http_request_duration_seconds', stats.latency, lines),
+                                    ('http_request_db_seconds', stats.db_time, db_lines)):
+                for q in quantiles:
+                    value = hist.percentile(q * 100)
+                    out.append(f'{name}{{{labels},quantile="{q}"}} {(value or 0) / 1000:.6f}')
+                out.append(f'{name}_sum{{{labels}}} {hist.total / 1000:.6f}')
+                out.append(f'{name}_count{{{labels}}} {hist.count}')
+            for status, n in sorted(stats.statuses.items()):
+                counters['http_requests_total'].append(f'http_requests_total{{{labels},status="{status}"}} {n}')
+            counters['http_request_queries_total'].append(f'http_request_queries_total{{{labels}}} {stats.queries}')
+            counters['http_response_bytes_total'].append(f'http_response_bytes_total{{{labels}}} {stats.bytes}')
+    lines.extend(db_lines)
+    for block in counters.values():
+        lines.extend(block)
+    return "\n".join(lines) + "\n"
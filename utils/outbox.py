@@ -0,0 +1,213 @@
+import threading
+import time
+from flask_mail import Message
+from utils.schema import register_table
+
+# Durable outbound email. Requests only insert rows into email_outbox on
+# their own connection, so the email is committed (or rolled back) together
+# with the change that triggered it and request latency never depends on
+# SMTP. Background workers claim batches, send each batch over one SMTP
+# connection and retry failures with exponential backoff.
+#
+#   status  'pending' -> 'sending' (claimed) -> 'sent'
+#                                            -> 'pending' again with a later
+#                                               next_attempt_at, or 'failed'
+#                                               once max attempts are used up
+
+register_table('email_outbox', """
+    create table if not exists email_outbox (
+        email_id bigint auto_increment primary key,
+        recipient varchar(255) not null,
+        subject varchar(255) not null,
+        body text not null,
+        html mediumtext null,
+        status enum('pending', 'sending', 'sent', 'failed') not null default 'pending',
+        attempts int not null default 0,
+        next_attempt_at datetime not null default current_timestamp,
+        claimed_at datetime null,
+        sent_at datetime null,
+        last_error varchar(512) null,
+        category varchar(32) null,
+        ref_id bigint null,
+        created_at datetime not null default current_timestamp,
+        key idx_outbox_due (status, next_attempt_at),
+        unique key uq_outbox_ref (category, ref_id)
+    )
+""")
+
+# (category, ref_id) identifies emails that must go out at most once, e.g.
+# ('appointment_reminder', appointment_id); queuing the same pair again is a
+# no-op. Rows with a null ref_id are never deduplicated.
+_INSERT = """
+    insert into email_outbox (recipient, subject, body, html, category, ref_id)
+    values (%s, %s, %s, %s, %s, %s)
+    on duplicate key update email_id = email_id
+"""
+
+def queue_email(conn, to, subject, body, html=None, category=None, ref_id=None):
+    """Add one email to the outbox inside the caller's transaction (no commit)."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(_INSERT, (to, subject, body, html, category, ref_id))
+    finally:
+        cursor.close()
+
+def queue_emails(conn, recipients, subject, body, html=None, category=None):
+    """Same as queue_email for many recipients in one multi-row insert."""
+    return queue_messages(conn, [(to, subject, body, html, category, None) for to in recipients])
+
+def queue_messages(conn, messages):
+    """messages: (to, subject, body, html, category, ref_id) tuples, one insert for all."""
+    messages = list(messages)
+    if not messages:
+        return 0
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(_INSERT, messages)
+    finally:
+        cursor.close()
+    return len(messages)
+
+class RateLimiter:
+    """Spaces sends at most `rate` per second across every worker thread."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class OutboxWorker:
+    def __init__(self, app, batch_size=50, rate=10, max_attempts=5,
+                 backoff=30, max_backoff=3600, stale_after=600):
+        self.app = app
+        self.batch_size = batch_size
+        self.limiter = rate if isinstance(rate, RateLimiter) else RateLimiter(rate)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stale_after = stale_after
+
+    def retry_delay(self, attempts):
+        return min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+
+    def claim(self, conn):
+        # skip locked lets several workers (and processes) claim disjoint
+        # batches; rows stuck in 'sending' after a crash are picked up again
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                select email_id, recipient, subject, body, html, attempts
+                from email_outbox
+                where (status = 'pending' and next_attempt_at <= now())
+                   or (status = 'sending' and claimed_at < now() - interval %s second)
+                order by email_id
+                limit %s
+                for update skip locked
+            """, (self.stale_after, self.batch_size))
+            rows = cursor.fetchall()
+            if rows:
+                ids = [row[0] for row in rows]
+                cursor.execute(
+                    "update email_outbox set status = 'sending', claimed_at = now(), attempts = attempts + 1 "
+                    "where email_id in (" + ", ".join(["%s"] * len(ids)) + ")",
+                    ids
+                )
+            conn.commit()
+            return [row[:5] + (row[5] + 1,) for row in rows]
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def send(self, rows):
+        """Send a claimed batch over one SMTP connection; returns (sent_ids, failures)."""
+        mail = self.app.extensions['mail']
+        sender = self.app.config.get('MAIL_DEFAULT_SENDER') or self.app.config.get('MAIL_USERNAME')
+        sent, failures = [], []
+        try:
+            with mail.connect() as smtp:
+                for email_id, recipient, subject, body, html, attempts in rows:
+                    self.limiter.wait()
+                    msg = Message(subject=subject, recipients=[recipient], sender=sender, body=body, html=html)
+                    try:
+                        smtp.send(msg)
+                        sent.append(email_id)
+                    except Exception as e:
+                        failures.append((email_id, attempts, str(e)))
+        except Exception as e:
+            # connecting (or closing) failed: everything not sent is retried
+            done = set(sent) | {f[0] for f in failures}
+            failures += [(row[0], row[5], str(e)) for row in rows if row[0] not in done]
+        return sent, failures
+
+    def record(self, conn, sent, failures):
+        cursor = conn.cursor()
+        try:
+            if sent:
+                cursor.execute(
+                    "update email_outbox set status = 'sent', sent_at = now(), last_error = null "
+                    "where email_id in (" + ", ".join(["%s"] * len(sent)) + ")",
+                    sent
+                )
+            if failures:
+                cursor.executemany("""
+                    update email_outbox
+                    set status = %s, next_attempt_at = now() + interval %s second, last_error = %s
+                    where email_id = %s
+                """, [
+                    ('failed' if attempts >= self.max_attempts else 'pending',
+                     self.retry_delay(attempts), error[:512], email_id)
+                    for email_id, attempts, error in failures
+                ])
+            conn.commit()
+        finally:
+            cursor.close()
+
+    def drain_once(self):
+        """Claim and send one batch. Returns the number of emails processed."""
+        with self.app.app_context():
+            conn = self.app.config['MYSQL'].connection
+            rows = self.claim(conn)
+            if not rows:
+                return 0
+            sent, failures = self.send(rows)
+            self.record(conn, sent, failures)
+            return len(rows)
+
+    def run(self, stop, poll_interval=2):
+        delay = poll_interval
+        while not stop.is_set():
+            try:
+                processed = self.drain_once()
+                delay = poll_interval
+            except Exception as e:
+                print(f"Email outbox worker error: {e}")
+                processed = 0
+                delay = min(delay * 2, 60)
+            if not processed:
+                stop.wait(delay)
+
+def start_outbox_workers(app, workers=2):
+    """Start daemon threads draining the outbox; returns the event that stops them."""
+    stop = threading.Event()
+    limiter = RateLimiter(app.config.get('EMAIL_OUTBOX_RATE', 10))
+    for n in range(workers):
+        worker = OutboxWorker(
+            app,
+            batch_size=app.config.get('EMAIL_OUTBOX_BATCH_SIZE', 50),
+            rate=limiter,
+            max_attempts=app.config.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+        )
+        threading.Thread(target=worker.run, args=(stop,), name=f'email-outbox-{n}', daemon=True).start()
+    return stop
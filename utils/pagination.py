@@ -0,0 +1,86 @@
+import threading
+import time
+from datetime import date, datetime
+from flask import current_app
+from itsdangerous import URLSafeSerializer, BadSignature
+
+# Keyset pagination. Instead of LIMIT/OFFSET (which reads and throws away
+# every skipped row) a page continues after the sort key of the previous
+# page's last row, so page 500 costs the same as page 1. The key travels in
+# an opaque, signed cursor token together with the page number, which keeps
+# iter_pages working. Totals come from a short-lived count cache so paging
+# doesn't repeat the COUNT(*) on every request.
+
+class InvalidCursor(ValueError):
+    pass
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='page-cursor')
+
+def _plain(value):
+    # dates go in as MySQL literals, which compare correctly against the column
+    if isinstance(value, (datetime, date)):
+        return str(value)
+    return value
+
+def encode_cursor(key, page):
+    return _serializer().dumps({'k': [_plain(v) for v in key], 'p': page})
+
+def decode_cursor(token):
+    """Returns (key values, page number) or raises InvalidCursor."""
+    try:
+        payload = _serializer().loads(token)
+        return payload['k'], int(payload['p'])
+    except (BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidCursor("Invalid cursor")
+
+def keyset_condition(columns, directions, values):
+    """
+    SQL (and params) selecting rows strictly after `values` in the order
+    given by columns/directions, e.g. for (review_date desc, review_id desc):
+        (review_date < %s or (review_date = %s and review_id < %s))
+    """
+    clauses = []
+    params = []
+    for i, (column, direction) in enumerate(zip(columns, directions)):
+        op = '<' if direction == 'desc' else '>'
+        parts = [f"{c} = %s" for c in columns[:i]] + [f"{column} {op} %s"]
+        clauses.append("(" + " and ".join(parts) + ")")
+        params.extend(values[:i])
+        params.append(values[i])
+    return "(" + " or ".join(clauses) + ")", params
+
+_counts = {}
+_counts_lock = threading.Lock()
+
+def cached_count(cursor, query, params, ttl=60, max_entries=1024):
+    """COUNT(*) result reused for `ttl` seconds per (query, params)."""
+    key = (query, tuple(params))
+    now = time.monotonic()
+    with _counts_lock:
+        hit = _counts.get(key)
+    if hit and hit[1] > now:
+        return hit[0]
+
+    cursor.execute(query, params)
+    total = cursor.fetchone()[0]
+    with _counts_lock:
+        if len(_counts) >= max_entries:
+            _counts.clear()
+        _counts[key] = (total, now + ttl)
+    return total
+
+def generate_iter_pages(current_page, total_pages, left_edge=2, right_edge=2, left_current=2, right_current=2):
+    last = 0
+    pages = []
+    for num in range(1, total_pages + 1):
+        if (
+            num <= left_edge or
+            (current_page - left_current - 1 < num < current_page + right_current) or
+            num > total_pages - right_edge
+        ):
+            if last + 1 != num:
+                pages.append('...')  # gap
+            pages.append(num)
+            last = num
+    return pages
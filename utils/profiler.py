@@ -0,0 +1,183 @@
+import random
+import re
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from flask import g, has_request_context, request
+
+# SQL profiler. Sees every statement on request connections through the
+# PooledMySQL query observer hook and
+#   - keeps the slowest statements (over SQL_SLOW_QUERY_MS) in a ring buffer,
+#   - for sampled requests, counts statements per normalized fingerprint and
+#     flags handlers that run more than SQL_QUERY_LIMIT statements or the
+#     same fingerprint SQL_REPEAT_LIMIT+ times (a query in a loop, i.e. N+1).
+# SQL_PROFILER_SAMPLE_RATE (0..1) controls how many requests get the per
+# request analysis, so production can keep it at a few percent.
+
+_COMMENTS = re.compile(r"/\*.*?\*/|--[^\n]*|#[^\n]*", re.S)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROWS = re.compile(r"(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+")
+_SPACE = re.compile(r"\s+")
+
+def fingerprint(statement):
+    """Statement shape with literals, placeholders and value lists folded, e.g.
+    "select * from t where id in (%s, %s)" -> "select * from t where id in (...)"."""
+    sql = statement.decode(errors='replace') if isinstance(statement, bytes) else str(statement)
+    sql = _STRINGS.sub("?", sql)
+    sql = _COMMENTS.sub(" ", sql)
+    sql = _PLACEHOLDERS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _LISTS.sub("(...)", sql)
+    sql = _ROWS.sub(r"\1", sql)
+    return _SPACE.sub(" ", sql).strip().lower()
+
+def _route():
+    return f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+
+class SqlProfiler:
+    def __init__(self, slow_ms=200, query_limit=25, repeat_limit=5, sample_rate=1.0,
+                 slow_log_size=200, flag_log_size=200):
+        self.enabled = True
+        self.slow_ms = slow_ms
+        self.query_limit = query_limit
+        self.repeat_limit = repeat_limit
+        self.sample_rate = sample_rate
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self.flagged = deque(maxlen=flag_log_size)
+        self.routes = {}
+        self.lock = threading.Lock()
+        self.counters = {'statements': 0, 'sampled_requests': 0, 'flagged_requests': 0, 'slow_queries': 0}
+
+    def configure(self, enabled=True, slow_ms=200, query_limit=25, repeat_limit=5, sample_rate=1.0):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.query_limit = query_limit
+        self.repeat_limit = repeat_limit
+        self.sample_rate = sample_rate
+
+    def start_request(self):
+        sampled = self.enabled and random.random() < self.sample_rate
+        g.sql_profile = {} if sampled else None
+
+    def observe(self, statement, args, seconds):
+        if not self.enabled or not has_request_context():
+            return
+        duration_ms = seconds * 1000
+        profile = g.get('sql_profile')
+        fp = None
+        if profile is not None:
+            fp = fingerprint(statement)
+            entry = profile.setdefault(fp, [0, 0.0])
+            entry[0] += 1
+            entry[1] += duration_ms
+        slow = None
+        if duration_ms >= self.slow_ms:
+            slow = {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'duration_ms': round(duration_ms, 3),
+                'fingerprint': fp or fingerprint(statement),
+                'statement': str(statement)[:1000],
+                'route': _route(),
+            }
+        with self.lock:
+            self.counters['statements'] += 1
+            if slow:
+                self.counters['slow_queries'] += 1
+                self.slow_queries.append(slow)
+
+    def finish_request(self):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return None
+        total = sum(count for count, _ in profile.values())
+        repeated = {fp: count for fp, (count, _) in profile.items() if count >= self.repeat_limit}
+        problems = []
+        if total > self.query_limit:
+            problems.append('too_many_queries')
+        if repeated:
+            problems.append('repeated_query')
+
+        route = _route()
+        with self.lock:
+            self.counters['sampled_requests'] += 1
+            stats = self.routes.setdefault(route, {
+                'sampled': 0, 'flagged': 0, 'max_queries': 0, 'total_queries': 0, 'repeated': {}
+            })
+            stats['sampled'] += 1
+            stats['total_queries'] += total
+            stats['max_queries'] = max(stats['max_queries'], total)
+            if problems:
+                self.counters['flagged_requests'] += 1
+                stats['flagged'] += 1
+                for fp, count in repeated.items():
+                    stats['repeated'][fp] = max(stats['repeated'].get(fp, 0), count)
+                self.flagged.append({
+                    'timestamp': datetime.now(timezone.utc).isoformat(),
+                    'route': route,
+                    'problems': problems,
+                    'queries': total,
+                    'db_ms': round(sum(ms for _, ms in profile.values()), 3),
+                    'repeated': [{'fingerprint': fp, 'count': count}
+                                 for fp, count in sorted(repeated.items(), key=lambda x: -x[1])]
+                })
+        return problems
+
+    def report(self, limit=50):
+        with self.lock:
+            routes = [{
+                'route': route,
+                'sampled': s['sampled'],
+                'flagged': s['flagged'],
+                'avg_queries': round(s['total_queries'] / s['sampled'], 2),
+                'max_queries': s['max_queries'],
+                'repeated': [{'fingerprint': fp, 'max_count': c}
+                             for fp, c in sorted(s['repeated'].items(), key=lambda x: -x[1])]
+            } for route, s in self.routes.items()]
+            counters = dict(self.counters)
+            slow = sorted(self.slow_queries, key=lambda q: -q['duration_ms'])[:limit]
+            flagged = list(self.flagged)[-limit:][::-1]
+        routes.sort(key=lambda r: (-r['flagged'], -r['max_queries']))
+        return {
+            'config': {
+                'enabled': self.enabled, 'sample_rate': self.sample_rate, 'slow_ms': self.slow_ms,
+                'query_limit': self.query_limit, 'repeat_limit': self.repeat_limit
+            },
+            'counters': counters,
+            'routes': routes[:limit],
+            'recent_flags': flagged,
+            'slow_queries': slow
+        }
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+            self.slow_queries.clear()
+            self.flagged.clear()
+            for k in self.counters:
+                self.counters[k] = 0
+
+sql_profiler = SqlProfiler()
+
+def init_profiler(app, profiler=sql_profiler):
+    profiler.configure(
+        enabled=app.config.get('SQL_PROFILER_ENABLED', True),
+        slow_ms=app.config.get('SQL_SLOW_QUERY_MS', 200),
+        query_limit=app.config.get('SQL_QUERY_LIMIT', 25),
+        repeat_limit=app.config.get('SQL_REPEAT_LIMIT', 5),
+        sample_rate=app.config.get('SQL_PROFILER_SAMPLE_RATE', 0.05)
+    )
+    mysql = app.config.get('MYSQL')
+    if hasattr(mysql, 'add_query_observer'):
+        mysql.add_query_observer(profiler.observe)
+
+    @app.before_request
+    def start_sql_profile():
+        profiler.start_request()
+
+    @app.after_request
+    def finish_sql_profile(response):
+        profiler.finish_request()
+        return response
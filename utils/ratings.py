@@ -0,0 +1,186 @@
+from utils.schema import register_table
+
+# Rating aggregates: sum, count and a 1-5 star histogram per salon, employee
+# and service. post_review/delete_review adjust the affected rows in their
+# own transaction with one INSERT ... ON DUPLICATE KEY UPDATE (+1 / -1), so
+# readers get an average, a count or a per-star filter count from a primary
+# key lookup instead of scanning the salon's reviews. rebuild() recomputes
+# everything from reviews and is scheduled as the repair job.
+#
+# A review counts towards the employee and service of its appointment.
+
+register_table('rating_aggregates', """
+    create table if not exists rating_aggregates (
+        scope enum('salon', 'employee', 'service') not null,
+        scope_id int not null,
+        rating_sum int not null default 0,
+        rating_count int not null default 0,
+        stars_1 int not null default 0,
+        stars_2 int not null default 0,
+        stars_3 int not null default 0,
+        stars_4 int not null default 0,
+        stars_5 int not null default 0,
+        average_rating decimal(3, 2) as (rating_sum / nullif(rating_count, 0)) stored,
+        updated_at datetime not null default current_timestamp on update current_timestamp,
+        primary key (scope, scope_id),
+        key idx_rating_aggregates_average (scope, average_rating)
+    )
+""")
+
+STARS = (1, 2, 3, 4, 5)
+LOCK_NAME = 'rating_aggregates_rebuild'
+COUNTERS = ('rating_sum', 'rating_count') + tuple(f'stars_{star}' for star in STARS)
+
+# (scope, scope_id) of every review matching {where}, one row per review and scope
+_SCOPED_REVIEWS = """
+    select 'salon' as scope, r.salon_id as scope_id, r.rating
+    from reviews r
+    where {where}
+    union all
+    select 'employee', a.employee_id, r.rating
+    from reviews r
+    join appointments a on a.appointment_id = r.appointment_id
+    where {where} and a.employee_id is not null
+    union all
+    select 'service', a.service_id, r.rating
+    from reviews r
+    join appointments a on a.appointment_id = r.appointment_id
+    where {where} and a.service_id is not null
+"""
+
+def _totals(where):
+    stars = ", ".join(f"sum(rating = {star}) as stars_{star}" for star in STARS)
+    return f"""
+        select scope, scope_id, sum(rating) as rating_sum, count(*) as rating_count, {stars}
+        from ({_SCOPED_REVIEWS.format(where=where)}) scoped
+        group by scope, scope_id
+    """
+
+def _apply(conn, where, params, sign):
+    updates = ", ".join(f"{c} = {c} + values({c})" for c in COUNTERS)
+    signed = ", ".join(f"%s * {c}" for c in COUNTERS)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            insert into rating_aggregates (scope, scope_id, {', '.join(COUNTERS)})
+            select scope, scope_id, {signed}
+            from ({_totals(where)}) totals
+            on duplicate key update {updates}
+        """, [sign] * len(COUNTERS) + list(params) * 3)
+    finally:
+        cursor.close()
+
+def add_review(conn, review_id):
+    """Count a just-inserted review; call in the transaction that inserted it."""
+    _apply(conn, "r.review_id = %s", (review_id,), 1)
+
+def remove_review(conn, review_id):
+    """Uncount a review; call before deleting it, in the same transaction."""
+    _apply(conn, "r.review_id = %s", (review_id,), -1)
+
+def remove_customer_reviews(conn, customer_id):
+    """Uncount every review of a customer, before they are deleted."""
+    _apply(conn, "r.customer_id = %s", (customer_id,), -1)
+
+def remove_salon_reviews(conn, salon_id):
+    """Uncount every review of a salon, before they are deleted."""
+    _apply(conn, "r.salon_id = %s", (salon_id,), -1)
+
+def parse_stars(value):
+    """Whole star count from a JSON value (4, 4.0 or "4"); None unless it is 1-5."""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number in STARS else None
+
+def rebuild(conn, wait=60):
+    """
+    Recompute every aggregate from reviews (repair job). INSERT ... SELECT
+    reads reviews with shared locks, so a review committed meanwhile is
+    either counted here or waits and applies its increment afterwards.
+    Returns how many scopes have reviews, or None when another worker still
+    holds the rebuild lock after `wait` seconds.
+    """
+    overwrite = ", ".join(f"{c} = values({c})" for c in COUNTERS)
+    zeros = ", ".join(f"ra.{c} = 0" for c in COUNTERS)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("select get_lock(%s, %s)", (LOCK_NAME, wait))
+        if not cursor.fetchone()[0]:
+            return None
+        try:
+            cursor.execute(f"""
+                insert into rating_aggregates (scope, scope_id, {', '.join(COUNTERS)})
+                {_totals("true")}
+                on duplicate key update {overwrite}
+            """)
+            # scopes whose last review is gone
+            cursor.execute(f"""
+                update rating_aggregates ra
+                left join ({_totals("true")}) totals
+                    on totals.scope = ra.scope and totals.scope_id = ra.scope_id
+                set {zeros}
+                where totals.scope_id is null and ra.rating_count <> 0
+            """)
+            conn.commit()
+            cursor.execute("select count(*) from rating_aggregates where rating_count > 0")
+            return cursor.fetchone()[0]
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("select release_lock(%s)", (LOCK_NAME,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+
+def aggregate_dict(row):
+    """(rating_sum, rating_count, stars_1..stars_5) -> response dict; None row means no reviews."""
+    row = row or (0,) * len(COUNTERS)
+    rating_sum, rating_count = row[0], row[1]
+    return {
+        'average_rating': round(rating_sum / rating_count, 2) if rating_count else None,
+        'rating_count': rating_count,
+        'histogram': {str(star): row[2 + i] for i, star in enumerate(STARS)}
+    }
+
+def get_aggregate(conn, scope, scope_id):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            select {', '.join(COUNTERS)} from rating_aggregates
+            where scope = %s and scope_id = %s
+        """, (scope, scope_id))
+        return aggregate_dict(cursor.fetchone())
+    finally:
+        cursor.close()
+
+def salon_breakdown(conn, salon_id):
+    """The salon's aggregate plus one per employee and service, from primary key lookups."""
+    cursor = conn.cursor()
+    try:
+        columns = ', '.join(f'ra.{c}' for c in COUNTERS)
+        cursor.execute(f"""
+            select e.employee_id, e.first_name, e.last_name, {columns}
+            from employees e
+            join rating_aggregates ra on ra.scope = 'employee' and ra.scope_id = e.employee_id
+            where e.salon_id = %s and ra.rating_count > 0
+            order by ra.average_rating desc, e.employee_id
+        """, (salon_id,))
+        employees = [{'employee_id': row[0], 'first_name': row[1], 'last_name': row[2], **aggregate_dict(row[3:])}
+                     for row in cursor.fetchall()]
+        cursor.execute(f"""
+            select sv.service_id, sv.name, {columns}
+            from services sv
+            join rating_aggregates ra on ra.scope = 'service' and ra.scope_id = sv.service_id
+            where sv.salon_id = %s and ra.rating_count > 0
+            order by ra.average_rating desc, sv.service_id
+        """, (salon_id,))
+        services = [{'service_id': row[0], 'name': row[1], **aggregate_dict(row[2:])}
+                    for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+    return {'salon': get_aggregate(conn, 'salon', salon_id), 'employees': employees, 'services': services}
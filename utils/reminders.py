@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+from utils.outbox import queue_messages
+from utils.schema import register_index
+
+# Appointment reminders. Every scan queues a reminder for each upcoming
+# appointment starting within the lead time that doesn't have one yet. The
+# reminder is an email_outbox row keyed by ('appointment_reminder',
+# appointment_id), so its state survives restarts and an appointment can
+# never be reminded twice, however many workers run the scan. A MySQL named
+# lock additionally keeps concurrent scans from doing the same work.
+
+CATEGORY = 'appointment_reminder'
+LOCK_NAME = 'salon.appointment_reminders'
+
+register_index('appointments', 'idx_appointments_start', 'appointment_date, start_time')
+
+# in-process record of the last scan, reported by reminder_metrics
+last_run = {'at': None, 'queued': 0, 'lock_held_elsewhere': False}
+
+# appointments in the window that have no reminder yet; the date range lets
+# idx_appointments_start narrow the scan before the exact timestamp check.
+# Customers without an email address never get a reminder, so they are left
+# out here rather than taking up a batch slot on every scan.
+_DUE = """
+    appointments.appointment_date between %s and %s
+    and timestamp(appointments.appointment_date, appointments.start_time) between %s and %s
+    and appointments.status <> 'cancelled'
+    and exists (
+        select 1 from users
+        where users.user_id = appointments.customer_id
+          and users.email <> ''
+    )
+    and not exists (
+        select 1 from email_outbox
+        where email_outbox.category = 'appointment_reminder'
+          and email_outbox.ref_id = appointments.appointment_id
+    )
+"""
+
+def _window(now, lead):
+    until = now + lead
+    return (now.date(), until.date(), now, until)
+
+def reminder_message(appointment_date, start_time, salon_name):
+    subject = f"Reminder: Appointment at {salon_name}"
+    body = (
+        f"Dear Customer,\n\n"
+        f"This is a reminder for your appointment at {salon_name} "
+        f"on {appointment_date} at {start_time}.\n\nThank you!"
+    )
+    return subject, body
+
+def due_reminders(cursor, now, lead, limit):
+    cursor.execute("""
+        select appointments.appointment_id, users.email, appointments.appointment_date,
+               appointments.start_time, salons.name
+        from appointments
+        join users on users.user_id = appointments.customer_id
+        join salons on salons.salon_id = appointments.salon_id
+        where """ + _DUE + """
+        order by appointments.appointment_date, appointments.start_time
+        limit %s
+    """, _window(now, lead) + (limit,))
+    return cursor.fetchall()
+
+def dispatch(conn, now=None, lead=timedelta(hours=24), batch_size=500):
+    """
+    Queue reminders for appointments starting within `lead`. Returns the number
+    queued, or None when another worker holds the dispatch lock.
+    """
+    now = now or datetime.now()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("select get_lock(%s, 0)", (LOCK_NAME,))
+        if not cursor.fetchone()[0]:
+            last_run.update(at=now, queued=0, lock_held_elsewhere=True)
+            return None
+        try:
+            queued = 0
+            while True:
+                rows = due_reminders(cursor, now, lead, batch_size)
+                messages = []
+                for appointment_id, email, appointment_date, start_time, salon_name in rows:
+                    if not email:
+                        continue
+                    subject, body = reminder_message(appointment_date, start_time, salon_name)
+                    messages.append((email, subject, body, None, CATEGORY, appointment_id))
+                queue_messages(conn, messages)
+                conn.commit()
+                queued += len(messages)
+                if len(rows) < batch_size:
+                    break
+        finally:
+            cursor.execute("select release_lock(%s)", (LOCK_NAME,))
+            cursor.fetchone()
+        last_run.update(at=now, queued=queued, lock_held_elsewhere=False)
+        return queued
+    finally:
+        cursor.close()
+
+def reminder_metrics(conn, now=None, lead=timedelta(hours=24)):
+    now = now or datetime.now()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("select count(*) from appointments where " + _DUE, _window(now, lead))
+        pending = cursor.fetchone()[0]
+        cursor.execute("""
+            select status, count(*)
+            from email_outbox
+            where category = %s
+            group by status
+        """, (CATEGORY,))
+        by_status = dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+    return {
+        'pending': pending,
+        'queued': by_status.get('pending', 0) + by_status.get('sending', 0),
+        'sent': by_status.get('sent', 0),
+        'failed': by_status.get('failed', 0),
+        'last_run': {
+            'at': last_run['at'].isoformat() if last_run['at'] else None,
+            'queued': last_run['queued'],
+            'lock_held_elsewhere': last_run['lock_held_elsewhere']
+        }
+    }
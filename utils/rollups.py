@@ -0,0 +1,296 @@
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from utils.schema import register_table
+
+# Pre-aggregated analytics. Every payment, refund and appointment status
+# change adds its deltas here inside the caller's transaction, so dashboard
+# reads are a lookup over (salon, dimension) groups instead of a GROUP BY over
+# appointments/invoices/invoice_line_items.
+#
+#   grain      'day' | 'month' | 'all' (lifetime, period = ALL_TIME)
+#   dimension  'salon' | 'service' | 'product' | 'employee'
+#   revenue    paid (non refunded) invoice totals, line totals for products
+#   quantity   invoices for salon/service/employee rows, units for products
+#   appointments  appointments scheduled in the period (any status)
+
+ALL_TIME = date(1000, 1, 1)
+CENT = Decimal('0.01')
+
+register_table('analytics_rollups', """
+    create table if not exists analytics_rollups (
+        grain enum('day', 'month', 'all') not null,
+        period date not null,
+        salon_id int not null,
+        dimension enum('salon', 'service', 'product', 'employee') not null,
+        dimension_id int not null,
+        revenue decimal(14, 2) not null default 0,
+        quantity int not null default 0,
+        appointments int not null default 0,
+        primary key (grain, dimension, dimension_id, period),
+        key idx_rollups_salon (salon_id, grain, dimension, period)
+    )
+""")
+
+register_table('analytics_status_rollups', """
+    create table if not exists analytics_status_rollups (
+        grain enum('day', 'month', 'all') not null,
+        period date not null,
+        salon_id int not null,
+        status varchar(32) not null,
+        appointments int not null default 0,
+        primary key (salon_id, grain, status, period)
+    )
+""")
+
+def _as_date(value):
+    if value is None:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+def _periods(day):
+    day = _as_date(day)
+    return (('day', day), ('month', day.replace(day=1)), ('all', ALL_TIME))
+
+class RollupDelta:
+    """Collects the deltas of one business event and writes them in two statements."""
+
+    def __init__(self):
+        self.metrics = defaultdict(lambda: [Decimal(0), 0, 0])
+        self.statuses = defaultdict(int)
+
+    def add(self, day, salon_id, dimension, dimension_id, revenue=0, quantity=0, appointments=0):
+        for grain, period in _periods(day):
+            row = self.metrics[(grain, period, salon_id, dimension, dimension_id)]
+            # request connections decode DECIMAL as float; sum exact cents instead
+            row[0] += Decimal(str(revenue)).quantize(CENT)
+            row[1] += quantity
+            row[2] += appointments
+
+    def add_status(self, day, salon_id, status, appointments):
+        if not status:
+            return
+        for grain, period in _periods(day):
+            self.statuses[(grain, period, salon_id, status.lower())] += appointments
+
+    def flush(self, cursor):
+        if self.metrics:
+            cursor.executemany("""
+                insert into analytics_rollups
+                    (grain, period, salon_id, dimension, dimension_id, revenue, quantity, appointments)
+                values (%s, %s, %s, %s, %s, %s, %s, %s)
+                on duplicate key update
+                    revenue = revenue + values(revenue),
+                    quantity = quantity + values(quantity),
+                    appointments = appointments + values(appointments)
+            """, [key + tuple(values) for key, values in self.metrics.items()])
+        if self.statuses:
+            cursor.executemany("""
+                insert into analytics_status_rollups (grain, period, salon_id, status, appointments)
+                values (%s, %s, %s, %s, %s)
+                on duplicate key update appointments = appointments + values(appointments)
+            """, [key + (count,) for key, count in self.statuses.items()])
+
+def _apply(conn, build):
+    # Errors propagate: the caller's except rolls the whole business
+    # transaction back, so a deadlock or lock wait timeout (which MySQL ends
+    # the transaction on) never leaves a payment committed without its
+    # rollup, or half of one.
+    cursor = conn.cursor()
+    try:
+        delta = RollupDelta()
+        build(cursor, delta)
+        delta.flush(cursor)
+    finally:
+        cursor.close()
+
+def _load_appointment(cursor, appointment_id):
+    cursor.execute("""
+        select salon_id, service_id, employee_id, appointment_date, status
+        from appointments
+        where appointment_id = %s
+    """, (appointment_id,))
+    return cursor.fetchone()
+
+def _count_appointment(delta, appointment, sign):
+    salon_id, service_id, employee_id, appointment_date, status = appointment
+    delta.add(appointment_date, salon_id, 'salon', salon_id, appointments=sign)
+    delta.add(appointment_date, salon_id, 'service', service_id, appointments=sign)
+    delta.add(appointment_date, salon_id, 'employee', employee_id, appointments=sign)
+    delta.add_status(appointment_date, salon_id, status, sign)
+
+def record_booking(conn, salon_id, service_id, employee_id, appointment_date, status='booked'):
+    record_bookings(conn, [(salon_id, service_id, employee_id, appointment_date)], status)
+
+def record_bookings(conn, bookings, status='booked'):
+    """bookings: iterable of (salon_id, service_id, employee_id, appointment_date)."""
+    def build(cursor, delta):
+        for salon_id, service_id, employee_id, appointment_date in bookings:
+            _count_appointment(delta, (salon_id, service_id, employee_id, appointment_date, status), 1)
+    _apply(conn, build)
+
+def record_reschedule(conn, appointment_id, new_date):
+    """Call before the UPDATE that moves the appointment."""
+    def build(cursor, delta):
+        appointment = _load_appointment(cursor, appointment_id)
+        if not appointment or _as_date(appointment[3]) == _as_date(new_date):
+            return
+        _count_appointment(delta, appointment, -1)
+        _count_appointment(delta, appointment[:3] + (new_date, appointment[4]), 1)
+    _apply(conn, build)
+
+def record_status_change(conn, appointment_id, new_status):
+    """Call before the UPDATE that changes appointments.status."""
+    def build(cursor, delta):
+        appointment = _load_appointment(cursor, appointment_id)
+        if not appointment or (appointment[4] or '').lower() == new_status.lower():
+            return
+        salon_id, appointment_date, status = appointment[0], appointment[3], appointment[4]
+        delta.add_status(appointment_date, salon_id, status, -1)
+        delta.add_status(appointment_date, salon_id, new_status, 1)
+    _apply(conn, build)
+
+def record_appointment_payment(conn, appointment_id, total, issued_date=None):
+    """Call before the UPDATE that marks the appointment paid."""
+    def build(cursor, delta):
+        appointment = _load_appointment(cursor, appointment_id)
+        if not appointment:
+            return
+        salon_id, service_id, employee_id, appointment_date, status = appointment
+        day = issued_date or date.today()
+        delta.add(day, salon_id, 'salon', salon_id, revenue=total, quantity=1)
+        delta.add(day, salon_id, 'service', service_id, revenue=total, quantity=1)
+        delta.add(day, salon_id, 'employee', employee_id, revenue=total, quantity=1)
+        if (status or '').lower() != 'paid':
+            delta.add_status(appointment_date, salon_id, status, -1)
+            delta.add_status(appointment_date, salon_id, 'paid', 1)
+    _apply(conn, build)
+
+def record_product_sale(conn, salon_id, items, issued_date=None):
+    """items: iterable of (product_id, quantity, line_total)."""
+    record_product_sales(conn, [(salon_id,) + tuple(item) for item in items], issued_date)
+
+def record_product_sales(conn, lines, issued_date=None):
+    """lines: iterable of (salon_id, product_id, quantity, line_total), any number of salons."""
+    def build(cursor, delta):
+        day = issued_date or date.today()
+        for salon_id, product_id, quantity, line_total in lines:
+            delta.add(day, int(salon_id), 'product', product_id, revenue=line_total, quantity=quantity)
+    _apply(conn, build)
+
+def record_refund(conn, invoice_id):
+    """Call before the invoice is marked cancelled; reverses what the payment added."""
+    def build(cursor, delta):
+        cursor.execute("""
+            select appointment_id, issued_date, total_amount, status
+            from invoices
+            where invoice_id = %s
+        """, (invoice_id,))
+        invoice = cursor.fetchone()
+        if not invoice or invoice[3] == 'cancelled':
+            return
+        appointment_id, issued_date, total, _ = invoice
+
+        if appointment_id:
+            appointment = _load_appointment(cursor, appointment_id)
+            if not appointment:
+                return
+            salon_id, service_id, employee_id, appointment_date, status = appointment
+            delta.add(issued_date, salon_id, 'salon', salon_id, revenue=-total, quantity=-1)
+            delta.add(issued_date, salon_id, 'service', service_id, revenue=-total, quantity=-1)
+            delta.add(issued_date, salon_id, 'employee', employee_id, revenue=-total, quantity=-1)
+            if (status or '').lower() != 'cancelled':
+                delta.add_status(appointment_date, salon_id, status, -1)
+                delta.add_status(appointment_date, salon_id, 'cancelled', 1)
+            return
+
+        cursor.execute("""
+            select products.salon_id, invoice_line_items.product_id,
+                   invoice_line_items.quantity, invoice_line_items.quantity * invoice_line_items.unit_price
+            from invoice_line_items
+            join products on products.product_id = invoice_line_items.product_id
+            where invoice_line_items.invoice_id = %s and invoice_line_items.item_type = 'product'
+        """, (invoice_id,))
+        for salon_id, product_id, quantity, line_total in cursor.fetchall():
+            delta.add(issued_date, salon_id, 'product', product_id, revenue=-line_total, quantity=-quantity)
+    _apply(conn, build)
+
+# backfill statements, formatted once per grain with its period expression
+_PERIOD_EXPR = {
+    'day': "{col}",
+    'month': "date_format({col}, '%%Y-%%m-01')",
+    'all': "'1000-01-01'",
+}
+
+_APPOINTMENT_COUNTS = """
+    insert into analytics_rollups (grain, period, salon_id, dimension, dimension_id, appointments)
+    select %s, {period}, salon_id, %s, {key}, count(*)
+    from appointments
+    group by {period}, salon_id, {key}
+    on duplicate key update appointments = appointments + values(appointments)
+"""
+
+_APPOINTMENT_REVENUE = """
+    insert into analytics_rollups (grain, period, salon_id, dimension, dimension_id, revenue, quantity)
+    select %s, {period}, appointments.salon_id, %s, appointments.{key},
+           sum(invoices.total_amount), count(*)
+    from invoices
+    join appointments on appointments.appointment_id = invoices.appointment_id
+    where invoices.status <> 'cancelled'
+    group by {period}, appointments.salon_id, appointments.{key}
+    on duplicate key update
+        revenue = revenue + values(revenue),
+        quantity = quantity + values(quantity)
+"""
+
+_PRODUCT_SALES = """
+    insert into analytics_rollups (grain, period, salon_id, dimension, dimension_id, revenue, quantity)
+    select %s, {period}, products.salon_id, 'product', products.product_id,
+           sum(invoice_line_items.quantity * invoice_line_items.unit_price), sum(invoice_line_items.quantity)
+    from invoice_line_items
+    join invoices on invoices.invoice_id = invoice_line_items.invoice_id
+    join products on products.product_id = invoice_line_items.product_id
+    where invoice_line_items.item_type = 'product' and invoices.status <> 'cancelled'
+    group by {period}, products.salon_id, products.product_id
+    on duplicate key update
+        revenue = revenue + values(revenue),
+        quantity = quantity + values(quantity)
+"""
+
+_STATUS_COUNTS = """
+    insert into analytics_status_rollups (grain, period, salon_id, status, appointments)
+    select %s, {period}, salon_id, lower(status), count(*)
+    from appointments
+    group by {period}, salon_id, lower(status)
+"""
+
+_DIMENSION_KEYS = (('salon', 'salon_id'), ('service', 'service_id'), ('employee', 'employee_id'))
+
+def rebuild(conn):
+    """Recompute every rollup from the source tables in one transaction."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("delete from analytics_rollups")
+        cursor.execute("delete from analytics_status_rollups")
+        for grain, expr in _PERIOD_EXPR.items():
+            for dimension, key in _DIMENSION_KEYS:
+                cursor.execute(
+                    _APPOINTMENT_COUNTS.format(period=expr.format(col='appointment_date'), key=key),
+                    (grain, dimension)
+                )
+                cursor.execute(
+                    _APPOINTMENT_REVENUE.format(period=expr.format(col='invoices.issued_date'), key=key),
+                    (grain, dimension)
+                )
+            cursor.execute(_PRODUCT_SALES.format(period=expr.format(col='invoices.issued_date')), (grain,))
+            cursor.execute(_STATUS_COUNTS.format(period=expr.format(col='appointment_date')), (grain,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,50 @@
+# Tables owned by backend subsystems (rollups, queues, projections, ...) and
+# indexes they need on existing tables.
+# Each module registers its DDL at import time and `flask --app app init-schema`
+# creates whatever is missing. DDL commits implicitly in MySQL, so it must never
+# run inside a request transaction.
+
+_tables = {}
+_indexes = {}
+_columns = {}
+
+def register_table(name, ddl):
+    _tables[name] = ddl
+
+def register_index(table, name, columns, unique=False):
+    """Secondary index on a table this repo doesn't own the DDL for."""
+    _indexes[(table, name)] = (columns, unique)
+
+def register_column(table, name, definition):
+    """Extra column on a table this repo doesn't own the DDL for."""
+    _columns[(table, name)] = definition
+
+def registered_tables():
+    return list(_tables)
+
+def ensure_schema(conn):
+    cursor = conn.cursor()
+    try:
+        for ddl in _tables.values():
+            cursor.execute(ddl)
+        for (table, name), definition in _columns.items():
+            cursor.execute("""
+                select 1 from information_schema.columns
+                where table_schema = database() and table_name = %s and column_name = %s
+                limit 1
+            """, (table, name))
+            if not cursor.fetchone():
+                cursor.execute(f"alter table {table} add column {name} {definition}")
+        # mysql has no "create index if not exists"
+        for (table, name), (columns, unique) in _indexes.items():
+            cursor.execute("""
+                select 1 from information_schema.statistics
+                where table_schema = database() and table_name = %s and index_name = %s
+                limit 1
+            """, (table, name))
+            if not cursor.fetchone():
+                kind = "unique index" if unique else "index"
+                cursor.execute(f"create {kind} {name} on {table} ({columns})")
+    finally:
+        cursor.close()
+    conn.commit()
@@ -0,0 +1,426 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from utils.schema import register_table
+
+# In-process salon search. Each worker keeps an inverted index (term ->
+# salons and the fields the term appears in) over salon name, description,
+# city/state, master tags, service names/tags and employee names. Lookups
+# match whole terms, prefixes (autocomplete) and terms one edit away
+# (typos), then rank by text score weighted with rating and verification.
+#
+# Writers call mark_salon_changed() inside their transaction; every worker
+# polls search_index_changes and reloads just the salons listed there, so
+# the index stays current across gunicorn workers without a rebuild.
+
+register_table('search_index_changes', """
+    create table if not exists search_index_changes (
+        change_id bigint auto_increment primary key,
+        salon_id int not null,
+        created_at datetime not null default current_timestamp
+    )
+""")
+
+# Change ids become visible in commit order, not id order: a reader must not
+# move its offset past a gap younger than FEED_GAP_GRACE seconds, or a lower
+# id committing late is skipped for good. Older gaps are rolled-back inserts.
+FEED_GAP_GRACE = 60
+FEED_RETENTION_HOURS = 24
+
+def advance_offset(offset, changes):
+    """
+    New feed offset after reading `changes` ((change_id, salon_id, age_seconds)
+    in id order): the highest id with no recent gap before it.
+    """
+    for change_id, _, age in changes:
+        if change_id != offset + 1 and age < FEED_GAP_GRACE:
+            break
+        offset = change_id
+    return offset
+
+def purge_changes(conn, hours=FEED_RETENTION_HOURS, batch_size=10000):
+    """
+    Delete feed rows older than `hours` that every projection_offsets reader
+    has passed; returns rows deleted. Workers idle longer rebuild their index.
+    """
+    cursor = conn.cursor()
+    try:
+        deleted = 0
+        while True:
+            cursor.execute("""
+                delete from search_index_changes
+                where created_at < now() - interval %s hour
+                  and change_id <= (select coalesce(min(last_change_id), 0) from projection_offsets)
+                order by change_id
+                limit %s
+            """, (hours, batch_size))
+            conn.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                return deleted
+    finally:
+        cursor.close()
+
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'tag': 2.0,
+    'service': 2.0,
+    'employee': 1.5,
+    'location': 1.5,
+    'description': 1.0,
+}
+
+EXACT, PREFIX, FUZZY = 1.0, 0.8, 0.5
+MIN_PREFIX = 2
+MIN_FUZZY = 4
+
+def tokenize(text):
+    return re.findall(r"[^\W_]+", (text or '').casefold())
+
+def _deletions(term):
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+class SearchIndex:
+    def __init__(self):
+        self.docs = {}
+        self.postings = {}
+        self.doc_terms = {}
+        self.deletes = {}
+        self.sorted_terms = []
+        self.sorted_dirty = False
+        self.lock = threading.RLock()
+
+    def upsert(self, doc):
+        """doc: {'salon_id', 'fields': {field: text or [texts]}, 'rating', 'is_verified', ...}"""
+        with self.lock:
+            self.remove(doc['salon_id'])
+            salon_id = doc['salon_id']
+            terms = {}
+            for field, value in doc['fields'].items():
+                texts = value if isinstance(value, (list, tuple, set)) else [value]
+                for text in texts:
+                    for term in tokenize(text):
+                        terms.setdefault(term, set()).add(field)
+            for term, fields in terms.items():
+                if term not in self.postings:
+                    self.postings[term] = {}
+                    self.sorted_dirty = True
+                    if len(term) >= MIN_FUZZY - 1:
+                        for variant in _deletions(term):
+                            self.deletes.setdefault(variant, set()).add(term)
+                self.postings[term][salon_id] = fields
+            self.docs[salon_id] = doc
+            self.doc_terms[salon_id] = set(terms)
+
+    def remove(self, salon_id):
+        with self.lock:
+            for term in self.doc_terms.pop(salon_id, ()):
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                posting.pop(salon_id, None)
+                if not posting:
+                    del self.postings[term]
+                    self.sorted_dirty = True
+                    for variant in _deletions(term):
+                        bucket = self.deletes.get(variant)
+                        if bucket:
+                            bucket.discard(term)
+                            if not bucket:
+                                del self.deletes[variant]
+            self.docs.pop(salon_id, None)
+
+    def _prefixed(self, token):
+        if self.sorted_dirty:
+            self.sorted_terms = sorted(self.postings)
+            self.sorted_dirty = False
+        i = bisect_left(self.sorted_terms, token)
+        while i < len(self.sorted_terms) and self.sorted_terms[i].startswith(token):
+            yield self.sorted_terms[i]
+            i += 1
+
+    def _fuzzy(self, token):
+        # symmetric delete: terms within one insertion, deletion or substitution
+        candidates = set(self.deletes.get(token, ()))
+        for variant in _deletions(token):
+            if variant in self.postings:
+                candidates.add(variant)
+            candidates |= self.deletes.get(variant, set())
+        candidates.discard(token)
+        return candidates
+
+    def match(self, token, fields=None):
+        """salon_id -> best score of one query token."""
+        scores = {}
+
+        def add(term, quality):
+            for salon_id, term_fields in self.postings.get(term, {}).items():
+                weights = [FIELD_WEIGHTS[f] for f in term_fields if fields is None or f in fields]
+                if weights:
+                    score = max(weights) * quality
+                    if score > scores.get(salon_id, 0):
+                        scores[salon_id] = score
+
+        add(token, EXACT)
+        if len(token) >= MIN_PREFIX:
+            for term in self._prefixed(token):
+                if term != token:
+                    add(term, PREFIX)
+        if len(token) >= MIN_FUZZY:
+            for term in self._fuzzy(token):
+                add(term, FUZZY)
+        return scores
+
+    def rank_boost(self, doc):
+        rating = float(doc.get('average_rating') or 0)
+        return (1 + rating / 5) * (1.25 if doc.get('is_verified') else 1.0)
+
+    def search(self, query, fields=None, where=None, limit=None):
+        """
+        Docs matching every query token, best first. An empty query returns
+        every doc ordered by verification, rating and name. `where` is an
+        optional predicate on the doc.
+        """
+        with self.lock:
+            tokens = tokenize(query)
+            if not tokens:
+                docs = [d for d in self.docs.values() if where is None or where(d)]
+                docs.sort(key=lambda d: (not d.get('is_verified'), -float(d.get('average_rating') or 0), d.get('name') or ''))
+                return docs[:limit] if limit else docs
+
+            scores = None
+            for token in tokens:
+                matched = self.match(token, fields)
+                if scores is None:
+                    scores = matched
+                else:
+                    scores = {sid: s + matched[sid] for sid, s in scores.items() if sid in matched}
+                if not scores:
+                    return []
+
+            ranked = []
+            for salon_id, score in scores.items():
+                doc = self.docs[salon_id]
+                if where is None or where(doc):
+                    ranked.append((score * self.rank_boost(doc), doc))
+            ranked.sort(key=lambda pair: (-pair[0], pair[1].get('name') or ''))
+            docs = [doc for _, doc in ranked]
+            return docs[:limit] if limit else docs
+
+    def match_ids(self, query, fields=None):
+        return [doc['salon_id'] for doc in self.search(query, fields=fields)]
+
+def _restrict(keyword, column, ids):
+    if ids is None:
+        return "", []
+    return f" {keyword} {column} in (" + ", ".join(["%s"] * len(ids)) + ")", list(ids)
+
+def load_documents(conn, salon_ids=None):
+    """Index documents for the given salons (all salons when None), five flat queries."""
+    cursor = conn.cursor()
+    try:
+        where, params = _restrict("where", "s.salon_id", salon_ids)
+        cursor.execute("""
+            select s.salon_id, s.name, s.description, s.email, s.phone_number, s.is_verified, s.created_at,
+                   a.address, a.city, a.state, a.postal_code,
+                   ra.average_rating, coalesce(ra.rating_count, 0)
+            from salons s
+            left join addresses a on a.salon_id = s.salon_id and a.entity_type = 'salon'
+            left join rating_aggregates ra on ra.scope = 'salon' and ra.scope_id = s.salon_id
+        """ + where, params)
+        docs = {}
+        for row in cursor.fetchall():
+            docs[row[0]] = {
+                'salon_id': row[0], 'name': row[1], 'description': row[2], 'email': row[3],
+                'phone_number': row[4], 'is_verified': bool(row[5]), 'created_at': row[6],
+                'address': row[7], 'city': row[8], 'state': row[9], 'postal_code': row[10],
+                'average_rating': row[11],
+                'review_count': row[12],
+                'master_tags': [], 'specific_tags': [], 'services': [], 'employees': []
+            }
+
+        def collect(sql, keyword, column, key, fmt=lambda row: row[1]):
+            where, params = _restrict(keyword, column, salon_ids)
+            cursor.execute(sql + where, params)
+            for row in cursor.fetchall():
+                doc = docs.get(row[0])
+                if doc is not None and fmt(row) not in doc[key]:
+                    doc[key].append(fmt(row))
+
+        collect("""
+            select emt.entity_id, mt.name
+            from entity_master_tags emt
+            join master_tags mt on mt.master_tag_id = emt.master_tag_id
+            where emt.entity_type = 'salon'
+        """, "and", "emt.entity_id", 'master_tags')
+        collect("""
+            select services.salon_id, tags.name
+            from entity_tags et
+            join services on services.service_id = et.entity_id
+            join tags on tags.tag_id = et.tag_id
+            where et.entity_type = 'service'
+        """, "and", "services.salon_id", 'specific_tags')
+        collect("select services.salon_id, services.name from services", "where", "services.salon_id", 'services')
+        collect(
+            "select employees.salon_id, employees.first_name, employees.last_name from employees",
+            "where", "employees.salon_id", 'employees', lambda row: f"{row[1] or ''} {row[2] or ''}".strip()
+        )
+    finally:
+        cursor.close()
+
+    for doc in docs.values():
+        doc['fields'] = {
+            'name': doc['name'],
+            'description': doc['description'],
+            'location': [doc['city'], doc['state']],
+            'tag': doc['master_tags'] + doc['specific_tags'],
+            'service': doc['services'],
+            'employee': doc['employees'],
+        }
+    return docs
+
+class SalonSearch:
+    """
+    Lazily built per-process index kept in sync through search_index_changes.
+    Full rebuilds run from the background refresh() job and build the new
+    index without holding the lock, so searches keep using the old one until
+    it is swapped in; only a cold process builds on the request thread.
+    """
+
+    def __init__(self, sync_interval=5, max_idle=FEED_RETENTION_HOURS * 3600 / 2):
+        self.sync_interval = sync_interval
+        self.max_idle = max_idle
+        self.index = None
+        self.last_change_id = 0
+        self.synced_at = 0
+        self.loaded_at = 0
+        self.lock = threading.Lock()
+
+    def _latest_change(self, cursor):
+        cursor.execute("select coalesce(max(change_id), 0) from search_index_changes")
+        return cursor.fetchone()[0]
+
+    def _build(self, conn):
+        cursor = conn.cursor()
+        try:
+            last_change_id = self._latest_change(cursor)
+        finally:
+            cursor.close()
+        index = SearchIndex()
+        for doc in load_documents(conn).values():
+            index.upsert(doc)
+        return index, last_change_id
+
+    def _swap(self, index, last_change_id):
+        # changes after last_change_id are applied by the next sync, even if
+        # the old index had already seen them
+        self.index, self.last_change_id = index, last_change_id
+        self.synced_at = self.loaded_at = time.monotonic()
+        return index
+
+    def rebuild(self, conn):
+        """Build a fresh index, then swap it in; searches meanwhile use the current one."""
+        index, last_change_id = self._build(conn)
+        with self.lock:
+            return self._swap(index, last_change_id)
+
+    def sync(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                select change_id, salon_id, timestampdiff(second, created_at, now())
+                from search_index_changes
+                where change_id > %s
+                order by change_id
+            """, (self.last_change_id,))
+            changes = cursor.fetchall()
+        finally:
+            cursor.close()
+        self.synced_at = self.loaded_at = time.monotonic()
+        if not changes:
+            return 0
+        salon_ids = {salon_id for _, salon_id, _ in changes}
+        docs = load_documents(conn, sorted(salon_ids))
+        for salon_id in salon_ids:
+            if salon_id in docs:
+                self.index.upsert(docs[salon_id])
+            else:
+                self.index.remove(salon_id)
+        # changes past an in-flight gap are applied now and read again next time
+        self.last_change_id = advance_offset(self.last_change_id, changes)
+        return len(salon_ids)
+
+    def get(self, conn):
+        with self.lock:
+            if self.index is None:
+                # cold process: nothing to serve yet
+                return self._swap(*self._build(conn))
+            if time.monotonic() - self.synced_at >= self.sync_interval:
+                self.sync(conn)
+            return self.index
+
+    def refresh(self, conn):
+        """
+        Background job: keeps the index synced while no searches come in, and
+        rebuilds it when it was never built or has been idle longer than the
+        feed is kept (the purge may have dropped changes it never read).
+        Returns True when it rebuilt.
+        """
+        if self.index is None or time.monotonic() - self.loaded_at >= self.max_idle:
+            self.rebuild(conn)
+            return True
+        with self.lock:
+            self.sync(conn)
+        return False
+
+    def expire(self):
+        self.synced_at = 0
+
+salon_search = SalonSearch()
+
+def mark_salon_changed(conn, salon_id):
+    """Queue a salon for reindexing; call inside the transaction that changed it."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("insert into search_index_changes (salon_id) values (%s)", (salon_id,))
+    finally:
+        cursor.close()
+    # this worker picks it up on its next search, the others within sync_interval
+    salon_search.expire()
+
+def mark_review_salon_changed(conn, review_id):
+    """Same as mark_salon_changed for the salon a review belongs to (its rating moves)."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            insert into search_index_changes (salon_id)
+            select salon_id from reviews where review_id = %s
+        """, (review_id,))
+    finally:
+        cursor.close()
+    salon_search.expire()
+
+def mark_reviewer_salons_changed(conn, customer_id):
+    """Queue every salon a customer reviewed, before their reviews are deleted."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            insert into search_index_changes (salon_id)
+            select distinct salon_id from reviews where customer_id = %s
+        """, (customer_id,))
+    finally:
+        cursor.close()
+    salon_search.expire()
+
+def mark_gallery_salon_changed(conn, gallery_id):
+    """Queue the salon when the gallery image is its profile photo (salon_summary shows it)."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            insert into search_index_changes (salon_id)
+            select salon_id from salon_gallery
+            where gallery_id = %s and is_primary = true and employee_id is null and product_id is null
+        """, (gallery_id,))
+    finally:
+        cursor.close()
@@ -0,0 +1,78 @@
+from flask import Response, current_app, request, stream_with_context
+from MySQLdb.cursors import SSCursor
+from utils.logerror import log_error
+
+# Streaming list responses. Unbounded lists used to be fetchall()-ed, turned
+# into a second list of dicts and then jsonify-ed as one string, so a worker
+# held the table three times over. Here rows are read from an unbuffered
+# server-side cursor STREAM_FETCH_SIZE at a time and encoded as they arrive:
+# the response keeps its usual JSON shape ({"users": [...]}) but is written
+# in chunks, and clients that send Accept: application/x-ndjson (or
+# ?format=ndjson) get one JSON document per line instead. Memory per request
+# stays at one batch of rows whatever the table size.
+#
+# The connection is busy until the cursor is exhausted or closed, so the view
+# must not run other queries on it after handing the rows to stream_json.
+
+NDJSON = 'application/x-ndjson'
+
+def wants_ndjson():
+    return request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == NDJSON
+
+def server_cursor(conn):
+    """Unbuffered cursor: rows stay on the server until they are fetched."""
+    return conn.cursor(SSCursor)
+
+def iter_rows(cursor, size=None):
+    """Yields the executed cursor's rows as dicts, fetching `size` at a time."""
+    size = size or current_app.config.get('STREAM_FETCH_SIZE', 500)
+    columns = [desc[0] for desc in cursor.description]
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        for row in rows:
+            yield dict(zip(columns, row))
+
+def stream_json(items, key=None, head=None, count_key=None, cursor=None):
+    """
+    Response streaming `items` as {**head, key: [...], count_key: n}, or as a
+    bare list when key is None. `cursor` is closed once the stream ends.
+    """
+    dumps = current_app.json.dumps
+    ndjson = wants_ndjson()
+    batch = current_app.config.get('STREAM_FETCH_SIZE', 500)
+
+    if key is None:
+        opening, closing = '[', ']'
+    else:
+        fields = [f'{dumps(k)}: {dumps(v)}, ' for k, v in (head or {}).items()]
+        opening, closing = '{' + ''.join(fields) + dumps(key) + ': [', ']'
+
+    def generate():
+        count = 0
+        chunk = [] if ndjson else [opening]
+        try:
+            for item in items:
+                if ndjson:
+                    chunk.append(dumps(item) + '\n')
+                else:
+                    chunk.append((',' if count else '') + dumps(item))
+                count += 1
+                if len(chunk) >= batch:
+                    yield ''.join(chunk)
+                    chunk = []
+            if not ndjson:
+                chunk.append(closing)
+                if key is not None:
+                    chunk.append(f', {dumps(count_key)}: {count}}}' if count_key else '}')
+            yield ''.join(chunk)
+        except Exception as e:
+            # headers are already out; dropping the connection is the only way to signal it
+            log_error(f"Streaming {request.path} failed: {e}")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON if ndjson else 'application/json')
@@ -0,0 +1,210 @@
+import json
+from utils.schema import register_table
+from utils.search import advance_offset
+
+# salon_summary: one precomputed card per salon (base fields, city/state,
+# master and service tags as JSON arrays, rating sum/count, profile photo).
+# Listing, favorites and the landing page read it with a single indexed
+# lookup instead of joining addresses, tags and reviews and grouping the
+# fanned-out rows on every request.
+#
+# The projection follows the same search_index_changes feed the search index
+# uses: every writer that touches a salon's reviews, tags, address, photo or
+# verification already calls mark_salon_changed() in its transaction, and
+# sync() refreshes just those salons. Change ids become visible in commit
+# order, not id order, so the stored offset is moved with
+# search.advance_offset and never passes a gap younger than FEED_GAP_GRACE
+# seconds - a transaction still in flight is picked up once it commits, and
+# a rolled-back id stops blocking after the grace period.
+# rebuild() recomputes every card and is run periodically as the repair job.
+
+register_table('salon_summary', """
+    create table if not exists salon_summary (
+        salon_id int primary key,
+        owner_id int null,
+        name varchar(255) not null,
+        description text null,
+        email varchar(255) null,
+        phone_number varchar(32) null,
+        is_verified boolean not null default false,
+        created_at datetime null,
+        address varchar(255) null,
+        city varchar(100) null,
+        state varchar(50) null,
+        postal_code varchar(20) null,
+        master_tags json not null,
+        specific_tags json not null,
+        rating_sum int not null default 0,
+        rating_count int not null default 0,
+        average_rating decimal(3, 2) as (rating_sum / nullif(rating_count, 0)) stored,
+        primary_image_url varchar(1024) null,
+        refreshed_at datetime not null default current_timestamp on update current_timestamp,
+        key idx_salon_summary_verified (is_verified, salon_id),
+        key idx_salon_summary_rating (is_verified, average_rating, name)
+    )
+""")
+
+register_table('projection_offsets', """
+    create table if not exists projection_offsets (
+        name varchar(64) primary key,
+        last_change_id bigint not null default 0,
+        updated_at datetime not null default current_timestamp on update current_timestamp
+    )
+""")
+
+PROJECTION = 'salon_summary'
+LOCK_NAME = 'salon_summary_sync'
+
+CARD_COLUMNS = (
+    'salon_id', 'owner_id', 'name', 'description', 'email', 'phone_number', 'is_verified', 'created_at',
+    'address', 'city', 'state', 'postal_code', 'master_tags', 'specific_tags',
+    'average_rating', 'rating_count', 'primary_image_url'
+)
+
+def _restrict(keyword, column, ids):
+    if ids is None:
+        return "", []
+    return f" {keyword} {column} in (" + ", ".join(["%s"] * len(ids)) + ")", list(ids)
+
+def refresh(conn, salon_ids=None):
+    """
+    Recompute the cards of `salon_ids` (every salon when None) in one
+    statement and drop cards of salons that no longer exist. Each aggregate
+    is grouped in its own derived table, so nothing fans out; ratings come
+    from rating_aggregates.
+    """
+    if salon_ids is not None and not salon_ids:
+        return
+    salons, salon_params = _restrict("where", "s.salon_id", salon_ids)
+    master, master_params = _restrict("and", "emt.entity_id", salon_ids)
+    specific, specific_params = _restrict("and", "sv.salon_id", salon_ids)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            insert into salon_summary (salon_id, owner_id, name, description, email, phone_number, is_verified,
+                                       created_at, address, city, state, postal_code, master_tags, specific_tags,
+                                       rating_sum, rating_count, primary_image_url)
+            select s.salon_id, s.owner_id, s.name, s.description, s.email, s.phone_number, s.is_verified,
+                   s.created_at, a.address, a.city, a.state, a.postal_code,
+                   coalesce(mt.names, json_array()), coalesce(st.names, json_array()),
+                   coalesce(r.rating_sum, 0), coalesce(r.rating_count, 0),
+                   (select g.image_url from salon_gallery g
+                    where g.salon_id = s.salon_id and g.is_primary = true
+                      and g.employee_id is null and g.product_id is null
+                    order by g.last_modified desc, g.gallery_id desc
+                    limit 1)
+            from salons s
+            left join addresses a on a.salon_id = s.salon_id and a.entity_type = 'salon'
+            left join (
+                select emt.entity_id as salon_id, json_arrayagg(m.name) as names
+                from entity_master_tags emt
+                join master_tags m on m.master_tag_id = emt.master_tag_id
+                where emt.entity_type = 'salon'{master}
+                group by emt.entity_id
+            ) mt on mt.salon_id = s.salon_id
+            left join (
+                select salon_id, json_arrayagg(name) as names
+                from (
+                    select distinct sv.salon_id, t.name
+                    from entity_tags et
+                    join services sv on sv.service_id = et.entity_id
+                    join tags t on t.tag_id = et.tag_id
+                    where et.entity_type = 'service'{specific}
+                ) service_tags
+                group by salon_id
+            ) st on st.salon_id = s.salon_id
+            left join rating_aggregates r on r.scope = 'salon' and r.scope_id = s.salon_id
+            {salons}
+            on duplicate key update
+                owner_id = values(owner_id), name = values(name), description = values(description),
+                email = values(email), phone_number = values(phone_number), is_verified = values(is_verified),
+                created_at = values(created_at), address = values(address), city = values(city),
+                state = values(state), postal_code = values(postal_code), master_tags = values(master_tags),
+                specific_tags = values(specific_tags), rating_sum = values(rating_sum),
+                rating_count = values(rating_count), primary_image_url = values(primary_image_url)
+        """, master_params + specific_params + salon_params)
+        gone, gone_params = _restrict("and", "salon_id", salon_ids)
+        cursor.execute(f"""
+            delete from salon_summary
+            where salon_id not in (select salon_id from salons){gone}
+        """, gone_params)
+    finally:
+        cursor.close()
+
+def _locked(conn, work, wait=0):
+    """Runs work(cursor) holding LOCK_NAME; None when another worker has it."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("select get_lock(%s, %s)", (LOCK_NAME, wait))
+        if not cursor.fetchone()[0]:
+            return None
+        try:
+            return work(cursor)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("select release_lock(%s)", (LOCK_NAME,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+
+def sync(conn, batch_size=1000):
+    """
+    Refresh the salons changed since the stored offset. Returns how many were
+    refreshed, or None when another worker is already syncing.
+    """
+    def work(cursor):
+        cursor.execute("select last_change_id from projection_offsets where name = %s", (PROJECTION,))
+        row = cursor.fetchone()
+        offset = row[0] if row else 0
+        refreshed = 0
+        while True:
+            cursor.execute("""
+                select change_id, salon_id, timestampdiff(second, created_at, now())
+                from search_index_changes
+                where change_id > %s
+                order by change_id
+                limit %s
+            """, (offset, batch_size))
+            changes = cursor.fetchall()
+            if not changes:
+                return refreshed
+            salon_ids = sorted({salon_id for _, salon_id, _ in changes})
+            refresh(conn, salon_ids)
+            refreshed += len(salon_ids)
+            advanced = advance_offset(offset, changes)
+            cursor.execute("""
+                insert into projection_offsets (name, last_change_id) values (%s, %s)
+                on duplicate key update last_change_id = values(last_change_id)
+            """, (PROJECTION, advanced))
+            conn.commit()
+            # stopped at an in-flight gap: the rest is read again on the next run
+            if advanced != changes[-1][0] or len(changes) < batch_size:
+                return refreshed
+            offset = advanced
+
+    return _locked(conn, work)
+
+def rebuild(conn, wait=60):
+    """Recompute every card (repair job / first deploy); returns how many there are."""
+    def work(cursor):
+        refresh(conn)
+        conn.commit()
+        cursor.execute("select count(*) from salon_summary")
+        return cursor.fetchone()[0]
+
+    return _locked(conn, work, wait)
+
+def summary_select(alias='ss'):
+    return ", ".join(f"{alias}.{column}" for column in CARD_COLUMNS)
+
+def card(row):
+    """salon_summary row (CARD_COLUMNS order or a dict) -> response dict with tags as lists."""
+    data = dict(row) if isinstance(row, dict) else dict(zip(CARD_COLUMNS, row))
+    for key in ('master_tags', 'specific_tags'):
+        value = data.get(key)
+        data[key] = json.loads(value) if isinstance(value, (str, bytes)) else (value or [])
+    data['is_verified'] = bool(data.get('is_verified'))
+    data['review_count'] = data.pop('rating_count', 0)
+    return data
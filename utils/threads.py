@@ -0,0 +1,177 @@
+from utils.schema import register_column, register_index
+
+# Review reply threads. Every reply stores its materialized path - the ids
+# from its root down to itself, zero-padded and '/'-terminated - and its
+# depth, so a thread (or any subtree) is one contiguous range of the
+# (review_id, path) index and comes back already in depth-first order:
+#
+#   0000000012/                 root reply 12
+#   0000000012/0000000031/      31 answers 12
+#   0000000012/0000000031/0000000040/
+#
+# Replies of a whole page of reviews load with one query and build_forest()
+# links them into trees in a single pass. Ids only grow, so siblings in path
+# order are also oldest first.
+
+register_column('review_replies', 'depth', 'int not null default 0')
+register_column('review_replies', 'path', 'varchar(255) null')
+register_index('review_replies', 'idx_replies_review_path', 'review_id, path')
+register_index('review_replies', 'idx_replies_parent_created', 'review_id, parent_reply_id, created_at, reply_id')
+
+SEGMENT = 10
+# 11 characters per level must fit in path varchar(255)
+MAX_REPLY_DEPTH = 20
+
+class InvalidReply(ValueError):
+    pass
+
+def segment(reply_id):
+    return str(reply_id).zfill(SEGMENT) + '/'
+
+def add_reply(conn, review_id, user_id, message, created_at, parent_reply_id=None):
+    """Insert a reply with its path in the caller's transaction; returns (reply_id, depth)."""
+    cursor = conn.cursor()
+    try:
+        prefix, depth = '', 0
+        if parent_reply_id is not None:
+            cursor.execute("""
+                select path, depth from review_replies
+                where reply_id = %s and review_id = %s
+            """, (parent_reply_id, review_id))
+            parent = cursor.fetchone()
+            if not parent:
+                raise InvalidReply('Parent reply not found on this review')
+            # a parent not backfilled yet leaves the path to backfill_paths()
+            prefix, depth = parent[0], parent[1] + 1
+            if depth > MAX_REPLY_DEPTH:
+                raise InvalidReply(f'Replies cannot be nested more than {MAX_REPLY_DEPTH} levels deep')
+        cursor.execute("""
+            insert into review_replies(review_id, user_id, parent_reply_id, message, created_at, depth)
+            values(%s, %s, %s, %s, %s, %s)
+        """, (review_id, user_id, parent_reply_id, message, created_at, depth))
+        reply_id = cursor.lastrowid
+        if prefix is not None:
+            cursor.execute("update review_replies set path = %s where reply_id = %s",
+                           (prefix + segment(reply_id), reply_id))
+        return reply_id, depth
+    finally:
+        cursor.close()
+
+REPLY_COLUMNS = ('reply_id', 'review_id', 'parent_reply_id', 'user_id', 'first_name', 'last_name',
+                 'message', 'created_at', 'depth')
+
+def _fetch(conn, where, params, max_depth=None):
+    if max_depth is not None:
+        # one level past the limit tells which cut-off replies have children
+        where += " and rr.depth <= %s"
+        params = list(params) + [max_depth + 1]
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            select rr.reply_id, rr.review_id, rr.parent_reply_id, rr.user_id, u.first_name, u.last_name,
+                   rr.message, rr.created_at, rr.depth
+            from review_replies rr
+            left join users u on u.user_id = rr.user_id
+            where {where}
+            order by rr.review_id, rr.path, rr.reply_id
+        """, params)
+        return [dict(zip(REPLY_COLUMNS, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def build_forest(rows, max_depth=None):
+    """
+    Link reply rows into trees: returns {review_id: [root replies]}, each reply
+    with a nested 'replies' list. A reply whose parent is not among the rows
+    becomes a root. Replies deeper than max_depth are dropped and their parent
+    gets has_replies = True.
+    """
+    nodes = {}
+    for row in rows:
+        row['replies'] = []
+        row['has_replies'] = False
+        nodes[row['reply_id']] = row
+    forest = {}
+    for row in rows:
+        parent = nodes.get(row['parent_reply_id'])
+        if parent is not None:
+            parent['has_replies'] = True
+        if max_depth is not None and row['depth'] > max_depth:
+            continue
+        if parent is not None:
+            parent['replies'].append(row)
+        else:
+            forest.setdefault(row['review_id'], []).append(row)
+    return forest
+
+def load_threads(conn, review_ids, max_depth=None):
+    """Reply trees of several reviews in one range query: {review_id: [roots]}."""
+    if not review_ids:
+        return {}
+    where = "rr.review_id in (" + ", ".join(["%s"] * len(review_ids)) + ")"
+    return build_forest(_fetch(conn, where, review_ids, max_depth), max_depth)
+
+def load_subtrees(conn, review_id, replies, max_depth=None):
+    """
+    Subtrees under `replies` (rows with reply_id, path, depth) of one review,
+    `max_depth` levels below them; returns {reply_id: [children]}.
+    """
+    replies = [reply for reply in replies if reply['path']]
+    if not replies:
+        return {}
+    ranges = " or ".join(["rr.path like %s"] * len(replies))
+    params = [review_id] + [reply['path'] + '_%' for reply in replies]
+    base = min(reply['depth'] for reply in replies)
+    limit = None if max_depth is None else base + max_depth
+    rows = _fetch(conn, f"rr.review_id = %s and ({ranges})", params, limit)
+    # children of the requested replies are the roots of this forest
+    children = {}
+    for root in build_forest(rows, limit).get(review_id, []):
+        children.setdefault(root['parent_reply_id'], []).append(root)
+    return children
+
+def delete_subtree(conn, reply_id):
+    """Delete a reply and everything under it in the caller's transaction; returns rows deleted."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("select review_id, path from review_replies where reply_id = %s", (reply_id,))
+        row = cursor.fetchone()
+        if not row:
+            return 0
+        review_id, path = row
+        if path:
+            cursor.execute("delete from review_replies where review_id = %s and path like %s",
+                           (review_id, path + '%'))
+        else:
+            cursor.execute("delete from review_replies where reply_id = %s", (reply_id,))
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+def backfill_paths(conn):
+    """Fill path/depth of replies written before paths existed, one tree level per pass."""
+    cursor = conn.cursor()
+    try:
+        filled = 0
+        # roots, and replies whose parent was deleted
+        cursor.execute("""
+            update review_replies c
+            left join review_replies p on p.reply_id = c.parent_reply_id
+            set c.depth = 0, c.path = concat(lpad(c.reply_id, %s, '0'), '/')
+            where c.path is null and p.reply_id is null
+        """, (SEGMENT,))
+        filled += cursor.rowcount
+        conn.commit()
+        while True:
+            cursor.execute("""
+                update review_replies c
+                join review_replies p on p.reply_id = c.parent_reply_id
+                set c.depth = p.depth + 1, c.path = concat(p.path, lpad(c.reply_id, %s, '0'), '/')
+                where c.path is null and p.path is not null
+            """, (SEGMENT,))
+            conn.commit()
+            if not cursor.rowcount:
+                return filled
+            filled += cursor.rowcount
+    finally:
+        cursor.close()
@@ -0,0 +1,169 @@
+import threading
+import time
+
+# Token-bucket throttling for endpoints that trigger expensive work (scrypt
+# on /login, outbound mail on /forgot-password). Each limit allows a burst of
+# `capacity` attempts per identity (IP, username, email) refilled evenly over
+# `period` seconds. Callers check before touching the database or the KDF and
+# answer 429 with Retry-After when a bucket is empty.
+#
+# Buckets live in process memory; with THROTTLE_REDIS_URL they live in Redis
+# instead so every worker draws from the same bucket.
+
+DEFAULT_LIMITS = {
+    'login_ip': (20, 60),
+    'login_user': (5, 60),
+    'forgot_ip': (5, 600),
+    'forgot_email': (3, 3600),
+}
+
+class LocalBuckets:
+    def __init__(self, max_keys=100000):
+        self.buckets = {}
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, period, now=None):
+        """Returns 0 when a token was taken, else seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        rate = capacity / period
+        with self.lock:
+            tokens, updated, _, _ = self.buckets.get(key, (capacity, now, rate, capacity))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                # each bucket keeps its own limit, prune() refills it at that rate
+                self.buckets[key] = (tokens - 1, now, rate, capacity)
+                if len(self.buckets) > self.max_keys:
+                    self.prune(now)
+                return 0
+            self.buckets[key] = (tokens, now, rate, capacity)
+            return (1 - tokens) / rate
+
+    def prune(self, now):
+        # a bucket that has refilled is the same as no bucket; if that isn't
+        # enough, forget the least recently touched half
+        full = [k for k, (tokens, updated, rate, capacity) in self.buckets.items()
+                if tokens + (now - updated) * rate >= capacity]
+        for k in full:
+            del self.buckets[k]
+        if len(self.buckets) > self.max_keys:
+            by_age = sorted(self.buckets, key=lambda k: self.buckets[k][1])
+            for k in by_age[:len(by_age) // 2]:
+                del self.buckets[k]
+
+    def exhausted(self, prefix, capacity, period, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            return [k[len(prefix):] for k, (tokens, updated, rate, _) in self.buckets.items()
+                    if k.startswith(prefix) and tokens + (now - updated) * rate < 1]
+
+    def __len__(self):
+        return len(self.buckets)
+
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('hmget', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('hset', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('expire', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+class RedisBuckets:
+    """Shared buckets; needs the redis package, only loaded when configured."""
+
+    def __init__(self, url, prefix='salon-throttle:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.script = self.client.register_script(_TAKE_SCRIPT)
+
+    def take(self, key, capacity, period, now=None):
+        now = time.time() if now is None else now
+        return float(self.script(keys=[self.prefix + key], args=[capacity, capacity / period, now]))
+
+    def exhausted(self, prefix, capacity, period, now=None):
+        return None  # not enumerated in the shared store
+
+    def __len__(self):
+        return 0
+
+class Throttle:
+    def __init__(self, limits=None, store=None):
+        self.limits = dict(DEFAULT_LIMITS)
+        self.limits.update(limits or {})
+        self.store = store or LocalBuckets()
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def configure(self, limits=None, store=None, enabled=True):
+        self.limits = dict(DEFAULT_LIMITS)
+        self.limits.update(limits or {})
+        self.store = store or LocalBuckets()
+        self.enabled = enabled
+
+    def count(self, name, outcome):
+        with self.lock:
+            counts = self.counts.setdefault(name, {'allowed': 0, 'rejected': 0, 'errors': 0})
+            counts[outcome] += 1
+
+    def check(self, *rules):
+        """
+        rules: (limit name, identity) pairs; identities that are empty are
+        skipped. Returns 0 if every bucket had a token, otherwise the longest
+        Retry-After in seconds. A failing shared store lets the request through.
+        """
+        if not self.enabled:
+            return 0
+        wait = 0
+        for name, identity in rules:
+            if not identity:
+                continue
+            capacity, period = self.limits[name]
+            try:
+                retry_after = self.store.take(f"{name}:{str(identity).lower()}", capacity, period)
+            except Exception:
+                self.count(name, 'errors')
+                continue
+            self.count(name, 'rejected' if retry_after else 'allowed')
+            wait = max(wait, retry_after)
+        return wait
+
+    def stats(self):
+        with self.lock:
+            counts = {name: dict(c) for name, c in self.counts.items()}
+        limits = {}
+        for name, (capacity, period) in self.limits.items():
+            exhausted = self.store.exhausted(name + ':', capacity, period)
+            limits[name] = dict(
+                capacity=capacity,
+                period_seconds=period,
+                throttled_now=len(exhausted) if exhausted is not None else None,
+                **counts.get(name, {'allowed': 0, 'rejected': 0, 'errors': 0})
+            )
+        return {
+            'enabled': self.enabled,
+            'shared_store': isinstance(self.store, RedisBuckets),
+            'tracked_keys': len(self.store),
+            'limits': limits
+        }
+
+throttle = Throttle()
+
+def init_throttle(app):
+    throttle.configure(
+        limits=app.config.get('THROTTLE_LIMITS'),
+        store=RedisBuckets(app.config['THROTTLE_REDIS_URL']) if app.config.get('THROTTLE_REDIS_URL') else None,
+        enabled=app.config.get('THROTTLE_ENABLED', True)
+    )